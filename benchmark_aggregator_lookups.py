@@ -0,0 +1,75 @@
+# benchmark_aggregator_lookups.py
+# Compara a latência da busca "última linha por dezena até o concurso X" no AnalysisAggregator:
+# consulta antiga (ROW_NUMBER() OVER PARTITION BY, sem índice) vs. busca indexada (dezena, concurso).
+# Uso: python benchmark_aggregator_lookups.py [--contests 3400] [--repeats 20]
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.analysis_aggregator import AnalysisAggregator
+from src.config import config_obj
+from src.database_manager import DatabaseManager
+
+
+def legacy_sql(table: str, cid_col: str) -> str:
+    return f"""
+        WITH RankedData AS (
+            SELECT dezena, current_delay, max_delay_observed, avg_delay,
+                   ROW_NUMBER() OVER (PARTITION BY dezena ORDER BY {cid_col} DESC) as rn
+            FROM {table} WHERE {cid_col} <= ?
+        )
+        SELECT dezena, current_delay, max_delay_observed, avg_delay FROM RankedData WHERE rn = 1;
+    """
+
+
+def time_queries(db: DatabaseManager, sql: str, contest_ids, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for contest_id in contest_ids:
+            db.execute_query(sql, (int(contest_id),))
+    return (time.perf_counter() - start) * 1000.0 / (repeats * len(contest_ids))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de buscas por concurso no AnalysisAggregator.")
+    parser.add_argument('--contests', type=int, default=3400)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    table = config_obj.ANALYSIS_DELAYS_TABLE_NAME
+    cid_col = config_obj.CONTEST_ID_COLUMN_NAME
+    rng = np.random.default_rng(0)
+    contests = np.repeat(np.arange(1, args.contests + 1), 25)
+    df = pd.DataFrame({
+        cid_col: contests,
+        'dezena': np.tile(np.arange(1, 26), args.contests),
+        'current_delay': rng.integers(0, 20, len(contests)),
+        'max_delay_observed': rng.integers(0, 30, len(contests)),
+        'avg_delay': rng.random(len(contests)),
+    })
+    lookup_contests = rng.integers(1, args.contests + 1, 10)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseManager(str(Path(tmp_dir) / "benchmark.db"))
+        try:
+            db.save_dataframe(df, table)
+            aggregator = AnalysisAggregator(db, config_obj)
+            before_ms = time_queries(db, legacy_sql(table, cid_col), lookup_contests, args.repeats)
+            aggregator.ensure_metric_indexes()
+            indexed_sql = aggregator._latest_rows_sql(table, "t.current_delay, t.max_delay_observed, t.avg_delay")
+            after_ms = time_queries(db, indexed_sql, lookup_contests, args.repeats)
+        finally:
+            db.close()
+
+    print(f"Tabela '{table}': {len(df)} linhas ({args.contests} concursos x 25 dezenas)")
+    print(f"  ROW_NUMBER() sem índice : {before_ms:8.3f} ms/consulta")
+    print(f"  Busca indexada          : {after_ms:8.3f} ms/consulta")
+    print(f"  Ganho                   : {before_ms / after_ms:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# benchmark_db_bulk_write.py
+# Compara a gravação das tabelas históricas (analysis_delays, analysis_frequency_overall):
+# df.to_sql(if_exists='replace', chunksize=1000) vs. DatabaseManager.bulk_write
+# (executemany numa única transação, PRAGMAs de carga em lote), em modo 'replace' e 'upsert'.
+# Uso: python benchmark_db_bulk_write.py [--contests 3400] [--repeats 3]
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.config import config_obj
+from src.database_manager import DatabaseManager
+
+
+def build_tables(n_contests: int):
+    rng = np.random.default_rng(0)
+    cid_col = config_obj.CONTEST_ID_COLUMN_NAME
+    contests = np.repeat(np.arange(1, n_contests + 1), 25)
+    dezenas = np.tile(np.arange(1, 26), n_contests)
+    delays = pd.DataFrame({
+        cid_col: contests, config_obj.DEZENA_COLUMN_NAME: dezenas,
+        config_obj.CURRENT_DELAY_COLUMN_NAME: rng.integers(0, 20, len(contests)),
+        config_obj.MAX_DELAY_OBSERVED_COLUMN_NAME: rng.integers(0, 30, len(contests)),
+        config_obj.AVG_DELAY_COLUMN_NAME: rng.random(len(contests)),
+    })
+    frequency = pd.DataFrame({
+        cid_col: contests, config_obj.DEZENA_COLUMN_NAME: dezenas,
+        config_obj.FREQUENCY_COLUMN_NAME: rng.integers(0, 2000, len(contests)),
+        config_obj.RELATIVE_FREQUENCY_COLUMN_NAME: rng.random(len(contests)),
+    })
+    return {
+        (config_obj.ANALYSIS_DELAYS_TABLE_NAME, '_create_table_analysis_delays'): delays,
+        (config_obj.ANALYSIS_FREQUENCY_OVERALL_TABLE_NAME, '_create_table_analysis_frequency_overall'): frequency,
+    }
+
+
+def best_of(repeats: int, func) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de gravação em lote no DatabaseManager.")
+    parser.add_argument('--contests', type=int, default=3400)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseManager(str(Path(tmp_dir) / "benchmark.db"))
+        try:
+            for (table, create_method), df in build_tables(args.contests).items():
+                to_sql_ms = best_of(args.repeats, lambda: df.to_sql(table, db.conn, if_exists='replace', index=False, chunksize=1000))
+                plain_ms = best_of(args.repeats, lambda: db.bulk_write(df, table, mode='replace')) # mesma tabela, sem chave
+                db._execute_ddl_query(f"DROP TABLE IF EXISTS {table}")
+                getattr(db, create_method)() # DDL com chave primária, preservada pelo bulk_write
+                keyed_ms = best_of(args.repeats, lambda: db.bulk_write(df, table, mode='replace'))
+                tail = df[df[config_obj.CONTEST_ID_COLUMN_NAME] > args.contests - 50]
+                upsert_ms = best_of(args.repeats, lambda: db.bulk_write(tail, table, mode='upsert'))
+
+                print(f"Tabela '{table}': {len(df)} linhas ({args.contests} concursos x 25 dezenas)")
+                print(f"  to_sql replace (chunksize=1000) : {to_sql_ms:9.1f} ms")
+                print(f"  bulk_write replace (sem chave)  : {plain_ms:9.1f} ms  ({to_sql_ms / plain_ms:.1f}x)")
+                print(f"  bulk_write replace (DDL com PK) : {keyed_ms:9.1f} ms")
+                print(f"  bulk_write upsert (50 concursos): {upsert_ms:9.1f} ms")
+        finally:
+            db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,163 @@
 # Lotofacil_Analysis/src/analysis/block_aggregator.py
 import pandas as pd
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Sequence
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
-def aggregate_block_data_to_wide_format(db_manager: Any, config: Any):
+# Métricas por dezena das tabelas bloco_analises_consolidadas_{tipo}_{tamanho}, na ordem das linhas.
+# 'engine_key': array do ChunkPrefixEngine.compute ('rank' = rank denso da frequência no bloco).
+BLOCK_PER_DEZENA_METRICS = [
+    {"source_table_prefix_const_name": "EVOL_METRIC_FREQUENCY_BLOCK_PREFIX", "value_column": "frequencia_absoluta", "analysis_type_name": "frequencia_bloco", "dtype": "Int64", "engine_key": "frequency"},
+    {"source_table_prefix_const_name": "EVOL_RANK_FREQUENCY_BLOCK_PREFIX", "value_column": "rank_no_bloco", "analysis_type_name": "rank_freq_bloco", "dtype": "Int64", "engine_key": "rank"},
+    {"source_table_prefix_const_name": "EVOL_METRIC_ATRASO_MEDIO_BLOCK_PREFIX", "value_column": "atraso_medio_no_bloco", "analysis_type_name": "atraso_medio_bloco", "dtype": "float", "engine_key": "delay_mean"},
+    {"source_table_prefix_const_name": "EVOL_METRIC_ATRASO_MAXIMO_BLOCK_PREFIX", "value_column": "atraso_maximo_no_bloco", "analysis_type_name": "atraso_maximo_bloco", "dtype": "Int64", "engine_key": "delay_max"},
+    {"source_table_prefix_const_name": "EVOL_METRIC_ATRASO_FINAL_BLOCK_PREFIX", "value_column": "atraso_final_no_bloco", "analysis_type_name": "atraso_final_no_bloco", "dtype": "Int64", "engine_key": "delay_final"},
+    {"source_table_prefix_const_name": "EVOL_METRIC_OCCURRENCE_STD_DEV_BLOCK_PREFIX", "value_column": "occurrence_std_dev", "analysis_type_name": "occurrence_std_dev_bloco", "dtype": "float", "engine_key": "occurrence_std"},
+    {"source_table_prefix_const_name": "EVOL_METRIC_DELAY_STD_DEV_BLOCK_PREFIX", "value_column": "delay_std_dev", "analysis_type_name": "delay_std_dev_bloco", "dtype": "float", "engine_key": "delay_std"},
+]
+BLOCK_KEY_COLUMNS = ['chunk_seq_id', 'chunk_start_contest', 'chunk_end_contest']
+# Métricas por dezena da tabela cycle_analises_consolidadas; 'engine_key': array de build_cycle_metric_arrays.
+CYCLE_PER_DEZENA_METRICS = [
+    {"source_table_name_const": "CYCLE_METRIC_FREQUENCY_TABLE_NAME", "value_column": "frequencia_no_ciclo", "analysis_type_name": "frequencia_no_ciclo", "dtype": "Int64", "engine_key": "frequency"},
+    {"source_table_name_const": "CYCLE_METRIC_ATRASO_MEDIO_TABLE_NAME", "value_column": "atraso_medio_no_ciclo", "analysis_type_name": "atraso_medio_no_ciclo", "dtype": "float", "engine_key": "delay_mean"},
+    {"source_table_name_const": "CYCLE_METRIC_ATRASO_MAXIMO_TABLE_NAME", "value_column": "atraso_maximo_no_ciclo", "analysis_type_name": "atraso_maximo_no_ciclo", "dtype": "Int64", "engine_key": "delay_max"},
+    {"source_table_name_const": "CYCLE_METRIC_ATRASO_FINAL_TABLE_NAME", "value_column": "atraso_final_no_ciclo", "analysis_type_name": "atraso_final_no_ciclo", "dtype": "Int64", "engine_key": "delay_final"},
+    {"source_table_name_const": "CYCLE_RANK_FREQUENCY_TABLE_NAME", "value_column": "rank_freq_no_ciclo", "analysis_type_name": "rank_freq_no_ciclo", "dtype": "Int64", "engine_key": "rank"},
+]
+CYCLE_BASE_INFO_RENAME = {'concurso_inicio': 'concurso_inicio_ciclo', 'concurso_fim': 'concurso_fim_ciclo', 'duracao_concursos': 'duracao_ciclo'}
+
+
+def dense_rank_descending(values: np.ndarray) -> np.ndarray:
+    """Rank denso decrescente por linha (maior valor = 1), como groupby().rank(method='dense', ascending=False)."""
+    sorted_values = np.sort(values, axis=1)
+    distinct = np.ones(sorted_values.shape, dtype=bool)
+    distinct[:, 1:] = sorted_values[:, 1:] != sorted_values[:, :-1]
+    greater_distinct = (sorted_values[:, None, :] > values[:, :, None]) & distinct[:, None, :]
+    return greater_distinct.sum(axis=2) + 1
+
+
+def build_block_wide_frame(chunk_metrics: Dict[str, np.ndarray], dezena_positions: Sequence[int], config: Any,
+                           group_metrics_df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Tabela larga de um tipo/tamanho de bloco direto dos arrays do ChunkPrefixEngine:
+    uma linha por (bloco, métrica) com dezena_1..25, mais as métricas de grupo do bloco.
+    Produz o mesmo conteúdo que o pivot das tabelas longas em aggregate_block_data_to_wide_format.
+    """
+    kept = np.flatnonzero(chunk_metrics['has_draws'])
+    row_positions: List[np.ndarray] = []
+    type_names: List[np.ndarray] = []
+    metric_blocks: List[np.ndarray] = []
+    used_dtypes = set()
+    for metric_config_item in BLOCK_PER_DEZENA_METRICS:
+        engine_key = metric_config_item["engine_key"]
+        source_key = 'frequency' if engine_key == 'rank' else engine_key
+        values = chunk_metrics[source_key][np.ix_(kept, list(dezena_positions))]
+        if engine_key == 'rank':
+            values = dense_rank_descending(values)
+        elif engine_key in ('delay_std', 'occurrence_std'):
+            values = np.round(values, 6)
+        values = np.asarray(values, dtype=float)
+        rows_with_values = np.flatnonzero(~np.isnan(values).all(axis=1)) # o pivot omite blocos sem nenhum valor
+        if not len(rows_with_values):
+            continue
+        row_positions.append(rows_with_values)
+        type_names.append(np.full(len(rows_with_values), metric_config_item["analysis_type_name"], dtype=object))
+        metric_blocks.append(values[rows_with_values])
+        used_dtypes.add(metric_config_item["dtype"])
+
+    if not metric_blocks:
+        return group_metrics_df.copy() if group_metrics_df is not None else pd.DataFrame()
+    # Mesmo dtype que o concat das métricas pivotadas: Int64 + float -> Float64.
+    column_dtype = 'Int64' if used_dtypes == {'Int64'} else ('float' if used_dtypes == {'float'} else 'Float64')
+    rows = kept[np.concatenate(row_positions)]
+    all_values = np.vstack(metric_blocks)
+    columns: Dict[str, Any] = {
+        'chunk_seq_id': rows + 1,
+        'chunk_start_contest': chunk_metrics['chunk_start'][rows],
+        'chunk_end_contest': chunk_metrics['chunk_end'][rows],
+        'tipo_analise': np.concatenate(type_names),
+    }
+    for position, dezena in enumerate(config.ALL_NUMBERS):
+        column_values = all_values[:, position]
+        columns[f'dezena_{dezena}'] = column_values if column_dtype == 'float' else pd.array(column_values, dtype=column_dtype)
+    df_consolidated_wide = pd.DataFrame(columns)
+    if group_metrics_df is not None and not group_metrics_df.empty:
+        df_consolidated_wide = pd.merge(df_consolidated_wide, group_metrics_df, on=BLOCK_KEY_COLUMNS, how='left')
+    return df_consolidated_wide
+
+
+def build_cycle_metric_arrays(cycle_metrics: Dict[str, np.ndarray], dezena_positions: Sequence[int]) -> Dict[str, np.ndarray]:
+    """
+    Arrays (ciclos x dezenas) das métricas de ciclo a partir de ChunkPrefixEngine.compute_ranges,
+    com os valores padrão das tabelas de ciclo: dezena ausente no ciclo tem atraso médio =
+    duração; ciclo sem sorteios nos dados tem rank NaN.
+    """
+    positions = list(dezena_positions)
+    has_draws = cycle_metrics['has_draws'][:, None]
+    durations = (cycle_metrics['chunk_end'] - cycle_metrics['chunk_start'] + 1)[:, None].astype(float)
+    frequency = cycle_metrics['frequency'][:, positions]
+    delay_mean = cycle_metrics['delay_mean'][:, positions]
+    return {
+        'frequency': frequency,
+        'rank': np.where(has_draws, dense_rank_descending(frequency), np.nan),
+        'delay_mean': np.where(np.isnan(delay_mean), durations, delay_mean),
+        'delay_max': cycle_metrics['delay_max'][:, positions],
+        'delay_final': cycle_metrics['delay_final'][:, positions],
+    }
+
+
+def build_cycle_wide_frame(per_dezena: Dict[str, np.ndarray], df_closed_cycles: pd.DataFrame, config: Any,
+                           group_metrics_df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Tabela larga de ciclos direto dos arrays de build_cycle_metric_arrays (linhas na ordem de
+    df_closed_cycles): uma linha por (ciclo, métrica) com dezena_1..25, mais as métricas de grupo.
+    Produz o mesmo conteúdo que o pivot das tabelas longas em aggregate_cycle_data_to_wide_format.
+    """
+    base_info = df_closed_cycles.rename(columns=CYCLE_BASE_INFO_RENAME)
+    base_info_cols = [col for col in ['ciclo_num'] + list(CYCLE_BASE_INFO_RENAME.values()) if col in base_info.columns]
+    base_info = base_info[base_info_cols].reset_index(drop=True)
+    first_of_cycle = ~base_info['ciclo_num'].duplicated().to_numpy()
+
+    row_positions: List[np.ndarray] = []
+    type_names: List[np.ndarray] = []
+    metric_blocks: List[np.ndarray] = []
+    used_dtypes = set()
+    for metric_config_item in CYCLE_PER_DEZENA_METRICS:
+        values = np.asarray(per_dezena[metric_config_item["engine_key"]], dtype=float)
+        rows_with_values = np.flatnonzero(~np.isnan(values).all(axis=1) & first_of_cycle) # o pivot omite ciclos sem valores
+        if not len(rows_with_values):
+            continue
+        row_positions.append(rows_with_values)
+        type_names.append(np.full(len(rows_with_values), metric_config_item["analysis_type_name"], dtype=object))
+        metric_blocks.append(values[rows_with_values])
+        used_dtypes.add(metric_config_item["dtype"])
+
+    if not metric_blocks:
+        return pd.DataFrame()
+    column_dtype = 'Int64' if used_dtypes == {'Int64'} else ('float' if used_dtypes == {'float'} else 'Float64')
+    all_values = np.vstack(metric_blocks)
+    df_consolidated_wide = base_info.iloc[np.concatenate(row_positions)].reset_index(drop=True)
+    df_consolidated_wide['tipo_analise_ciclo'] = np.concatenate(type_names)
+    dezena_columns = {f'dezena_{dezena}': (all_values[:, position] if column_dtype == 'float' else pd.array(all_values[:, position], dtype=column_dtype))
+                      for position, dezena in enumerate(config.ALL_NUMBERS)}
+    df_consolidated_wide = pd.concat([df_consolidated_wide, pd.DataFrame(dezena_columns)], axis=1)
+    if group_metrics_df is not None and not group_metrics_df.empty:
+        group_metrics = group_metrics_df.astype({'ciclo_num': base_info['ciclo_num'].dtype})
+        df_consolidated_wide = pd.merge(df_consolidated_wide, group_metrics, on='ciclo_num', how='left')
+    return df_consolidated_wide
+
+
+def aggregate_block_data_to_wide_format(db_manager: Any, config: Any, rebuild_existing: bool = False):
+    """
+    Monta as tabelas largas de bloco a partir das tabelas longas no SQLite.
+    O cálculo de chunks (calculate_chunk_metrics_and_persist) já materializa essas tabelas
+    em memória; tabelas existentes só são refeitas com rebuild_existing=True.
+    """
     logger.info("Iniciando agregação de dados de bloco para formato largo (incluindo métricas de grupo).")
 
-    per_dezena_metric_configs = [
-        {"source_table_prefix_const_name": "EVOL_METRIC_FREQUENCY_BLOCK_PREFIX", "value_column": "frequencia_absoluta", "analysis_type_name": "frequencia_bloco", "dtype": "Int64"},
-        {"source_table_prefix_const_name": "EVOL_RANK_FREQUENCY_BLOCK_PREFIX", "value_column": "rank_no_bloco", "analysis_type_name": "rank_freq_bloco", "dtype": "Int64"},
-        {"source_table_prefix_const_name": "EVOL_METRIC_ATRASO_MEDIO_BLOCK_PREFIX", "value_column": "atraso_medio_no_bloco", "analysis_type_name": "atraso_medio_bloco", "dtype": "float"},
-        {"source_table_prefix_const_name": "EVOL_METRIC_ATRASO_MAXIMO_BLOCK_PREFIX", "value_column": "atraso_maximo_no_bloco", "analysis_type_name": "atraso_maximo_bloco", "dtype": "Int64"},
-        {"source_table_prefix_const_name": "EVOL_METRIC_ATRASO_FINAL_BLOCK_PREFIX", "value_column": "atraso_final_no_bloco", "analysis_type_name": "atraso_final_no_bloco", "dtype": "Int64"},
-        {"source_table_prefix_const_name": "EVOL_METRIC_OCCURRENCE_STD_DEV_BLOCK_PREFIX", "value_column": "occurrence_std_dev", "analysis_type_name": "occurrence_std_dev_bloco", "dtype": "float"},
-        {"source_table_prefix_const_name": "EVOL_METRIC_DELAY_STD_DEV_BLOCK_PREFIX", "value_column": "delay_std_dev", "analysis_type_name": "delay_std_dev_bloco", "dtype": "float"},
-    ]
+    per_dezena_metric_configs = BLOCK_PER_DEZENA_METRICS
 
     required_config_attrs = [
         'CHUNK_TYPES_CONFIG', 'BLOCK_ANALISES_CONSOLIDADAS_PREFIX',
@@ -32,6 +172,9 @@ def aggregate_block_data_to_wide_format(db_manager: Any, config: Any):
     for chunk_type, list_of_sizes in config.CHUNK_TYPES_CONFIG.items():
         for size_val in list_of_sizes:
             consolidated_table_name = f"{config.BLOCK_ANALISES_CONSOLIDADAS_PREFIX}_{chunk_type}_{size_val}"
+            if not rebuild_existing and db_manager.table_exists(consolidated_table_name):
+                logger.info(f"Tabela consolidada de BLOCKS '{consolidated_table_name}' já materializada no cálculo de chunks. Pulando.")
+                continue
             logger.info(f"Processando para tabela consolidada de BLOCKS: '{consolidated_table_name}'")
             all_wide_dfs_for_this_chunk_config: List[pd.DataFrame] = []
 
@@ -126,16 +269,18 @@ def aggregate_block_data_to_wide_format(db_manager: Any, config: Any):
     logger.info("Agregação de dados de bloco para formato largo concluída.")
 
 
-def aggregate_cycle_data_to_wide_format(db_manager: Any, config: Any):
+def aggregate_cycle_data_to_wide_format(db_manager: Any, config: Any, rebuild_existing: bool = False):
+    """
+    Monta a tabela larga de ciclos a partir das tabelas longas no SQLite.
+    calculate_detailed_metrics_per_closed_cycle já materializa essa tabela em memória;
+    ela só é refeita com rebuild_existing=True.
+    """
     logger.info("Iniciando agregação de dados de CICLO para formato largo.")
-    cycle_per_dezena_metric_configs = [
-        {"source_table_name_const": "CYCLE_METRIC_FREQUENCY_TABLE_NAME", "value_column": "frequencia_no_ciclo", "analysis_type_name": "frequencia_no_ciclo", "dtype": "Int64"},
-        {"source_table_name_const": "CYCLE_METRIC_ATRASO_MEDIO_TABLE_NAME", "value_column": "atraso_medio_no_ciclo", "analysis_type_name": "atraso_medio_no_ciclo", "dtype": "float"},
-        {"source_table_name_const": "CYCLE_METRIC_ATRASO_MAXIMO_TABLE_NAME", "value_column": "atraso_maximo_no_ciclo", "analysis_type_name": "atraso_maximo_no_ciclo", "dtype": "Int64"},
-        {"source_table_name_const": "CYCLE_METRIC_ATRASO_FINAL_TABLE_NAME", "value_column": "atraso_final_no_ciclo", "analysis_type_name": "atraso_final_no_ciclo", "dtype": "Int64"},
-        {"source_table_name_const": "CYCLE_RANK_FREQUENCY_TABLE_NAME", "value_column": "rank_freq_no_ciclo", "analysis_type_name": "rank_freq_no_ciclo", "dtype": "Int64"},
-    ]
+    cycle_per_dezena_metric_configs = CYCLE_PER_DEZENA_METRICS
     consolidated_cycle_table_name = config.CYCLE_ANALISES_CONSOLIDADAS_TABLE_NAME
+    if not rebuild_existing and db_manager.table_exists(consolidated_cycle_table_name):
+        logger.info(f"Tabela consolidada de CICLOS '{consolidated_cycle_table_name}' já materializada nas métricas detalhadas. Pulando.")
+        return
     all_wide_dfs_for_cycles: List[pd.DataFrame] = []
     cycles_detail_input_table = config.ANALYSIS_CYCLES_DETAIL_TABLE_NAME
 
@@ -152,11 +297,7 @@ def aggregate_cycle_data_to_wide_format(db_manager: Any, config: Any):
         logger.warning(f"Nenhum ciclo fechado em '{cycles_detail_input_table}'. Consolidada de ciclos não gerada.")
         return
 
-    rename_map_ciclos = {'concurso_inicio': 'concurso_inicio_ciclo',
-                         'concurso_fim': 'concurso_fim_ciclo'}
-    if 'duracao_concursos' in df_closed_ciclos_base_info.columns:
-        rename_map_ciclos['duracao_concursos'] = 'duracao_ciclo'
-    df_closed_ciclos_base_info.rename(columns=rename_map_ciclos, inplace=True)
+    df_closed_ciclos_base_info.rename(columns=CYCLE_BASE_INFO_RENAME, inplace=True)
     
     # Garantir que ciclo_num exista e seja usado como base
     if 'ciclo_num' not in df_closed_ciclos_base_info.columns:
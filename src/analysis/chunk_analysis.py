@@ -3,9 +3,11 @@ import pandas as pd
 from typing import List, Dict, Tuple, Any, Set, Optional
 import logging
 import numpy as np
-import math
 
-from src.analysis.number_properties_analysis import analyze_draw_properties
+from src.analysis.number_properties_analysis import build_property_kernel
+from src.analysis.draw_matrix import DrawMatrix, get_draw_matrix_provider
+from src.analysis.chunk_engine import build_chunk_engine
+from src.analysis.block_aggregator import build_block_wide_frame
 
 logger = logging.getLogger(__name__)
 
@@ -73,56 +75,31 @@ def calculate_frequency_in_chunk(df_chunk: pd.DataFrame, config: Any) -> pd.Seri
     return frequency_series.astype(int)
 
 
-def get_draw_matrix_for_chunk(df_chunk: pd.DataFrame, chunk_start_contest: int, chunk_end_contest: int, config: Any) -> pd.DataFrame:
-    default_cols = getattr(config, 'ALL_NUMBERS', list(range(1,26)))
+def get_draw_matrix_for_chunk(
+    df_chunk: pd.DataFrame,
+    chunk_start_contest: int,
+    chunk_end_contest: int,
+    config: Any,
+    draw_matrix: Optional[DrawMatrix] = None
+) -> pd.DataFrame:
+    """
+    Matriz de presença (concursos do intervalo x dezenas). Se 'draw_matrix' (a matriz
+    completa da execução) for informada, o bloco é uma fatia dela e 'df_chunk' não é
+    reprocessado.
+    """
     contest_id_col_name = getattr(config, 'CONTEST_ID_COLUMN_NAME', 'contest_id')
-
-    if not hasattr(config, 'BALL_NUMBER_COLUMNS'):
-        logger.error("BALL_NUMBER_COLUMNS não em config para get_draw_matrix_for_chunk.")
-        return pd.DataFrame(columns=default_cols)
-
     all_contests_in_chunk_range = pd.Index(range(chunk_start_contest, chunk_end_contest + 1), name=contest_id_col_name)
 
-    if df_chunk.empty:
-        logger.debug(f"Chunk C{chunk_start_contest}-C{chunk_end_contest} vazio. Retornando matriz de zeros.")
-        return pd.DataFrame(0, index=all_contests_in_chunk_range, columns=config.ALL_NUMBERS, dtype=int)
+    if draw_matrix is None:
+        if not hasattr(config, 'BALL_NUMBER_COLUMNS'):
+            logger.error("BALL_NUMBER_COLUMNS não em config para get_draw_matrix_for_chunk.")
+            return pd.DataFrame(columns=getattr(config, 'ALL_NUMBERS', list(range(1,26))))
+        if df_chunk.empty or contest_id_col_name not in df_chunk.columns:
+            logger.debug(f"Chunk C{chunk_start_contest}-C{chunk_end_contest} vazio ou sem coluna de concurso. Retornando matriz de zeros.")
+            return pd.DataFrame(0, index=all_contests_in_chunk_range, columns=config.ALL_NUMBERS, dtype=int)
+        draw_matrix = get_draw_matrix_provider(df_chunk, config)
 
-    dezena_cols = config.BALL_NUMBER_COLUMNS
-    actual_dezena_cols = [col for col in dezena_cols if col in df_chunk.columns]
-    if not actual_dezena_cols:
-        logger.warning(f"Nenhuma coluna de bola ({dezena_cols}) em df_chunk para C{chunk_start_contest}-C{chunk_end_contest}")
-        return pd.DataFrame(0, index=all_contests_in_chunk_range, columns=config.ALL_NUMBERS, dtype=int)
-
-    if contest_id_col_name not in df_chunk.columns:
-        logger.error(f"Coluna '{contest_id_col_name}' ausente em df_chunk para C{chunk_start_contest}-C{chunk_end_contest}")
-        return pd.DataFrame(0, index=all_contests_in_chunk_range, columns=config.ALL_NUMBERS, dtype=int)
-
-    df_chunk_copy = df_chunk[[contest_id_col_name] + actual_dezena_cols].copy()
-    try:
-        df_chunk_copy[contest_id_col_name] = pd.to_numeric(df_chunk_copy[contest_id_col_name])
-    except Exception as e:
-        logger.error(f"Não converter '{contest_id_col_name}' para numérico: {e}")
-        return pd.DataFrame(0, index=all_contests_in_chunk_range, columns=config.ALL_NUMBERS, dtype=int)
-
-    melted_df = df_chunk_copy.melt(id_vars=[contest_id_col_name], value_vars=actual_dezena_cols, value_name='Dezena_val_temp')
-    melted_df.dropna(subset=['Dezena_val_temp'], inplace=True)
-    if melted_df.empty:
-        return pd.DataFrame(0, index=all_contests_in_chunk_range, columns=config.ALL_NUMBERS, dtype=int)
-
-    melted_df['Dezena'] = pd.to_numeric(melted_df['Dezena_val_temp'], errors='coerce')
-    melted_df.dropna(subset=['Dezena'], inplace=True)
-    if melted_df.empty:
-        return pd.DataFrame(0, index=all_contests_in_chunk_range, columns=config.ALL_NUMBERS, dtype=int)
-    melted_df['Dezena'] = melted_df['Dezena'].astype(int)
-    melted_df['presente'] = 1
-
-    try:
-        draw_matrix = melted_df.pivot_table(index=contest_id_col_name, columns='Dezena', values='presente', fill_value=0)
-        draw_matrix = draw_matrix.reindex(index=all_contests_in_chunk_range, columns=config.ALL_NUMBERS, fill_value=0)
-    except Exception as e:
-        logger.error(f"Erro ao pivotar draw_matrix no chunk C{chunk_start_contest}-C{chunk_end_contest}: {e}")
-        return pd.DataFrame(0, index=all_contests_in_chunk_range, columns=config.ALL_NUMBERS, dtype=int)
-    return draw_matrix.astype(int)
+    return draw_matrix.to_dataframe_for_range(chunk_start_contest, chunk_end_contest, index_name=contest_id_col_name)
 
 def calculate_delays_for_matrix(draw_matrix: pd.DataFrame, chunk_start_contest: int, chunk_end_contest: int, config: Any) -> Dict[str, pd.Series]:
     chunk_duration_calc = chunk_end_contest - chunk_start_contest + 1
@@ -174,40 +151,15 @@ def calculate_block_group_summary_metrics(df_chunk: pd.DataFrame, config: Any) -
     }
     if df_chunk.empty or not hasattr(config, 'BALL_NUMBER_COLUMNS') or not hasattr(config, 'NUMBERS_PER_DRAW'):
         return summary_metrics
+    if not any(col in df_chunk.columns for col in config.BALL_NUMBER_COLUMNS): return summary_metrics
 
-    ball_cols = config.BALL_NUMBER_COLUMNS
-    actual_ball_cols = [col for col in ball_cols if col in df_chunk.columns]
-    if not actual_ball_cols: return summary_metrics
-
-    contest_properties_list: List[Dict[str, Any]] = []
-    for _, row in df_chunk.iterrows():
-        try:
-            draw_numbers_raw = [row[col] for col in actual_ball_cols if pd.notna(row[col])]
-            draw = [int(float(d_num)) for d_num in draw_numbers_raw if str(d_num).replace('.0','',1).isdigit()]
-
-            if len(draw) == config.NUMBERS_PER_DRAW:
-                properties = analyze_draw_properties(draw, config)
-                contest_properties_list.append(properties)
-            elif len(draw_numbers_raw) > 0:
-                 logger.debug(f"Sorteio incompleto no concurso {row.get(config.CONTEST_ID_COLUMN_NAME, 'N/A')} (bloco). Dezenas: {draw_numbers_raw}.")
-        except ValueError as e_val:
-            logger.warning(f"Erro converter dezenas para concurso {row.get(config.CONTEST_ID_COLUMN_NAME, 'Desconhecido')} (grupo): {e_val}.")
-            continue
-        except Exception as e_gen:
-             logger.error(f"Erro inesperado em group_summary para concurso {row.get(config.CONTEST_ID_COLUMN_NAME, 'Desconhecido')}: {e_gen}")
-             continue
-
-    if not contest_properties_list: return summary_metrics
-    df_contest_properties = pd.DataFrame(contest_properties_list)
+    draw_matrix = get_draw_matrix_provider(df_chunk, config)
+    if draw_matrix.empty: return summary_metrics
+    range_means = build_property_kernel(config).range_means(draw_matrix, [draw_matrix.contest_ids[0]], [draw_matrix.contest_ids[-1]])
+    if not range_means['draws'][0]: return summary_metrics
 
-    property_to_final_col_map = {
-        'pares': 'avg_pares_no_bloco', 'impares': 'avg_impares_no_bloco',
-        'primos': 'avg_primos_no_bloco', 'soma_dezenas': 'avg_soma_dezenas_no_bloco'
-    }
-    for prop_key, final_col_name in property_to_final_col_map.items():
-        if prop_key in df_contest_properties.columns and not df_contest_properties[prop_key].empty:
-            mean_val = df_contest_properties[prop_key].mean()
-            summary_metrics[final_col_name] = round(mean_val, 2) if pd.notna(mean_val) else None
+    for prop_key in ('pares', 'impares', 'primos', 'soma_dezenas'):
+        summary_metrics[f'avg_{prop_key}_no_bloco'] = round(float(range_means[prop_key][0]), 2)
     return summary_metrics
 
 def calculate_chunk_metrics_and_persist(all_data_df: pd.DataFrame, db_manager: Any, config: Any):
@@ -238,77 +190,75 @@ def calculate_chunk_metrics_and_persist(all_data_df: pd.DataFrame, db_manager: A
         logger.error(f"Total de concursos inválido: {total_contests}. Abortando.")
         return
 
+    full_draw_matrix = get_draw_matrix_provider(df_to_process, config)
+    engine = build_chunk_engine(full_draw_matrix, config, total_contests=int(total_contests))
+    dezenas = np.asarray(config.ALL_NUMBERS, dtype=int)
+    engine_columns = [int(n) for n in engine.numbers]
+    dezena_positions = [engine_columns.index(int(n)) for n in dezenas]
+
+    metrics_to_save_map = {
+        config.EVOL_METRIC_FREQUENCY_BLOCK_PREFIX: ("frequencia_absoluta", "frequency"),
+        config.EVOL_METRIC_ATRASO_MEDIO_BLOCK_PREFIX: ("atraso_medio_no_bloco", "delay_mean"),
+        config.EVOL_METRIC_ATRASO_MAXIMO_BLOCK_PREFIX: ("atraso_maximo_no_bloco", "delay_max"),
+        config.EVOL_METRIC_ATRASO_FINAL_BLOCK_PREFIX: ("atraso_final_no_bloco", "delay_final"),
+        config.EVOL_METRIC_OCCURRENCE_STD_DEV_BLOCK_PREFIX: ("occurrence_std_dev", "occurrence_std"),
+        config.EVOL_METRIC_DELAY_STD_DEV_BLOCK_PREFIX: ("delay_std_dev", "delay_std")
+    }
+    group_columns = {
+        'avg_pares_no_bloco': 'avg_pares', 'avg_impares_no_bloco': 'avg_impares',
+        'avg_primos_no_bloco': 'avg_primos', 'avg_soma_dezenas_no_bloco': 'avg_soma_dezenas'
+    }
+
     for chunk_type_key, list_of_sizes in config.CHUNK_TYPES_CONFIG.items():
         for size_val_loop in list_of_sizes:
+            if size_val_loop <= 0:
+                logger.warning(f"Tamanho de chunk inválido: {size_val_loop} para {chunk_type_key}. Pulando."); continue
             logger.info(f"Processando chunks: tipo='{chunk_type_key}', tamanho={size_val_loop}.")
-            chunk_definitions = get_chunk_definitions(int(total_contests), chunk_type_key, [size_val_loop], config)
-
-            if not chunk_definitions:
-                logger.warning(f"Nenhuma definição de chunk para {chunk_type_key}_{size_val_loop}."); continue
-
-            all_metrics_for_db: List[Dict[str, Any]] = []
-            all_group_metrics_for_db: List[Dict[str, Any]] = []
-
-            for start_contest, end_contest, chunk_label_original, chunk_seq_id_val in chunk_definitions:
-                mask = (df_to_process[contest_col] >= start_contest) & (df_to_process[contest_col] <= end_contest)
-                df_current_chunk = df_to_process[mask]
-                if df_current_chunk.empty:
-                    logger.debug(f"Chunk C{start_contest}-C{end_contest} (SeqID {chunk_seq_id_val}) vazio. Pulando.")
-                    continue
-                chunk_actual_duration = end_contest - start_contest + 1
-                frequency_series = calculate_frequency_in_chunk(df_current_chunk, config)
-                draw_matrix_chunk = get_draw_matrix_for_chunk(df_current_chunk, start_contest, end_contest, config)
-                delay_metrics_dict = calculate_delays_for_matrix(draw_matrix_chunk, start_contest, end_contest, config)
-                for dezena_val_loop in config.ALL_NUMBERS:
-                    frequencia_abs_dezena = frequency_series.get(dezena_val_loop, 0)
-                    freq_rel_no_chunk = frequencia_abs_dezena / chunk_actual_duration if chunk_actual_duration > 0 else 0.0
-                    occurrence_std_dev_val = math.sqrt(freq_rel_no_chunk * (1 - freq_rel_no_chunk)) if 0 < freq_rel_no_chunk < 1 else 0.0
-                    all_metrics_for_db.append({
-                        'chunk_seq_id': chunk_seq_id_val, 'chunk_start_contest': start_contest,
-                        'chunk_end_contest': end_contest, 'dezena': int(dezena_val_loop),
-                        'frequencia_absoluta': int(frequencia_abs_dezena),
-                        'atraso_medio_no_bloco': float(delay_metrics_dict["mean"].get(dezena_val_loop, np.nan)) if pd.notna(delay_metrics_dict["mean"].get(dezena_val_loop, np.nan)) else None,
-                        'atraso_maximo_no_bloco': int(delay_metrics_dict["max"].get(dezena_val_loop, chunk_actual_duration)) if pd.notna(delay_metrics_dict["max"].get(dezena_val_loop, chunk_actual_duration)) else None,
-                        'atraso_final_no_bloco': int(delay_metrics_dict["final"].get(dezena_val_loop, chunk_actual_duration)) if pd.notna(delay_metrics_dict["final"].get(dezena_val_loop, chunk_actual_duration)) else None,
-                        'occurrence_std_dev': round(occurrence_std_dev_val, 6) if pd.notna(occurrence_std_dev_val) else None,
-                        'delay_std_dev': round(float(delay_metrics_dict["std_dev"].get(dezena_val_loop, np.nan)), 6) if pd.notna(delay_metrics_dict["std_dev"].get(dezena_val_loop, np.nan)) else None
-                    })
-                group_metrics = calculate_block_group_summary_metrics(df_current_chunk, config)
-                all_group_metrics_for_db.append({'chunk_seq_id': chunk_seq_id_val, 'chunk_start_contest': start_contest, 'chunk_end_contest': end_contest, **group_metrics})
-
-            if all_metrics_for_db:
-                metrics_df_long_combined = pd.DataFrame(all_metrics_for_db)
-                base_cols_dezena = ['chunk_seq_id', 'chunk_start_contest', 'chunk_end_contest', 'dezena']
-                metrics_to_save_map = {
-                    config.EVOL_METRIC_FREQUENCY_BLOCK_PREFIX: "frequencia_absoluta",
-                    config.EVOL_METRIC_ATRASO_MEDIO_BLOCK_PREFIX: "atraso_medio_no_bloco",
-                    config.EVOL_METRIC_ATRASO_MAXIMO_BLOCK_PREFIX: "atraso_maximo_no_bloco",
-                    config.EVOL_METRIC_ATRASO_FINAL_BLOCK_PREFIX: "atraso_final_no_bloco",
-                    config.EVOL_METRIC_OCCURRENCE_STD_DEV_BLOCK_PREFIX: "occurrence_std_dev",
-                    config.EVOL_METRIC_DELAY_STD_DEV_BLOCK_PREFIX: "delay_std_dev"
-                }
-                for table_prefix_from_config, value_col_name_in_df in metrics_to_save_map.items():
-                    if value_col_name_in_df in metrics_df_long_combined.columns:
-                        df_to_save_metric = metrics_df_long_combined[base_cols_dezena + [value_col_name_in_df]].copy()
-                        if pd.api.types.is_float_dtype(df_to_save_metric[value_col_name_in_df]):
-                             df_to_save_metric.dropna(subset=[value_col_name_in_df], inplace=True)
-                        if not df_to_save_metric.empty:
-                            table_name = f"{table_prefix_from_config}_{chunk_type_key}_{size_val_loop}"
-                            # CORREÇÃO APLICADA: removido index=False
-                            db_manager.save_dataframe(df_to_save_metric, table_name, if_exists='replace')
-                            logger.info(f"Métricas ({value_col_name_in_df}) salvas em '{table_name}'. {len(df_to_save_metric)} regs.")
-                        else:
-                            logger.debug(f"Nenhum dado para métrica '{value_col_name_in_df}' no chunk {chunk_type_key}_{size_val_loop}.")
-            if all_group_metrics_for_db:
-                group_metrics_df = pd.DataFrame(all_group_metrics_for_db)
-                cols_to_check_for_nan_group = [col for col in group_metrics_df.columns if col.startswith('avg_')]
-                if cols_to_check_for_nan_group :
-                     group_metrics_df.dropna(subset=cols_to_check_for_nan_group, how='all', inplace=True)
-                if not group_metrics_df.empty:
-                    group_table_name = f"{config.EVOL_BLOCK_GROUP_METRICS_PREFIX}_{chunk_type_key}_{size_val_loop}"
-                    # CORREÇÃO APLICADA: removido index=False
-                    db_manager.save_dataframe(group_metrics_df, group_table_name, if_exists='replace')
-                    logger.info(f"Métricas de grupo de chunk salvas em '{group_table_name}'. {len(group_metrics_df)} regs.")
+            chunk_metrics = engine.compute(int(size_val_loop))
+            kept = np.flatnonzero(chunk_metrics['has_draws'])
+            if len(kept) == 0:
+                logger.warning(f"Nenhum bloco com sorteios para {chunk_type_key}_{size_val_loop}."); continue
+
+            n_dezenas = len(dezenas)
+            base_df = pd.DataFrame({
+                'chunk_seq_id': np.repeat(kept + 1, n_dezenas),
+                'chunk_start_contest': np.repeat(chunk_metrics['chunk_start'][kept], n_dezenas),
+                'chunk_end_contest': np.repeat(chunk_metrics['chunk_end'][kept], n_dezenas),
+                'dezena': np.tile(dezenas, len(kept)),
+            })
+            for table_prefix_from_config, (value_col_name, engine_key) in metrics_to_save_map.items():
+                values = chunk_metrics[engine_key][np.ix_(kept, dezena_positions)].ravel()
+                df_to_save_metric = base_df.copy()
+                if engine_key in ('delay_std', 'occurrence_std'):
+                    values = np.round(values, 6)
+                df_to_save_metric[value_col_name] = values
+                if pd.api.types.is_float_dtype(df_to_save_metric[value_col_name]):
+                    df_to_save_metric.dropna(subset=[value_col_name], inplace=True)
+                if not df_to_save_metric.empty:
+                    table_name = f"{table_prefix_from_config}_{chunk_type_key}_{size_val_loop}"
+                    db_manager.save_dataframe(df_to_save_metric, table_name, if_exists='replace')
+                    logger.info(f"Métricas ({value_col_name}) salvas em '{table_name}'. {len(df_to_save_metric)} regs.")
                 else:
-                    logger.info(f"Nenhuma métrica de grupo de chunk para {chunk_type_key}_{size_val_loop}.")
+                    logger.debug(f"Nenhum dado para métrica '{value_col_name}' no chunk {chunk_type_key}_{size_val_loop}.")
+
+            group_metrics_df = pd.DataFrame({
+                'chunk_seq_id': kept + 1,
+                'chunk_start_contest': chunk_metrics['chunk_start'][kept],
+                'chunk_end_contest': chunk_metrics['chunk_end'][kept],
+                **{col: np.round(chunk_metrics[engine_key][kept], 2) for col, engine_key in group_columns.items()}
+            })
+            group_metrics_df.dropna(subset=list(group_columns), how='all', inplace=True)
+            if not group_metrics_df.empty:
+                group_table_name = f"{config.EVOL_BLOCK_GROUP_METRICS_PREFIX}_{chunk_type_key}_{size_val_loop}"
+                db_manager.save_dataframe(group_metrics_df, group_table_name, if_exists='replace')
+                logger.info(f"Métricas de grupo de chunk salvas em '{group_table_name}'. {len(group_metrics_df)} regs.")
+            else:
+                logger.info(f"Nenhuma métrica de grupo de chunk para {chunk_type_key}_{size_val_loop}.")
+
+            # Tabela larga consolidada no mesmo passo, direto dos arrays (sem reler as tabelas longas).
+            consolidated_table_name = f"{config.BLOCK_ANALISES_CONSOLIDADAS_PREFIX}_{chunk_type_key}_{size_val_loop}"
+            wide_df = build_block_wide_frame(chunk_metrics, dezena_positions, config, group_metrics_df)
+            if not wide_df.empty:
+                db_manager.save_dataframe(wide_df, consolidated_table_name, if_exists='replace')
+                logger.info(f"Tabela consolidada de BLOCKS '{consolidated_table_name}' materializada ({len(wide_df)} linhas).")
     logger.info("Cálculo e persistência de métricas de chunk concluído.")
\ No newline at end of file
@@ -0,0 +1,144 @@
+# src/analysis/chunk_engine.py
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from src.analysis.draw_matrix import DrawMatrix
+from src.analysis.number_properties_analysis import DrawPropertyKernel
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkPrefixEngine:
+    """
+    Métricas de blocos (chunks) de concursos para qualquer tamanho a partir de arrays
+    pré-computados uma única vez sobre o eixo de concursos 1..total_contests:
+
+    - presença acumulada por dezena (frequência do bloco = diferença de prefixos);
+    - índice do último concurso em que cada dezena saiu (atrasos locais ao bloco);
+    - somas acumuladas das propriedades dos sorteios (pares, ímpares, primos, soma).
+
+    Concursos sem sorteio nos dados contam como ausência de todas as dezenas, como na
+    matriz reindexada usada por calculate_delays_for_matrix.
+    """
+
+    def __init__(self, draw_matrix: DrawMatrix, total_contests: int, numbers_per_draw: int = 15):
+        self.total_contests = int(total_contests)
+        self.numbers = list(draw_matrix.numbers)
+        total = self.total_contests
+        n_numbers = len(self.numbers)
+
+        in_range = (draw_matrix.contest_ids >= 1) & (draw_matrix.contest_ids <= total)
+        positions = draw_matrix.contest_ids[in_range].astype(np.int64) - 1
+        presence = np.zeros((total, n_numbers), dtype=np.uint8)
+        presence[positions] = draw_matrix.presence[in_range]
+        has_draw = np.zeros(total, dtype=bool)
+        has_draw[positions] = True
+        self.presence = presence
+
+        self.cum_presence = np.zeros((total + 1, n_numbers), dtype=np.int32)
+        np.cumsum(presence, axis=0, dtype=np.int32, out=self.cum_presence[1:])
+        self.cum_draws = np.zeros(total + 1, dtype=np.int32)
+        np.cumsum(has_draw, dtype=np.int32, out=self.cum_draws[1:])
+
+        # last_seen[t, j]: último concurso <= t em que a dezena j saiu (0 = nunca).
+        contest_axis = np.arange(1, total + 1, dtype=np.int32)[:, None]
+        self.last_seen = np.zeros((total + 1, n_numbers), dtype=np.int32)
+        np.maximum.accumulate(np.where(presence == 1, contest_axis, 0), axis=0, out=self.last_seen[1:])
+
+        # Propriedades por sorteio; só sorteios completos entram nas médias de grupo.
+        properties = DrawPropertyKernel(self.numbers, numbers_per_draw).properties_for_presence(presence)
+        valid = has_draw & properties['valid']
+        self.cum_valid_draws = np.concatenate([[0], np.cumsum(valid, dtype=np.int64)])
+        self.cum_properties = {name: np.concatenate([[0], np.cumsum(np.where(valid, properties[name], 0), dtype=np.int64)])
+                               for name in ('pares', 'impares', 'primos', 'soma_dezenas')}
+        logger.debug(f"ChunkPrefixEngine: {total} concursos x {n_numbers} dezenas pré-computados.")
+
+    def chunk_bounds(self, chunk_size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Concursos iniciais e finais (inclusivos) dos blocos consecutivos de 'chunk_size'."""
+        starts = np.arange(1, self.total_contests + 1, chunk_size, dtype=np.int64)
+        ends = np.minimum(starts + chunk_size - 1, self.total_contests)
+        return starts, ends
+
+    def compute(self, chunk_size: int) -> Dict[str, np.ndarray]:
+        """
+        Métricas de todos os blocos de um tamanho. Arrays por bloco: 'chunk_start',
+        'chunk_end', 'has_draws' (bloco com ao menos um sorteio nos dados) e as médias de
+        grupo 'avg_*' (NaN sem sorteios completos). Arrays (blocos x dezenas):
+        'frequency', 'delay_final', 'delay_max', 'delay_mean', 'delay_std',
+        'occurrence_std' (atraso médio/desvio são NaN se a dezena não saiu no bloco).
+        """
+        if chunk_size <= 0:
+            raise ValueError(f"Tamanho de chunk inválido: {chunk_size}")
+        starts, ends = self.chunk_bounds(chunk_size)
+        return self.compute_ranges(starts, ends)
+
+    def compute_ranges(self, starts: np.ndarray, ends: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Mesmas métricas de compute() para intervalos arbitrários [starts[i], ends[i]]
+        (inclusivos, crescentes e sem sobreposição, dentro de 1..total_contests), como os
+        ciclos. Cada intervalo é só um par de índices nos arrays compartilhados.
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        if len(starts) != len(ends) or (len(starts) and (
+                (starts < 1).any() or (ends > self.total_contests).any() or (ends < starts).any() or (starts[1:] <= ends[:-1]).any())):
+            raise ValueError("Intervalos inválidos: esperados crescentes, sem sobreposição e dentro do eixo de concursos.")
+        durations = (ends - starts + 1)[:, None]
+
+        frequency = (self.cum_presence[ends] - self.cum_presence[starts - 1]).astype(np.int64)
+        last_in_chunk = np.maximum(self.last_seen[ends], (starts - 1)[:, None])
+        trailing_gap = (ends[:, None] - last_in_chunk).astype(np.int64)
+
+        # Atraso antes de cada ocorrência, contado a partir do início do intervalo da ocorrência;
+        # concursos fora dos intervalos não contribuem (atraso zero nas reduções).
+        contest_axis = np.arange(1, self.total_contests + 1, dtype=np.int64)
+        owner = np.maximum(np.searchsorted(starts, contest_axis, side='right') - 1, 0)
+        in_ranges = (contest_axis >= starts[owner]) & (contest_axis <= ends[owner]) if len(starts) else np.zeros(len(contest_axis), dtype=bool)
+        range_start_of_contest = np.where(in_ranges, starts[owner], contest_axis) if len(starts) else contest_axis
+        previous = np.maximum(self.last_seen[:-1], (range_start_of_contest - 1)[:, None])
+        inner_gaps = (contest_axis[:, None] - previous - 1) * (self.presence * in_ranges[:, None])
+        if len(starts):
+            row_offsets = starts - 1
+            max_inner = np.maximum.reduceat(inner_gaps, row_offsets, axis=0)
+            sumsq_inner = np.add.reduceat(inner_gaps * inner_gaps, row_offsets, axis=0)
+        else:
+            max_inner = sumsq_inner = np.zeros((0, len(self.numbers)), dtype=np.int64)
+
+        # Os atrasos de um bloco particionam os concursos sem a dezena: soma = duração - frequência.
+        n_gaps = frequency + 1
+        gap_sum = durations - frequency
+        gap_sumsq = sumsq_inner + trailing_gap * trailing_gap
+        appeared = frequency > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delay_mean = np.where(appeared, gap_sum / n_gaps, np.nan)
+            variance = (n_gaps * gap_sumsq - gap_sum * gap_sum) / (n_gaps * n_gaps).astype(float)
+            delay_std = np.where(appeared, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+        relative = frequency / durations
+        occurrence_std = np.where((relative > 0) & (relative < 1), np.sqrt(relative * (1 - relative)), 0.0)
+
+        result: Dict[str, np.ndarray] = {
+            'chunk_start': starts,
+            'chunk_end': ends,
+            'has_draws': (self.cum_draws[ends] - self.cum_draws[starts - 1]) > 0,
+            'frequency': frequency,
+            'delay_final': trailing_gap,
+            'delay_max': np.maximum(max_inner, trailing_gap),
+            'delay_mean': delay_mean,
+            'delay_std': delay_std,
+            'occurrence_std': occurrence_std,
+        }
+        valid_counts = self.cum_valid_draws[ends] - self.cum_valid_draws[starts - 1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for name, cum_values in self.cum_properties.items():
+                totals = cum_values[ends] - cum_values[starts - 1]
+                result[f'avg_{name}'] = np.where(valid_counts > 0, totals / np.maximum(valid_counts, 1), np.nan)
+        return result
+
+
+def build_chunk_engine(draw_matrix: DrawMatrix, config: Any, total_contests: Optional[int] = None) -> ChunkPrefixEngine:
+    """Cria o engine sobre o eixo 1..total_contests (padrão: maior concurso da matriz)."""
+    if total_contests is None:
+        total_contests = int(draw_matrix.contest_ids.max()) if not draw_matrix.empty else 0
+    return ChunkPrefixEngine(draw_matrix, total_contests, getattr(config, 'NUMBERS_PER_DRAW', 15))
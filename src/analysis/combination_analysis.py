@@ -1,12 +1,14 @@
 # Lotofacil_Analysis/src/analysis/combination_analysis.py
 import logging
 import pandas as pd
-from itertools import combinations
-from collections import Counter
-from typing import List, Dict, Any, Set, Tuple, Union 
+from types import SimpleNamespace
+from typing import List, Dict, Any, Optional, Set, Tuple, Union 
 
-from mlxtend.preprocessing import TransactionEncoder
-from mlxtend.frequent_patterns import apriori, association_rules
+from mlxtend.frequent_patterns import association_rules
+
+from src.analysis.cooccurrence import CooccurrenceEngine
+from src.analysis.draw_matrix import build_draw_matrix
+from src.analysis.itemset_miner import build_item_bitsets, frequent_itemsets_dataframe, mine_frequent_itemsets_eclat
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +26,6 @@ class CombinationAnalyzer:
         drawn_numbers_col: str = 'drawn_numbers',
         contest_id_col: str = 'contest_id'
     ) -> pd.DataFrame:
-        # ... (código existente do analyze_pairs, sem alterações) ...
         logger.info("Iniciando análise de pares.")
         
         if drawn_numbers_col not in all_draws_df.columns:
@@ -36,53 +37,22 @@ class CombinationAnalyzer:
             logger.error(msg)
             raise ValueError(msg)
 
-        pair_counts: Counter[Tuple[int, int]] = Counter()
-        last_occurrence_pair: Dict[Tuple[int, int], int] = {}
-        
         draws_data = all_draws_df[[contest_id_col, drawn_numbers_col]].copy()
         try:
             draws_data[contest_id_col] = draws_data[contest_id_col].astype(int)
-            draws_data[drawn_numbers_col] = draws_data[drawn_numbers_col].apply(
-                lambda x: sorted([int(n) for n in x]) if isinstance(x, (list, set, tuple)) else []
-            )
         except Exception as e:
             logger.error(f"Erro ao converter colunas para o tipo esperado: {e}")
             raise
 
         max_contest_id_in_history = draws_data[contest_id_col].max() if not draws_data.empty else 0
 
-        for _, row in draws_data.iterrows():
-            contest_id = row[contest_id_col]
-            drawn_numbers = row[drawn_numbers_col]
-            
-            if len(drawn_numbers) < 2:
-                continue
-
-            for pair_tuple in combinations(drawn_numbers, 2):
-                pair_counts[pair_tuple] += 1
-                last_occurrence_pair[pair_tuple] = contest_id
-        
-        all_possible_pairs = list(combinations(self.all_numbers, 2))
-        
-        results = []
-        for pair_tuple in all_possible_pairs:
-            pair_str = f"{pair_tuple[0]}-{pair_tuple[1]}"
-            frequency = pair_counts.get(pair_tuple, 0)
-            last_contest = last_occurrence_pair.get(pair_tuple, 0)
-            
-            if frequency > 0:
-                current_delay = max_contest_id_in_history - last_contest
-            else:
-                current_delay = max_contest_id_in_history 
-
-            results.append({
-                'pair_str': pair_str,
-                'frequency': frequency,
-                'last_contest': last_contest,
-                'current_delay': current_delay
-            })
-            
-        pairs_df = pd.DataFrame(results)
+        # Coocorrência via Mᵀ·M sobre a matriz de presença (sem iterar sorteios/combinações).
+        matrix_config = SimpleNamespace(
+            ALL_NUMBERS=self.all_numbers, CONTEST_ID_COLUMN_NAME=contest_id_col,
+            DRAWN_NUMBERS_COLUMN_NAME=drawn_numbers_col, BALL_NUMBER_COLUMNS=[]
+        )
+        engine = CooccurrenceEngine(build_draw_matrix(draws_data, matrix_config))
+        pairs_df = engine.pairs_dataframe(self.all_numbers, max_contest_id=int(max_contest_id_in_history))
         pairs_df = pairs_df.sort_values(by=['frequency', 'current_delay'], ascending=[False, True]).reset_index(drop=True)
         
         logger.info(f"Análise de pares concluída. {len(pairs_df)} pares processados.")
@@ -94,17 +64,20 @@ class CombinationAnalyzer:
         min_support: float, 
         min_len: int = 3, 
         max_len: int = 10,
-        drawn_numbers_col: str = 'drawn_numbers'
+        drawn_numbers_col: str = 'drawn_numbers',
+        max_itemsets: Optional[int] = None
     ) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """
         Analisa os sorteios para encontrar conjuntos frequentes de dezenas (itemsets)
-        usando o algoritmo Apriori.
+        com um minerador Eclat sobre bitsets de concursos por dezena. 'max_itemsets'
+        limita opcionalmente o total de itemsets minerados (resultado parcial com os
+        tamanhos que couberem inteiros no limite).
 
         Retorna dois DataFrames:
         1. df_for_db: Formatado para salvar no banco de dados (com 'itemset_str'),
                       filtrado por min_len e max_len.
         2. frequent_itemsets_raw_mlxtend: Contém 'itemsets' como frozensets e 'support',
-                                         resultado direto do apriori, *antes* da filtragem
+                                         no formato do apriori do mlxtend, *antes* da filtragem
                                          por min_len/max_len, para ser usado na geração de regras.
         """
         logger.info(f"Iniciando análise de itemsets frequentes com min_support={min_support}, min_len={min_len}, max_len={max_len}")
@@ -133,24 +106,13 @@ class CombinationAnalyzer:
             logger.warning("Nenhuma dezena encontrada nas transações. Retornando DataFrames de itemsets vazios.")
             return pd.DataFrame(columns=empty_cols_db), pd.DataFrame(columns=empty_cols_rules_lookup)
 
-        te = TransactionEncoder()
-        try:
-            te_ary = te.fit_transform(transactions)
-        except ValueError as e:
-            logger.error(f"Erro no TransactionEncoder: {e}")
-            logger.error(f"Primeiras 5 transações: {transactions[:5]}")
-            return pd.DataFrame(columns=empty_cols_db), pd.DataFrame(columns=empty_cols_rules_lookup)
-            
-        df_one_hot = pd.DataFrame(te_ary, columns=te.columns_)
-        logger.debug(f"DataFrame one-hot criado com {df_one_hot.shape[0]} transações e {df_one_hot.shape[1]} itens.")
-
-        if df_one_hot.empty:
-            logger.warning("DataFrame one-hot está vazio. Retornando DataFrames de itemsets vazios.")
-            return pd.DataFrame(columns=empty_cols_db), pd.DataFrame(columns=empty_cols_rules_lookup)
-
-        # DataFrame bruto do apriori - este será usado para gerar as regras
-        frequent_itemsets_raw_mlxtend = apriori(df_one_hot, min_support=min_support, use_colnames=True, verbose=0)
-        logger.debug(f"Apriori encontrou {len(frequent_itemsets_raw_mlxtend)} itemsets frequentes (bruto).")
+        # Eclat sobre bitsets verticais por dezena (mesmo formato de saída do apriori do mlxtend).
+        item_bitsets = build_item_bitsets(transactions)
+        mined_itemsets = mine_frequent_itemsets_eclat(
+            item_bitsets, len(transactions), min_support, max_itemsets=max_itemsets
+        )
+        frequent_itemsets_raw_mlxtend = frequent_itemsets_dataframe(mined_itemsets, len(transactions))
+        logger.debug(f"Eclat encontrou {len(frequent_itemsets_raw_mlxtend)} itemsets frequentes (bruto) sobre {len(item_bitsets)} itens.")
 
         if frequent_itemsets_raw_mlxtend.empty:
             logger.info("Nenhum itemset frequente encontrado com o min_support fornecido (bruto).")
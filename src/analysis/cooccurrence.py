@@ -0,0 +1,120 @@
+# src/analysis/cooccurrence.py
+import logging
+from itertools import combinations
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.draw_matrix import DrawMatrix
+
+logger = logging.getLogger(__name__)
+
+
+class CooccurrenceEngine:
+    """
+    Coocorrência de dezenas a partir da matriz de presença M (sorteios x dezenas):
+
+    - pares: Mᵀ·M (diagonal = frequência de cada dezena);
+    - trincas: tensor T[i, j, k] pelo produto em lote (pares por sorteio)ᵀ·M;
+    - janelas (últimos K concursos, blocos, até um concurso) por diferença de
+      prefixos das matrizes de pares, sem recontar os sorteios.
+    """
+
+    def __init__(self, draw_matrix: DrawMatrix):
+        self.draw_matrix = draw_matrix
+        self.numbers = list(draw_matrix.numbers)
+        self.contest_ids = draw_matrix.contest_ids
+        self._presence = np.ascontiguousarray(draw_matrix.presence, dtype=np.float64) # float: produto via BLAS
+        self._pair_prefix: Optional[np.ndarray] = None
+
+    def _rows(self, start_row: Optional[int], end_row: Optional[int]) -> np.ndarray:
+        return self._presence[slice(start_row, end_row)]
+
+    def pair_matrix(self, start_row: Optional[int] = None, end_row: Optional[int] = None) -> np.ndarray:
+        """Contagem de coocorrência de pares (dezenas x dezenas) nas linhas [start_row, end_row)."""
+        rows = self._rows(start_row, end_row)
+        return np.rint(rows.T @ rows).astype(np.int64)
+
+    def triple_tensor(self, start_row: Optional[int] = None, end_row: Optional[int] = None) -> np.ndarray:
+        """Contagem de coocorrência de trincas (dezenas x dezenas x dezenas) nas linhas [start_row, end_row)."""
+        rows = self._rows(start_row, end_row)
+        n_numbers = rows.shape[1]
+        # Um único produto: (pares presentes por sorteio)ᵀ · M -> (dezenas², dezenas).
+        pair_rows = (rows[:, :, None] * rows[:, None, :]).reshape(len(rows), n_numbers * n_numbers)
+        return np.rint(pair_rows.T @ rows).astype(np.int64).reshape(n_numbers, n_numbers, n_numbers)
+
+    @property
+    def pair_prefix(self) -> np.ndarray:
+        """Prefixos P[t] = Σ_{linhas < t} mᵀm, shape (sorteios + 1, dezenas, dezenas)."""
+        if self._pair_prefix is None:
+            n_numbers = len(self.numbers)
+            presence = self.draw_matrix.presence.astype(np.int32)
+            prefix = np.zeros((len(presence) + 1, n_numbers, n_numbers), dtype=np.int32)
+            np.cumsum(presence[:, :, None] * presence[:, None, :], axis=0, out=prefix[1:])
+            self._pair_prefix = prefix
+        return self._pair_prefix
+
+    def pair_matrix_window(self, start_row: int, end_row: int) -> np.ndarray:
+        """Pares nas linhas [start_row, end_row) por diferença de prefixos."""
+        return (self.pair_prefix[end_row] - self.pair_prefix[start_row]).astype(np.int64)
+
+    def pair_matrix_for_contests(self, start_contest: Optional[int] = None, end_contest: Optional[int] = None) -> np.ndarray:
+        """Pares nos concursos start_contest..end_contest (inclusivo)."""
+        lo, hi = self.draw_matrix.row_bounds(start_contest, end_contest)
+        return self.pair_matrix_window(lo, hi)
+
+    def pair_matrix_last_k(self, k: int, until_contest: Optional[int] = None) -> np.ndarray:
+        """Pares nos últimos K sorteios até until_contest (inclusivo; padrão: último)."""
+        _, hi = self.draw_matrix.row_bounds(None, until_contest)
+        return self.pair_matrix_window(max(0, hi - int(k)), hi)
+
+    def pair_matrices_for_chunks(self, chunk_size: int, total_contests: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pares por bloco de concursos 1..chunk_size, chunk_size+1..2*chunk_size, ...
+        Retorna (inícios dos blocos, array blocos x dezenas x dezenas).
+        """
+        if total_contests is None:
+            total_contests = int(self.contest_ids.max()) if len(self.contest_ids) else 0
+        starts = np.arange(1, total_contests + 1, chunk_size, dtype=np.int64)
+        ends = np.minimum(starts + chunk_size - 1, total_contests)
+        lo = np.searchsorted(self.contest_ids, starts, side='left')
+        hi = np.searchsorted(self.contest_ids, ends, side='right')
+        return starts, (self.pair_prefix[hi] - self.pair_prefix[lo]).astype(np.int64)
+
+    def last_pair_contest(self) -> np.ndarray:
+        """Último concurso em que cada par saiu junto (0 se nunca)."""
+        presence = self.draw_matrix.presence.astype(bool)
+        last = np.zeros((len(self.numbers), len(self.numbers)), dtype=np.int64)
+        if not len(self.contest_ids):
+            return last
+        contests = self.contest_ids.astype(np.int64)
+        for col in range(len(self.numbers)):
+            rows = presence[:, col]
+            if rows.any():
+                last[col] = np.where(presence[rows], contests[rows][:, None], 0).max(axis=0)
+        return last
+
+    def pairs_dataframe(self, numbers: Sequence[int], max_contest_id: Optional[int] = None) -> pd.DataFrame:
+        """
+        Métricas de pares no formato de CombinationAnalyzer.analyze_pairs:
+        'pair_str', 'frequency', 'last_contest', 'current_delay'.
+        """
+        if max_contest_id is None:
+            max_contest_id = int(self.contest_ids.max()) if len(self.contest_ids) else 0
+        position = {int(number): pos for pos, number in enumerate(self.numbers)}
+        pairs: List[Tuple[int, int]] = list(combinations(sorted(int(n) for n in numbers), 2))
+        first = np.array([position.get(a, -1) for a, _ in pairs], dtype=np.int64)
+        second = np.array([position.get(b, -1) for _, b in pairs], dtype=np.int64)
+        known = (first >= 0) & (second >= 0)
+
+        counts, last = self.pair_matrix(), self.last_pair_contest()
+        frequency = np.where(known, counts[first, second], 0)
+        last_contest = np.where(known & (frequency > 0), last[first, second], 0)
+        current_delay = np.where(frequency > 0, max_contest_id - last_contest, max_contest_id)
+        return pd.DataFrame({
+            'pair_str': [f"{a}-{b}" for a, b in pairs],
+            'frequency': frequency.astype(int),
+            'last_contest': last_contest.astype(int),
+            'current_delay': current_delay.astype(int),
+        })
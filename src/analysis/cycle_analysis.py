@@ -4,24 +4,33 @@ from typing import List, Dict, Tuple, Set, Optional, Any
 import logging
 import numpy as np
 
-from src.analysis.chunk_analysis import (
-    calculate_frequency_in_chunk, 
-    get_draw_matrix_for_chunk,    
-    calculate_delays_for_matrix   
-)
-from src.analysis.number_properties_analysis import analyze_draw_properties 
+from src.analysis.chunk_engine import build_chunk_engine
+from src.analysis.block_aggregator import build_cycle_metric_arrays, build_cycle_wide_frame
+from src.analysis.draw_matrix import get_draw_matrix_provider
+from src.analysis.cycle_engine import CycleEngine
 
 logger = logging.getLogger(__name__)
 
 # Constantes para as chaves do dicionário de resultados
 KEY_CYCLE_DETAILS_DF = 'analysis_cycle_details_df'
 KEY_CYCLE_SUMMARY_DF = 'analysis_cycle_summary_df'
-
-def identify_and_process_cycles(all_data_df: pd.DataFrame, config: Any) -> Dict[str, Optional[pd.DataFrame]]:
+# Primeiro ciclo_num cujas linhas mudaram nesta execução (1 sem retomada; com retomada, o ciclo que estava aberto).
+KEY_CYCLE_FIRST_UPDATED_NUM = 'analysis_cycle_first_updated_num'
+LAST_PROCESSED_CONTEST_COLUMN = 'ultimo_concurso_processado'
+
+def identify_and_process_cycles(all_data_df: pd.DataFrame, config: Any,
+                                previous_cycles_detail: Optional[pd.DataFrame] = None,
+                                last_processed_contest: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Identifica os ciclos de 'all_data_df'. Com 'previous_cycles_detail' (tabela de ciclos já
+    gravada) e 'last_processed_contest', retoma o ciclo aberto (CycleEngine.from_cycles_detail)
+    e processa só os concursos posteriores.
+    """
     logger.info("Iniciando análise completa de ciclos.")
-    results: Dict[str, Optional[pd.DataFrame]] = {
+    results: Dict[str, Any] = {
         KEY_CYCLE_DETAILS_DF: None, 
-        KEY_CYCLE_SUMMARY_DF: None
+        KEY_CYCLE_SUMMARY_DF: None,
+        KEY_CYCLE_FIRST_UPDATED_NUM: 1
     }
     if all_data_df is None or all_data_df.empty:
         logger.warning("DataFrame de entrada para 'identify_and_process_cycles' está vazio ou nulo.")
@@ -29,7 +38,6 @@ def identify_and_process_cycles(all_data_df: pd.DataFrame, config: Any) -> Dict[
 
     contest_col = config.CONTEST_ID_COLUMN_NAME
     ball_cols = config.BALL_NUMBER_COLUMNS
-    current_all_numbers_set = set(config.ALL_NUMBERS)
 
     required_cols = [contest_col] + ball_cols
     missing_cols = [col for col in required_cols if col not in all_data_df.columns]
@@ -37,75 +45,24 @@ def identify_and_process_cycles(all_data_df: pd.DataFrame, config: Any) -> Dict[
         logger.error(f"Colunas obrigatórias ausentes no DataFrame de entrada: {missing_cols}")
         return results
 
-    df_sorted = all_data_df.copy()
     try:
-        df_sorted[contest_col] = pd.to_numeric(df_sorted[contest_col])
+        pd.to_numeric(all_data_df[contest_col])
     except Exception as e:
         logger.error(f"Erro ao converter a coluna {contest_col} para numérico: {e}", exc_info=True)
         return results
-    df_sorted = df_sorted.sort_values(by=contest_col).reset_index(drop=True)
-    
-    cycles_data: List[Dict[str, Any]] = []
-    current_cycle_numbers_needed = current_all_numbers_set.copy()
-    current_cycle_start_contest = int(df_sorted.loc[0, contest_col]) if not df_sorted.empty else 0
-    cycle_count = 0
-    last_processed_contest_num_for_open_cycle = int(df_sorted[contest_col].max()) if not df_sorted.empty else 0
-    
-    for index, row in df_sorted.iterrows():
-        contest_number = int(row[contest_col])
-        try:
-            drawn_numbers_in_this_contest = set(int(row[col_b]) for col_b in ball_cols if pd.notna(row[col_b]))
-        except ValueError: 
-            logger.warning(f"Erro ao converter dezenas para o concurso {contest_number}. Pulando este concurso na análise de ciclos.")
-            continue
-            
-        if current_cycle_numbers_needed == current_all_numbers_set and contest_number != current_cycle_start_contest:
-             current_cycle_start_contest = contest_number
-             
-        current_cycle_numbers_needed.difference_update(drawn_numbers_in_this_contest)
-        
-        if not current_cycle_numbers_needed: 
-            cycle_count += 1
-            cycles_data.append({
-                'ciclo_num': cycle_count,
-                'concurso_inicio': current_cycle_start_contest,
-                'concurso_fim': contest_number,
-                'duracao_concursos': contest_number - current_cycle_start_contest + 1,
-                'numeros_faltantes': None,
-                'qtd_faltantes': 0
-            })
-            current_cycle_numbers_needed = current_all_numbers_set.copy()
-            if index + 1 < len(df_sorted):
-                current_cycle_start_contest = int(df_sorted.loc[index + 1, contest_col])
-            else: 
-                current_cycle_start_contest = contest_number + 1 
-                
-    if current_cycle_numbers_needed and current_cycle_numbers_needed != current_all_numbers_set:
-        if not df_sorted.empty and current_cycle_start_contest <= last_processed_contest_num_for_open_cycle:
-            cycles_data.append({
-                'ciclo_num': cycle_count + 1,
-                'concurso_inicio': current_cycle_start_contest,
-                'concurso_fim': pd.NA, 
-                'duracao_concursos': pd.NA, 
-                'numeros_faltantes': ",".join(map(str, sorted(list(current_cycle_numbers_needed)))),
-                'qtd_faltantes': len(current_cycle_numbers_needed)
-            })
-    elif cycle_count == 0 and not df_sorted.empty and current_cycle_numbers_needed and current_cycle_numbers_needed != current_all_numbers_set : 
-            cycles_data.append({
-                'ciclo_num': 1, 
-                'concurso_inicio': current_cycle_start_contest, 
-                'concurso_fim': pd.NA,
-                'duracao_concursos': pd.NA,
-                'numeros_faltantes': ",".join(map(str, sorted(list(current_cycle_numbers_needed)))),
-                'qtd_faltantes': len(current_cycle_numbers_needed)
-            })
-            
-    if cycles_data:
-        df_cycles_detail = pd.DataFrame(cycles_data)
-        for col_int in ['concurso_fim', 'duracao_concursos', 'qtd_faltantes', 'ciclo_num', 'concurso_inicio']:
-            if col_int in df_cycles_detail.columns:
-                df_cycles_detail[col_int] = pd.to_numeric(df_cycles_detail[col_int], errors='coerce').astype('Int64')
-        
+
+    draw_matrix = get_draw_matrix_provider(all_data_df, config)
+    if previous_cycles_detail is not None and last_processed_contest is not None:
+        engine = CycleEngine.from_cycles_detail(previous_cycles_detail, draw_matrix.numbers, last_processed_contest)
+        results[KEY_CYCLE_FIRST_UPDATED_NUM] = len(engine.cycle_ends) + 1
+        new_draws = draw_matrix.slice(start_contest=int(last_processed_contest) + 1)
+        engine.extend(new_draws.contest_ids, new_draws.bitmasks)
+        logger.info(f"Ciclos retomados após o concurso {last_processed_contest}: {len(new_draws)} concurso(s) novo(s).")
+    else:
+        engine = CycleEngine.from_draw_matrix(draw_matrix)
+    df_cycles_detail = engine.to_cycles_detail_df()
+
+    if not df_cycles_detail.empty:
         results[KEY_CYCLE_DETAILS_DF] = df_cycles_detail
         
         if 'duracao_concursos' in df_cycles_detail.columns:
@@ -118,10 +75,11 @@ def identify_and_process_cycles(all_data_df: pd.DataFrame, config: Any) -> Dict[
                     'duracao_media_ciclo': float(df_closed_cycles['duracao_concursos'].mean()) if len(df_closed_cycles) > 0 else np.nan,
                     'duracao_min_ciclo': int(df_closed_cycles['duracao_concursos'].min()) if len(df_closed_cycles) > 0 else pd.NA, 
                     'duracao_max_ciclo': int(df_closed_cycles['duracao_concursos'].max()) if len(df_closed_cycles) > 0 else pd.NA, 
-                    'duracao_mediana_ciclo': float(df_closed_cycles['duracao_concursos'].median()) if len(df_closed_cycles) > 0 else np.nan
+                    'duracao_mediana_ciclo': float(df_closed_cycles['duracao_concursos'].median()) if len(df_closed_cycles) > 0 else np.nan,
+                    LAST_PROCESSED_CONTEST_COLUMN: engine.last_contest
                 }
                 df_summary = pd.DataFrame([summary_stats_data])
-                for col_int_sum in ['total_ciclos_fechados', 'duracao_min_ciclo', 'duracao_max_ciclo']:
+                for col_int_sum in ['total_ciclos_fechados', 'duracao_min_ciclo', 'duracao_max_ciclo', LAST_PROCESSED_CONTEST_COLUMN]:
                      if col_int_sum in df_summary.columns:
                         df_summary[col_int_sum] = pd.to_numeric(df_summary[col_int_sum], errors='coerce').astype('Int64')
                 
@@ -135,13 +93,13 @@ def calculate_detailed_metrics_per_closed_cycle(
     df_ciclos_detalhe: Optional[pd.DataFrame], 
     config: Any 
 ) -> Dict[str, Optional[pd.DataFrame]]:
-    # ... (corpo desta função como na do arquivo all_project_sources.txt - está correto e não precisa de novas alterações aqui)
-    # Para fins de completude, vou colar a versão que você já tem e que está correta.
+    """
+    Métricas por dezena de cada ciclo fechado (frequência, rank, atrasos) e médias de
+    grupo por ciclo. Cada ciclo é um intervalo de índices nos arrays do ChunkPrefixEngine
+    (somas de prefixo sobre a matriz de sorteios compartilhada), sem copiar all_data_df.
+    Inclui também a tabela larga config.CYCLE_ANALISES_CONSOLIDADAS_TABLE_NAME.
+    """
     logger.info("Iniciando cálculo de métricas detalhadas por dezena/ciclo.")
-    results_data_lists: Dict[str, List[Dict[str, Any]]] = {
-        "frequency": [], "mean_delay": [], "max_delay": [], 
-        "final_delay": [], "rank_frequency": [], "group_metrics_cycle": []
-    }
     output_dfs: Dict[str, Optional[pd.DataFrame]] = {
         config.CYCLE_METRIC_FREQUENCY_TABLE_NAME: None,
         config.CYCLE_METRIC_ATRASO_MEDIO_TABLE_NAME: None, 
@@ -168,164 +126,67 @@ def calculate_detailed_metrics_per_closed_cycle(
     df_closed_cycles = df_ciclos_detalhe[
         df_ciclos_detalhe['concurso_fim'].notna() & 
         df_ciclos_detalhe['duracao_concursos'].notna() & 
-        (df_ciclos_detalhe['duracao_concursos'] > 0)
-    ].copy()
+        (df_ciclos_detalhe['duracao_concursos'] > 0) &
+        df_ciclos_detalhe['ciclo_num'].notna() &
+        df_ciclos_detalhe['concurso_inicio'].notna()
+    ]
     
     if df_closed_cycles.empty:
         logger.warning("Nenhum ciclo fechado encontrado para calcular métricas detalhadas.")
         return output_dfs
-    
-    contest_col = config.CONTEST_ID_COLUMN_NAME
-    ball_cols = config.BALL_NUMBER_COLUMNS
-
-    for _, cycle_row in df_closed_cycles.iterrows():
-        try:
-            ciclo_num = int(cycle_row['ciclo_num'])
-            start_contest = int(cycle_row['concurso_inicio'])
-            end_contest = int(cycle_row['concurso_fim'])
-        except ValueError:
-            logger.warning(f"Não foi possível converter informações do ciclo para int (ciclo_num: {cycle_row.get('ciclo_num', 'N/A')}). Pulando este ciclo.")
-            continue
 
-        df_current_cycle_contests_filtered = all_data_df.copy() 
-        try:
-            df_current_cycle_contests_filtered[contest_col] = pd.to_numeric(df_current_cycle_contests_filtered[contest_col], errors='coerce')
-            df_current_cycle_contests_filtered.dropna(subset=[contest_col], inplace=True) 
-            df_current_cycle_contests_filtered[contest_col] = df_current_cycle_contests_filtered[contest_col].astype(int)
-        except Exception as e_conv_detail:
-            logger.error(f"Erro ao converter {contest_col} para int no processamento do ciclo {ciclo_num}: {e_conv_detail}")
-            continue 
-        
-        mask = (df_current_cycle_contests_filtered[contest_col] >= start_contest) & (df_current_cycle_contests_filtered[contest_col] <= end_contest)
-        df_current_cycle_contests = df_current_cycle_contests_filtered[mask]
-
-        chunk_duration = end_contest - start_contest + 1 
-        default_freq_val = 0
-        default_delay_float_val = float(chunk_duration) if chunk_duration > 0 else np.nan 
-        default_delay_int_val = int(chunk_duration) if chunk_duration > 0 else pd.NA 
-        default_rank_val = pd.NA 
-        default_avg_group_val = np.nan 
-
-        if df_current_cycle_contests.empty:
-            logger.warning(f"Nenhum concurso encontrado para o ciclo {ciclo_num} (entre {start_contest} e {end_contest}). Usando valores padrão para métricas.")
-            for d_val in config.ALL_NUMBERS:
-                results_data_lists["frequency"].append({'ciclo_num': ciclo_num, 'dezena': d_val, 'frequencia_no_ciclo': default_freq_val})
-                results_data_lists["mean_delay"].append({'ciclo_num': ciclo_num, 'dezena': d_val, 'atraso_medio_no_ciclo': default_delay_float_val})
-                results_data_lists["max_delay"].append({'ciclo_num': ciclo_num, 'dezena': d_val, 'atraso_maximo_no_ciclo': default_delay_int_val})
-                results_data_lists["final_delay"].append({'ciclo_num': ciclo_num, 'dezena': d_val, 'atraso_final_no_ciclo': default_delay_int_val})
-                results_data_lists["rank_frequency"].append({'ciclo_num': ciclo_num, 'dezena': d_val, 'frequencia_no_ciclo': default_freq_val, 'rank_freq_no_ciclo': default_rank_val})
-            results_data_lists["group_metrics_cycle"].append({'ciclo_num': ciclo_num, 'avg_pares_no_ciclo': default_avg_group_val, 'avg_impares_no_ciclo': default_avg_group_val, 'avg_primos_no_ciclo': default_avg_group_val})
-            continue
-
-        freq_series = calculate_frequency_in_chunk(df_current_cycle_contests, config) 
-        
-        temp_cycle_freq_data_for_rank: List[Dict[str, Any]] = []
-        all_dezenas_in_config = set(config.ALL_NUMBERS)
-        
-        for d_item in all_dezenas_in_config: 
-            v_item = freq_series.get(d_item, default_freq_val) 
-            results_data_lists["frequency"].append({'ciclo_num': ciclo_num, 'dezena': int(d_item), 'frequencia_no_ciclo': int(v_item)})
-            temp_cycle_freq_data_for_rank.append({'dezena': int(d_item), 'frequencia_no_ciclo': int(v_item)})
-
-        if temp_cycle_freq_data_for_rank:
-            df_temp_freq = pd.DataFrame(temp_cycle_freq_data_for_rank)
-            if not df_temp_freq.empty and 'frequencia_no_ciclo' in df_temp_freq.columns:
-                 df_temp_freq['rank_freq_no_ciclo'] = df_temp_freq['frequencia_no_ciclo'].rank(method='dense', ascending=False).astype('Int64')
-                 for _, rank_row in df_temp_freq.iterrows():
-                     results_data_lists["rank_frequency"].append({
-                         'ciclo_num': ciclo_num, 
-                         'dezena': int(rank_row['dezena']), 
-                         'frequencia_no_ciclo': int(rank_row['frequencia_no_ciclo']),
-                         'rank_freq_no_ciclo': rank_row['rank_freq_no_ciclo']
-                     })
-            else: 
-                for d_val in all_dezenas_in_config:
-                    results_data_lists["rank_frequency"].append({'ciclo_num': ciclo_num, 'dezena': int(d_val), 'frequencia_no_ciclo': default_freq_val, 'rank_freq_no_ciclo': default_rank_val})
-        else: 
-            for d_val in all_dezenas_in_config:
-                results_data_lists["rank_frequency"].append({'ciclo_num': ciclo_num, 'dezena': int(d_val), 'frequencia_no_ciclo': default_freq_val, 'rank_freq_no_ciclo': default_rank_val})
-        
-        draw_matrix_cycle = get_draw_matrix_for_chunk(df_current_cycle_contests, start_contest, end_contest, config) 
-        if not draw_matrix_cycle.empty:
-            delay_metrics_dict = calculate_delays_for_matrix(draw_matrix_cycle, start_contest, end_contest, config)
-            for d_val in all_dezenas_in_config: 
-                results_data_lists["mean_delay"].append({'ciclo_num': ciclo_num, 'dezena': int(d_val), 'atraso_medio_no_ciclo': float(delay_metrics_dict["mean"].get(d_val, np.nan)) if pd.notna(delay_metrics_dict["mean"].get(d_val, np.nan)) else default_delay_float_val})
-                results_data_lists["max_delay"].append({'ciclo_num': ciclo_num, 'dezena': int(d_val), 'atraso_maximo_no_ciclo': pd.NA if pd.isna(delay_metrics_dict["max"].get(d_val)) else int(delay_metrics_dict["max"].get(d_val, default_delay_int_val))})
-                results_data_lists["final_delay"].append({'ciclo_num': ciclo_num, 'dezena': int(d_val), 'atraso_final_no_ciclo': pd.NA if pd.isna(delay_metrics_dict["final"].get(d_val)) else int(delay_metrics_dict["final"].get(d_val, default_delay_int_val))})
-        else: 
-            for d_val in all_dezenas_in_config:
-                results_data_lists["mean_delay"].append({'ciclo_num': ciclo_num, 'dezena': int(d_val), 'atraso_medio_no_ciclo': default_delay_float_val})
-                results_data_lists["max_delay"].append({'ciclo_num': ciclo_num, 'dezena': int(d_val), 'atraso_maximo_no_ciclo': default_delay_int_val})
-                results_data_lists["final_delay"].append({'ciclo_num': ciclo_num, 'dezena': int(d_val), 'atraso_final_no_ciclo': default_delay_int_val})
-            
-        actual_ball_cols_for_props = [col for col in ball_cols if col in df_current_cycle_contests.columns]
-        if not actual_ball_cols_for_props :
-            results_data_lists["group_metrics_cycle"].append({'ciclo_num': ciclo_num, 'avg_pares_no_ciclo': default_avg_group_val, 'avg_impares_no_ciclo': default_avg_group_val, 'avg_primos_no_ciclo': default_avg_group_val})
-        else:
-            cycle_contest_properties_list: List[Dict[str, Any]] = []
-            for _, contest_row_in_cycle in df_current_cycle_contests.iterrows():
-                try:
-                    draw_in_cycle = [int(x) for x in contest_row_in_cycle[actual_ball_cols_for_props].values if pd.notna(x)]
-                    if len(draw_in_cycle) == config.NUMBERS_PER_DRAW: 
-                        properties = analyze_draw_properties(draw_in_cycle, config) 
-                        cycle_contest_properties_list.append(properties)
-                    else:
-                        logger.debug(f"Concurso {contest_row_in_cycle.get(contest_col, 'N/A')} no ciclo {ciclo_num} não tem {config.NUMBERS_PER_DRAW} dezenas válidas após limpeza. Pulando propriedades.")
-                except ValueError: 
-                    logger.warning(f"Erro ao converter dezenas do concurso {contest_row_in_cycle.get(contest_col, 'N/A')} no ciclo {ciclo_num} para análise de propriedades."); 
-                    continue
-            if cycle_contest_properties_list:
-                 df_cycle_props = pd.DataFrame(cycle_contest_properties_list)
-                 avg_pares = df_cycle_props['pares'].mean() if 'pares' in df_cycle_props and not df_cycle_props['pares'].dropna().empty else default_avg_group_val
-                 avg_impares = df_cycle_props['impares'].mean() if 'impares' in df_cycle_props and not df_cycle_props['impares'].dropna().empty else default_avg_group_val
-                 avg_primos = df_cycle_props['primos'].mean() if 'primos' in df_cycle_props and not df_cycle_props['primos'].dropna().empty else default_avg_group_val
-
-                 results_data_lists["group_metrics_cycle"].append({
-                    'ciclo_num': ciclo_num,
-                    'avg_pares_no_ciclo': avg_pares,
-                    'avg_impares_no_ciclo': avg_impares,
-                    'avg_primos_no_ciclo': avg_primos
-                })
-            else: 
-                results_data_lists["group_metrics_cycle"].append({'ciclo_num': ciclo_num, 'avg_pares_no_ciclo': default_avg_group_val, 'avg_impares_no_ciclo': default_avg_group_val, 'avg_primos_no_ciclo': default_avg_group_val})
-
-    for key_df_config_map, data_list_val in results_data_lists.items():
-        output_table_name_val = ""
-        if key_df_config_map == "frequency": output_table_name_val = config.CYCLE_METRIC_FREQUENCY_TABLE_NAME
-        elif key_df_config_map == "mean_delay": output_table_name_val = config.CYCLE_METRIC_ATRASO_MEDIO_TABLE_NAME
-        elif key_df_config_map == "max_delay": output_table_name_val = config.CYCLE_METRIC_ATRASO_MAXIMO_TABLE_NAME
-        elif key_df_config_map == "final_delay": output_table_name_val = config.CYCLE_METRIC_ATRASO_FINAL_TABLE_NAME
-        elif key_df_config_map == "rank_frequency": output_table_name_val = config.CYCLE_RANK_FREQUENCY_TABLE_NAME
-        elif key_df_config_map == "group_metrics_cycle": output_table_name_val = config.CYCLE_GROUP_METRICS_TABLE_NAME
-        else: continue
-
-        if data_list_val:
-            df_metric = pd.DataFrame(data_list_val)
-            if key_df_config_map == "frequency":
-                if 'frequencia_no_ciclo' in df_metric.columns: df_metric['frequencia_no_ciclo'] = pd.to_numeric(df_metric['frequencia_no_ciclo'], errors='coerce').astype('Int64')
-            elif key_df_config_map == "mean_delay":
-                if 'atraso_medio_no_ciclo' in df_metric.columns: df_metric['atraso_medio_no_ciclo'] = pd.to_numeric(df_metric['atraso_medio_no_ciclo'], errors='coerce').astype('float')
-            elif key_df_config_map == "max_delay":
-                if 'atraso_maximo_no_ciclo' in df_metric.columns: df_metric['atraso_maximo_no_ciclo'] = pd.to_numeric(df_metric['atraso_maximo_no_ciclo'], errors='coerce').astype('Int64')
-            elif key_df_config_map == "final_delay":
-                if 'atraso_final_no_ciclo' in df_metric.columns: df_metric['atraso_final_no_ciclo'] = pd.to_numeric(df_metric['atraso_final_no_ciclo'], errors='coerce').astype('Int64')
-            elif key_df_config_map == "rank_frequency":
-                if 'rank_freq_no_ciclo' in df_metric.columns: df_metric['rank_freq_no_ciclo'] = pd.to_numeric(df_metric['rank_freq_no_ciclo'], errors='coerce').astype('Int64')
-                if 'frequencia_no_ciclo' in df_metric.columns: df_metric['frequencia_no_ciclo'] = pd.to_numeric(df_metric['frequencia_no_ciclo'], errors='coerce').astype('Int64')
-            elif key_df_config_map == "group_metrics_cycle":
-                for col_group in ['avg_pares_no_ciclo', 'avg_impares_no_ciclo', 'avg_primos_no_ciclo']:
-                    if col_group in df_metric.columns:
-                        df_metric[col_group] = pd.to_numeric(df_metric[col_group], errors='coerce').astype('float')
-            
-            if config.CICLO_NUM_COLUMN_NAME in df_metric.columns:
-                df_metric[config.CICLO_NUM_COLUMN_NAME] = pd.to_numeric(df_metric[config.CICLO_NUM_COLUMN_NAME], errors='coerce').astype('Int64')
-            if config.DEZENA_COLUMN_NAME in df_metric.columns:
-                 df_metric[config.DEZENA_COLUMN_NAME] = pd.to_numeric(df_metric[config.DEZENA_COLUMN_NAME], errors='coerce').astype('Int64')
-            output_dfs[output_table_name_val] = df_metric
-        else: 
-             output_dfs[output_table_name_val] = pd.DataFrame()
-
-    logger.info("Cálculo de métricas detalhadas por dezena/ciclo concluído.")
+    ciclo_nums = df_closed_cycles['ciclo_num'].to_numpy(dtype=np.int64)
+    starts = df_closed_cycles['concurso_inicio'].to_numpy(dtype=np.int64)
+    ends = df_closed_cycles['concurso_fim'].to_numpy(dtype=np.int64)
+    full_draw_matrix = get_draw_matrix_provider(all_data_df, config)
+    total_contests = max(int(full_draw_matrix.contest_ids.max()) if not full_draw_matrix.empty else 0, int(ends.max()))
+    engine = build_chunk_engine(full_draw_matrix, config, total_contests=total_contests)
+    order = np.argsort(starts, kind='stable') # compute_ranges exige intervalos crescentes
+    try:
+        sorted_metrics = engine.compute_ranges(starts[order], ends[order])
+    except ValueError as e:
+        logger.error(f"Intervalos de ciclos inválidos em df_ciclos_detalhe: {e}")
+        return output_dfs
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order))
+    cycle_metrics = {key: values[inverse] for key, values in sorted_metrics.items()}
+
+    dezenas = np.asarray(config.ALL_NUMBERS, dtype=np.int64)
+    engine_columns = [int(n) for n in engine.numbers]
+    dezena_positions = [engine_columns.index(int(n)) for n in dezenas]
+    per_dezena = build_cycle_metric_arrays(cycle_metrics, dezena_positions)
+
+    n_cycles, n_dezenas = len(ciclo_nums), len(dezenas)
+    def long_frame(values_by_column: Dict[str, Any]) -> pd.DataFrame:
+        columns: Dict[str, Any] = {
+            config.CICLO_NUM_COLUMN_NAME: pd.array(np.repeat(ciclo_nums, n_dezenas), dtype='Int64'),
+            config.DEZENA_COLUMN_NAME: pd.array(np.tile(dezenas, n_cycles), dtype='Int64'),
+        }
+        for column, (values, dtype) in values_by_column.items():
+            values = values.ravel()
+            columns[column] = values.astype(float) if dtype == 'float' else pd.array(values, dtype=dtype)
+        return pd.DataFrame(columns)
+
+    output_dfs[config.CYCLE_METRIC_FREQUENCY_TABLE_NAME] = long_frame({'frequencia_no_ciclo': (per_dezena['frequency'], 'Int64')})
+    output_dfs[config.CYCLE_METRIC_ATRASO_MEDIO_TABLE_NAME] = long_frame({'atraso_medio_no_ciclo': (per_dezena['delay_mean'], 'float')})
+    output_dfs[config.CYCLE_METRIC_ATRASO_MAXIMO_TABLE_NAME] = long_frame({'atraso_maximo_no_ciclo': (per_dezena['delay_max'], 'Int64')})
+    output_dfs[config.CYCLE_METRIC_ATRASO_FINAL_TABLE_NAME] = long_frame({'atraso_final_no_ciclo': (per_dezena['delay_final'], 'Int64')})
+    output_dfs[config.CYCLE_RANK_FREQUENCY_TABLE_NAME] = long_frame({
+        'frequencia_no_ciclo': (per_dezena['frequency'], 'Int64'),
+        'rank_freq_no_ciclo': (per_dezena['rank'], 'Int64'),
+    })
+    group_metrics_df = pd.DataFrame({
+        config.CICLO_NUM_COLUMN_NAME: pd.array(ciclo_nums, dtype='Int64'),
+        **{f'avg_{name}_no_ciclo': cycle_metrics[f'avg_{name}'].astype(float) for name in ('pares', 'impares', 'primos')},
+    })
+    output_dfs[config.CYCLE_GROUP_METRICS_TABLE_NAME] = group_metrics_df
+
+    # Tabela larga consolidada no mesmo passo, direto dos arrays (sem reler as tabelas longas).
+    wide_df = build_cycle_wide_frame(per_dezena, df_closed_cycles, config, group_metrics_df)
+    if not wide_df.empty:
+        output_dfs[config.CYCLE_ANALISES_CONSOLIDADAS_TABLE_NAME] = wide_df
+
+    logger.info(f"Cálculo de métricas detalhadas por dezena/ciclo concluído ({n_cycles} ciclos fechados).")
     return output_dfs
 
 # Wrappers
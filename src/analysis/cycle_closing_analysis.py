@@ -5,6 +5,8 @@ import numpy as np
 import logging
 from typing import List, Dict, Optional, Tuple, Set, Any
 
+from src.analysis.draw_matrix import DrawMatrix, build_draw_matrix
+
 logger = logging.getLogger(__name__)
 
 def _get_draw_numbers_from_row(draw_row: pd.Series, ball_columns: List[str]) -> Set[int]:
@@ -47,7 +49,9 @@ def get_cycles_df_corrected( # Esta função parece carregar do DB e pode não s
              params.append(concurso_maximo)
         else:
             logger.warning(f"Coluna 'concurso_fim' não existe na tabela '{cycles_table_name}' para filtro.")
-    sql_query += f" ORDER BY {ciclo_num_col_in_db} ASC;"
+    # Ciclos fecham em ordem: ordenar por concurso_fim (e número) equivale a ordenar pelo número
+    # do ciclo e permite ao SQLite usar o índice de concurso_fim sem varrer a tabela.
+    sql_query += f" ORDER BY concurso_fim ASC, {ciclo_num_col_in_db} ASC;"
     
     df = db_manager.load_dataframe(table_name=cycles_table_name, query=sql_query, params=tuple(params))
 
@@ -84,10 +88,52 @@ def get_draw_numbers_for_contest(
     logger.warning(f"Nenhum dado encontrado para o concurso {contest_id} ao buscar dezenas.")
     return None
 
+def load_draw_matrix_from_db(db_manager: Any, config: Any) -> DrawMatrix:
+    """Carrega todos os sorteios da tabela principal numa única consulta."""
+    ball_cols_str = ", ".join(config.BALL_NUMBER_COLUMNS)
+    query = f"SELECT {config.CONTEST_ID_COLUMN_NAME}, {ball_cols_str} FROM {config.MAIN_DRAWS_TABLE_NAME} ORDER BY {config.CONTEST_ID_COLUMN_NAME}"
+    return build_draw_matrix(db_manager.execute_query(query), config)
+
+def compute_cycle_closings(draw_matrix: DrawMatrix, cycle_starts: np.ndarray, cycle_ends: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Dezenas que fecharam cada ciclo, em uma passada sobre as máscaras de bits dos sorteios:
+    cobertura = OR das máscaras de concurso_inicio a concurso_fim - 1 (reduceat por intervalo);
+    fechamento = máscara do concurso_fim & ~cobertura. 'closing_bits' (ciclos x dezenas) segue
+    a ordem de draw_matrix.numbers; ciclos cujo concurso final não está nos dados têm máscara 0
+    e 'closing_draw_found' False.
+    """
+    cycle_starts = np.asarray(cycle_starts, dtype=np.int64)
+    cycle_ends = np.asarray(cycle_ends, dtype=np.int64)
+    contest_ids = draw_matrix.contest_ids.astype(np.int64)
+    masks = np.append(draw_matrix.bitmasks.astype(np.uint32), np.uint32(0)) # sentinela p/ intervalos no fim
+    lo = np.searchsorted(contest_ids, cycle_starts, side='left')
+    hi = np.searchsorted(contest_ids, cycle_ends - 1, side='right')
+    coverage = np.zeros(len(cycle_starts), dtype=np.uint32)
+    if len(cycle_starts):
+        bounds = np.column_stack([lo, hi]).ravel()
+        coverage = np.bitwise_or.reduceat(masks, bounds)[::2]
+        coverage = np.where(lo < hi, coverage, np.uint32(0)).astype(np.uint32)
+
+    end_rows = np.searchsorted(contest_ids, cycle_ends, side='left')
+    found = end_rows < len(contest_ids)
+    found[found] = contest_ids[end_rows[found]] == cycle_ends[found]
+    closing_draw = np.where(found, masks[np.minimum(end_rows, len(contest_ids))], np.uint32(0)).astype(np.uint32)
+    closing_masks = closing_draw & ~coverage
+    bits = np.arange(len(draw_matrix.numbers), dtype=np.uint32)
+    return {
+        'concurso_inicio': cycle_starts,
+        'concurso_fim': cycle_ends,
+        'coverage_masks': coverage,
+        'closing_masks': closing_masks,
+        'closing_bits': ((closing_masks[:, None] >> bits) & 1).astype(np.int64),
+        'closing_draw_found': found,
+    }
+
 def calculate_closing_number_stats(
     db_manager: Any,
     config: Any,
-    cycles_df: pd.DataFrame # Este DF vem do shared_context e tem 'ciclo_num' e 'duracao_concursos'
+    cycles_df: pd.DataFrame, # Este DF vem do shared_context e tem 'ciclo_num' e 'duracao_concursos'
+    draw_matrix: Optional[DrawMatrix] = None
 ) -> pd.DataFrame:
     logger.info("Calculando estatísticas de frequência de fechamento de ciclo...")
 
@@ -119,63 +165,28 @@ def calculate_closing_number_stats(
 
     df_len = len(closed_cycles_df)
     logger.info(f"Analisando {df_len} ciclos fechados para estatísticas de fechamento...")
-    
-    closing_counter = Counter()
-    sole_closing_counter = Counter()
-    processed_valid_cycles = 0
-    
-    main_draws_table = config.MAIN_DRAWS_TABLE_NAME
-    ball_cols_for_query_str = ", ".join(config.BALL_NUMBER_COLUMNS)
 
-    for index, cycle_row in closed_cycles_df.iterrows():
-        try:
-            cycle_num = int(cycle_row['ciclo_num']) # Usando 'ciclo_num'
-            start_c = int(cycle_row['concurso_inicio'])
-            end_c = int(cycle_row['concurso_fim'])
-        except Exception as e:
-            logger.error(f"Erro ao processar dados da linha do ciclo {index} (num: {cycle_row.get('ciclo_num', 'N/A')}): {e}")
-            continue
-            
-        concurso_fim_menos_1 = end_c - 1
-        seen_in_cycle_before_closing_draw: Set[int] = set()
-
-        if start_c <= concurso_fim_menos_1:
-            query_seen_before = f"""
-                SELECT {ball_cols_for_query_str} 
-                FROM {main_draws_table} 
-                WHERE {config.CONTEST_ID_COLUMN_NAME} BETWEEN ? AND ?
-            """
-            df_seen_before = db_manager.execute_query(query_seen_before, params=(start_c, concurso_fim_menos_1))
-            
-            if df_seen_before is not None and not df_seen_before.empty:
-                for _, draw_row_seen in df_seen_before.iterrows():
-                    seen_in_cycle_before_closing_draw.update(_get_draw_numbers_from_row(draw_row_seen, config.BALL_NUMBER_COLUMNS))
-        
-        drawn_at_closing_contest = get_draw_numbers_for_contest(db_manager, config, end_c)
-        if drawn_at_closing_contest is None:
-            logger.warning(f"Não obter dezenas para concurso de fechamento {end_c} do ciclo {cycle_num}. Pulando.")
-            continue
-            
-        missing_for_cycle_closure = set(config.ALL_NUMBERS) - seen_in_cycle_before_closing_draw
-        actual_closing_numbers = drawn_at_closing_contest.intersection(missing_for_cycle_closure)
-        
-        if not actual_closing_numbers:
-            logger.warning(
-                f"Ciclo {cycle_num} (final {end_c}): Nenhuma dezena de fechamento. "
-                f"Faltavam: {sorted(list(missing_for_cycle_closure)) if missing_for_cycle_closure else 'Nenhuma'}. "
-                f"Sorteadas em {end_c}: {sorted(list(drawn_at_closing_contest))}."
-            )
-            if not missing_for_cycle_closure:
-                 logger.debug(f"Ciclo {cycle_num}, todas dezenas vistas antes do concurso {end_c}.")
-            continue 
-        
-        closing_counter.update(actual_closing_numbers)
-        if len(actual_closing_numbers) == 1:
-            sole_closing_counter.update(actual_closing_numbers) 
-        
-        processed_valid_cycles += 1
-        if processed_valid_cycles > 0 and processed_valid_cycles % 20 == 0:
-            logger.info(f"{processed_valid_cycles}/{df_len} ciclos processados para análise de fechamento...")
+    if draw_matrix is None:
+        draw_matrix = load_draw_matrix_from_db(db_manager, config)
+    cycle_starts = pd.to_numeric(closed_cycles_df['concurso_inicio'], errors='coerce').to_numpy(dtype=float)
+    cycle_ends = pd.to_numeric(closed_cycles_df['concurso_fim'], errors='coerce').to_numpy(dtype=float)
+    valid_bounds = ~np.isnan(cycle_starts)
+    closings = compute_cycle_closings(draw_matrix, cycle_starts[valid_bounds].astype(np.int64), cycle_ends[valid_bounds].astype(np.int64))
+
+    cycle_nums = closed_cycles_df['ciclo_num'].to_numpy()[valid_bounds]
+    for cycle_num, end_c in zip(cycle_nums[~closings['closing_draw_found']], closings['concurso_fim'][~closings['closing_draw_found']]):
+        logger.warning(f"Não obter dezenas para concurso de fechamento {end_c} do ciclo {cycle_num}. Pulando.")
+    no_closing = closings['closing_draw_found'] & (closings['closing_masks'] == 0)
+    if no_closing.any():
+        logger.warning(f"{int(no_closing.sum())} ciclo(s) sem dezena de fechamento (todas vistas antes do concurso final). Ciclos: {cycle_nums[no_closing].tolist()[:20]}")
+
+    valid_cycles = closings['closing_masks'] != 0
+    processed_valid_cycles = int(valid_cycles.sum())
+    closing_bits = closings['closing_bits'][valid_cycles]
+    sole_cycles = closing_bits.sum(axis=1) == 1
+    numbers_order = [int(n) for n in draw_matrix.numbers]
+    closing_counter = Counter(dict(zip(numbers_order, closing_bits.sum(axis=0).tolist())))
+    sole_closing_counter = Counter(dict(zip(numbers_order, closing_bits[sole_cycles].sum(axis=0).tolist())))
 
     stats_df_final = pd.DataFrame(index=pd.Index(config.ALL_NUMBERS, name=config.DEZENA_COLUMN_NAME))
     stats_df_final['closing_freq'] = stats_df_final.index.map(closing_counter).fillna(0).astype(int)
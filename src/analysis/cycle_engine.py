@@ -0,0 +1,209 @@
+# src/analysis/cycle_engine.py
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.draw_matrix import DrawMatrix
+
+logger = logging.getLogger(__name__)
+
+# Janela inicial (em sorteios) do OR acumulado na busca do fechamento; dobra se o ciclo não fechar.
+_INITIAL_CLOSE_WINDOW = 32
+
+
+class CycleEngine:
+    """
+    Ciclos de dezenas (todas as dezenas sorteadas ao menos uma vez) sobre a máscara de
+    bits de cada sorteio: o OR acumulado desde o início do ciclo fecha o ciclo quando
+    cobre todas as dezenas. O ciclo começa no primeiro sorteio (após o fechamento
+    anterior) que traz alguma dezena.
+
+    O estado é retomável (ciclo aberto: concurso inicial e máscara já vista; último
+    concurso processado): append() de um concurso novo custa O(1) e extend() processa
+    lotes com numpy. Concursos até o último processado são ignorados, de modo que
+    reenviar o fim do histórico após retomar não conta sorteios duas vezes.
+    from_cycles_detail() reconstrói o estado a partir da tabela de detalhes de ciclos
+    e do último concurso processado, sem reprocessar o histórico.
+
+    Trajetórias por concurso processado: ciclo a que pertence e máscara das dezenas
+    que ainda faltavam após o sorteio.
+    """
+
+    def __init__(self, numbers: Sequence[int]):
+        self.numbers = [int(n) for n in numbers]
+        self.full_mask = (1 << len(self.numbers)) - 1
+        self.cycle_starts: List[int] = []
+        self.cycle_ends: List[int] = []
+        self.open_start: Optional[int] = None
+        self.open_seen_mask = 0
+        self.last_contest: Optional[int] = None
+        self._row_contests: List[np.ndarray] = []
+        self._row_cycle_nums: List[np.ndarray] = []
+        self._row_missing_after: List[np.ndarray] = []
+
+    @classmethod
+    def from_draw_matrix(cls, draw_matrix: DrawMatrix) -> "CycleEngine":
+        engine = cls(draw_matrix.numbers)
+        engine.extend(draw_matrix.contest_ids, draw_matrix.bitmasks)
+        return engine
+
+    @classmethod
+    def from_cycles_detail(cls, df_cycles_detail: pd.DataFrame, numbers: Sequence[int],
+                           last_contest: Optional[int]) -> "CycleEngine":
+        """
+        Retoma a partir da tabela de detalhes (ciclos fechados + ciclo aberto com
+        'numeros_faltantes') e do último concurso já processado, que a tabela não guarda
+        (o ciclo aberto pode ter recebido sorteios depois do seu concurso inicial).
+        """
+        engine = cls(numbers)
+        if df_cycles_detail is None or df_cycles_detail.empty:
+            engine.last_contest = None if last_contest is None else int(last_contest)
+            return engine
+        ordered = df_cycles_detail.sort_values('ciclo_num')
+        closed = ordered[ordered['concurso_fim'].notna()]
+        engine.cycle_starts = [int(c) for c in closed['concurso_inicio']]
+        engine.cycle_ends = [int(c) for c in closed['concurso_fim']]
+        open_rows = ordered[ordered['concurso_fim'].isna()]
+        if not open_rows.empty:
+            open_row = open_rows.iloc[-1]
+            missing = [int(n) for n in str(open_row['numeros_faltantes'] or '').split(',') if n.strip()]
+            engine.open_start = int(open_row['concurso_inicio'])
+            engine.open_seen_mask = engine.full_mask & ~engine.mask_for(missing)
+        recorded = max(engine.cycle_ends[-1] if engine.cycle_ends else 0, engine.open_start or 0)
+        if last_contest is None or int(last_contest) < recorded:
+            raise ValueError(f"last_contest ({last_contest}) deve ser informado e >= {recorded}, "
+                             "o último concurso registrado na tabela de ciclos.")
+        engine.last_contest = int(last_contest)
+        return engine
+
+    def mask_for(self, numbers: Sequence[int]) -> int:
+        position = {number: pos for pos, number in enumerate(self.numbers)}
+        return sum(1 << position[int(n)] for n in set(numbers) if int(n) in position)
+
+    def numbers_for(self, mask: int) -> List[int]:
+        return sorted(number for pos, number in enumerate(self.numbers) if (int(mask) >> pos) & 1)
+
+    def append(self, contest_id: int, mask: int) -> Optional[int]:
+        """
+        Processa um sorteio. Retorna o número do ciclo fechado por ele (ou None).
+        Concursos até o último processado são ignorados.
+        """
+        if self.last_contest is not None and int(contest_id) <= self.last_contest:
+            logger.debug(f"Concurso {contest_id} já processado (último: {self.last_contest}). Ignorado.")
+            return None
+        mask = int(mask) & self.full_mask
+        closed_cycle: Optional[int] = None
+        if self.open_seen_mask == 0 and mask:
+            self.open_start = int(contest_id)
+        self.open_seen_mask |= mask
+        cycle_num = len(self.cycle_ends) + 1
+        missing_after = self.full_mask & ~self.open_seen_mask
+        if self.open_seen_mask == self.full_mask:
+            self._close(int(contest_id))
+            closed_cycle = cycle_num
+        self.last_contest = int(contest_id)
+        self._row_contests.append(np.array([contest_id], dtype=np.int64))
+        self._row_cycle_nums.append(np.array([cycle_num], dtype=np.int64))
+        self._row_missing_after.append(np.array([missing_after], dtype=np.uint32))
+        return closed_cycle
+
+    def _close(self, contest_id: int) -> None:
+        self.cycle_starts.append(int(self.open_start))
+        self.cycle_ends.append(contest_id)
+        self.open_start = None
+        self.open_seen_mask = 0
+
+    def extend(self, contest_ids: np.ndarray, masks: np.ndarray) -> None:
+        """
+        Processa um lote de sorteios (em ordem de concurso) com OR acumulado
+        por ciclo. Concursos até o último processado são ignorados.
+        """
+        contest_ids = np.asarray(contest_ids, dtype=np.int64)
+        masks = np.asarray(masks, dtype=np.uint32) & np.uint32(self.full_mask)
+        if len(contest_ids) > 1 and (np.diff(contest_ids) < 0).any():
+            raise ValueError("extend() requer concursos em ordem crescente.")
+        if self.last_contest is not None:
+            new_rows = contest_ids > self.last_contest
+            if not new_rows.all():
+                logger.debug(f"{int((~new_rows).sum())} concurso(s) já processado(s) ignorado(s) no lote.")
+                contest_ids, masks = contest_ids[new_rows], masks[new_rows]
+        n_rows = len(masks)
+        if not n_rows:
+            return
+        row_cycle = np.empty(n_rows, dtype=np.int64)
+        missing_after = np.empty(n_rows, dtype=np.uint32)
+        full = np.uint32(self.full_mask)
+        pos = 0
+        while pos < n_rows:
+            cycle_num = len(self.cycle_ends) + 1
+            if self.open_seen_mask == 0:
+                contributing = np.flatnonzero(masks[pos:])
+                first = pos + int(contributing[0]) if len(contributing) else n_rows
+                row_cycle[pos:first] = cycle_num # sorteios sem dezenas antes do início do ciclo
+                missing_after[pos:first] = full
+                if first == n_rows:
+                    break
+                self.open_start = int(contest_ids[first])
+                pos = first
+            window = _INITIAL_CLOSE_WINDOW
+            while True:
+                stop = min(pos + window, n_rows)
+                coverage = np.bitwise_or.accumulate(masks[pos:stop]) | np.uint32(self.open_seen_mask)
+                closing = np.flatnonzero(coverage == full)
+                if len(closing) or stop == n_rows:
+                    end = pos + int(closing[0]) + 1 if len(closing) else stop
+                    row_cycle[pos:end] = cycle_num
+                    missing_after[pos:end] = full & ~coverage[:end - pos]
+                    if len(closing):
+                        self._close(int(contest_ids[end - 1]))
+                    else:
+                        self.open_seen_mask = int(coverage[-1])
+                    pos = end
+                    break
+                window *= 2
+        self.last_contest = int(contest_ids[-1])
+        self._row_contests.append(contest_ids)
+        self._row_cycle_nums.append(row_cycle)
+        self._row_missing_after.append(missing_after)
+
+    def arrays(self) -> Dict[str, Any]:
+        """Ciclos fechados e trajetórias processadas como arrays numpy."""
+        starts = np.asarray(self.cycle_starts, dtype=np.int64)
+        ends = np.asarray(self.cycle_ends, dtype=np.int64)
+        def joined(parts: List[np.ndarray], dtype: Any) -> np.ndarray:
+            return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+        return {
+            'cycle_num': np.arange(1, len(starts) + 1, dtype=np.int64),
+            'concurso_inicio': starts,
+            'concurso_fim': ends,
+            'duracao_concursos': ends - starts + 1,
+            'open_start': self.open_start,
+            'open_missing_mask': self.full_mask & ~self.open_seen_mask,
+            'row_contest_ids': joined(self._row_contests, np.int64),
+            'row_cycle_num': joined(self._row_cycle_nums, np.int64),
+            'row_missing_after': joined(self._row_missing_after, np.uint32),
+        }
+
+    def to_cycles_detail_df(self) -> pd.DataFrame:
+        """Tabela de detalhes de ciclos: fechados + ciclo aberto com dezenas faltantes (se iniciado)."""
+        n_closed = len(self.cycle_ends)
+        rows: Dict[str, List[Any]] = {
+            'ciclo_num': list(range(1, n_closed + 1)),
+            'concurso_inicio': list(self.cycle_starts),
+            'concurso_fim': list(self.cycle_ends),
+            'duracao_concursos': [end - start + 1 for start, end in zip(self.cycle_starts, self.cycle_ends)],
+            'numeros_faltantes': [None] * n_closed,
+            'qtd_faltantes': [0] * n_closed,
+        }
+        if self.open_seen_mask:
+            missing = self.numbers_for(self.full_mask & ~self.open_seen_mask)
+            for key, value in (('ciclo_num', n_closed + 1), ('concurso_inicio', self.open_start), ('concurso_fim', pd.NA),
+                               ('duracao_concursos', pd.NA), ('numeros_faltantes', ",".join(map(str, missing))),
+                               ('qtd_faltantes', len(missing))):
+                rows[key].append(value)
+        df_cycles_detail = pd.DataFrame(rows)
+        for col_int in ['concurso_fim', 'duracao_concursos', 'qtd_faltantes', 'ciclo_num', 'concurso_inicio']:
+            df_cycles_detail[col_int] = pd.to_numeric(df_cycles_detail[col_int], errors='coerce').astype('Int64')
+        return df_cycles_detail
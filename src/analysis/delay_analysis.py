@@ -4,55 +4,19 @@ import numpy as np
 from typing import Dict, List, Any, Optional 
 import logging
 
+from src.analysis.draw_matrix import get_draw_matrix_provider
+
 logger = logging.getLogger(__name__)
 
-# get_draw_matrix permanece como está, pois será chamada uma vez por iteração no execute_delay.py
 def get_draw_matrix(all_data_df: pd.DataFrame, config: Any) -> pd.DataFrame:
     logger.debug("Interno: get_draw_matrix iniciando.")
     if all_data_df.empty or config.CONTEST_ID_COLUMN_NAME not in all_data_df.columns:
         logger.warning("DataFrame de entrada para get_draw_matrix está vazio ou sem coluna de concurso.")
         return pd.DataFrame(columns=config.ALL_NUMBERS) 
 
-    df_for_matrix = all_data_df.copy()
-    try:
-        df_for_matrix[config.CONTEST_ID_COLUMN_NAME] = pd.to_numeric(df_for_matrix[config.CONTEST_ID_COLUMN_NAME])
-    except Exception as e:
-        logger.error(f"Não foi possível converter '{config.CONTEST_ID_COLUMN_NAME}' para numérico: {e}")
-        return pd.DataFrame(columns=config.ALL_NUMBERS)
-        
-    df_sorted = df_for_matrix.sort_values(by=config.CONTEST_ID_COLUMN_NAME).set_index(config.CONTEST_ID_COLUMN_NAME)
-    
-    actual_ball_cols = [col for col in config.BALL_NUMBER_COLUMNS if col in df_sorted.columns]
-    if not actual_ball_cols:
-        logger.error(f"Nenhuma coluna de bola encontrada em all_data_df para get_draw_matrix.")
-        return pd.DataFrame(columns=config.ALL_NUMBERS, index=df_sorted.index if not df_sorted.empty else None)
-
-    draw_matrix_list = []
-    for contest_id_loop, row in df_sorted.iterrows(): # Renomeado contest_id para evitar conflito
-        try:
-            drawn_numbers_for_row = [int(n) for n in row[actual_ball_cols].dropna().unique()]
-            drawn_numbers = set(drawn_numbers_for_row)
-            contest_presence = {number: 1 if number in drawn_numbers else 0 for number in config.ALL_NUMBERS}
-            draw_matrix_list.append(contest_presence)
-        except ValueError:
-            logger.warning(f"Valor não numérico encontrado nas dezenas do concurso {contest_id_loop}. Adicionando linha de zeros na matriz.")
-            contest_presence = {number: 0 for number in config.ALL_NUMBERS} 
-            draw_matrix_list.append(contest_presence) # Garante que a lista tenha o mesmo tamanho do índice
-            continue 
-    
-    if not draw_matrix_list: # Deve ser raro se df_sorted não for vazio
-        logger.warning("Nenhum dado processado para a matriz de sorteios.")
-        return pd.DataFrame(columns=config.ALL_NUMBERS, index=df_sorted.index if not df_sorted.empty else None)
-
-    # Se draw_matrix_list foi populado, seu tamanho deve corresponder a df_sorted.index
-    draw_matrix_df = pd.DataFrame(draw_matrix_list, index=df_sorted.index) 
-    
-    missing_num_cols = set(config.ALL_NUMBERS) - set(draw_matrix_df.columns)
-    for col in missing_num_cols:
-        draw_matrix_df[col] = 0
-    
+    draw_matrix = get_draw_matrix_provider(all_data_df, config)
     logger.debug("Interno: get_draw_matrix concluído.")
-    return draw_matrix_df[config.ALL_NUMBERS].astype(int)
+    return draw_matrix.to_dataframe(index_name=config.CONTEST_ID_COLUMN_NAME)
 
 
 # MODIFICADO: Recebe draw_matrix e last_contest_id_in_matrix
@@ -151,4 +115,101 @@ def calculate_mean_delay(draw_matrix: pd.DataFrame, config: Any) -> pd.DataFrame
     delay_df['Dezena'] = delay_df['Dezena'].astype(int)
     delay_df['Atraso Medio'] = pd.to_numeric(delay_df['Atraso Medio'], errors='coerce').round(4)
     logger.debug(f"Atraso médio calculado para {len(delay_df)} dezenas.")
-    return delay_df.sort_values(by=['Atraso Medio', 'Dezena'], ascending=[False, True])
\ No newline at end of file
+    return delay_df.sort_values(by=['Atraso Medio', 'Dezena'], ascending=[False, True])
+
+def calculate_delay_history(
+    all_data_df: pd.DataFrame,
+    config: Any,
+    target_contest_ids: List[int]
+) -> pd.DataFrame:
+    """
+    Calcula atraso atual, máximo e médio de todas as dezenas para cada concurso de
+    corte em 'target_contest_ids', percorrendo os sorteios uma única vez.
+
+    Por dezena são mantidos: última ocorrência, primeira ocorrência, maior intervalo
+    entre ocorrências, soma e quantidade de intervalos. Os valores emitidos são os
+    mesmos de calculate_current_delay/calculate_max_delay/calculate_mean_delay
+    aplicados ao prefixo do histórico até cada concurso de corte.
+
+    Args:
+        all_data_df: DataFrame com as colunas de bolas e de concurso.
+        config: Objeto de configuração.
+        target_contest_ids: Concursos de corte para os quais emitir linhas.
+
+    Returns:
+        DataFrame longo com as colunas [concurso, dezena, atraso atual, atraso máximo, atraso médio].
+    """
+    logger.debug("Interno: Iniciando calculate_delay_history (kernel de passada única).")
+    contest_id_col = config.CONTEST_ID_COLUMN_NAME
+    dezena_col = config.DEZENA_COLUMN_NAME
+    current_col = config.CURRENT_DELAY_COLUMN_NAME
+    max_col = config.MAX_DELAY_OBSERVED_COLUMN_NAME
+    avg_col = config.AVG_DELAY_COLUMN_NAME
+    output_cols = [contest_id_col, dezena_col, current_col, max_col, avg_col]
+
+    if all_data_df.empty or contest_id_col not in all_data_df.columns or not target_contest_ids:
+        return pd.DataFrame(columns=output_cols)
+
+    draw_matrix = get_draw_matrix_provider(all_data_df, config)
+    if draw_matrix.empty:
+        return pd.DataFrame(columns=output_cols)
+    contest_ids, presence = draw_matrix.contest_ids, draw_matrix.presence.astype(bool)
+    n_numbers = presence.shape[1]
+    targets = set(int(cid) for cid in target_contest_ids)
+
+    first_contest = contest_ids[0]
+    last_occ = np.full(n_numbers, -1, dtype=np.int64)
+    first_occ = np.full(n_numbers, -1, dtype=np.int64)
+    seen = np.zeros(n_numbers, dtype=bool)
+    max_inner_gap = np.zeros(n_numbers, dtype=np.int64)
+    gap_sum = np.zeros(n_numbers, dtype=np.int64)
+    gap_count = np.zeros(n_numbers, dtype=np.int64)
+
+    out_contests: List[int] = []
+    out_current: List[np.ndarray] = []
+    out_max: List[np.ndarray] = []
+    out_avg: List[np.ndarray] = []
+
+    for row_idx, cid in enumerate(contest_ids):
+        drawn = presence[row_idx]
+        repeat = drawn & seen
+        if repeat.any():
+            gaps = cid - last_occ[repeat] - 1
+            gap_sum[repeat] += gaps
+            gap_count[repeat] += 1
+            max_inner_gap[repeat] = np.maximum(max_inner_gap[repeat], gaps)
+        first_seen = drawn & ~seen
+        first_occ[first_seen] = cid
+        seen |= drawn
+        last_occ[drawn] = cid
+
+        if int(cid) not in targets:
+            continue
+
+        rows_so_far = row_idx + 1
+        current_delay = np.where(seen, cid - last_occ, rows_so_far)
+        max_delay = np.where(
+            seen,
+            np.maximum.reduce([first_occ - first_contest, max_inner_gap, cid - last_occ]),
+            rows_so_far
+        )
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_delay = np.where(gap_count > 0, gap_sum / np.maximum(gap_count, 1), np.nan)
+
+        out_contests.append(int(cid))
+        out_current.append(current_delay)
+        out_max.append(max_delay)
+        out_avg.append(np.round(avg_delay, 4))
+
+    if not out_contests:
+        return pd.DataFrame(columns=output_cols)
+
+    history_df = pd.DataFrame({
+        contest_id_col: np.repeat(out_contests, n_numbers),
+        dezena_col: np.tile(np.asarray(config.ALL_NUMBERS, dtype=int), len(out_contests)),
+        current_col: np.concatenate(out_current).astype(int),
+        max_col: np.concatenate(out_max).astype(int),
+        avg_col: np.concatenate(out_avg).astype(float),
+    })
+    logger.debug(f"Atrasos históricos calculados para {len(out_contests)} concursos de corte.")
+    return history_df[output_cols]
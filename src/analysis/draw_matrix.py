@@ -0,0 +1,158 @@
+# src/analysis/draw_matrix.py
+import logging
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Cache por execução: id(DataFrame) -> (weakref do DataFrame, assinatura, DrawMatrix).
+# A assinatura evita reaproveitar a matriz se o DataFrame foi alterado in-place.
+_DRAW_MATRIX_CACHE: Dict[int, Tuple[Any, Tuple, "DrawMatrix"]] = {}
+_DRAW_MATRIX_CACHE_MAX_ENTRIES = 4
+
+
+class DrawMatrix:
+    """
+    Matriz de presença (concursos x dezenas) em NumPy, ordenada por concurso.
+
+    'presence' é um array uint8 (0/1) com uma linha por sorteio e uma coluna por
+    dezena de 'numbers'; 'contest_ids' é o índice de concursos. Fatias por intervalo
+    de concursos (slice) são views sobre os mesmos arrays, sem cópia.
+    """
+
+    def __init__(self, contest_ids: np.ndarray, presence: np.ndarray, numbers: List[int]):
+        self.contest_ids = contest_ids
+        self.presence = presence
+        self.numbers = list(numbers)
+        self._bitmasks: Optional[np.ndarray] = None
+        self._contest_index: Optional[Dict[int, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.contest_ids)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.contest_ids) == 0
+
+    @property
+    def contest_index(self) -> Dict[int, int]:
+        """Mapa concurso -> posição da linha na matriz."""
+        if self._contest_index is None:
+            self._contest_index = {int(cid): pos for pos, cid in enumerate(self.contest_ids)}
+        return self._contest_index
+
+    @property
+    def bitmasks(self) -> np.ndarray:
+        """Máscara de 32 bits por sorteio; a dezena na coluna j ocupa o bit j."""
+        if self._bitmasks is None:
+            weights = np.left_shift(np.uint32(1), np.arange(len(self.numbers), dtype=np.uint32))
+            self._bitmasks = (self.presence.astype(np.uint32) * weights).sum(axis=1, dtype=np.uint32)
+        return self._bitmasks
+
+    def row_bounds(self, start_contest: Optional[int] = None, end_contest: Optional[int] = None) -> Tuple[int, int]:
+        """Posições [inicio, fim) das linhas com start_contest <= concurso <= end_contest."""
+        lo = 0 if start_contest is None else int(np.searchsorted(self.contest_ids, start_contest, side='left'))
+        hi = len(self.contest_ids) if end_contest is None else int(np.searchsorted(self.contest_ids, end_contest, side='right'))
+        return lo, max(lo, hi)
+
+    def slice(self, start_contest: Optional[int] = None, end_contest: Optional[int] = None) -> "DrawMatrix":
+        """Retorna uma view da matriz restrita ao intervalo de concursos (inclusivo)."""
+        lo, hi = self.row_bounds(start_contest, end_contest)
+        sliced = DrawMatrix(self.contest_ids[lo:hi], self.presence[lo:hi], self.numbers)
+        if self._bitmasks is not None:
+            sliced._bitmasks = self._bitmasks[lo:hi]
+        return sliced
+
+    def to_dataframe(self, index_name: Optional[str] = None) -> pd.DataFrame:
+        """Converte para o formato legado: índice de concursos, colunas = dezenas, valores 0/1 (int)."""
+        index = pd.Index(self.contest_ids, name=index_name)
+        return pd.DataFrame(self.presence.astype(int), index=index, columns=self.numbers)
+
+    def to_dataframe_for_range(self, start_contest: int, end_contest: int, index_name: Optional[str] = None) -> pd.DataFrame:
+        """Como to_dataframe, mas reindexado a todos os concursos do intervalo (ausentes = 0)."""
+        sliced = self.slice(start_contest, end_contest)
+        full = np.zeros((end_contest - start_contest + 1, len(self.numbers)), dtype=int)
+        if not sliced.empty:
+            full[sliced.contest_ids - start_contest] = sliced.presence
+        index = pd.RangeIndex(start_contest, end_contest + 1, name=index_name)
+        return pd.DataFrame(full, index=index, columns=self.numbers)
+
+
+def build_draw_matrix(all_data_df: pd.DataFrame, config: Any) -> DrawMatrix:
+    """
+    Constrói a DrawMatrix a partir das colunas de bolas (config.BALL_NUMBER_COLUMNS)
+    ou, na falta delas, da coluna de listas config.DRAWN_NUMBERS_COLUMN_NAME.
+    Valores não numéricos ou fora de config.ALL_NUMBERS são ignorados.
+    """
+    numbers = list(getattr(config, 'ALL_NUMBERS', list(range(1, 26))))
+    contest_id_col = getattr(config, 'CONTEST_ID_COLUMN_NAME', 'contest_id')
+    empty_matrix = DrawMatrix(np.empty(0, dtype=np.int64), np.zeros((0, len(numbers)), dtype=np.uint8), numbers)
+
+    if all_data_df is None or all_data_df.empty or contest_id_col not in all_data_df.columns:
+        logger.warning("DataFrame de entrada para build_draw_matrix está vazio ou sem coluna de concurso.")
+        return empty_matrix
+
+    contest_series = pd.to_numeric(all_data_df[contest_id_col], errors='coerce')
+    valid_rows = contest_series.notna().to_numpy()
+    order = np.argsort(contest_series.to_numpy()[valid_rows], kind='stable')
+    contest_ids = contest_series.to_numpy()[valid_rows][order].astype(np.int64)
+
+    ball_cols = [col for col in getattr(config, 'BALL_NUMBER_COLUMNS', []) if col in all_data_df.columns]
+    if ball_cols:
+        balls = all_data_df[ball_cols].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)[valid_rows][order]
+    else:
+        drawn_numbers_col = getattr(config, 'DRAWN_NUMBERS_COLUMN_NAME', 'drawn_numbers')
+        if drawn_numbers_col not in all_data_df.columns:
+            logger.error("Nenhuma coluna de bola ou de dezenas sorteadas encontrada para build_draw_matrix.")
+            return empty_matrix
+        lists = all_data_df[drawn_numbers_col].to_numpy()[valid_rows][order]
+        rows = [list(item) if isinstance(item, (list, tuple, set, frozenset)) else [] for item in lists]
+        balls = pd.DataFrame(rows, index=range(len(rows))).apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+    presence = np.zeros((len(contest_ids), len(numbers)), dtype=np.uint8)
+    for col_pos, number in enumerate(numbers):
+        presence[:, col_pos] = (balls == number).any(axis=1)
+
+    logger.debug(f"DrawMatrix construída: {presence.shape[0]} concursos x {presence.shape[1]} dezenas.")
+    return DrawMatrix(contest_ids, presence, numbers)
+
+
+def _frame_signature(all_data_df: pd.DataFrame, config: Any) -> Tuple:
+    contest_id_col = getattr(config, 'CONTEST_ID_COLUMN_NAME', 'contest_id')
+    contests = all_data_df[contest_id_col] if contest_id_col in all_data_df.columns else pd.Series(dtype=float)
+    first_last = (contests.iloc[0], contests.iloc[-1]) if len(contests) else (None, None)
+    return (len(all_data_df), tuple(all_data_df.columns), first_last, tuple(getattr(config, 'ALL_NUMBERS', [])))
+
+
+def get_draw_matrix_provider(all_data_df: pd.DataFrame, config: Any) -> DrawMatrix:
+    """
+    Retorna a DrawMatrix de 'all_data_df', construindo-a uma única vez por DataFrame.
+    Chamadas seguintes com o mesmo objeto reaproveitam os arrays (use slice() para
+    intervalos de concursos).
+    """
+    key = id(all_data_df)
+    signature = _frame_signature(all_data_df, config)
+    cached = _DRAW_MATRIX_CACHE.get(key)
+    if cached is not None:
+        frame_ref, cached_signature, matrix = cached
+        if frame_ref() is all_data_df and cached_signature == signature:
+            return matrix
+
+    matrix = build_draw_matrix(all_data_df, config)
+    try:
+        frame_ref = weakref.ref(all_data_df)
+    except TypeError:
+        return matrix
+
+    if len(_DRAW_MATRIX_CACHE) >= _DRAW_MATRIX_CACHE_MAX_ENTRIES:
+        _DRAW_MATRIX_CACHE.pop(next(iter(_DRAW_MATRIX_CACHE)))
+    _DRAW_MATRIX_CACHE[key] = (frame_ref, signature, matrix)
+    return matrix
+
+
+def clear_draw_matrix_cache() -> None:
+    """Descarta as matrizes em cache (ex.: após recarregar os dados)."""
+    _DRAW_MATRIX_CACHE.clear()
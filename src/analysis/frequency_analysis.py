@@ -1,4 +1,5 @@
 # src/analysis/frequency_analysis.py
+import numpy as np
 import pandas as pd
 import logging
 from typing import Dict, Optional, Any # Adicionado Any
@@ -92,4 +93,102 @@ def calculate_relative_frequency(
     
     # logger.info(f"Frequência relativa calculada para {len(df_relative_frequency)} dezenas em calculate_relative_frequency (analysis).") # MUDADO PARA DEBUG ou REMOVIDO
     logger.debug(f"Frequência relativa calculada para {len(df_relative_frequency)} dezenas em calculate_relative_frequency (analysis).")
-    return df_relative_frequency
\ No newline at end of file
+    return df_relative_frequency
+
+def calculate_cumulative_frequency_history(
+    all_data_df: pd.DataFrame,
+    config: Any, # Espera config_obj
+    start_after_contest_id: Optional[int] = None,
+    base_counts: Optional[Dict[int, int]] = None,
+    base_total_draws: int = 0
+) -> pd.DataFrame:
+    """
+    Calcula a frequência absoluta e relativa acumulada de todas as dezenas para
+    cada concurso de corte em uma única passada (contador de 25 colunas + cumsum),
+    com o mesmo resultado de chamar calculate_frequency/calculate_relative_frequency
+    para cada prefixo do histórico.
+
+    Args:
+        all_data_df: DataFrame com as colunas de bolas e de concurso.
+        config: Objeto de configuração.
+        start_after_contest_id: Se informado, só emite linhas para concursos
+            posteriores a ele (modo de retomada).
+        base_counts: Contagens acumuladas (dezena -> frequência) já persistidas
+            para 'start_after_contest_id'. Se None no modo de retomada, o prefixo
+            é recontado a partir de 'all_data_df'.
+        base_total_draws: Número de concursos únicos considerados em 'base_counts'.
+
+    Returns:
+        DataFrame longo com as colunas [concurso, dezena, frequência, frequência relativa].
+    """
+    logger.debug("Interno: Iniciando calculate_cumulative_frequency_history (analysis).")
+    contest_id_col = config.CONTEST_ID_COLUMN_NAME
+    dezena_col = config.DEZENA_COLUMN_NAME
+    freq_col = config.FREQUENCY_COLUMN_NAME
+    rel_freq_col = config.RELATIVE_FREQUENCY_COLUMN_NAME
+    output_cols = [contest_id_col, dezena_col, freq_col, rel_freq_col]
+
+    if all_data_df.empty or contest_id_col not in all_data_df.columns:
+        return pd.DataFrame(columns=output_cols)
+
+    ball_columns_to_use = [col for col in config.BALL_NUMBER_COLUMNS if col in all_data_df.columns]
+    if not ball_columns_to_use:
+        logger.error("Nenhuma coluna de bola encontrada no DataFrame para calculate_cumulative_frequency_history.")
+        return pd.DataFrame(columns=output_cols)
+
+    all_numbers = np.asarray(config.ALL_NUMBERS, dtype=np.int64)
+    lookup_size = int(all_numbers.max()) + 1
+    number_to_col = np.full(lookup_size, -1, dtype=np.int64)
+    number_to_col[all_numbers] = np.arange(len(all_numbers))
+
+    contest_ids = all_data_df[contest_id_col].to_numpy()
+    unique_contests, contest_pos = np.unique(contest_ids, return_inverse=True)
+
+    use_prefix_seed = start_after_contest_id is not None and base_counts is not None
+    if use_prefix_seed:
+        # Só as linhas novas entram na contagem; o prefixo vem do estado persistido.
+        row_mask = contest_ids > start_after_contest_id
+    else:
+        row_mask = np.ones(len(contest_ids), dtype=bool)
+
+    # Mesma conversão tolerante de calculate_frequency (valores inválidos ignorados).
+    balls = all_data_df.loc[row_mask, ball_columns_to_use].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    rows_pos = np.repeat(contest_pos[row_mask], len(ball_columns_to_use))
+    balls_flat = balls.ravel()
+    valid = ~np.isnan(balls_flat)
+    balls_int = balls_flat[valid].astype(np.int64)
+    rows_pos = rows_pos[valid]
+    in_range = (balls_int >= 0) & (balls_int < lookup_size)
+    cols = np.full(len(balls_int), -1, dtype=np.int64)
+    cols[in_range] = number_to_col[balls_int[in_range]]
+    keep = cols >= 0
+
+    per_contest_counts = np.zeros((len(unique_contests), len(all_numbers)), dtype=np.int64)
+    np.add.at(per_contest_counts, (rows_pos[keep], cols[keep]), 1)
+    cumulative_counts = np.cumsum(per_contest_counts, axis=0)
+    total_draws = np.arange(1, len(unique_contests) + 1, dtype=np.int64)
+
+    if start_after_contest_id is not None:
+        emit_mask = unique_contests > start_after_contest_id
+        if use_prefix_seed:
+            seed = np.array([int(base_counts.get(int(d), 0)) for d in all_numbers], dtype=np.int64)
+            cumulative_counts = cumulative_counts + seed
+            total_draws = np.cumsum(emit_mask.astype(np.int64)) + int(base_total_draws)
+        unique_contests = unique_contests[emit_mask]
+        cumulative_counts = cumulative_counts[emit_mask]
+        total_draws = total_draws[emit_mask]
+
+    if len(unique_contests) == 0:
+        return pd.DataFrame(columns=output_cols)
+
+    n_contests, n_numbers = cumulative_counts.shape
+    relative = np.round(cumulative_counts / total_draws[:, None], 6)
+
+    history_df = pd.DataFrame({
+        contest_id_col: np.repeat(unique_contests, n_numbers),
+        dezena_col: np.tile(all_numbers.astype(int), n_contests),
+        freq_col: cumulative_counts.ravel(),
+        rel_freq_col: relative.ravel(),
+    })
+    logger.debug(f"Frequência acumulada calculada para {n_contests} concursos de corte (analysis).")
+    return history_df[output_cols]
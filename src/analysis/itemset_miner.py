@@ -0,0 +1,87 @@
+# src/analysis/itemset_miner.py
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def build_item_bitsets(transactions: Sequence[Iterable[int]]) -> Dict[int, int]:
+    """
+    Bitset vertical por item: o bit i do inteiro do item indica que ele está na
+    transação i. Itens repetidos numa transação contam uma vez.
+    """
+    bitsets: Dict[int, int] = {}
+    for position, transaction in enumerate(transactions):
+        bit = 1 << position
+        for item in set(transaction):
+            bitsets[item] = bitsets.get(item, 0) | bit
+    return dict(sorted(bitsets.items()))
+
+
+def mine_frequent_itemsets_eclat(
+    item_bitsets: Dict[int, int],
+    n_transactions: int,
+    min_support: float,
+    max_len: Optional[int] = None,
+    max_itemsets: Optional[int] = None
+) -> List[Tuple[Tuple[int, ...], int]]:
+    """
+    Mineração Eclat por níveis (interseções de bitsets verticais dentro de cada classe
+    de prefixo). Retorna (itemset ordenado, nº de transações) para todo itemset com
+    suporte (contagem / n_transactions) >= min_support e tamanho <= max_len.
+    'max_itemsets' é aplicado por nível inteiro: um tamanho só entra se couber
+    completo no limite, de modo que todo subconjunto de um itemset retornado também
+    está no resultado (necessário para as regras de associação).
+    """
+    if n_transactions <= 0:
+        return []
+    results: List[Tuple[Tuple[int, ...], int]] = []
+
+    def is_frequent(count: int) -> bool:
+        return count / float(n_transactions) >= min_support
+
+    singletons = [(item, bits, bits.bit_count()) for item, bits in sorted(item_bitsets.items())]
+    # Classes de equivalência do nível atual: (prefixo, [(item, bitset, contagem), ...]).
+    level: List[Tuple[Tuple[int, ...], List[Tuple[int, int, int]]]] = [
+        ((), [candidate for candidate in singletons if is_frequent(candidate[2])])
+    ]
+    length = 1
+    while level:
+        level_itemsets = [(prefix + (item,), count) for prefix, members in level for item, _, count in members]
+        if not level_itemsets:
+            break
+        if max_itemsets is not None and len(results) + len(level_itemsets) > max_itemsets:
+            logger.warning(f"Limite de {max_itemsets} itemsets atingido na mineração Eclat: "
+                           f"resultado parcial com itemsets de tamanho até {length - 1}.")
+            break
+        results.extend(level_itemsets)
+        if max_len is not None and length >= max_len:
+            break
+        next_level: List[Tuple[Tuple[int, ...], List[Tuple[int, int, int]]]] = []
+        for prefix, members in level:
+            for pos, (item, bits, _) in enumerate(members):
+                next_members: List[Tuple[int, int, int]] = []
+                for other_item, other_bits, _ in members[pos + 1:]:
+                    common = bits & other_bits
+                    common_count = common.bit_count()
+                    if is_frequent(common_count):
+                        next_members.append((other_item, common, common_count))
+                if next_members:
+                    next_level.append((prefix + (item,), next_members))
+        level = next_level
+        length += 1
+    return results
+
+
+def frequent_itemsets_dataframe(
+    mined: List[Tuple[Tuple[int, ...], int]],
+    n_transactions: int
+) -> pd.DataFrame:
+    """DataFrame no formato do apriori do mlxtend: 'support' e 'itemsets' (frozenset), por tamanho."""
+    ordered = sorted(mined, key=lambda entry: (len(entry[0]), entry[0]))
+    return pd.DataFrame({
+        'support': [count / float(n_transactions) for _, count in ordered],
+        'itemsets': [frozenset(itemset) for itemset, _ in ordered],
+    }, columns=['support', 'itemsets'])
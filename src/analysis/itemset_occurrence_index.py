@@ -0,0 +1,158 @@
+# src/analysis/itemset_occurrence_index.py
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.draw_matrix import DrawMatrix, get_draw_matrix_provider
+
+logger = logging.getLogger(__name__)
+
+# Itemsets avaliados por bloco na consulta em lote (limita a matriz itemsets x sorteios).
+ITEMSET_BATCH_SIZE = 2048
+
+
+class ItemsetOccurrenceIndex:
+    """
+    Índice de ocorrências de itemsets sobre o histórico de sorteios.
+
+    Cada sorteio é uma máscara de 25 bits (bit j = dezena na coluna j de 'numbers');
+    um itemset ocorre num sorteio quando (mascara & m) == m. Também mantém um bitmap
+    vertical (compactado) por dezena: a interseção (AND) dos bitmaps das dezenas de um
+    itemset dá diretamente os sorteios em que ele ocorreu.
+    """
+
+    def __init__(self, contest_ids: np.ndarray, draw_masks: np.ndarray, numbers: Sequence[int]):
+        order = np.argsort(contest_ids, kind='stable')
+        self.contest_ids = np.asarray(contest_ids, dtype=np.int64)[order]
+        self.draw_masks = np.asarray(draw_masks, dtype=np.uint32)[order]
+        self.numbers = [int(n) for n in numbers]
+        self._bit_by_number = {number: np.uint32(1 << pos) for pos, number in enumerate(self.numbers)}
+        self._vertical: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_draw_matrix(cls, draw_matrix: DrawMatrix) -> "ItemsetOccurrenceIndex":
+        return cls(draw_matrix.contest_ids, draw_matrix.bitmasks, draw_matrix.numbers)
+
+    def __len__(self) -> int:
+        return len(self.contest_ids)
+
+    @property
+    def vertical_bitmaps(self) -> np.ndarray:
+        """Bitmaps por dezena (dezenas x ceil(sorteios/8)), bits na ordem dos sorteios."""
+        if self._vertical is None:
+            bits = np.arange(len(self.numbers), dtype=np.uint32)
+            presence = ((self.draw_masks[None, :] >> bits[:, None]) & 1).astype(bool)
+            self._vertical = np.packbits(presence, axis=1)
+        return self._vertical
+
+    def itemset_mask(self, itemset: Iterable[int]) -> Optional[np.uint32]:
+        """Máscara de bits do itemset; None se alguma dezena não pertence ao universo."""
+        mask = np.uint32(0)
+        for number in itemset:
+            bit = self._bit_by_number.get(int(number))
+            if bit is None:
+                return None
+            mask |= bit
+        return mask
+
+    def occurrence_bitmap(self, itemset: Iterable[int]) -> np.ndarray:
+        """AND dos bitmaps verticais das dezenas do itemset (compactado, como vertical_bitmaps)."""
+        positions = [self.numbers.index(int(number)) for number in itemset]
+        if not positions:
+            return np.packbits(np.ones(len(self), dtype=bool))
+        return np.bitwise_and.reduce(self.vertical_bitmaps[positions], axis=0)
+
+    def occurrence_contests(self, itemset: Iterable[int]) -> np.ndarray:
+        """Concursos (ordenados) em que todas as dezenas do itemset saíram."""
+        itemset = list(itemset)
+        if any(int(number) not in self._bit_by_number for number in itemset):
+            return np.empty(0, dtype=np.int64)
+        hits = np.unpackbits(self.occurrence_bitmap(itemset), count=len(self)).astype(bool)
+        return self.contest_ids[hits]
+
+    def support_count(self, itemset: Iterable[int]) -> int:
+        itemset = list(itemset)
+        if any(int(number) not in self._bit_by_number for number in itemset):
+            return 0
+        return int(np.unpackbits(self.occurrence_bitmap(itemset), count=len(self)).sum())
+
+    def delay_metrics(self, itemset_masks: np.ndarray, latest_contest_id: int) -> Dict[str, Any]:
+        """
+        Métricas de atraso para um lote de itemsets (máscaras uint32), sem laços por
+        itemset. Retorna arrays alinhados a 'itemset_masks': 'frequency',
+        'last_occurrence' (-1 se nunca ocorreu), 'current_delay', 'mean_delay',
+        'max_delay', 'std_dev_delay' (intervalos entre ocorrências consecutivas; NaN com
+        menos de 2 ocorrências) e 'occurrences' (lista de arrays de concursos).
+        """
+        itemset_masks = np.asarray(itemset_masks, dtype=np.uint32)
+        n_itemsets = len(itemset_masks)
+        frequency = np.zeros(n_itemsets, dtype=np.int64)
+        last_occurrence = np.full(n_itemsets, -1, dtype=np.int64)
+        gap_count = np.zeros(n_itemsets, dtype=np.int64)
+        gap_sum = np.zeros(n_itemsets, dtype=np.float64)
+        gap_sumsq = np.zeros(n_itemsets, dtype=np.float64)
+        max_delay = np.full(n_itemsets, np.nan)
+        occurrences: List[np.ndarray] = []
+
+        for batch_start in range(0, n_itemsets, ITEMSET_BATCH_SIZE):
+            batch = itemset_masks[batch_start:batch_start + ITEMSET_BATCH_SIZE]
+            hits = (self.draw_masks[None, :] & batch[:, None]) == batch[:, None]
+            rows, cols = np.nonzero(hits)
+            contests = self.contest_ids[cols]
+            counts = np.bincount(rows, minlength=len(batch))
+            offsets = np.concatenate([[0], np.cumsum(counts)])
+            batch_slice = slice(batch_start, batch_start + len(batch))
+            frequency[batch_slice] = counts
+            has_hits = counts > 0
+            last_occurrence[batch_slice][has_hits] = contests[offsets[1:][has_hits] - 1]
+
+            # Intervalos entre ocorrências consecutivas do mesmo itemset.
+            same_itemset = rows[1:] == rows[:-1]
+            gaps = (contests[1:] - contests[:-1] - 1)[same_itemset].astype(np.float64)
+            gap_rows = rows[1:][same_itemset]
+            gap_count[batch_slice] = np.bincount(gap_rows, minlength=len(batch))
+            gap_sum[batch_slice] = np.bincount(gap_rows, weights=gaps, minlength=len(batch))
+            gap_sumsq[batch_slice] = np.bincount(gap_rows, weights=gaps * gaps, minlength=len(batch))
+            batch_max = np.full(len(batch), -np.inf)
+            np.maximum.at(batch_max, gap_rows, gaps)
+            max_delay[batch_slice] = np.where(np.isfinite(batch_max), batch_max, np.nan)
+            occurrences.extend(np.split(contests, offsets[1:-1]))
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_delay = np.where(gap_count > 0, gap_sum / gap_count, np.nan)
+            variance = (gap_sumsq - gap_count * mean_delay * mean_delay) / (gap_count - 1)
+            std_dev_delay = np.where(gap_count > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+        current_delay = np.where(last_occurrence >= 0, latest_contest_id - last_occurrence, -1)
+        return {
+            'frequency': frequency,
+            'last_occurrence': last_occurrence,
+            'current_delay': current_delay,
+            'mean_delay': mean_delay,
+            'max_delay': max_delay,
+            'std_dev_delay': std_dev_delay,
+            'occurrences': occurrences,
+        }
+
+
+def build_itemset_occurrence_index(all_draws_df: pd.DataFrame, config: Any) -> ItemsetOccurrenceIndex:
+    """
+    Índice a partir do DataFrame de sorteios: usa a DrawMatrix compartilhada (colunas de
+    bolas ou 'drawn_numbers') ou, na falta delas, a coluna de conjuntos 'numbers_drawn_set'.
+    """
+    contest_col = getattr(config, 'CONTEST_ID_COLUMN_NAME', 'contest_id')
+    ball_cols = [col for col in getattr(config, 'BALL_NUMBER_COLUMNS', []) if col in all_draws_df.columns]
+    drawn_numbers_col = getattr(config, 'DRAWN_NUMBERS_COLUMN_NAME', 'drawn_numbers')
+    if ball_cols or drawn_numbers_col in all_draws_df.columns:
+        return ItemsetOccurrenceIndex.from_draw_matrix(get_draw_matrix_provider(all_draws_df, config))
+
+    if 'numbers_drawn_set' not in all_draws_df.columns:
+        raise ValueError("DataFrame de sorteios deve conter colunas de bolas, 'drawn_numbers' ou 'numbers_drawn_set'.")
+    numbers = list(getattr(config, 'ALL_NUMBERS', list(range(1, 26))))
+    bit_by_number = {number: 1 << pos for pos, number in enumerate(numbers)}
+    masks = np.array([
+        sum(bit_by_number.get(int(number), 0) for number in drawn) if isinstance(drawn, (set, frozenset, list, tuple)) else 0
+        for drawn in all_draws_df['numbers_drawn_set']
+    ], dtype=np.uint32)
+    return ItemsetOccurrenceIndex(pd.to_numeric(all_draws_df[contest_col]).to_numpy(dtype=np.int64), masks, numbers)
@@ -1,12 +1,14 @@
 # src/analysis/number_properties_analysis.py
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence
 import logging
 
 # Importa ALL_NUMBERS para definir PRIMES_UP_TO_25 globalmente
 # Se preferir, PRIMES_UP_TO_25 pode ser um atributo de config também.
 from src.config import ALL_NUMBERS as CONFIG_ALL_NUMBERS # Renomeado para evitar conflito se config for passado
+from src.config import LOTOFACIL_GRID_LINES, LOTOFACIL_GRID_COLUMNS
+from src.analysis.draw_matrix import DrawMatrix, get_draw_matrix_provider
 
 logger = logging.getLogger(__name__)
 
@@ -31,20 +33,145 @@ limit_for_primes = max(CONFIG_ALL_NUMBERS) if CONFIG_ALL_NUMBERS else 25
 PRIMES_UP_TO_25: List[int] = get_prime_numbers(limit_for_primes)
 logger.debug(f"PRIMES_UP_TO_25 (módulo): {PRIMES_UP_TO_25}")
 
+FIBONACCI_UP_TO_25: List[int] = [1, 2, 3, 5, 8, 13, 21]
+
+# Propriedades originais da tabela por concurso; as demais vêm do DrawPropertyKernel.
+BASE_PROPERTY_COLUMNS: List[str] = ['soma_dezenas', 'pares', 'impares', 'primos']
+
+
+class DrawPropertyKernel:
+    """
+    Propriedades de todos os sorteios de uma vez a partir da matriz de presença
+    (sorteios x dezenas): cada propriedade de contagem/soma é um vetor de pesos por
+    dezena, e a matriz de pesos é aplicada num único produto matricial.
+
+    Propriedades: soma_dezenas, pares, impares, primos, fibonacci, moldura/miolo do
+    volante, linha_1..N e coluna_1..N (distribuição no volante), sequencias (trechos de
+    dezenas consecutivas com 2+ dezenas) e maior_sequencia. Só sorteios com exatamente
+    numbers_per_draw dezenas válidas são considerados ('valid').
+    """
+
+    def __init__(self, numbers: Sequence[int], numbers_per_draw: int = 15,
+                 grid_lines: Optional[Dict[str, List[int]]] = None, grid_columns: Optional[Dict[str, List[int]]] = None):
+        self.numbers = [int(n) for n in numbers]
+        self.numbers_per_draw = int(numbers_per_draw)
+        numbers_arr = np.asarray(self.numbers, dtype=np.int64)
+        grid_lines = grid_lines if grid_lines is not None else LOTOFACIL_GRID_LINES
+        grid_columns = grid_columns if grid_columns is not None else LOTOFACIL_GRID_COLUMNS
+        line_sets = list(grid_lines.values())
+        column_sets = list(grid_columns.values())
+        frame = set(line_sets[0]) | set(line_sets[-1]) | set(column_sets[0]) | set(column_sets[-1]) if line_sets and column_sets else set()
+        grid_numbers = set().union(*line_sets) if line_sets else set()
+
+        weights: Dict[str, np.ndarray] = {
+            'soma_dezenas': numbers_arr,
+            'pares': numbers_arr % 2 == 0,
+            'impares': numbers_arr % 2 != 0,
+            'primos': np.isin(numbers_arr, PRIMES_UP_TO_25),
+            'fibonacci': np.isin(numbers_arr, FIBONACCI_UP_TO_25),
+            'moldura': np.isin(numbers_arr, sorted(frame)),
+            'miolo': np.isin(numbers_arr, sorted(grid_numbers - frame)),
+        }
+        for position, line_numbers in enumerate(line_sets, start=1):
+            weights[f'linha_{position}'] = np.isin(numbers_arr, line_numbers)
+        for position, column_numbers in enumerate(column_sets, start=1):
+            weights[f'coluna_{position}'] = np.isin(numbers_arr, column_numbers)
+        self.weight_names = list(weights)
+        self.weights = np.column_stack([np.asarray(w, dtype=np.int64) for w in weights.values()])
+        # Pares de colunas vizinhas da matriz que são dezenas consecutivas.
+        self.adjacent_consecutive = np.diff(numbers_arr) == 1
+        self.property_names = self.weight_names + ['sequencias', 'maior_sequencia']
+
+    def properties_for_presence(self, presence: np.ndarray) -> Dict[str, np.ndarray]:
+        """Arrays por linha da matriz de presença (sorteios x dezenas de self.numbers), mais 'valid'."""
+        presence = np.asarray(presence, dtype=bool)
+        weighted = presence.astype(np.int64) @ self.weights
+        result: Dict[str, np.ndarray] = {name: weighted[:, k] for k, name in enumerate(self.weight_names)}
+
+        # Cascata deslocar-e-AND: após k passos, run[:, j] indica k+1 dezenas consecutivas a partir de j.
+        adjacent = presence[:, 1:] & presence[:, :-1] & self.adjacent_consecutive
+        run_starts = adjacent.copy()
+        run_starts[:, 1:] &= ~adjacent[:, :-1]
+        result['sequencias'] = run_starts.sum(axis=1, dtype=np.int64)
+        longest = presence.any(axis=1).astype(np.int64)
+        run, step = presence, 0
+        while True:
+            run = run[:, :-1] & adjacent[:, step:]
+            if not run.any():
+                break
+            longest += run.any(axis=1)
+            step += 1
+        result['maior_sequencia'] = longest
+        result['valid'] = presence.sum(axis=1) == self.numbers_per_draw
+        return result
+
+    def _check_numbers(self, draw_matrix: DrawMatrix) -> None:
+        if [int(n) for n in draw_matrix.numbers] != self.numbers:
+            raise ValueError("As dezenas da DrawMatrix não correspondem às do DrawPropertyKernel.")
+
+    def compute(self, draw_matrix: DrawMatrix) -> Dict[str, np.ndarray]:
+        self._check_numbers(draw_matrix)
+        return self.properties_for_presence(draw_matrix.presence)
+
+    def table(self, draw_matrix: DrawMatrix, contest_column: str = 'Concurso') -> pd.DataFrame:
+        """Tabela histórica: uma linha por sorteio válido, ordenada por concurso."""
+        properties = self.compute(draw_matrix)
+        valid = properties['valid']
+        columns: Dict[str, Any] = {contest_column: draw_matrix.contest_ids[valid].astype(np.int64)}
+        columns.update({name: properties[name][valid] for name in self.property_names})
+        return pd.DataFrame(columns)
+
+    def range_means(self, draw_matrix: DrawMatrix, start_contests: Sequence[int], end_contests: Sequence[int]) -> Dict[str, np.ndarray]:
+        """
+        Médias das propriedades por intervalo de concursos [start, end] (inclusivo), por
+        somas de prefixo sobre os sorteios válidos. 'draws' = sorteios válidos no intervalo;
+        médias NaN sem sorteios válidos.
+        """
+        properties = self.compute(draw_matrix)
+        valid = properties['valid']
+        lo = np.searchsorted(draw_matrix.contest_ids, np.asarray(start_contests, dtype=np.int64), side='left')
+        hi = np.searchsorted(draw_matrix.contest_ids, np.asarray(end_contests, dtype=np.int64), side='right')
+        hi = np.maximum(hi, lo)
+        cum_valid = np.concatenate([[0], np.cumsum(valid, dtype=np.int64)])
+        draws = cum_valid[hi] - cum_valid[lo]
+        result: Dict[str, np.ndarray] = {'draws': draws}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for name in self.property_names:
+                cum_values = np.concatenate([[0], np.cumsum(np.where(valid, properties[name], 0), dtype=np.int64)])
+                result[name] = np.where(draws > 0, (cum_values[hi] - cum_values[lo]) / np.maximum(draws, 1), np.nan)
+        return result
+
+
+def build_property_kernel(config: Any) -> DrawPropertyKernel:
+    return DrawPropertyKernel(
+        getattr(config, 'ALL_NUMBERS', list(range(1, 26))),
+        getattr(config, 'NUMBERS_PER_DRAW', 15),
+        getattr(config, 'LOTOFACIL_GRID_LINES', None),
+        getattr(config, 'LOTOFACIL_GRID_COLUMNS', None),
+    )
+
+
+_PRIMES_SET = frozenset(PRIMES_UP_TO_25)
+
 def analyze_draw_properties(draw: List[int], config_obj_param: Any) -> Dict[str, Any]: # Renomeado config para evitar conflito
-    properties: Dict[str, Any] = {}
+    """Propriedades de um único sorteio. Para vários sorteios, use DrawPropertyKernel."""
     if not draw or len(draw) != config_obj_param.NUMBERS_PER_DRAW:
         logger.warning(f"Sorteio inválido ou número incorreto de dezenas: {draw}")
         return {'soma_dezenas': 0, 'pares': 0, 'impares': 0, 'primos': 0}
 
-    draw_series = pd.Series(draw)
-    properties['soma_dezenas'] = int(draw_series.sum())
-    properties['pares'] = int(draw_series.apply(lambda x: x % 2 == 0).sum())
-    properties['impares'] = int(draw_series.apply(lambda x: x % 2 != 0).sum())
-    properties['primos'] = int(draw_series.apply(lambda x: x in PRIMES_UP_TO_25).sum())
-    return properties
+    pares = sum(1 for x in draw if x % 2 == 0)
+    return {
+        'soma_dezenas': int(sum(draw)),
+        'pares': pares,
+        'impares': len(draw) - pares,
+        'primos': sum(1 for x in draw if x in _PRIMES_SET),
+    }
 
 def analyze_number_properties(all_data_df: pd.DataFrame, config: Any) -> pd.DataFrame: # Recebe config
+    """
+    Tabela de propriedades por concurso ('Concurso' + BASE_PROPERTY_COLUMNS + demais
+    propriedades do DrawPropertyKernel), só para sorteios com NUMBERS_PER_DRAW dezenas.
+    """
     logger.info("Iniciando análise de propriedades numéricas dos sorteios.")
     if all_data_df is None or all_data_df.empty:
         logger.warning("DataFrame para analyze_number_properties está vazio.")
@@ -64,30 +191,13 @@ def analyze_number_properties(all_data_df: pd.DataFrame, config: Any) -> pd.Data
         if not actual_ball_cols:
             logger.error("Nenhuma coluna de bola encontrada."); return pd.DataFrame()
 
-    results = []
-    for index, row in all_data_df.iterrows():
-        try:
-            draw = [int(row[col]) for col in actual_ball_cols if pd.notna(row[col])]
-            if len(draw) != numbers_per_draw_val:
-                logger.debug(f"Sorteio {row[contest_col]} tem {len(draw)} dezenas, esperado {numbers_per_draw_val}. Pulando.")
-                continue
-            properties = analyze_draw_properties(draw, config) # Passa config
-            properties_entry: Dict[str,Any] = {contest_col: int(row[contest_col])}
-            properties_entry.update(properties)
-            results.append(properties_entry)
-        except Exception as e:
-            logger.error(f"Erro processar props concurso {row.get(contest_col, 'UKN')}: {e}", exc_info=False)
-    
-    if not results: logger.warning("Nenhuma propriedade calculada."); return pd.DataFrame()
-    properties_df = pd.DataFrame(results)
-    
-    final_col_order = [contest_col] + [col for col in properties_df.columns if col != contest_col]
-    # Garante que apenas colunas existentes sejam selecionadas
-    final_col_order = [col for col in final_col_order if col in properties_df.columns]
-    properties_df = properties_df[final_col_order]
-    
-    # Renomeia a coluna de concurso para "Concurso" se a tabela final no DB espera esse nome
-    properties_df.rename(columns={contest_col: "Concurso"}, inplace=True, errors='ignore')
+    draw_matrix = get_draw_matrix_provider(all_data_df, config)
+    # Renomeia a coluna de concurso para "Concurso": nome esperado pelas etapas que leem a tabela.
+    properties_df = build_property_kernel(config).table(draw_matrix, contest_column="Concurso")
+    skipped = len(draw_matrix) - len(properties_df)
+    if skipped:
+        logger.debug(f"{skipped} sorteio(s) sem {numbers_per_draw_val} dezenas válidas ignorados.")
 
+    if properties_df.empty: logger.warning("Nenhuma propriedade calculada."); return pd.DataFrame()
     logger.info(f"Análise de propriedades numéricas concluída para {len(properties_df)} concursos.")
-    return properties_df
\ No newline at end of file
+    return properties_df
@@ -2,7 +2,8 @@
 import pandas as pd
 from typing import List, Dict, Tuple, Any
 import logging
-from collections import defaultdict
+
+import numpy as np
 
 try:
     from ..config import Config, CONTEST_ID_COLUMN_NAME, \
@@ -13,32 +14,51 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
-def _find_consecutive_sequences_in_draw(
-    draw_numbers_sorted: List[int], 
-    min_len: int, 
-    max_len: int
-) -> Dict[int, List[Tuple[int, ...]]]:
-    found_sequences_by_length: Dict[int, List[Tuple[int, ...]]] = {
-        length: [] for length in range(min_len, max_len + 1)
-    }
-    n = len(draw_numbers_sorted)
-    if n == 0 or n < min_len:
-        return found_sequences_by_length
-    for length_to_check in range(min_len, max_len + 1):
-        if n < length_to_check:
+def draws_to_bitmasks(drawn_numbers: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Máscara de 64 bits por sorteio (dezena n no bit n) a partir de uma sequência de listas
+    de dezenas. Retorna (máscaras, válidos); sorteios que não são listas de int são inválidos
+    e ficam com máscara 0. Dezenas fora de 0..63 são ignoradas.
+    """
+    draws = list(drawn_numbers)
+    valid = np.array([isinstance(draw, list) and all(isinstance(n, int) for n in draw) for draw in draws], dtype=bool)
+    masks = np.zeros(len(draws), dtype=np.uint64)
+    valid_positions = np.flatnonzero(valid)
+    if len(valid_positions):
+        lengths = np.array([len(draws[pos]) for pos in valid_positions], dtype=np.int64)
+        flat = np.fromiter((n for pos in valid_positions for n in draws[pos]), dtype=np.int64, count=int(lengths.sum()))
+        rows = np.repeat(valid_positions, lengths)
+        in_range = (flat >= 0) & (flat < 64)
+        np.bitwise_or.at(masks, rows[in_range], np.left_shift(np.uint64(1), flat[in_range].astype(np.uint64)))
+    return masks, valid
+
+
+def count_progressions(masks: np.ndarray, step: int, min_len: int, max_len: int) -> Dict[int, Tuple[int, Dict[Tuple[int, ...], int]]]:
+    """
+    Progressões aritméticas de razão 'step' (step=1: consecutivas) em todos os sorteios por
+    cascata deslocar-e-AND: após k passos, o bit s indica que s, s+step, ..., s+k*step saíram.
+    Retorna {comprimento: (sorteios com alguma progressão, {progressão: nº de sorteios})},
+    com as progressões em ordem crescente.
+    """
+    masks = np.asarray(masks, dtype=np.uint64)
+    result: Dict[int, Tuple[int, Dict[Tuple[int, ...], int]]] = {}
+    if step <= 0 or max_len < min_len:
+        return result
+    starts = masks.copy()
+    for length in range(1, max_len + 1):
+        if length > 1:
+            starts &= masks >> np.uint64((length - 1) * step)
+        if length < min_len:
             continue
-        for i in range(n - length_to_check + 1):
-            current_subsequence = draw_numbers_sorted[i : i + length_to_check]
-            is_consecutive_flag = True 
-            for k in range(len(current_subsequence) - 1):
-                if current_subsequence[k+1] - current_subsequence[k] != 1:
-                    is_consecutive_flag = False
-                    break
-            if is_consecutive_flag:
-                found_sequences_by_length[length_to_check].append(tuple(current_subsequence))
-    return found_sequences_by_length
+        # Ocorrências por bit inicial: unpackbits sobre os 8 bytes (little-endian) de cada máscara.
+        bits = np.unpackbits(starts.astype('<u8').view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+        counts_by_start = bits.sum(axis=0, dtype=np.int64)
+        specific = {tuple(range(start, start + length * step, step)): int(counts_by_start[start])
+                    for start in np.flatnonzero(counts_by_start)}
+        result[length] = (int(np.count_nonzero(starts)), specific)
+    return result
+
 
-# <<< NOVA FUNÇÃO AUXILIAR PARA SEQUÊNCIAS ARITMÉTICAS >>>
 def _find_arithmetic_sequences_in_draw(
     draw_numbers_sorted: List[int],
     min_len: int,
@@ -47,55 +67,25 @@ def _find_arithmetic_sequences_in_draw(
 ) -> Dict[int, List[Tuple[int, ...]]]:
     """
     Encontra todas as subsequências aritméticas com um 'step_value' específico
-    de comprimentos entre min_len e max_len em uma lista ordenada de números de um sorteio.
+    de comprimentos entre min_len e max_len em um sorteio (via count_progressions).
     """
     found_sequences_by_length: Dict[int, List[Tuple[int, ...]]] = {
         length: [] for length in range(min_len, max_len + 1)
     }
-    n = len(draw_numbers_sorted)
-
-    if n == 0 or n < min_len or step_value <= 0:
+    if not draw_numbers_sorted or len(draw_numbers_sorted) < min_len or step_value <= 0:
         return found_sequences_by_length
-
-    for length_to_check in range(min_len, max_len + 1):
-        if n < length_to_check:
-            continue
-        
-        # Para encontrar sequências aritméticas, precisamos de uma abordagem diferente da janela deslizante simples.
-        # Podemos iterar sobre todas as combinações de 'length_to_check' números do sorteio
-        # e verificar se formam uma progressão aritmética com o 'step_value'.
-        # No entanto, isso pode ser computacionalmente caro (C(15, k)).
-        # Uma abordagem mais eficiente é iterar sobre os números e tentar construir sequências.
-
-        # Abordagem: Iterar sobre cada número como um potencial início de sequência
-        for i in range(n):
-            potential_sequence = [draw_numbers_sorted[i]]
-            current_num = draw_numbers_sorted[i]
-            
-            # Tenta construir uma sequência do tamanho 'length_to_check'
-            for _ in range(1, length_to_check):
-                next_expected_num = current_num + step_value
-                # Otimização: buscar 'next_expected_num' no restante da lista 'draw_numbers_sorted'
-                # Isso é mais eficiente do que iterar sobre todas as subsequências.
-                # Como draw_numbers_sorted é ordenada, podemos fazer uma busca eficiente.
-                found_next = False
-                for j in range(i + len(potential_sequence), n): # Busca a partir do próximo índice
-                    if draw_numbers_sorted[j] == next_expected_num:
-                        potential_sequence.append(next_expected_num)
-                        current_num = next_expected_num
-                        found_next = True
-                        break # Encontrou o próximo número esperado, para este passo da sequência
-                    elif draw_numbers_sorted[j] > next_expected_num:
-                        break # Passou do ponto onde o número poderia estar
-                
-                if not found_next: # Se não encontrou o próximo número esperado para a sequência
-                    break # Quebra a tentativa de construir esta sequência particular
-            
-            if len(potential_sequence) == length_to_check:
-                found_sequences_by_length[length_to_check].append(tuple(potential_sequence))
-                
+    masks, _ = draws_to_bitmasks([list(draw_numbers_sorted)])
+    for length, (_, specific) in count_progressions(masks, step_value, min_len, max_len).items():
+        found_sequences_by_length[length] = sorted(specific)
     return found_sequences_by_length
-# <<< FIM DA NOVA FUNÇÃO AUXILIAR >>>
+
+
+def _find_consecutive_sequences_in_draw(
+    draw_numbers_sorted: List[int], 
+    min_len: int, 
+    max_len: int
+) -> Dict[int, List[Tuple[int, ...]]]:
+    return _find_arithmetic_sequences_in_draw(draw_numbers_sorted, min_len, max_len, 1)
 
 def analyze_sequences(
     all_draws_df: pd.DataFrame, 
@@ -127,29 +117,17 @@ def analyze_sequences(
     if is_active_consecutive:
         if 'drawn_numbers' in all_draws_df.columns:
             logger.info(f"Analisando sequências CONSECUTIVAS de comprimento {min_len_consecutive} a {max_len_consecutive}.")
-            sequence_counts_consecutive: Dict[int, Dict[Tuple[int, ...], int]] = {
-                length: defaultdict(int) for length in range(min_len_consecutive, max_len_consecutive + 1)
-            }
-            draws_with_consecutive_sequence_of_length: Dict[int, int] = defaultdict(int)
             total_draws = len(all_draws_df)
 
             if total_draws > 0:
-                for _, row in all_draws_df.iterrows():
-                    draw_numbers_sorted = row.get('drawn_numbers')
-                    if not isinstance(draw_numbers_sorted, list) or not all(isinstance(n, int) for n in draw_numbers_sorted):
-                        contest_id_val = row.get(CONTEST_ID_COLUMN_NAME, "Desconhecido") 
-                        logger.warning(f"Sorteio {contest_id_val} tem 'drawn_numbers' inválido. Pulando para sequências. Conteúdo: {draw_numbers_sorted}")
-                        continue
-                    draw_numbers_sorted.sort() 
-                    sequences_found_in_this_draw = _find_consecutive_sequences_in_draw(draw_numbers_sorted, min_len_consecutive, max_len_consecutive)
-                    for length, sequences_list_found in sequences_found_in_this_draw.items(): 
-                        if sequences_list_found: 
-                            draws_with_consecutive_sequence_of_length[length] += 1
-                            for seq_tuple in sequences_list_found:
-                                sequence_counts_consecutive[length][seq_tuple] += 1
-                
+                masks, valid_draws = draws_to_bitmasks(all_draws_df['drawn_numbers'])
+                for pos in np.flatnonzero(~valid_draws):
+                    contest_id_val = all_draws_df[CONTEST_ID_COLUMN_NAME].iloc[pos] if CONTEST_ID_COLUMN_NAME in all_draws_df.columns else "Desconhecido"
+                    logger.warning(f"Sorteio {contest_id_val} tem 'drawn_numbers' inválido. Pulando para sequências. Conteúdo: {all_draws_df['drawn_numbers'].iloc[pos]}")
+                consecutive_progressions = count_progressions(masks, 1, min_len_consecutive, max_len_consecutive)
+
                 for length_iter in range(min_len_consecutive, max_len_consecutive + 1):
-                    total_draws_with_this_len_seq = draws_with_consecutive_sequence_of_length[length_iter]
+                    total_draws_with_this_len_seq, specific_counts = consecutive_progressions.get(length_iter, (0, {}))
                     support_for_len = (total_draws_with_this_len_seq / total_draws) if total_draws > 0 else 0.0
                     results_list.append({
                         "sequence_description": f"Qualquer sequência consecutiva de {length_iter} dezenas",
@@ -157,7 +135,7 @@ def analyze_sequences(
                         "specific_sequence": "N/A", 
                         "frequency_count": total_draws_with_this_len_seq, "support": round(support_for_len, 6) 
                     })
-                    for seq_tuple, count in sorted(sequence_counts_consecutive[length_iter].items()):
+                    for seq_tuple, count in sorted(specific_counts.items()):
                         seq_str = "-".join(map(str, seq_tuple))
                         support_specific = (count / total_draws) if total_draws > 0 else 0.0
                         results_list.append({
@@ -188,6 +166,7 @@ def analyze_sequences(
             logger.info(f"Analisando sequências ARITMÉTICAS com steps {steps_to_check}, comprimentos de {min_len_arith} a {max_len_arith}.")
 
             total_draws = len(all_draws_df) # Já definido, mas para clareza se este bloco for isolado
+            masks, _ = draws_to_bitmasks(all_draws_df['drawn_numbers']) # sorteios inválidos já logados acima
 
             for step_value in steps_to_check:
                 if step_value <= 0:
@@ -195,29 +174,11 @@ def analyze_sequences(
                     continue
                 
                 logger.info(f"Analisando para step: {step_value}")
-                sequence_counts_arith: Dict[int, Dict[Tuple[int, ...], int]] = {
-                    length: defaultdict(int) for length in range(min_len_arith, max_len_arith + 1)
-                }
-                draws_with_arithmetic_sequence_of_length: Dict[int, int] = defaultdict(int)
-
                 if total_draws > 0:
-                    for _, row in all_draws_df.iterrows():
-                        draw_numbers_sorted = row.get('drawn_numbers')
-                        if not isinstance(draw_numbers_sorted, list) or not all(isinstance(n, int) for n in draw_numbers_sorted):
-                            continue # Já logado acima
-                        draw_numbers_sorted.sort()
-                        
-                        sequences_found_this_draw_step = _find_arithmetic_sequences_in_draw(
-                            draw_numbers_sorted, min_len_arith, max_len_arith, step_value
-                        )
-                        for length, sequences_list_found in sequences_found_this_draw_step.items():
-                            if sequences_list_found:
-                                draws_with_arithmetic_sequence_of_length[length] += 1
-                                for seq_tuple in sequences_list_found:
-                                    sequence_counts_arith[length][seq_tuple] += 1
-                    
+                    arithmetic_progressions = count_progressions(masks, step_value, min_len_arith, max_len_arith)
+
                     for length_iter in range(min_len_arith, max_len_arith + 1):
-                        total_draws_with_this_len_step_seq = draws_with_arithmetic_sequence_of_length[length_iter]
+                        total_draws_with_this_len_step_seq, specific_counts = arithmetic_progressions.get(length_iter, (0, {}))
                         support_for_len_step = (total_draws_with_this_len_step_seq / total_draws) if total_draws > 0 else 0.0
                         results_list.append({
                             "sequence_description": f"Qualquer sequência aritmética (step {step_value}) de {length_iter} dezenas",
@@ -228,7 +189,7 @@ def analyze_sequences(
                             "frequency_count": total_draws_with_this_len_step_seq,
                             "support": round(support_for_len_step, 6)
                         })
-                        for seq_tuple, count in sorted(sequence_counts_arith[length_iter].items()):
+                        for seq_tuple, count in sorted(specific_counts.items()):
                             seq_str = "-".join(map(str, seq_tuple))
                             support_specific_step = (count / total_draws) if total_draws > 0 else 0.0
                             results_list.append({
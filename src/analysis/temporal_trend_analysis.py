@@ -2,7 +2,9 @@
 import pandas as pd
 import numpy as np # Adicionado para np.nan
 import logging
-from typing import List, Any # Any para o objeto config
+from typing import Any, Dict, List # Any para o objeto config
+
+from src.analysis.draw_matrix import get_draw_matrix_provider
 
 logger = logging.getLogger(__name__)
 
@@ -36,34 +38,79 @@ def get_full_draw_matrix(all_draws_df: pd.DataFrame, config: Any) -> pd.DataFram
         logger.error(f"Coluna '{drawn_numbers_col}' não encontrada em all_draws_df.")
         return pd.DataFrame()
 
-    try:
-        df_copy = all_draws_df[[contest_col, drawn_numbers_col]].copy()
-        df_copy[contest_col] = pd.to_numeric(df_copy[contest_col], errors='coerce')
-        df_copy.dropna(subset=[contest_col], inplace=True)
-        df_copy[contest_col] = df_copy[contest_col].astype(int)
-        df_copy.set_index(contest_col, inplace=True)
-        df_copy.sort_index(inplace=True) # Garante que os concursos estão ordenados
-    except Exception as e:
-        logger.error(f"Erro ao processar coluna de concurso '{contest_col}': {e}", exc_info=True)
-        return pd.DataFrame()
-
-    all_contests_idx = df_copy.index
-    draw_matrix = pd.DataFrame(0, index=all_contests_idx, columns=config.ALL_NUMBERS)
-    draw_matrix.index.name = contest_col
-
-    for contest_id, row in df_copy.iterrows():
-        drawn_numbers = row[drawn_numbers_col]
-        if isinstance(drawn_numbers, list):
-            for number in drawn_numbers:
-                if number in draw_matrix.columns:
-                    draw_matrix.loc[contest_id, number] = 1
-        else:
-            logger.warning(f"Dados em '{drawn_numbers_col}' para o concurso {contest_id} não são uma lista: {drawn_numbers}")
-            
+    draw_matrix = get_draw_matrix_provider(all_draws_df, config).to_dataframe(index_name=contest_col)
     logger.debug(f"Matriz completa de sorteios criada com {draw_matrix.shape[0]} concursos e {draw_matrix.shape[1]} dezenas.")
     return draw_matrix
 
 
+def rolling_means(values: np.ndarray, windows: List[int]) -> Dict[int, np.ndarray]:
+    """
+    Médias móveis (min_periods=1, NaN ignorados, como rolling().mean()) de cada coluna de
+    'values' (concursos x dezenas) para todas as janelas, a partir de uma única soma
+    acumulada: média da janela = diferença de prefixos / quantidade de valores válidos.
+    """
+    values = np.asarray(values, dtype=float)
+    n_rows = values.shape[0]
+    valid = ~np.isnan(values)
+    cum_values = np.zeros((n_rows + 1,) + values.shape[1:], dtype=float)
+    np.cumsum(np.where(valid, values, 0.0), axis=0, out=cum_values[1:])
+    cum_valid = np.zeros((n_rows + 1,) + values.shape[1:], dtype=np.int64)
+    np.cumsum(valid, axis=0, out=cum_valid[1:])
+
+    ends = np.arange(1, n_rows + 1)
+    means: Dict[int, np.ndarray] = {}
+    for window_size in windows:
+        starts = np.maximum(ends - window_size, 0)
+        counts = cum_valid[ends] - cum_valid[starts]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means[window_size] = np.where(counts > 0, (cum_values[ends] - cum_values[starts]) / counts, np.nan)
+    return means
+
+
+def _moving_average_long_df(matrix: pd.DataFrame, windows: List[int], config: Any,
+                            value_column: str, matrix_name: str) -> pd.DataFrame:
+    """
+    Médias móveis de todas as dezenas e janelas de uma matriz (Concursos x Dezenas) no
+    formato longo 'Concurso', 'Dezena', 'Janela', <value_column>, ordenado por dezena,
+    janela e concurso.
+    """
+    empty_df = pd.DataFrame(columns=['Concurso', 'Dezena', 'Janela', value_column])
+    if not pd.api.types.is_numeric_dtype(matrix.index):
+        try:
+            matrix.index = pd.to_numeric(matrix.index)
+        except Exception as e:
+            logger.error(f"Índice da {matrix_name} (Concurso) não é numérico e não pôde ser convertido: {e}")
+            return empty_df
+    matrix = matrix.sort_index()
+
+    all_numbers = getattr(config, 'ALL_NUMBERS', None)
+    numbers = []
+    for dezena_col in matrix.columns:
+        if all_numbers is not None and dezena_col not in all_numbers:
+            logger.warning(f"Coluna {dezena_col} na {matrix_name} não está em config.ALL_NUMBERS. Pulando.")
+            continue
+        numbers.append(dezena_col)
+    valid_windows = []
+    for window_size in windows:
+        if window_size <= 0:
+            logger.warning(f"Tamanho de janela inválido {window_size}. Pulando.")
+            continue
+        valid_windows.append(window_size)
+    if not numbers or not valid_windows:
+        return empty_df
+
+    means = rolling_means(matrix[numbers].to_numpy(dtype=float), valid_windows)
+    n_rows, n_windows = len(matrix), len(valid_windows)
+    # (dezenas, janelas, concursos) achatado na ordem do formato longo.
+    stacked = np.stack([means[window_size] for window_size in valid_windows]).transpose(2, 0, 1)
+    return pd.DataFrame({
+        'Concurso': np.tile(matrix.index.to_numpy(), len(numbers) * n_windows),
+        'Dezena': np.repeat(np.asarray(numbers), n_windows * n_rows),
+        'Janela': np.tile(np.repeat(np.asarray(valid_windows, dtype=np.int64), n_rows), len(numbers)),
+        value_column: stacked.reshape(-1),
+    })
+
+
 def calculate_moving_average_frequency(
     draw_matrix: pd.DataFrame, 
     windows: List[int], 
@@ -80,44 +127,11 @@ def calculate_moving_average_frequency(
         logger.warning("Nenhuma janela especificada para cálculo da média móvel de frequência.")
         return pd.DataFrame(columns=['Concurso', 'Dezena', 'Janela', 'MA_Frequencia'])
 
-    all_ma_results = []
-    
-    if not pd.api.types.is_numeric_dtype(draw_matrix.index):
-        try:
-            draw_matrix.index = pd.to_numeric(draw_matrix.index)
-        except Exception as e:
-            logger.error(f"Índice da draw_matrix (Concurso) não é numérico e não pôde ser convertido: {e}")
-            return pd.DataFrame(columns=['Concurso', 'Dezena', 'Janela', 'MA_Frequencia'])
-    
-    draw_matrix = draw_matrix.sort_index()
-
-    for dezena_col in draw_matrix.columns:
-        if dezena_col not in config.ALL_NUMBERS:
-            logger.warning(f"Coluna {dezena_col} na draw_matrix não está em config.ALL_NUMBERS. Pulando.")
-            continue
-            
-        occurrence_series = draw_matrix[dezena_col]
-        
-        for window_size in windows:
-            if window_size <= 0:
-                logger.warning(f"Tamanho de janela inválido {window_size} para a dezena {dezena_col}. Pulando.")
-                continue
-            
-            ma_series = occurrence_series.rolling(window=window_size, min_periods=1).mean()
-            
-            temp_df = ma_series.reset_index()
-            temp_df.columns = ['Concurso', 'MA_Frequencia']
-            temp_df['Dezena'] = dezena_col
-            temp_df['Janela'] = window_size
-            all_ma_results.append(temp_df)
-
-    if not all_ma_results:
+    final_df = _moving_average_long_df(draw_matrix, windows, config, 'MA_Frequencia', 'draw_matrix')
+    if final_df.empty:
         logger.warning("Nenhum resultado de média móvel de frequência foi gerado.")
-        return pd.DataFrame(columns=['Concurso', 'Dezena', 'Janela', 'MA_Frequencia'])
+        return final_df
 
-    final_df = pd.concat(all_ma_results, ignore_index=True)
-    final_df = final_df[['Concurso', 'Dezena', 'Janela', 'MA_Frequencia']]
-    
     logger.info(f"Cálculo da média móvel de frequência concluído. {len(final_df)} registros gerados.")
     return final_df
 
@@ -127,6 +141,11 @@ def get_historical_delay_matrix(draw_matrix: pd.DataFrame, config: Any) -> pd.Da
     """
     Calcula o atraso atual histórico para cada dezena em cada concurso.
 
+    O atraso no concurso t é contado até a última ocorrência anterior a t (antes de
+    considerar o sorteio de t); sem ocorrência anterior, conta desde o primeiro concurso.
+    O último concurso visto é propagado com maximum.accumulate sobre as posições de
+    presença, num único passe sobre a matriz.
+
     Args:
         draw_matrix (pd.DataFrame): Matriz de ocorrências (Concursos x Dezenas, valores 0/1),
                                      com índice de Concurso ordenado.
@@ -142,32 +161,17 @@ def get_historical_delay_matrix(draw_matrix: pd.DataFrame, config: Any) -> pd.Da
         return pd.DataFrame()
 
     # Assume que draw_matrix.index são os IDs dos concursos e estão ordenados.
-    historical_delay_df = pd.DataFrame(index=draw_matrix.index, columns=draw_matrix.columns)
+    contest_ids = draw_matrix.index.to_numpy(dtype=np.int64)
+    # Antes da primeira ocorrência, o "último concurso" equivale ao anterior ao primeiro.
+    before_first = contest_ids.min() - 1
+    seen = np.where(draw_matrix.to_numpy() == 1, contest_ids[:, None], before_first)
+    last_seen_before = np.full(seen.shape, before_first, dtype=np.int64)
+    if len(seen) > 1:
+        np.maximum.accumulate(seen[:-1], axis=0, out=last_seen_before[1:])
+    delays = contest_ids[:, None] - last_seen_before
+
+    historical_delay_df = pd.DataFrame(delays, index=draw_matrix.index.copy(), columns=draw_matrix.columns)
     historical_delay_df.index.name = config.CONTEST_ID_COLUMN_NAME # ou draw_matrix.index.name
-    
-    first_contest_id_overall = draw_matrix.index.min()
-
-    for dezena in draw_matrix.columns:
-        last_occurrence_contest = 0 # Considera 0 como "antes do primeiro concurso"
-        
-        # Se a dezena nunca ocorre em todo o histórico, o atraso será sempre crescente
-        # desde o primeiro concurso.
-        if draw_matrix[dezena].sum() == 0:
-            for contest_id in draw_matrix.index:
-                historical_delay_df.loc[contest_id, dezena] = contest_id - first_contest_id_overall +1 # Ou apenas contest_id
-            continue
-
-        for contest_id in draw_matrix.index:
-            if last_occurrence_contest == 0: # Ainda não encontrou a primeira ocorrência
-                 current_delay = contest_id - first_contest_id_overall + 1
-            else:
-                 current_delay = contest_id - last_occurrence_contest
-            
-            historical_delay_df.loc[contest_id, dezena] = current_delay
-            
-            if draw_matrix.loc[contest_id, dezena] == 1: # Se a dezena ocorreu neste concurso
-                last_occurrence_contest = contest_id    # Atualiza o último concurso de ocorrência
-
     logger.debug("Matriz de atraso atual histórico calculada.")
     return historical_delay_df.astype(int)
 
@@ -198,44 +202,10 @@ def calculate_moving_average_delay(
         logger.warning("Nenhuma janela especificada para cálculo da média móvel de atraso.")
         return pd.DataFrame(columns=['Concurso', 'Dezena', 'Janela', 'MA_Atraso'])
 
-    all_ma_results = []
-    
-    # Garante que o índice (Concurso) é numérico e ordenado (já deve ser pela função anterior)
-    if not pd.api.types.is_numeric_dtype(historical_delay_matrix.index):
-        try:
-            historical_delay_matrix.index = pd.to_numeric(historical_delay_matrix.index)
-        except Exception as e:
-            logger.error(f"Índice da historical_delay_matrix (Concurso) não é numérico e não pôde ser convertido: {e}")
-            return pd.DataFrame(columns=['Concurso', 'Dezena', 'Janela', 'MA_Atraso'])
-
-    historical_delay_matrix = historical_delay_matrix.sort_index()
-
-    for dezena_col in historical_delay_matrix.columns:
-        if hasattr(config, 'ALL_NUMBERS') and dezena_col not in config.ALL_NUMBERS:
-             logger.warning(f"Coluna {dezena_col} na historical_delay_matrix não está em config.ALL_NUMBERS. Pulando.")
-             continue
-
-        delay_series = historical_delay_matrix[dezena_col].astype(float) # .rolling().mean() espera float
-        
-        for window_size in windows:
-            if window_size <= 0:
-                logger.warning(f"Tamanho de janela inválido {window_size} para a dezena {dezena_col}. Pulando.")
-                continue
-            
-            ma_series = delay_series.rolling(window=window_size, min_periods=1).mean()
-            
-            temp_df = ma_series.reset_index()
-            temp_df.columns = ['Concurso', 'MA_Atraso']
-            temp_df['Dezena'] = dezena_col
-            temp_df['Janela'] = window_size
-            all_ma_results.append(temp_df)
-
-    if not all_ma_results:
+    final_df = _moving_average_long_df(historical_delay_matrix, windows, config, 'MA_Atraso', 'historical_delay_matrix')
+    if final_df.empty:
         logger.warning("Nenhum resultado de média móvel de atraso foi gerado.")
-        return pd.DataFrame(columns=['Concurso', 'Dezena', 'Janela', 'MA_Atraso'])
+        return final_df
 
-    final_df = pd.concat(all_ma_results, ignore_index=True)
-    final_df = final_df[['Concurso', 'Dezena', 'Janela', 'MA_Atraso']]
-    
     logger.info(f"Cálculo da média móvel de atraso concluído. {len(final_df)} registros gerados.")
-    return final_df
\ No newline at end of file
+    return final_df
@@ -1,6 +1,7 @@
 # src/analysis_aggregator.py
+import numpy as np
 import pandas as pd
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Tuple
 import logging
 from sklearn.preprocessing import MinMaxScaler
 
@@ -9,8 +10,12 @@ logger = logging.getLogger(__name__)
 
 # Importar o objeto de configuração diretamente e o tipo Config para type hinting
 from .database_manager import DatabaseManager
+from .db_schema import ensure_schema_indexes
 from .config import config_obj, Config # Importando o config_obj global e a classe Config
 
+# Tabelas consultadas por dezena e intervalo de concursos (índice composto (dezena, concurso)).
+LATEST_ROW_TABLE_KEYS = ('draws_flat', 'delays', 'frequency_overall', 'recurrence_cdf', 'rank_trends', 'cycle_status')
+
 class AnalysisAggregator:
     def __init__(self, db_manager: DatabaseManager,
                  config_instance: Optional[Config] = None): # Recebe uma instância de Config
@@ -61,6 +66,11 @@ class AnalysisAggregator:
             'participation_score_k3': {'default': 0.0, 'type': float, 'source_table': self.table_names['itemset_metrics']},
         }
         self._target_metric_columns = list(self.metric_configs.keys())
+        # Métricas consolidadas por concurso de corte (get_historical_metrics_for_dezenas / lote),
+        # válidas para a versão dos dados das tabelas de origem em _metrics_cache_version.
+        self._metrics_cache: Dict[int, pd.DataFrame] = {}
+        self._metrics_cache_version: Optional[Tuple] = None
+        self._metric_indexes: Optional[List[str]] = None
 
     def _get_latest_concurso_id_from_db(self) -> Optional[int]:
         try:
@@ -74,6 +84,60 @@ class AnalysisAggregator:
             logger.error(f"Falha ao buscar último concurso_id: {e}", exc_info=True)
         return None
 
+    def source_data_version(self) -> Tuple:
+        """
+        Versão dos dados das tabelas de origem das métricas: o token que o bulk_write troca
+        a cada gravação da tabela ou, para tabelas gravadas por fora dele, o maior rowid.
+        Muda sempre que o pipeline regrava alguma das tabelas.
+        """
+        tables = sorted(set(self.table_names.values()))
+        versions = self.db_manager.get_table_versions(tables) if hasattr(self.db_manager, 'get_table_versions') else {}
+        state = []
+        for table in tables:
+            version = versions.get(table)
+            if version is None and self.db_manager.table_exists(table):
+                max_rowid_df = self.db_manager.execute_query(f"SELECT MAX(rowid) AS max_rowid FROM {table}")
+                version = None if max_rowid_df.empty or pd.isna(max_rowid_df.iloc[0, 0]) else f"rowid:{int(max_rowid_df.iloc[0, 0])}"
+            state.append((table, version))
+        return tuple(state)
+
+    def _sync_metrics_cache(self) -> None:
+        """Descarta o cache de métricas se as tabelas de origem mudaram desde que ele foi preenchido."""
+        version = self.source_data_version()
+        if version != self._metrics_cache_version:
+            if self._metrics_cache:
+                logger.info("Tabelas de análise alteradas desde o último cálculo. Cache de métricas do Aggregator descartado.")
+            self._metrics_cache.clear()
+            self._metrics_cache_version = version
+
+    def ensure_metric_indexes(self) -> List[str]:
+        """
+        Garante os índices declarados no esquema (db_schema) para as tabelas consultadas por
+        "última linha por dezena até o concurso X". Chamado uma vez por instância pelas
+        consultas de métricas; bulk_write já recria os índices de tabelas novas.
+        """
+        tables = [self.table_names[table_key] for table_key in LATEST_ROW_TABLE_KEYS]
+        self._metric_indexes = ensure_schema_indexes(self.db_manager, self.config_access, tables=tables)
+        return self._metric_indexes
+
+    def _latest_rows_sql(self, table: str, select_exprs: str) -> str:
+        """
+        Última linha de cada dezena com concurso <= ? (um parâmetro). Para cada dezena, a
+        subconsulta é uma busca no índice (dezena, concurso) seguida de um acesso por rowid,
+        em vez de varrer e ordenar a tabela inteira (ROW_NUMBER() OVER PARTITION BY).
+        Colunas da tabela em 'select_exprs' devem usar o alias 't'.
+        """
+        cid_col = self.config_access.CONTEST_ID_COLUMN_NAME
+        return f"""
+            SELECT t.dezena, {select_exprs}
+            FROM json_each(json_array({','.join(map(str, self._all_dezenas_list))})) d
+            JOIN {table} t ON t.rowid = (
+                SELECT s.rowid FROM {table} s
+                WHERE s.dezena = d.value AND s.{cid_col} <= ?
+                ORDER BY s.{cid_col} DESC LIMIT 1
+            );
+        """
+
     def get_historical_metrics_for_dezenas(self, latest_concurso_id: Optional[int] = None) -> pd.DataFrame:
         if latest_concurso_id is None:
             latest_concurso_id = self._get_latest_concurso_id_from_db()
@@ -83,7 +147,15 @@ class AnalysisAggregator:
                 for col, conf in self.metric_configs.items(): empty_df[col] = conf['default']
                 return empty_df.astype({col: conf['type'] for col, conf in self.metric_configs.items() if conf['type'] is not object and col in empty_df}, errors='ignore')
 
+        latest_concurso_id = int(latest_concurso_id)
+        self._sync_metrics_cache()
+        if latest_concurso_id in self._metrics_cache:
+            logger.debug(f"Métricas do concurso {latest_concurso_id} servidas do cache do Aggregator.")
+            return self._metrics_cache[latest_concurso_id].copy()
+
         logger.info(f"Consolidando métricas históricas para dezenas até o concurso {latest_concurso_id}...")
+        if self._metric_indexes is None:
+            self.ensure_metric_indexes()
         dezenas_df = pd.DataFrame({'dezena': self._all_dezenas_list})
 
         merge_methods_map = {
@@ -100,7 +172,13 @@ class AnalysisAggregator:
                 dezenas_df = merge_method(dezenas_df, latest_concurso_id)
             except Exception as e:
                 logger.error(f"Erro durante {merge_method.__name__} para o grupo '{metric_group}': {e}", exc_info=True)
-        
+
+        dezenas_df = self._finalize_metrics_df(dezenas_df)
+        self._metrics_cache[latest_concurso_id] = dezenas_df.copy()
+        return dezenas_df
+
+    def _finalize_metrics_df(self, dezenas_df: pd.DataFrame) -> pd.DataFrame:
+        """Preenche defaults, aplica os tipos de metric_configs e ordena as colunas."""
         for col_name, conf in self.metric_configs.items():
             if col_name not in dezenas_df.columns:
                 dezenas_df[col_name] = conf['default']
@@ -118,6 +196,160 @@ class AnalysisAggregator:
         
         return dezenas_df
 
+    def clear_metrics_cache(self) -> None:
+        """Descarta as métricas em cache (a troca de versão das tabelas de origem já as descarta)."""
+        self._metrics_cache.clear()
+        self._metrics_cache_version = None
+
+    def export_metrics_cache(self, contest_ids: Optional[Iterable[int]] = None) -> Dict[int, pd.DataFrame]:
+        """Cópia das métricas em cache (todas ou dos concursos pedidos), ex.: para outros processos."""
+        keys = self._metrics_cache.keys() if contest_ids is None else [int(c) for c in contest_ids if int(c) in self._metrics_cache]
+        return {contest_id: self._metrics_cache[contest_id].copy() for contest_id in keys}
+
+    def seed_metrics_cache(self, snapshots: Dict[int, pd.DataFrame]) -> None:
+        """Carrega métricas já consolidadas (concurso -> DataFrame), calculadas sobre os dados atuais do banco."""
+        self._sync_metrics_cache()
+        for contest_id, metrics_df in snapshots.items():
+            self._metrics_cache[int(contest_id)] = metrics_df.copy()
+
+    def get_historical_metrics_for_contests(self, contest_ids: Iterable[int]) -> pd.DataFrame:
+        """
+        Métricas de get_historical_metrics_for_dezenas para vários concursos de corte, em
+        formato longo (concurso, dezena, métricas...). Concursos fora do cache são
+        calculados juntos: uma consulta por tabela de métricas (até o maior corte) e a
+        "última linha por dezena até cada corte" via merge_asof, sem uma rodada de
+        consultas por concurso. Os resultados alimentam o cache usado também pela
+        consulta de concurso único.
+        """
+        cid_col = self.config_access.CONTEST_ID_COLUMN_NAME
+        requested = [int(c) for c in contest_ids]
+        self._sync_metrics_cache()
+        missing = sorted(set(c for c in requested if c not in self._metrics_cache))
+        if missing:
+            logger.info(f"Consolidando métricas em lote para {len(missing)} concurso(s) ({missing[0]}..{missing[-1]}).")
+            batch_df = self._finalize_metrics_df(self._compute_metrics_for_contests(missing))
+            for contest_id, contest_df in batch_df.groupby(cid_col, sort=False):
+                self._metrics_cache[int(contest_id)] = contest_df.drop(columns=[cid_col]).reset_index(drop=True)
+
+        if not requested:
+            return pd.DataFrame(columns=[cid_col, 'dezena'] + self._target_metric_columns)
+        frames = [self._metrics_cache[contest_id] for contest_id in requested]
+        long_df = pd.concat(frames, ignore_index=True)
+        long_df.insert(0, cid_col, np.repeat(np.asarray(requested, dtype=np.int64), [len(frame) for frame in frames]))
+        return long_df
+
+    def get_metrics_cube(self, contest_ids: Iterable[int],
+                         metric_columns: Optional[List[str]] = None) -> Tuple[np.ndarray, List[str]]:
+        """
+        Métricas numéricas como array 3-D (concursos x dezenas x métricas), na ordem de
+        'contest_ids' e de ALL_NUMBERS. Retorna (array, nomes das métricas).
+        """
+        long_df = self.get_historical_metrics_for_contests(contest_ids)
+        if metric_columns is None:
+            metric_columns = [col for col in self._target_metric_columns
+                              if self.metric_configs.get(col, {}).get('type') in (int, float)]
+        n_contests = len(long_df) // max(len(self._all_dezenas_list), 1)
+        values = long_df[metric_columns].to_numpy(dtype=np.float64)
+        return values.reshape(n_contests, len(self._all_dezenas_list), len(metric_columns)), list(metric_columns)
+
+    def _latest_rows_for_contests(self, grid_df: pd.DataFrame, table: str, select_exprs: str,
+                                  max_contest_id: int, metric_group_name: str) -> pd.DataFrame:
+        """
+        Para cada (concurso, dezena) de 'grid_df', a última linha da tabela com concurso <= o
+        corte (mesma semântica de _latest_rows_sql), a partir de uma única consulta.
+        """
+        cid_col = self.config_access.CONTEST_ID_COLUMN_NAME
+        sql = f"SELECT t.{cid_col} AS _row_contest, t.dezena, {select_exprs} FROM {table} t WHERE t.{cid_col} <= ? ORDER BY t.{cid_col}, t.rowid;"
+        data_df = self.db_manager.execute_query(sql, (max_contest_id,))
+        if data_df is None or data_df.empty:
+            logger.info(f"Nenhum dado encontrado via query para {metric_group_name} (até {max_contest_id}).")
+            return grid_df
+        data_df['_row_contest'] = data_df['_row_contest'].astype('int64')
+        data_df['dezena'] = data_df['dezena'].astype('int64')
+        merged = pd.merge_asof(grid_df.sort_values(cid_col), data_df, left_on=cid_col, right_on='_row_contest',
+                               by='dezena', direction='backward')
+        return merged.drop(columns=['_row_contest']).sort_values([cid_col, 'dezena'], kind='stable')
+
+    def _compute_metrics_for_contests(self, contest_ids: List[int]) -> pd.DataFrame:
+        cid_col = self.config_access.CONTEST_ID_COLUMN_NAME
+        max_contest_id = max(contest_ids)
+        if self._metric_indexes is None:
+            self.ensure_metric_indexes()
+        grid_df = pd.DataFrame({
+            cid_col: np.repeat(np.asarray(contest_ids, dtype=np.int64), len(self._all_dezenas_list)),
+            'dezena': np.tile(np.asarray(self._all_dezenas_list, dtype=np.int64), len(contest_ids)),
+        })
+
+        latest_row_queries = [
+            ('delays', "t.current_delay, COALESCE(t.max_delay_observed, t.current_delay) AS max_delay_observed, "
+                       "COALESCE(t.avg_delay, t.current_delay) AS avg_delay", "métricas de atraso"),
+            ('frequency_overall', "t.frequency AS overall_frequency, t.relative_frequency AS overall_relative_frequency", "frequência geral"),
+            ('recurrence_cdf', "t.recurrence_cdf", "métricas de recorrência"),
+            ('rank_trends', "t.rank_slope, t.trend_status", "tendência de rank"),
+            ('cycle_status', "t.is_missing_in_current_cycle", "status de ciclo (faltantes)"),
+        ]
+        for table_key, select_exprs, metric_group_name in latest_row_queries:
+            try:
+                grid_df = self._latest_rows_for_contests(grid_df, self.table_names[table_key], select_exprs,
+                                                         max_contest_id, metric_group_name)
+            except Exception as e:
+                logger.error(f"Erro no lote de {metric_group_name}: {e}", exc_info=True)
+
+        try:
+            grid_df = self._merge_recent_frequency_for_contests(grid_df, contest_ids)
+        except Exception as e:
+            logger.error(f"Erro no lote de frequência recente: {e}", exc_info=True)
+
+        closing_df = self.db_manager.execute_query(
+            f"SELECT dezena, score AS cycle_closing_propensity_score FROM {self.table_names['cycle_closing_propensity']};")
+        if closing_df is not None and not closing_df.empty and 'dezena' in closing_df.columns:
+            grid_df = pd.merge(grid_df, closing_df, on='dezena', how='left')
+
+        # Participação em itemsets é por itemset, não por dezena: segue a rotina de concurso único.
+        frames = []
+        for contest_id, contest_df in grid_df.groupby(cid_col, sort=False):
+            contest_df = contest_df.reset_index(drop=True)
+            try:
+                contest_df = self._merge_itemset_participation_scores(contest_df, int(contest_id))
+            except Exception as e:
+                logger.error(f"Erro durante _merge_itemset_participation_scores para o concurso {contest_id}: {e}", exc_info=True)
+            frames.append(contest_df)
+        return pd.concat(frames, ignore_index=True)
+
+    def _merge_recent_frequency_for_contests(self, grid_df: pd.DataFrame, contest_ids: List[int]) -> pd.DataFrame:
+        """Frequência na janela recente de cada corte, por diferença de contagens acumuladas."""
+        cid_col = self.config_access.CONTEST_ID_COLUMN_NAME
+        window_size = self.config_access.AGGREGATOR_DEFAULT_RECENT_WINDOW
+        col_name_recent_freq = f'recent_frequency_window_{window_size}'
+        if col_name_recent_freq not in self.metric_configs:
+            self.metric_configs[col_name_recent_freq] = {'default': 0, 'type': int, 'source_table': self.table_names['draws_flat']}
+            if col_name_recent_freq not in self._target_metric_columns:
+                self._target_metric_columns.append(col_name_recent_freq)
+
+        contests = np.asarray(contest_ids, dtype=np.int64)
+        starts = np.maximum(1, contests - window_size + 1)
+        max_contest_id = int(contests.max())
+        flat_df = self.db_manager.execute_query(
+            f"SELECT {cid_col}, dezena FROM {self.table_names['draws_flat']} WHERE {cid_col} BETWEEN ? AND ?;",
+            (int(starts.min()), max_contest_id))
+
+        position = {int(dezena): pos for pos, dezena in enumerate(self._all_dezenas_list)}
+        counts = np.zeros((max_contest_id + 1, len(self._all_dezenas_list)), dtype=np.int64)
+        if flat_df is not None and not flat_df.empty:
+            flat_contests = flat_df[cid_col].to_numpy(dtype=np.int64)
+            flat_positions = flat_df['dezena'].map(position).to_numpy()
+            known = ~pd.isna(flat_positions) & (flat_contests >= 0)
+            np.add.at(counts, (flat_contests[known], flat_positions[known].astype(np.int64)), 1)
+        cumulative = np.cumsum(counts, axis=0)
+        recent = cumulative[contests] - cumulative[starts - 1]
+
+        recent_df = pd.DataFrame({
+            cid_col: np.repeat(contests, len(self._all_dezenas_list)),
+            'dezena': np.tile(np.asarray(self._all_dezenas_list, dtype=np.int64), len(contests)),
+            col_name_recent_freq: recent.reshape(-1),
+        })
+        return pd.merge(grid_df, recent_df, on=[cid_col, 'dezena'], how='left')
+
     def _execute_metric_query(self, base_df: pd.DataFrame, sql: str, params: tuple,
                                expected_metric_cols: List[str], metric_group_name: str) -> pd.DataFrame:
         data_df = None
@@ -151,18 +383,9 @@ class AnalysisAggregator:
 
     def _merge_delay_metrics(self, base_df: pd.DataFrame, concurso_id: int) -> pd.DataFrame:
         table = self.table_names['delays']
-        # Usando CONTEST_ID_COLUMN_NAME do config para consistência
-        cid_col = self.config_access.CONTEST_ID_COLUMN_NAME
-        sql = f"""
-            WITH RankedData AS (
-                SELECT dezena, current_delay,
-                       COALESCE(max_delay_observed, current_delay) AS max_delay_observed,
-                       COALESCE(avg_delay, current_delay) AS avg_delay,
-                       ROW_NUMBER() OVER (PARTITION BY dezena ORDER BY {cid_col} DESC) as rn
-                FROM {table} WHERE {cid_col} <= ?
-            )
-            SELECT dezena, current_delay, max_delay_observed, avg_delay FROM RankedData WHERE rn = 1;
-        """
+        sql = self._latest_rows_sql(table, "t.current_delay, "
+                                           "COALESCE(t.max_delay_observed, t.current_delay) AS max_delay_observed, "
+                                           "COALESCE(t.avg_delay, t.current_delay) AS avg_delay")
         params = (concurso_id,)
         metric_cols = ['current_delay', 'max_delay_observed', 'avg_delay']
         return self._execute_metric_query(base_df, sql, params, metric_cols, "métricas de atraso")
@@ -173,14 +396,8 @@ class AnalysisAggregator:
         table_flat = self.table_names['draws_flat']
         cid_col = self.config_access.CONTEST_ID_COLUMN_NAME
         
-        sql_overall = f"""
-            WITH RankedData AS (
-                SELECT dezena, frequency AS overall_frequency, relative_frequency AS overall_relative_frequency,
-                       ROW_NUMBER() OVER (PARTITION BY dezena ORDER BY {cid_col} DESC) as rn
-                FROM {table_overall} WHERE {cid_col} <= ?
-            )
-            SELECT dezena, overall_frequency, overall_relative_frequency FROM RankedData WHERE rn = 1;
-        """
+        sql_overall = self._latest_rows_sql(table_overall, "t.frequency AS overall_frequency, "
+                                                           "t.relative_frequency AS overall_relative_frequency")
         params_overall = (concurso_id,)
         metric_cols_overall = ['overall_frequency', 'overall_relative_frequency']
         merged_df = self._execute_metric_query(merged_df, sql_overall, params_overall, metric_cols_overall, "frequência geral")
@@ -209,30 +426,14 @@ class AnalysisAggregator:
 
     def _merge_recurrence_metrics(self, base_df: pd.DataFrame, concurso_id: int) -> pd.DataFrame:
         table = self.table_names['recurrence_cdf']
-        cid_col = self.config_access.CONTEST_ID_COLUMN_NAME
-        sql = f"""
-            WITH RankedData AS (
-                SELECT dezena, recurrence_cdf,
-                       ROW_NUMBER() OVER (PARTITION BY dezena ORDER BY {cid_col} DESC) as rn
-                FROM {table} WHERE {cid_col} <= ?
-            )
-            SELECT dezena, recurrence_cdf FROM RankedData WHERE rn = 1;
-        """
+        sql = self._latest_rows_sql(table, "t.recurrence_cdf")
         params = (concurso_id,)
         metric_cols = ['recurrence_cdf']
         return self._execute_metric_query(base_df, sql, params, metric_cols, "métricas de recorrência")
 
     def _merge_rank_trend_metrics(self, base_df: pd.DataFrame, concurso_id: int) -> pd.DataFrame:
         table = self.table_names['rank_trends']
-        cid_col = self.config_access.CONTEST_ID_COLUMN_NAME
-        sql = f"""
-            WITH RankedData AS (
-                SELECT dezena, rank_slope, trend_status,
-                       ROW_NUMBER() OVER (PARTITION BY dezena ORDER BY {cid_col} DESC) as rn
-                FROM {table} WHERE {cid_col} <= ?
-            )
-            SELECT dezena, rank_slope, trend_status FROM RankedData WHERE rn = 1;
-        """
+        sql = self._latest_rows_sql(table, "t.rank_slope, t.trend_status")
         params = (concurso_id,)
         metric_cols = ['rank_slope', 'trend_status']
         return self._execute_metric_query(base_df, sql, params, metric_cols, "tendência de rank")
@@ -240,17 +441,9 @@ class AnalysisAggregator:
     def _merge_cycle_status_metrics(self, base_df: pd.DataFrame, concurso_id: int) -> pd.DataFrame:
         table_status = self.table_names['cycle_status']
         table_closing = self.table_names['cycle_closing_propensity']
-        cid_col = self.config_access.CONTEST_ID_COLUMN_NAME
         merged_df = base_df.copy()
 
-        sql_missing = f"""
-            WITH RankedData AS (
-                SELECT dezena, is_missing_in_current_cycle,
-                       ROW_NUMBER() OVER (PARTITION BY dezena ORDER BY {cid_col} DESC) as rn
-                FROM {table_status} WHERE {cid_col} <= ?
-            )
-            SELECT dezena, is_missing_in_current_cycle FROM RankedData WHERE rn = 1;
-        """
+        sql_missing = self._latest_rows_sql(table_status, "t.is_missing_in_current_cycle")
         params_missing = (concurso_id,)
         metric_cols_missing = ['is_missing_in_current_cycle']
         merged_df = self._execute_metric_query(merged_df, sql_missing, params_missing, metric_cols_missing, "status de ciclo (faltantes)")
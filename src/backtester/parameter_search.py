@@ -0,0 +1,283 @@
+# src/backtester/parameter_search.py
+import itertools
+import json
+import logging
+import os
+import pickle
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.draw_matrix import get_draw_matrix_provider
+from src.backtester.evaluator import evaluate_hits, summarize_results
+from src.step_cache import hash_config, hash_draws, hash_value
+
+logger = logging.getLogger(__name__)
+
+# Estado de cada processo da busca (ScorerManager com conexão própria e cache de métricas pré-carregado).
+_SEARCH_WORKER_CONTEXT: Dict[str, Any] = {}
+
+
+def expand_parameter_grid(param_grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Produto cartesiano dos valores de cada parâmetro (ordem estável das chaves)."""
+    keys = list(param_grid.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*(list(param_grid[key]) for key in keys))]
+
+
+def sample_parameter_sets(param_grid: Dict[str, List[Any]], n_iter: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Busca aleatória: até 'n_iter' combinações distintas da grade, sorteadas com 'seed'."""
+    grid = expand_parameter_grid(param_grid)
+    if n_iter >= len(grid):
+        return grid
+    positions = sorted(random.Random(seed).sample(range(len(grid)), n_iter))
+    return [grid[pos] for pos in positions]
+
+
+def walk_forward_windows(start_contest: int, end_contest: int, window_size: int,
+                         step: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Janelas [início, fim] (inclusivas) de 'window_size' concursos, avançando 'step' (padrão: window_size)."""
+    if window_size <= 0:
+        raise ValueError(f"Tamanho de janela inválido: {window_size}")
+    step = step or window_size
+    windows = []
+    for window_start in range(int(start_contest), int(end_contest) + 1, step):
+        windows.append((window_start, min(window_start + window_size - 1, int(end_contest))))
+        if window_start + window_size - 1 >= end_contest:
+            break
+    return windows
+
+
+def _params_key(params: Dict[str, Any]) -> str:
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def _evaluate_candidate_window(scorer_manager: Any, strategy_class_name: str, params: Dict[str, Any],
+                               actual_draws: Dict[int, Set[int]]) -> Dict[int, int]:
+    """
+    Joga cada concurso da janela com a estratégia configurada por 'params', usando só os
+    dados até o concurso anterior. Retorna {concurso: acertos} (-1 em falha da estratégia).
+    """
+    instance = scorer_manager.get_strategy_instance(strategy_class_name, params, use_cache_if_no_specific_params=False)
+    results: Dict[int, int] = {}
+    for contest_id, actual_numbers in sorted(actual_draws.items()):
+        chosen = None
+        if instance is not None:
+            try:
+                scores_df = instance.generate_scores(contest_id - 1)
+                chosen = instance.select_numbers(scores_df, 15)
+            except Exception as e:
+                logger.error(f"Estratégia '{strategy_class_name}' {params} falhou no concurso {contest_id}: {e}")
+        chosen_set = set(int(n) for n in chosen) if chosen is not None else None
+        results[contest_id] = evaluate_hits(chosen_set, actual_numbers) if chosen_set is not None and len(chosen_set) == 15 else -1
+    return results
+
+
+def _init_search_worker(db_path: str, aggregator_config: Any, strategy_config: Dict[str, Any],
+                        metric_snapshots: Dict[int, pd.DataFrame]) -> None:
+    from src.analysis_aggregator import AnalysisAggregator
+    from src.database_manager import DatabaseManager
+    from src.scorer import ScorerManager
+
+    db_manager = DatabaseManager(db_path)
+    aggregator = AnalysisAggregator(db_manager, aggregator_config)
+    aggregator.seed_metrics_cache(metric_snapshots)
+    _SEARCH_WORKER_CONTEXT['scorer_manager'] = ScorerManager(db_manager, aggregator, strategy_config)
+
+
+def _evaluate_in_worker(strategy_class_name: str, params: Dict[str, Any],
+                        actual_draws: Dict[int, Set[int]]) -> Dict[int, int]:
+    return _evaluate_candidate_window(_SEARCH_WORKER_CONTEXT['scorer_manager'], strategy_class_name, params, actual_draws)
+
+
+class StrategyParameterSearch:
+    """
+    Busca em grade (ou aleatória) de parâmetros de uma estratégia descoberta pelo
+    ScorerManager, avaliada em janelas walk-forward de concursos.
+
+    - As métricas do AnalysisAggregator de todos os concursos de corte são consolidadas
+      uma vez (API em lote) e compartilhadas por todos os candidatos (e processos).
+    - Cada par (candidato, janela) é uma tarefa; com max_workers > 1 as tarefas rodam em
+      processos, cada um com sua conexão ao banco.
+    - Cada tarefa concluída é anexada ao checkpoint (JSON lines); uma nova execução com a
+      mesma busca (mesmos candidatos, janelas, sorteios, Config e versão das tabelas de
+      análise) pula as tarefas já gravadas.
+    """
+
+    def __init__(self,
+                 scorer_manager: Any,
+                 strategy_class_name: str,
+                 param_grid: Dict[str, List[Any]],
+                 all_draws_df: pd.DataFrame,
+                 config: Any,
+                 start_contest: int,
+                 end_contest: int,
+                 window_size: int,
+                 step: Optional[int] = None,
+                 search_mode: str = 'grid',
+                 n_iter: Optional[int] = None,
+                 random_seed: int = 0,
+                 max_workers: Optional[int] = None,
+                 checkpoint_path: Optional[str] = None):
+        if strategy_class_name not in scorer_manager.get_available_strategy_names():
+            raise ValueError(f"Estratégia '{strategy_class_name}' não encontrada pelo ScorerManager.")
+        if search_mode not in ('grid', 'random'):
+            raise ValueError(f"Modo de busca inválido: '{search_mode}' (use 'grid' ou 'random').")
+        self.scorer_manager = scorer_manager
+        self.strategy_class_name = strategy_class_name
+        self.config = config
+        if search_mode == 'random':
+            self.candidates = sample_parameter_sets(param_grid, n_iter or 10, random_seed)
+        else:
+            self.candidates = expand_parameter_grid(param_grid)
+        self.windows = walk_forward_windows(start_contest, end_contest, window_size, step)
+        self.max_workers = max(1, int(max_workers if max_workers is not None else getattr(config, 'PARAMETER_SEARCH_MAX_WORKERS', 1)))
+
+        draw_matrix = get_draw_matrix_provider(all_draws_df, config)
+        numbers = np.asarray(draw_matrix.numbers)
+        self._actual_draws: Dict[int, Set[int]] = {
+            int(contest_id): set(numbers[row.astype(bool)].tolist())
+            for contest_id, row in zip(draw_matrix.contest_ids, draw_matrix.presence)
+            if start_contest <= contest_id <= end_contest
+        }
+
+        if checkpoint_path is None:
+            # Novos concursos ou tabelas de análise regravadas mudam os resultados: outra busca.
+            aggregator = getattr(scorer_manager, 'analysis_aggregator', None)
+            data_version = aggregator.source_data_version() if hasattr(aggregator, 'source_data_version') else None
+            search_id = hash_value([strategy_class_name, [_params_key(c) for c in self.candidates], self.windows,
+                                    hash_draws(all_draws_df, config), hash_config(config), data_version])[:16]
+            checkpoint_dir = getattr(config, 'PARAMETER_SEARCH_CHECKPOINT_DIR', 'parameter_search')
+            checkpoint_path = os.path.join(checkpoint_dir, f"{strategy_class_name}_{search_id}.jsonl")
+        self.checkpoint_path = checkpoint_path
+        self.window_results: Dict[Tuple[str, int, int], Dict[int, int]] = {}
+        self.walk_forward_selection: List[Dict[str, Any]] = []
+
+    def _load_checkpoint(self) -> None:
+        if not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as handle:
+            for line in handle:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue # linha parcial de uma execução interrompida
+                key = (entry['params_key'], int(entry['window'][0]), int(entry['window'][1]))
+                self.window_results[key] = {int(c): int(h) for c, h in entry['results'].items()}
+        logger.info(f"Checkpoint '{self.checkpoint_path}': {len(self.window_results)} tarefa(s) já concluída(s).")
+
+    def _append_checkpoint(self, handle: Any, params: Dict[str, Any], window: Tuple[int, int], results: Dict[int, int]) -> None:
+        entry = {'params_key': _params_key(params), 'params': params, 'window': list(window), 'results': results}
+        handle.write(json.dumps(entry, default=str) + '\n')
+        handle.flush()
+
+    def _window_draws(self, window: Tuple[int, int]) -> Dict[int, Set[int]]:
+        return {c: numbers for c, numbers in self._actual_draws.items() if window[0] <= c <= window[1]}
+
+    def _shared_metric_snapshots(self) -> Dict[int, pd.DataFrame]:
+        """Consolida (em lote) as métricas de todos os cortes das janelas e as devolve para compartilhar."""
+        aggregator = getattr(self.scorer_manager, 'analysis_aggregator', None)
+        if aggregator is None or not hasattr(aggregator, 'get_historical_metrics_for_contests'):
+            return {}
+        cutoffs = sorted(c - 1 for c in self._actual_draws)
+        aggregator.get_historical_metrics_for_contests(cutoffs)
+        return aggregator.export_metrics_cache(cutoffs)
+
+    def run(self) -> pd.DataFrame:
+        """Executa as tarefas pendentes e retorna o ranking de candidatos (maior média de acertos primeiro)."""
+        start_time = time.time()
+        self._load_checkpoint()
+        pending = [(params, window) for params in self.candidates for window in self.windows
+                   if (_params_key(params), window[0], window[1]) not in self.window_results]
+        logger.info(f"Busca de parâmetros '{self.strategy_class_name}': {len(self.candidates)} candidato(s) x "
+                    f"{len(self.windows)} janela(s); {len(pending)} tarefa(s) pendente(s).")
+
+        if pending:
+            snapshots = self._shared_metric_snapshots()
+            os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint_path)), exist_ok=True)
+            with open(self.checkpoint_path, 'a', encoding='utf-8') as checkpoint_handle:
+                done = False
+                if self.max_workers > 1 and len(pending) > 1:
+                    done = self._run_parallel(pending, snapshots, checkpoint_handle)
+                if not done:
+                    for params, window in pending:
+                        if (_params_key(params), window[0], window[1]) in self.window_results:
+                            continue
+                        results = _evaluate_candidate_window(self.scorer_manager, self.strategy_class_name, params, self._window_draws(window))
+                        self._record(params, window, results, checkpoint_handle)
+
+        ranking = self.summarize()
+        logger.info(f"Busca de parâmetros concluída em {time.time() - start_time:.2f} segundos.")
+        return ranking
+
+    def _record(self, params: Dict[str, Any], window: Tuple[int, int], results: Dict[int, int], checkpoint_handle: Any) -> None:
+        self.window_results[(_params_key(params), window[0], window[1])] = results
+        self._append_checkpoint(checkpoint_handle, params, window, results)
+
+    def _run_parallel(self, pending: List[Tuple[Dict[str, Any], Tuple[int, int]]],
+                      snapshots: Dict[int, pd.DataFrame], checkpoint_handle: Any) -> bool:
+        db_path = getattr(getattr(self.scorer_manager, 'db_manager', None), 'db_path', None)
+        aggregator = getattr(self.scorer_manager, 'analysis_aggregator', None)
+        if not db_path or db_path == ':memory:' or aggregator is None:
+            logger.warning("Busca paralela requer um banco em arquivo e um AnalysisAggregator. Executando sequencialmente.")
+            return False
+        try:
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(pending)), initializer=_init_search_worker,
+                                     initargs=(db_path, aggregator.config_access, self.scorer_manager.config, snapshots)) as executor:
+                futures = {executor.submit(_evaluate_in_worker, self.strategy_class_name, params, self._window_draws(window)): (params, window)
+                           for params, window in pending}
+                for future in as_completed(futures):
+                    params, window = futures[future]
+                    self._record(params, window, future.result(), checkpoint_handle)
+            return True
+        except (OSError, NotImplementedError, ImportError, pickle.PicklingError, BrokenProcessPool) as e:
+            logger.warning(f"Execução paralela indisponível ({e}). Tarefas restantes serão executadas sequencialmente.")
+            return False
+
+    def summarize(self) -> pd.DataFrame:
+        """
+        Uma linha por candidato: parâmetros, média de acertos geral e por janela, faixas de
+        acertos (summarize_results) e erros. Também preenche 'walk_forward_selection': para
+        cada janela, o melhor candidato da janela anterior e sua média fora da amostra.
+        """
+        rows = []
+        window_means: Dict[str, Dict[Tuple[int, int], float]] = {}
+        for params in self.candidates:
+            key = _params_key(params)
+            combined: Dict[int, int] = {}
+            window_means[key] = {}
+            row: Dict[str, Any] = {'params': key, **{f'param_{name}': value for name, value in params.items()}}
+            for window in self.windows:
+                results = self.window_results.get((key, window[0], window[1]))
+                if results is None:
+                    continue
+                valid_hits = [h for h in results.values() if h >= 0]
+                window_means[key][window] = float(np.mean(valid_hits)) if valid_hits else float('nan')
+                row[f'mean_hits_{window[0]}_{window[1]}'] = window_means[key][window]
+                combined.update(results)
+            valid_hits = [h for h in combined.values() if h >= 0]
+            row['mean_hits'] = float(np.mean(valid_hits)) if valid_hits else float('nan')
+            row['contests_evaluated'] = len(combined)
+            summary = summarize_results(combined) if combined else {}
+            row.update({f'hits_{faixa}': count for faixa, count in summary.items()})
+            rows.append(row)
+
+        self.walk_forward_selection = []
+        for previous_window, window in zip(self.windows, self.windows[1:]):
+            scored = [(means[previous_window], key) for key, means in window_means.items()
+                      if previous_window in means and not np.isnan(means[previous_window]) and window in means]
+            if not scored:
+                continue
+            best_in_sample, best_key = max(scored, key=lambda item: item[0])
+            self.walk_forward_selection.append({
+                'window': window, 'selected_params': best_key,
+                'in_sample_mean_hits': best_in_sample, 'out_of_sample_mean_hits': window_means[best_key][window],
+            })
+
+        if not rows:
+            return pd.DataFrame()
+        return pd.DataFrame(rows).sort_values('mean_hits', ascending=False, kind='stable').reset_index(drop=True)
@@ -1,168 +1,231 @@
 # src/backtester/runner.py
-
-from typing import Callable, Optional, Set, Dict, Any, List
-import pandas as pd
-from collections import Counter
+import logging
+import pickle
 import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
-# Importa do config (INCLUINDO BASE_COLS)
-from src.config import logger, ALL_NUMBERS, BASE_COLS, NEW_BALL_COLUMNS
-
-# Importa do database_manager (SEM BASE_COLS)
-from src.database_manager import read_data_from_db, get_draw_numbers
-from src.backtester.evaluator import evaluate_hits, summarize_results
-# Importa o agregador para buscar o estado inicial
-from src.analysis_aggregator import get_consolidated_analysis
+import numpy as np
+import pandas as pd
 
-# Fallbacks (caso config falhe)
-if 'ALL_NUMBERS' not in globals(): ALL_NUMBERS = list(range(1, 26))
-if 'NEW_BALL_COLUMNS' not in globals(): NEW_BALL_COLUMNS = [f'b{i}' for i in range(1,16)]
-if 'BASE_COLS' not in globals(): BASE_COLS = ['concurso'] + NEW_BALL_COLUMNS
+from src.analysis.draw_matrix import DrawMatrix, get_draw_matrix_provider
+from src.backtester.evaluator import summarize_results
 
+logger = logging.getLogger(__name__)
 
-# Novo tipo para a função da estratégia
+# Estratégia por concurso: recebe o estado (dict) antes do concurso e devolve 15 dezenas.
 StrategyFuncType = Callable[[Dict[str, Any]], Optional[Set[int]]]
+# Estratégia vetorizada: recebe os arrays de estado de todo o período (concursos x dezenas)
+# e devolve uma matriz booleana de escolhas (concursos x dezenas).
+VectorizedStrategyFuncType = Callable[[Dict[str, np.ndarray]], np.ndarray]
+
+
+class BacktestState:
+    """
+    Estado das análises antes de cada concurso do período, pré-computado uma única vez
+    a partir da DrawMatrix. Linha i = situação ao fim do sorteio anterior a contests[i]:
+
+    - 'overall_freq': frequência acumulada por dezena;
+    - 'current_delay': concursos desde a última aparição (concurso anterior - último visto);
+    - 'numbers_in_last_draw': presença no sorteio anterior;
+    - 'missing_in_current_cycle': dezenas ainda não sorteadas no ciclo em andamento
+      (o ciclo fecha quando as 25 dezenas saem; o sorteio que fecha inicia o próximo vazio).
+
+    'draw_masks' traz o sorteio real de cada concurso (bits na ordem de 'numbers').
+    """
+
+    def __init__(self, draw_matrix: DrawMatrix, start_contest: int, end_contest: int):
+        self.numbers = list(draw_matrix.numbers)
+        n_numbers = len(self.numbers)
+        presence = draw_matrix.presence.astype(np.int64)
+        contest_ids = draw_matrix.contest_ids.astype(np.int64)
+        lo, hi = draw_matrix.row_bounds(start_contest, end_contest)
+        self.contests = contest_ids[lo:hi]
+        self.draw_masks = draw_matrix.bitmasks[lo:hi].astype(np.uint32)
+
+        cum_presence = np.zeros((len(presence) + 1, n_numbers), dtype=np.int64)
+        np.cumsum(presence, axis=0, out=cum_presence[1:])
+        last_seen = np.zeros((len(presence) + 1, n_numbers), dtype=np.int64)
+        np.maximum.accumulate(np.where(presence == 1, contest_ids[:, None], 0), axis=0, out=last_seen[1:])
+        previous_contest = np.concatenate([[0], contest_ids])[lo:hi]
+
+        rows = np.arange(lo, hi)
+        self.overall_freq = cum_presence[rows]
+        self.current_delay = previous_contest[:, None] - last_seen[rows]
+        self.numbers_in_last_draw = np.where(rows[:, None] > 0, presence[np.maximum(rows - 1, 0)], 0).astype(bool)
+        self.missing_in_current_cycle = self._missing_in_cycle(draw_matrix.bitmasks, n_numbers)[rows]
+
+    @staticmethod
+    def _missing_in_cycle(bitmasks: np.ndarray, n_numbers: int) -> np.ndarray:
+        """Máscara das dezenas faltantes no ciclo antes de cada linha (e após a última)."""
+        full_mask = (1 << n_numbers) - 1
+        seen = 0
+        missing_masks = np.empty(len(bitmasks) + 1, dtype=np.uint32)
+        for pos, mask in enumerate(bitmasks.tolist()):
+            missing_masks[pos] = full_mask & ~seen
+            seen |= mask
+            if seen == full_mask:
+                seen = 0
+        missing_masks[len(bitmasks)] = full_mask & ~seen
+        bits = np.arange(n_numbers, dtype=np.uint32)
+        return ((missing_masks[:, None] >> bits) & 1).astype(bool)
+
+    def __len__(self) -> int:
+        return len(self.contests)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            'contests': self.contests,
+            'overall_freq': self.overall_freq,
+            'current_delay': self.current_delay,
+            'numbers_in_last_draw': self.numbers_in_last_draw,
+            'missing_in_current_cycle': self.missing_in_current_cycle,
+        }
+
+    def state_for_row(self, row: int) -> Dict[str, Any]:
+        """Estado no formato dict das estratégias por concurso (Series indexadas pelas dezenas)."""
+        numbers = np.asarray(self.numbers)
+        return {
+            'contest': int(self.contests[row]),
+            'overall_freq': pd.Series(self.overall_freq[row], index=self.numbers),
+            'current_delay': pd.Series(self.current_delay[row], index=self.numbers),
+            'numbers_in_last_draw': set(numbers[self.numbers_in_last_draw[row]].tolist()),
+            'missing_in_current_cycle': set(numbers[self.missing_in_current_cycle[row]].tolist()),
+        }
+
+
+def select_top_by_metric(state_arrays: Dict[str, np.ndarray], metric: str, largest: bool = True, count: int = 15) -> np.ndarray:
+    """
+    Estratégia vetorizada: as 'count' dezenas com maior (ou menor) valor de 'metric' em
+    cada concurso. Empates favorecem a dezena menor. Use com functools.partial.
+    """
+    values = np.asarray(state_arrays[metric], dtype=np.float64)
+    keys = -values if largest else values
+    order = np.argsort(keys, axis=1, kind='stable')[:, :count]
+    choices = np.zeros(values.shape, dtype=bool)
+    np.put_along_axis(choices, order, True, axis=1)
+    return choices
+
+
+def _choices_to_masks(choices: np.ndarray) -> np.ndarray:
+    weights = np.left_shift(np.uint32(1), np.arange(choices.shape[1], dtype=np.uint32))
+    return (choices.astype(np.uint32) * weights).sum(axis=1, dtype=np.uint32)
+
+
+def _popcount32(values: np.ndarray) -> np.ndarray:
+    """Bits ligados de cada uint32 (unpackbits sobre os 4 bytes; np.bitwise_count exige numpy 2)."""
+    as_bytes = np.ascontiguousarray(values, dtype='<u4').view(np.uint8).reshape(-1, 4)
+    return np.unpackbits(as_bytes, axis=1).sum(axis=1, dtype=np.int64)
+
+
+def _run_strategy(name: str, strategy: Callable, vectorized: bool, state: BacktestState,
+                  extra_state: Optional[Dict[int, Any]]) -> Tuple[str, Dict[int, int]]:
+    """Avalia uma estratégia em todo o período. Acertos = bits comuns entre escolha e sorteio."""
+    n_rows = len(state)
+    if vectorized:
+        choices = np.asarray(strategy(state.arrays()), dtype=bool)
+        valid = choices.sum(axis=1) == 15
+        masks = _choices_to_masks(choices)
+    else:
+        position = {number: pos for pos, number in enumerate(state.numbers)}
+        valid = np.zeros(n_rows, dtype=bool)
+        masks = np.zeros(n_rows, dtype=np.uint32)
+        for row in range(n_rows):
+            contest_state = state.state_for_row(row)
+            if extra_state is not None:
+                contest_state['aggregated_metrics'] = extra_state.get(int(state.contests[row]))
+            try:
+                chosen = strategy(contest_state)
+            except Exception as e:
+                logger.error(f"Estratégia '{name}' falhou no concurso {state.contests[row]}: {e}")
+                continue
+            if chosen is None or len(set(chosen)) != 15 or any(number not in position for number in chosen):
+                continue
+            valid[row] = True
+            masks[row] = sum(1 << position[number] for number in set(chosen))
+
+    hits = _popcount32(masks & state.draw_masks)
+    hits = np.where(valid, hits, -1)
+    return name, dict(zip(state.contests.tolist(), hits.tolist()))
+
 
 class BacktesterRunner:
-    """ Executa backtesting usando atualização incremental (Fase 1: Freq/Delay). """
+    """
+    Backtest de várias estratégias (e variações de parâmetros) sobre o mesmo período.
+
+    O estado por concurso (frequência, atraso, último sorteio, faltantes do ciclo) é
+    pré-computado uma vez em arrays (BacktestState); cada estratégia percorre esses
+    arrays, sem atualizar DataFrames concurso a concurso. Estratégias vetorizadas
+    recebem os arrays do período inteiro e são avaliadas numa única operação.
+    Com 'max_workers' > 1, as estratégias são distribuídas entre processos.
+
+    Estratégias por concurso com parâmetros: functools.partial(func, **params) com
+    'func' definida no nível do módulo (necessário para os processos).
+    """
+
     def __init__(self,
-                 strategy_func: StrategyFuncType,
-                 strategy_name: str,
-                 start_contest: int,
-                 end_contest: int,
-                 initial_analysis_needed: bool = True):
-        self.strategy_func = strategy_func
-        self.strategy_name = strategy_name
-        self.start_contest = start_contest
-        self.end_contest = end_contest
-        self.initial_analysis_needed = initial_analysis_needed
-        self.logger = logger
-        self.current_contest: int = 0
-        self.overall_freq: Optional[pd.Series] = None
-        self.current_delay: Optional[pd.Series] = None
-        self.last_seen_concurso: Optional[Dict[int, int]] = None
-        self.analysis_state: Dict[str, Any] = {}
-        self.results_log: Dict[int, int] = {}
-        self.draw_data_period: Optional[pd.DataFrame] = None # Armazena dados lidos
-
-    def _initialize_state(self) -> bool:
-        """ Calcula o estado inicial das métricas até start_contest - 1. """
-        self.current_contest = self.start_contest - 1
-        self.logger.info(f"Inicializando estado do backtester até concurso {self.current_contest}...")
-
-        # Se precisar de todas as análises (ex: top_score), chama o agregador UMA VEZ
-        if self.initial_analysis_needed:
-            self.logger.info("Buscando análises consolidadas iniciais...")
-            initial_agg_results = get_consolidated_analysis(self.current_contest)
-            if initial_agg_results is None: self.logger.error("Falha ao obter análises iniciais."); return False
-            self.analysis_state.update(initial_agg_results)
-            self.overall_freq = self.analysis_state.get('overall_freq')
-            self.current_delay = self.analysis_state.get('current_delay')
-            if self.current_delay is not None:
-                 self.last_seen_concurso = { n: self.current_contest - int(d) if pd.notna(d) else 0 for n, d in self.current_delay.items() }
-                 self.logger.info("last_seen_concurso inicializado a partir do current_delay agregado.")
-            else: self.logger.error("current_delay não encontrado."); return False
-            self.logger.info("Análises consolidadas iniciais obtidas.")
-        # Senão, calcula apenas as básicas (Freq, Delay)
-        else:
-            # Usa BASE_COLS importado do config
-            initial_data = read_data_from_db(columns=BASE_COLS, concurso_maximo=self.current_contest)
-            if initial_data is None: self.logger.error("Falha ao ler dados iniciais."); return False
-            # Frequência Geral
-            if initial_data.empty: self.overall_freq = pd.Series(0, index=ALL_NUMBERS)
-            else: melted = initial_data[NEW_BALL_COLUMNS].melt(value_name='n')['n'].dropna().astype(int); self.overall_freq = melted.value_counts().reindex(ALL_NUMBERS, fill_value=0)
-            self.analysis_state['overall_freq'] = self.overall_freq; logger.info("Freq. geral inicial calculada.")
-            # Atraso Atual e Last Seen
-            self.last_seen_concurso = {n: 0 for n in ALL_NUMBERS}; self.current_delay = pd.Series(self.current_contest + 1, index=ALL_NUMBERS, dtype='Int64')
-            if not initial_data.empty:
-                for index, row in initial_data.iloc[::-1].iterrows():
-                    conc = int(row['concurso']); drawn = {int(n) for n in row[NEW_BALL_COLUMNS].dropna().values}
-                    for num in ALL_NUMBERS:
-                         if self.last_seen_concurso.get(num, 0) == 0 and num in drawn: self.last_seen_concurso[num] = conc
-                for num in ALL_NUMBERS:
-                    last_seen = self.last_seen_concurso[num]
-                    if last_seen > 0: self.current_delay[num] = self.current_contest - last_seen
-            self.analysis_state['current_delay'] = self.current_delay; logger.info("Atraso atual inicial calculado.")
-            self.analysis_state['numbers_in_last_draw'] = set(initial_data.iloc[-1][NEW_BALL_COLUMNS].dropna().astype(int)) if not initial_data.empty else set()
-
-        # Pré-lê os dados do período de backtest
-        self.logger.info(f"Pré-lendo dados sorteios {self.start_contest} a {self.end_contest}...")
-        # Usa BASE_COLS importado do config
-        self.draw_data_period = read_data_from_db(columns=BASE_COLS, concurso_minimo=self.start_contest, concurso_maximo=self.end_contest)
-        if self.draw_data_period is None or self.draw_data_period.empty: self.logger.error("Não ler dados período backtest."); return False
-        self.draw_data_period.set_index('concurso', inplace=True); logger.info("Dados período backtest lidos.")
-
-        if self.overall_freq is None or self.current_delay is None or self.last_seen_concurso is None: self.logger.error("Estado inicial incompleto."); return False
-        return True
-
-
-    def _update_state(self, drawn_numbers_current_draw: Set[int]):
-        """ Atualiza incrementalmente Freq Geral e Atraso Atual. """
-        self.current_contest += 1; logger.debug(f"Atualizando estado p/ FIM do Concurso {self.current_contest}...")
-        # 1. Frequência Geral
-        if self.overall_freq is not None:
-             self.overall_freq.loc[list(drawn_numbers_current_draw)] += 1 # Mais eficiente
-             self.analysis_state['overall_freq'] = self.overall_freq
-        # 2. Atraso Atual e Last Seen
-        if self.current_delay is not None and self.last_seen_concurso is not None:
-            # Incrementa atraso para todos que NÃO saíram
-            not_drawn = set(ALL_NUMBERS) - drawn_numbers_current_draw
-            self.current_delay.loc[list(not_drawn)] += 1
-            # Zera atraso e atualiza last_seen para os que saíram
-            self.current_delay.loc[list(drawn_numbers_current_draw)] = 0
-            for num in drawn_numbers_current_draw: self.last_seen_concurso[num] = self.current_contest
-            self.analysis_state['current_delay'] = self.current_delay
-        # 3. Outras métricas (AINDA NÃO INCREMENTAIS - Recalcula p/ top_score)
-        if self.strategy_name == 'top_score':
-             # logger.warning("Backtester incremental Fase 1: Recalculando métricas p/ 'top_score'.") # Log opcional
-             temp_results = get_consolidated_analysis(self.current_contest)
-             if temp_results:
-                 self.analysis_state.update(temp_results)
-                 if self.overall_freq is not None: self.analysis_state['overall_freq'] = self.overall_freq # Garante overwrite
-                 if self.current_delay is not None: self.analysis_state['current_delay'] = self.current_delay # Garante overwrite
-        # 4. Guarda números deste sorteio para próxima iteração
-        self.analysis_state['numbers_in_last_draw'] = drawn_numbers_current_draw
-
-
-    def run(self) -> Optional[Dict[int, int]]:
-        """ Executa o loop de backtest. """
+                 all_draws_df: pd.DataFrame,
+                 config: Any,
+                 strategies: Optional[Dict[str, StrategyFuncType]] = None,
+                 start_contest: Optional[int] = None,
+                 end_contest: Optional[int] = None,
+                 vectorized_strategies: Optional[Dict[str, VectorizedStrategyFuncType]] = None,
+                 max_workers: int = 1,
+                 analysis_aggregator: Any = None):
+        self.config = config
+        self.strategies = dict(strategies or {})
+        self.vectorized_strategies = dict(vectorized_strategies or {})
+        duplicated = set(self.strategies) & set(self.vectorized_strategies)
+        if duplicated:
+            raise ValueError(f"Nomes de estratégia duplicados: {sorted(duplicated)}")
+        self.max_workers = max(1, int(max_workers or 1))
+        self.analysis_aggregator = analysis_aggregator
+
+        self.draw_matrix = get_draw_matrix_provider(all_draws_df, config)
+        if self.draw_matrix.empty:
+            raise ValueError("Nenhum sorteio disponível para o backtest.")
+        self.start_contest = int(start_contest) if start_contest is not None else int(self.draw_matrix.contest_ids[1 if len(self.draw_matrix) > 1 else 0])
+        self.end_contest = int(end_contest) if end_contest is not None else int(self.draw_matrix.contest_ids[-1])
+        self.results_logs: Dict[str, Dict[int, int]] = {}
+
+    def _aggregated_metrics_by_contest(self, state: BacktestState) -> Optional[Dict[int, pd.DataFrame]]:
+        """Métricas do AnalysisAggregator até o concurso anterior a cada jogo, buscadas em lote."""
+        if self.analysis_aggregator is None or not self.strategies or not len(state):
+            return None
+        cid_col = getattr(self.config, 'CONTEST_ID_COLUMN_NAME', 'contest_id')
+        cutoffs = [int(c) - 1 for c in state.contests]
+        long_df = self.analysis_aggregator.get_historical_metrics_for_contests(cutoffs)
+        by_cutoff = {int(cutoff): df.drop(columns=[cid_col]).reset_index(drop=True) for cutoff, df in long_df.groupby(cid_col)}
+        return {int(contest): by_cutoff.get(int(contest) - 1) for contest in state.contests}
+
+    def run(self) -> Dict[str, Dict[Any, int]]:
+        """Executa o backtest e retorna o resumo (summarize_results) de cada estratégia."""
         start_time = time.time()
-        if not self._initialize_state(): return None
-
-        total_contests = self.end_contest - self.start_contest + 1; contests_processed = 0
-        self.logger.info(f"Iniciando loop backtest ({self.start_contest} a {self.end_contest})...")
-
-        for contest_to_play in range(self.start_contest, self.end_contest + 1):
-            # Estado reflete fim do concurso self.current_contest (= contest_to_play - 1)
-            current_analysis_for_strategy = self.analysis_state.copy()
-
-            # Chama Estratégia
-            self.logger.debug(f"Backtest [Conc. {contest_to_play}]: Aplicando '{self.strategy_name}'...")
-            chosen_numbers = self.strategy_func(current_analysis_for_strategy) # Passa dict
-
-            # Processa resultado
-            actual_numbers_set = None
-            if contest_to_play in self.draw_data_period.index:
-                 # Usa NEW_BALL_COLUMNS importado do config
-                 actual_numbers_set = set(self.draw_data_period.loc[contest_to_play][NEW_BALL_COLUMNS].dropna().astype(int))
-            else: self.logger.error(f"Dados reais não encontrados p/ {contest_to_play}!"); self.results_log[contest_to_play] = -1
-
-            if chosen_numbers is None or len(chosen_numbers) != 15 :
-                self.logger.error(f"Estratégia falhou conc. {contest_to_play}."); self.results_log[contest_to_play] = -1
-            elif actual_numbers_set is not None:
-                hits = evaluate_hits(chosen_numbers, actual_numbers_set)
-                self.results_log[contest_to_play] = hits; self.logger.debug(f"Conc. {contest_to_play}: {hits} acertos.")
-            # else: erro já logado
-
-            # Atualiza estado com dados REAIS do concurso que acabou de acontecer
-            if actual_numbers_set is not None: self._update_state(actual_numbers_set)
-            else: self.logger.critical(f"Fim backtest - dados faltantes conc. {contest_to_play}."); break
-
-            contests_processed += 1
-            if contests_processed % 100 == 0: self.logger.info(f"Progresso: {contests_processed}/{total_contests} processados.")
-
-        # Fim do Loop
-        duration = time.time() - start_time
-        self.logger.info(f"Backtest concluído p/ '{self.strategy_name}'. Processados: {contests_processed}/{total_contests}.")
-        self.logger.info(f"Tempo total: {duration:.2f} segundos.")
-        return summarize_results(self.results_log)
\ No newline at end of file
+        state = BacktestState(self.draw_matrix, self.start_contest, self.end_contest)
+        logger.info(f"Backtest de {len(self.strategies) + len(self.vectorized_strategies)} estratégia(s) em "
+                    f"{len(state)} concursos ({self.start_contest} a {self.end_contest}). Estado pré-computado.")
+        extra_state = self._aggregated_metrics_by_contest(state)
+
+        tasks = [(name, func, False) for name, func in self.strategies.items()]
+        tasks += [(name, func, True) for name, func in self.vectorized_strategies.items()]
+        results: List[Tuple[str, Dict[int, int]]] = []
+        if self.max_workers > 1 and len(tasks) > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as executor:
+                    futures = [executor.submit(_run_strategy, name, func, vectorized, state, extra_state)
+                               for name, func, vectorized in tasks]
+                    results = [future.result() for future in futures]
+            except (OSError, NotImplementedError, ImportError, pickle.PicklingError, AttributeError, BrokenProcessPool) as e:
+                logger.warning(f"Execução paralela indisponível ({e}). Avaliando estratégias sequencialmente.")
+                results = []
+        if not results:
+            results = [_run_strategy(name, func, vectorized, state, extra_state) for name, func, vectorized in tasks]
+
+        summaries: Dict[str, Dict[Any, int]] = {}
+        for name, results_log in results:
+            self.results_logs[name] = results_log
+            logger.info(f"Estratégia '{name}':")
+            summaries[name] = summarize_results(results_log)
+        logger.info(f"Backtest concluído em {time.time() - start_time:.2f} segundos.")
+        return summaries
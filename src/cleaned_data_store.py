@@ -0,0 +1,223 @@
+# src/cleaned_data_store.py
+import hashlib
+import io
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.config import (
+    BALL_NUMBER_COLUMNS,
+    CONTEST_ID_COLUMN_NAME,
+    DATE_COLUMN_NAME,
+    DRAWN_NUMBERS_COLUMN_NAME,
+)
+
+logger = logging.getLogger(__name__)
+
+# Layout colunar dos dados limpos: um .npy por coluna (carregáveis com mmap_mode='r')
+# e um manifest.json com versão do formato e hash do conteúdo.
+STORE_FORMAT_VERSION = 1
+MANIFEST_FILE_NAME = 'manifest.json'
+STORE_ARRAY_FILES: Dict[str, str] = {
+    'contest_ids': 'contest_ids.npy',   # int32 (N,)
+    'dates': 'dates.npy',               # datetime64[D] (N,), NaT se ausente
+    'balls': 'balls.npy',               # uint8 (N, 15), na ordem das colunas de bolas
+}
+
+
+def _content_hash(arrays: Dict[str, np.ndarray]) -> str:
+    hasher = hashlib.sha256()
+    for name in sorted(arrays):
+        array = np.ascontiguousarray(arrays[name])
+        hasher.update(name.encode('utf-8'))
+        hasher.update(str(array.dtype).encode('utf-8'))
+        hasher.update(str(array.shape).encode('utf-8'))
+        hasher.update(array.view(np.uint8).tobytes() if array.size else b'')
+    return hasher.hexdigest()
+
+
+def dataframe_to_store_arrays(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Converte o DataFrame limpo (contest_id, date, ball_1..ball_15) nos arrays do store."""
+    contest_ids = pd.to_numeric(df[CONTEST_ID_COLUMN_NAME]).to_numpy(dtype=np.int32)
+    if DATE_COLUMN_NAME in df.columns:
+        dates = pd.to_datetime(df[DATE_COLUMN_NAME], errors='coerce').to_numpy(dtype='datetime64[D]')
+    else:
+        dates = np.full(len(df), np.datetime64('NaT'), dtype='datetime64[D]')
+    balls = df[BALL_NUMBER_COLUMNS].to_numpy(dtype=np.int64)
+    if balls.size and (balls.min() < 0 or balls.max() > 255):
+        raise ValueError("Dezenas fora do intervalo suportado por uint8.")
+    return {
+        'contest_ids': contest_ids,
+        'dates': dates,
+        'balls': balls.astype(np.uint8),
+    }
+
+
+def save_cleaned_data_store(df: pd.DataFrame, store_dir: str) -> str:
+    """
+    Grava os dados limpos no formato colunar. Os .npy são escritos primeiro e o
+    manifest por último, de modo que um store incompleto nunca é considerado válido.
+
+    Returns:
+        O hash de conteúdo gravado no manifest.
+    """
+    arrays = dataframe_to_store_arrays(df)
+    store_path = Path(store_dir)
+    store_path.mkdir(parents=True, exist_ok=True)
+
+    for name, file_name in STORE_ARRAY_FILES.items():
+        tmp_path = store_path / f".{file_name}.tmp"
+        with open(tmp_path, 'wb') as fh:
+            np.save(fh, arrays[name], allow_pickle=False)
+        os.replace(tmp_path, store_path / file_name)
+
+    content_hash = _content_hash(arrays)
+    manifest = {
+        'format_version': STORE_FORMAT_VERSION,
+        'content_hash': content_hash,
+        'rows': int(len(arrays['contest_ids'])),
+        'last_contest_id': int(arrays['contest_ids'].max()) if len(arrays['contest_ids']) else None,
+        'ball_columns': list(BALL_NUMBER_COLUMNS),
+        'files': STORE_ARRAY_FILES,
+    }
+    tmp_manifest = store_path / f".{MANIFEST_FILE_NAME}.tmp"
+    tmp_manifest.write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+    os.replace(tmp_manifest, store_path / MANIFEST_FILE_NAME)
+    logger.info(f"Store colunar de dados limpos salvo em '{store_dir}' ({manifest['rows']} linhas, hash {content_hash[:12]}).")
+    return content_hash
+
+
+def _append_rows_to_npy(npy_path: Path, new_rows: np.ndarray) -> bool:
+    """
+    Acrescenta linhas ao final de um .npy existente sem reescrever os dados já gravados:
+    só o cabeçalho (shape) é atualizado. Retorna False se o cabeçalho não couber no
+    espaço original (o chamador deve então regravar o arquivo).
+    """
+    with open(npy_path, 'r+b') as fh:
+        version = np.lib.format.read_magic(fh)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fh)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fh)
+        data_offset = fh.tell()
+        if fortran_order or new_rows.dtype != dtype or tuple(new_rows.shape[1:]) != tuple(shape[1:]):
+            return False
+
+        header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False,
+                  'shape': (shape[0] + new_rows.shape[0],) + tuple(shape[1:])}
+        buffer = io.BytesIO()
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(buffer, header)
+        else:
+            np.lib.format.write_array_header_2_0(buffer, header)
+        if len(buffer.getvalue()) != data_offset:
+            return False
+
+        fh.seek(0)
+        fh.write(buffer.getvalue())
+        fh.seek(0, os.SEEK_END)
+        fh.write(np.ascontiguousarray(new_rows).tobytes())
+    return True
+
+
+def append_cleaned_data_store(df_new: pd.DataFrame, store_dir: str) -> str:
+    """
+    Acrescenta novos concursos ao store existente (linhas já gravadas não são reescritas)
+    e atualiza o manifest com o novo hash de conteúdo.
+
+    Returns:
+        O hash de conteúdo gravado no manifest.
+    """
+    existing = load_cleaned_store_arrays(store_dir, mmap=True)
+    if existing is None:
+        raise FileNotFoundError(f"Store de dados limpos inválido ou inexistente em '{store_dir}'.")
+    new_arrays = dataframe_to_store_arrays(df_new)
+    last_contest = int(existing['contest_ids'].max()) if len(existing['contest_ids']) else None
+    if last_contest is not None and len(new_arrays['contest_ids']) and int(new_arrays['contest_ids'].min()) <= last_contest:
+        raise ValueError(f"Novos concursos devem ser posteriores ao último do store ({last_contest}).")
+    del existing # Libera os mmaps antes de alterar os arquivos
+
+    store_path = Path(store_dir)
+    for name, file_name in STORE_ARRAY_FILES.items():
+        if not _append_rows_to_npy(store_path / file_name, new_arrays[name]):
+            logger.info(f"Cabeçalho de '{file_name}' sem espaço para o novo shape. Regravando o arquivo.")
+            current = np.load(store_path / file_name, allow_pickle=False)
+            tmp_path = store_path / f".{file_name}.tmp"
+            with open(tmp_path, 'wb') as fh:
+                np.save(fh, np.concatenate([current, new_arrays[name]]), allow_pickle=False)
+            os.replace(tmp_path, store_path / file_name)
+
+    arrays = load_cleaned_store_arrays(store_dir, mmap=True, verify_hash=False)
+    content_hash = _content_hash(arrays)
+    manifest = read_store_manifest(store_dir) or {}
+    manifest.update({
+        'format_version': STORE_FORMAT_VERSION,
+        'content_hash': content_hash,
+        'rows': int(len(arrays['contest_ids'])),
+        'last_contest_id': int(arrays['contest_ids'].max()) if len(arrays['contest_ids']) else None,
+    })
+    del arrays
+    tmp_manifest = store_path / f".{MANIFEST_FILE_NAME}.tmp"
+    tmp_manifest.write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+    os.replace(tmp_manifest, store_path / MANIFEST_FILE_NAME)
+    logger.info(f"{len(df_new)} concursos acrescentados ao store '{store_dir}' (total {manifest['rows']}, hash {content_hash[:12]}).")
+    return content_hash
+
+
+def read_store_manifest(store_dir: str) -> Optional[dict]:
+    manifest_path = Path(store_dir) / MANIFEST_FILE_NAME
+    if not manifest_path.exists():
+        return None
+    try:
+        return json.loads(manifest_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Manifest do store '{store_dir}' ilegível: {e}")
+        return None
+
+
+def load_cleaned_store_arrays(store_dir: str, mmap: bool = True, verify_hash: bool = True) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Abre os arrays do store (por padrão via memória mapeada, somente leitura).
+    Retorna None se o store não existir, tiver outra versão de formato ou se o
+    hash de conteúdo não conferir com o manifest.
+    """
+    manifest = read_store_manifest(store_dir)
+    if manifest is None:
+        return None
+    if manifest.get('format_version') != STORE_FORMAT_VERSION:
+        logger.warning(f"Store '{store_dir}' com versão de formato {manifest.get('format_version')} (esperada {STORE_FORMAT_VERSION}).")
+        return None
+    if manifest.get('ball_columns') != list(BALL_NUMBER_COLUMNS):
+        logger.warning(f"Store '{store_dir}' gravado com outras colunas de bolas. Ignorando.")
+        return None
+
+    arrays: Dict[str, np.ndarray] = {}
+    try:
+        for name, file_name in STORE_ARRAY_FILES.items():
+            arrays[name] = np.load(Path(store_dir) / file_name, mmap_mode='r' if mmap else None, allow_pickle=False)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Falha ao abrir arrays do store '{store_dir}': {e}")
+        return None
+
+    if verify_hash and _content_hash(arrays) != manifest.get('content_hash'):
+        logger.warning(f"Hash de conteúdo do store '{store_dir}' não confere com o manifest. Ignorando store.")
+        return None
+    return arrays
+
+
+def store_arrays_to_dataframe(arrays: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """Reconstrói o DataFrame no formato de load_and_clean_data (incluindo 'drawn_numbers')."""
+    balls = np.asarray(arrays['balls']).astype(int)
+    df = pd.DataFrame({
+        CONTEST_ID_COLUMN_NAME: np.asarray(arrays['contest_ids']).astype(int),
+        DATE_COLUMN_NAME: pd.to_datetime(np.asarray(arrays['dates']).astype('datetime64[ns]')),
+    })
+    for col_pos, ball_col in enumerate(BALL_NUMBER_COLUMNS):
+        df[ball_col] = balls[:, col_pos]
+    df[DRAWN_NUMBERS_COLUMN_NAME] = np.sort(balls, axis=1).tolist()
+    return df
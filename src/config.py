@@ -16,6 +16,7 @@ PLOT_DIR: str = os.path.join(BASE_DIR, 'Plots')
 PLOT_DIR_CONFIG: str = os.getenv('PLOT_DIR', PLOT_DIR)
 RAW_DATA_FILE_NAME: str = os.getenv('RAW_DATA_FILE_NAME', 'historico.csv')
 CLEANED_DATA_FILE_NAME: str = os.getenv('CLEANED_DATA_FILE_NAME', 'cleaned_draws.pkl')
+CLEANED_DATA_STORE_DIR_NAME: str = os.getenv('CLEANED_DATA_STORE_DIR_NAME', 'cleaned_draws_store')
 
 _columns_to_keep_str: str = os.getenv('COLUMNS_TO_KEEP', 'Concurso,Data Sorteio,Bola1,Bola2,Bola3,Bola4,Bola5,Bola6,Bola7,Bola8,Bola9,Bola10,Bola11,Bola12,Bola13,Bola14,Bola15')
 COLUMNS_TO_KEEP: List[str] = [col.strip() for col in _columns_to_keep_str.split(',')]
@@ -32,6 +33,7 @@ DB_PATH: str = os.path.join(DATA_DIR, DB_NAME)
 HISTORICO_CSV_FILENAME: str = RAW_DATA_FILE_NAME
 HISTORICO_CSV_PATH: str = os.path.join(DATA_DIR, HISTORICO_CSV_FILENAME)
 CLEANED_DATA_PATH: str = os.path.join(DATA_DIR, CLEANED_DATA_FILE_NAME)
+CLEANED_DATA_STORE_PATH: str = os.path.join(DATA_DIR, CLEANED_DATA_STORE_DIR_NAME)
 
 ALL_NUMBERS: List[int] = list(range(1, 26))
 NUMBERS_PER_DRAW: int = 15
@@ -138,7 +140,23 @@ CHUNK_TYPES_CONFIG: Dict[str, List[int]] = {
 APRIORI_MIN_SUPPORT: float = float(os.getenv('APRIORI_MIN_SUPPORT', 0.02))
 FREQUENT_ITEMSETS_MIN_LEN: int = int(os.getenv('FREQUENT_ITEMSETS_MIN_LEN', 3))
 FREQUENT_ITEMSETS_MAX_LEN: int = int(os.getenv('FREQUENT_ITEMSETS_MAX_LEN', 8))
+# Limite opcional de itemsets minerados (0 = sem limite), aplicado por tamanho inteiro.
+FREQUENT_ITEMSETS_MAX_COUNT: int = int(os.getenv('FREQUENT_ITEMSETS_MAX_COUNT', 0))
 LOG_LEVEL: str = os.getenv('LOG_LEVEL', 'INFO').upper()
+
+# --- Execução do Pipeline ---
+# 1 = execução sequencial (padrão); > 1 = etapas independentes em paralelo (processos).
+PIPELINE_MAX_WORKERS: int = int(os.getenv('PIPELINE_MAX_WORKERS', '1'))
+# Cache de resultados por etapa: etapas cujas entradas não mudaram são puladas.
+PIPELINE_STEP_CACHE_ENABLED: bool = os.getenv('PIPELINE_STEP_CACHE_ENABLED', 'true').strip().lower() in ('1', 'true', 'yes', 'sim')
+PIPELINE_STEP_CACHE_DIR: str = os.getenv('PIPELINE_STEP_CACHE_DIR', os.path.join(DATA_DIR, 'step_cache'))
+# Busca de parâmetros de estratégias (walk-forward): processos e checkpoints de resultados parciais.
+PARAMETER_SEARCH_MAX_WORKERS: int = int(os.getenv('PARAMETER_SEARCH_MAX_WORKERS', '1'))
+PARAMETER_SEARCH_CHECKPOINT_DIR: str = os.getenv('PARAMETER_SEARCH_CHECKPOINT_DIR', os.path.join(DATA_DIR, 'parameter_search'))
+# PRAGMAs aplicados durante cargas em lote (DatabaseManager.bulk_write) e restaurados ao final.
+DB_BULK_SYNCHRONOUS: str = os.getenv('DB_BULK_SYNCHRONOUS', 'NORMAL').strip().upper()
+DB_BULK_CACHE_SIZE_KB: int = int(os.getenv('DB_BULK_CACHE_SIZE_KB', '65536'))
+DB_BULK_TEMP_STORE: str = os.getenv('DB_BULK_TEMP_STORE', 'MEMORY').strip().upper()
 LOG_FILE: str = os.path.join(LOG_DIR, 'lotofacil_analysis.log')
 DEFAULT_CHUNK_TYPE_FOR_PLOTTING: str = os.getenv('DEFAULT_CHUNK_TYPE_FOR_PLOTTING', 'linear')
 DEFAULT_CHUNK_SIZE_FOR_PLOTTING: int = int(os.getenv('DEFAULT_CHUNK_SIZE_FOR_PLOTTING', '50'))
@@ -194,6 +212,8 @@ class Config:
     CLEANED_DATA_FILE_NAME: str = CLEANED_DATA_FILE_NAME
     HISTORICO_CSV_PATH: str = HISTORICO_CSV_PATH
     CLEANED_DATA_PATH: str = CLEANED_DATA_PATH
+    CLEANED_DATA_STORE_DIR_NAME: str = CLEANED_DATA_STORE_DIR_NAME
+    CLEANED_DATA_STORE_PATH: str = CLEANED_DATA_STORE_PATH
 
     ALL_NUMBERS: List[int] = ALL_NUMBERS
     NUMBERS_PER_DRAW: int = NUMBERS_PER_DRAW
@@ -284,8 +304,17 @@ class Config:
     APRIORI_MIN_SUPPORT: float = APRIORI_MIN_SUPPORT
     FREQUENT_ITEMSETS_MIN_LEN: int = FREQUENT_ITEMSETS_MIN_LEN
     FREQUENT_ITEMSETS_MAX_LEN: int = FREQUENT_ITEMSETS_MAX_LEN
+    FREQUENT_ITEMSETS_MAX_COUNT: int = FREQUENT_ITEMSETS_MAX_COUNT
 
     LOG_LEVEL: str = LOG_LEVEL
+    PIPELINE_MAX_WORKERS: int = PIPELINE_MAX_WORKERS
+    PIPELINE_STEP_CACHE_ENABLED: bool = PIPELINE_STEP_CACHE_ENABLED
+    PIPELINE_STEP_CACHE_DIR: str = PIPELINE_STEP_CACHE_DIR
+    PARAMETER_SEARCH_MAX_WORKERS: int = PARAMETER_SEARCH_MAX_WORKERS
+    PARAMETER_SEARCH_CHECKPOINT_DIR: str = PARAMETER_SEARCH_CHECKPOINT_DIR
+    DB_BULK_SYNCHRONOUS: str = DB_BULK_SYNCHRONOUS
+    DB_BULK_CACHE_SIZE_KB: int = DB_BULK_CACHE_SIZE_KB
+    DB_BULK_TEMP_STORE: str = DB_BULK_TEMP_STORE
     LOG_FILE: str = LOG_FILE
 
     DEFAULT_CHUNK_TYPE_FOR_PLOTTING: str = DEFAULT_CHUNK_TYPE_FOR_PLOTTING
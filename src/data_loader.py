@@ -1,121 +1,151 @@
 # src/data_loader.py
+import numpy as np
 import pandas as pd
+import io
+import json
 from pathlib import Path
 import logging
+from typing import Any, Optional, Tuple
 
 # Importar as constantes de configuração relevantes
 from src.config import (
     RAW_DATA_FILE_NAME,
     CLEANED_DATA_FILE_NAME,
+    CLEANED_DATA_STORE_DIR_NAME,
     COLUMNS_TO_KEEP,
     NEW_COLUMN_NAMES,
     BALL_NUMBER_COLUMNS,
     CONTEST_ID_COLUMN_NAME, # <<< ADICIONADO IMPORT
-    DATE_COLUMN_NAME # Para consistência com final_expected_cols
+    DATE_COLUMN_NAME, # Para consistência com final_expected_cols
+    ALL_NUMBERS,
+    NUMBERS_PER_DRAW
+)
+from src.cleaned_data_store import (
+    save_cleaned_data_store,
+    append_cleaned_data_store,
+    read_store_manifest,
+    load_cleaned_store_arrays,
+    store_arrays_to_dataframe
 )
 
 logger = logging.getLogger(__name__)
 
-def load_and_clean_data(raw_file_path: str, cleaned_file_path_to_save: str) -> pd.DataFrame:
-    """
-    Carrega os dados brutos do arquivo CSV, realiza a limpeza e os transforma.
-    Salva os dados limpos em formato pickle para carregamentos futuros mais rápidos.
-    """
+def _read_raw_draws_file(raw_file_path: str) -> pd.DataFrame:
+    """Lê o arquivo bruto (CSV ';' com fallback de encoding, ou XLSX)."""
+    if str(raw_file_path).lower().endswith(('.xlsx', '.xls')):
+        df = pd.read_excel(raw_file_path, header=0)
+        logger.info(f"Dados carregados com sucesso de planilha: {raw_file_path}")
+        return df
     try:
-        logger.info(f"Iniciando carregamento e limpeza de dados de: {raw_file_path}")
-        try:
-            df = pd.read_csv(raw_file_path, sep=';', encoding='utf-8', header=0)
-            logger.info(f"Dados carregados com sucesso de CSV (UTF-8): {raw_file_path}")
-        except UnicodeDecodeError:
-            logger.warning(f"Falha ao decodificar {raw_file_path} com UTF-8. Tentando com ISO-8859-1.")
-            df = pd.read_csv(raw_file_path, sep=';', encoding='iso-8859-1', header=0)
-            logger.info(f"Dados carregados com sucesso de CSV (ISO-8859-1): {raw_file_path}")
-
-        logger.debug(f"Colunas originais do CSV: {df.columns.tolist()}")
-        
-        actual_columns_to_keep_from_config = [col for col in COLUMNS_TO_KEEP if col in df.columns]
-        
-        if len(actual_columns_to_keep_from_config) != len(COLUMNS_TO_KEEP):
-            missing_cols = set(COLUMNS_TO_KEEP) - set(actual_columns_to_keep_from_config)
-            logger.warning(f"Colunas de COLUMNS_TO_KEEP não encontradas no arquivo: {missing_cols}. Usando as que existem.")
-            if not actual_columns_to_keep_from_config:
-                logger.error(f"Nenhuma coluna de COLUMNS_TO_KEEP ({COLUMNS_TO_KEEP}) encontrada no arquivo. Verifique a configuração e o arquivo de dados.")
-                return pd.DataFrame()
-        
-        df_processed = df[actual_columns_to_keep_from_config].copy()
-
-        current_col_names = df_processed.columns.tolist()
-        # Garante que NEW_COLUMN_NAMES tenha o tamanho certo para o zip
-        effective_new_column_names = NEW_COLUMN_NAMES[:len(current_col_names)]
-        rename_map = dict(zip(current_col_names, effective_new_column_names))
-        df_processed.rename(columns=rename_map, inplace=True)
-        logger.debug(f"Colunas renomeadas para: {df_processed.columns.tolist()}")
-
-        # A lógica original do seu data_loader verifica por 'Data Sorteio' APÓS a renomeação.
-        # Isso implica que 'Data Sorteio' não deve ser renomeada agressivamente por NEW_COLUMN_NAMES
-        # se esta lógica for para funcionar como está.
-        # Se NEW_COLUMN_NAMES[1] (correspondente a COLUMNS_TO_KEEP[1] == 'Data Sorteio')
-        # for, por exemplo, 'draw_date_str', então a verificação abaixo deveria ser
-        # if 'draw_date_str' in df_processed.columns:
-        # Para o config.py que forneci, NEW_COLUMN_NAMES[1] é 'Data Sorteio'.
-        
-        date_column_after_rename = None
-        if COLUMNS_TO_KEEP[1] == 'Data Sorteio': # Assumindo que a segunda coluna em COLUMNS_TO_KEEP é a data
-            date_column_after_rename = NEW_COLUMN_NAMES[1] # Este é o nome da coluna de data após a renomeação
-
-        if date_column_after_rename and date_column_after_rename in df_processed.columns:
-            # DATE_COLUMN_NAME é o nome final da coluna de data ('date' por default)
-            df_processed[DATE_COLUMN_NAME] = pd.to_datetime(df_processed[date_column_after_rename], format='%d/%m/%Y', errors='coerce')
-            if date_column_after_rename != DATE_COLUMN_NAME: # Só dropa se o nome for diferente do nome final
-                df_processed.drop(columns=[date_column_after_rename], inplace=True)
-            df_processed.dropna(subset=[DATE_COLUMN_NAME], inplace=True)
-        else:
-            logger.warning(f"Coluna de data ('{date_column_after_rename}') não encontrada após renomeação para conversão. Verifique COLUMNS_TO_KEEP e NEW_COLUMN_NAMES.")
+        df = pd.read_csv(raw_file_path, sep=';', encoding='utf-8', header=0)
+        logger.info(f"Dados carregados com sucesso de CSV (UTF-8): {raw_file_path}")
+    except UnicodeDecodeError:
+        logger.warning(f"Falha ao decodificar {raw_file_path} com UTF-8. Tentando com ISO-8859-1.")
+        df = pd.read_csv(raw_file_path, sep=';', encoding='iso-8859-1', header=0)
+        logger.info(f"Dados carregados com sucesso de CSV (ISO-8859-1): {raw_file_path}")
+    return df
 
-        for ball_col_name in BALL_NUMBER_COLUMNS:
-            if ball_col_name in df_processed.columns:
-                df_processed[ball_col_name] = pd.to_numeric(df_processed[ball_col_name], errors='coerce')
-            else:
-                logger.warning(f"Coluna de bola esperada '{ball_col_name}' não encontrada após renomeação.")
-        
-        existing_ball_cols_for_dropna = [col for col in BALL_NUMBER_COLUMNS if col in df_processed.columns]
-        if existing_ball_cols_for_dropna:
-            df_processed.dropna(subset=existing_ball_cols_for_dropna, inplace=True)
-            for ball_col_name in existing_ball_cols_for_dropna:
-                 df_processed[ball_col_name] = df_processed[ball_col_name].astype(int)
+
+def _clean_raw_draws(df: pd.DataFrame) -> pd.DataFrame:
+    """Seleciona, renomeia e converte as colunas do arquivo bruto para o formato limpo."""
+    logger.debug(f"Colunas originais do CSV: {df.columns.tolist()}")
+    
+    actual_columns_to_keep_from_config = [col for col in COLUMNS_TO_KEEP if col in df.columns]
+    
+    if len(actual_columns_to_keep_from_config) != len(COLUMNS_TO_KEEP):
+        missing_cols = set(COLUMNS_TO_KEEP) - set(actual_columns_to_keep_from_config)
+        logger.warning(f"Colunas de COLUMNS_TO_KEEP não encontradas no arquivo: {missing_cols}. Usando as que existem.")
+        if not actual_columns_to_keep_from_config:
+            logger.error(f"Nenhuma coluna de COLUMNS_TO_KEEP ({COLUMNS_TO_KEEP}) encontrada no arquivo. Verifique a configuração e o arquivo de dados.")
+            return pd.DataFrame()
+    
+    df_processed = df[actual_columns_to_keep_from_config].copy()
+
+    current_col_names = df_processed.columns.tolist()
+    # Garante que NEW_COLUMN_NAMES tenha o tamanho certo para o zip
+    effective_new_column_names = NEW_COLUMN_NAMES[:len(current_col_names)]
+    rename_map = dict(zip(current_col_names, effective_new_column_names))
+    df_processed.rename(columns=rename_map, inplace=True)
+    logger.debug(f"Colunas renomeadas para: {df_processed.columns.tolist()}")
+
+    # A lógica original do seu data_loader verifica por 'Data Sorteio' APÓS a renomeação.
+    # Isso implica que 'Data Sorteio' não deve ser renomeada agressivamente por NEW_COLUMN_NAMES
+    # se esta lógica for para funcionar como está.
+    # Se NEW_COLUMN_NAMES[1] (correspondente a COLUMNS_TO_KEEP[1] == 'Data Sorteio')
+    # for, por exemplo, 'draw_date_str', então a verificação abaixo deveria ser
+    # if 'draw_date_str' in df_processed.columns:
+    # Para o config.py que forneci, NEW_COLUMN_NAMES[1] é 'Data Sorteio'.
+    
+    date_column_after_rename = None
+    if COLUMNS_TO_KEEP[1] == 'Data Sorteio': # Assumindo que a segunda coluna em COLUMNS_TO_KEEP é a data
+        date_column_after_rename = NEW_COLUMN_NAMES[1] # Este é o nome da coluna de data após a renomeação
+
+    if date_column_after_rename and date_column_after_rename in df_processed.columns:
+        # DATE_COLUMN_NAME é o nome final da coluna de data ('date' por default)
+        df_processed[DATE_COLUMN_NAME] = pd.to_datetime(df_processed[date_column_after_rename], format='%d/%m/%Y', errors='coerce')
+        if date_column_after_rename != DATE_COLUMN_NAME: # Só dropa se o nome for diferente do nome final
+            df_processed.drop(columns=[date_column_after_rename], inplace=True)
+        df_processed.dropna(subset=[DATE_COLUMN_NAME], inplace=True)
+    else:
+        logger.warning(f"Coluna de data ('{date_column_after_rename}') não encontrada após renomeação para conversão. Verifique COLUMNS_TO_KEEP e NEW_COLUMN_NAMES.")
+
+    for ball_col_name in BALL_NUMBER_COLUMNS:
+        if ball_col_name in df_processed.columns:
+            df_processed[ball_col_name] = pd.to_numeric(df_processed[ball_col_name], errors='coerce')
         else:
-            logger.warning("Nenhuma coluna de bola encontrada para verificar NaNs ou converter para inteiro.")
+            logger.warning(f"Coluna de bola esperada '{ball_col_name}' não encontrada após renomeação.")
+    
+    existing_ball_cols_for_dropna = [col for col in BALL_NUMBER_COLUMNS if col in df_processed.columns]
+    if existing_ball_cols_for_dropna:
+        df_processed.dropna(subset=existing_ball_cols_for_dropna, inplace=True)
+        for ball_col_name in existing_ball_cols_for_dropna:
+             df_processed[ball_col_name] = df_processed[ball_col_name].astype(int)
+    else:
+        logger.warning("Nenhuma coluna de bola encontrada para verificar NaNs ou converter para inteiro.")
 
-        # --- CORREÇÃO AQUI para essential_cols e final_expected_cols ---
-        # Usar os nomes de colunas FINAIS padronizados do config.py
-        final_expected_cols = [CONTEST_ID_COLUMN_NAME, DATE_COLUMN_NAME] + BALL_NUMBER_COLUMNS
-        
-        cols_to_select_final = [col for col in final_expected_cols if col in df_processed.columns]
-        
-        essential_cols = [CONTEST_ID_COLUMN_NAME] + BALL_NUMBER_COLUMNS # Colunas essenciais após toda a renomeação
-        # --- FIM DA CORREÇÃO ---
+    # --- CORREÇÃO AQUI para essential_cols e final_expected_cols ---
+    # Usar os nomes de colunas FINAIS padronizados do config.py
+    final_expected_cols = [CONTEST_ID_COLUMN_NAME, DATE_COLUMN_NAME] + BALL_NUMBER_COLUMNS
+    
+    cols_to_select_final = [col for col in final_expected_cols if col in df_processed.columns]
+    
+    essential_cols = [CONTEST_ID_COLUMN_NAME] + BALL_NUMBER_COLUMNS # Colunas essenciais após toda a renomeação
+    # --- FIM DA CORREÇÃO ---
+    
+    missing_essential_cols = [col for col in essential_cols if col not in df_processed.columns]
+    if missing_essential_cols:
+        logger.error(f"Colunas essenciais estão faltando após o processamento: {missing_essential_cols}. Verifique a configuração e os dados.")
+        logger.debug(f"Colunas disponíveis em df_processed: {df_processed.columns.tolist()}")
+        return pd.DataFrame()
         
-        missing_essential_cols = [col for col in essential_cols if col not in df_processed.columns]
-        if missing_essential_cols:
-            logger.error(f"Colunas essenciais estão faltando após o processamento: {missing_essential_cols}. Verifique a configuração e os dados.")
-            logger.debug(f"Colunas disponíveis em df_processed: {df_processed.columns.tolist()}")
-            return pd.DataFrame()
-            
-        df_final = df_processed[cols_to_select_final].copy() # Usar .copy() para evitar SettingWithCopyWarning
+    df_final = df_processed[cols_to_select_final].copy() # Usar .copy() para evitar SettingWithCopyWarning
 
-        # Adicionar a coluna 'drawn_numbers' (lista de dezenas) que muitas análises podem esperar
-        # Esta coluna não estava sendo criada no seu data_loader.py, mas é um padrão útil.
-        # As análises que forneci (como combination_analysis) esperam esta coluna.
-        # Se você não a quiser, as análises precisarão ser ajustadas para ler de 'ball_1'...'ball_15'.
-        try:
-            df_final['drawn_numbers'] = df_final[BALL_NUMBER_COLUMNS].apply(lambda row: sorted([int(num) for num in row if pd.notna(num)]), axis=1)
-            logger.info("Coluna 'drawn_numbers' (lista de dezenas) criada.")
-        except Exception as e_drawn:
-            logger.warning(f"Não foi possível criar a coluna 'drawn_numbers': {e_drawn}")
+    # Adicionar a coluna 'drawn_numbers' (lista de dezenas) que muitas análises podem esperar
+    # Esta coluna não estava sendo criada no seu data_loader.py, mas é um padrão útil.
+    # As análises que forneci (como combination_analysis) esperam esta coluna.
+    # Se você não a quiser, as análises precisarão ser ajustadas para ler de 'ball_1'...'ball_15'.
+    try:
+        df_final['drawn_numbers'] = np.sort(df_final[BALL_NUMBER_COLUMNS].to_numpy(dtype=int), axis=1).tolist()
+        logger.info("Coluna 'drawn_numbers' (lista de dezenas) criada.")
+    except Exception as e_drawn:
+        logger.warning(f"Não foi possível criar a coluna 'drawn_numbers': {e_drawn}")
+    return df_final
 
 
-        df_final.to_pickle(cleaned_file_path_to_save)
-        logger.info(f"Dados limpos e transformados ({len(df_final)} linhas) salvos em: {cleaned_file_path_to_save}")
+def load_and_clean_data(raw_file_path: str, cleaned_store_path_to_save: str) -> pd.DataFrame:
+    """
+    Carrega os dados brutos do arquivo CSV, realiza a limpeza e os transforma.
+    Salva os dados limpos no store colunar (.npy + manifest) para carregamentos futuros mais rápidos.
+    """
+    try:
+        logger.info(f"Iniciando carregamento e limpeza de dados de: {raw_file_path}")
+        df = _read_raw_draws_file(raw_file_path)
+        df_final = _clean_raw_draws(df)
+        if df_final.empty:
+            return df_final
+
+        save_cleaned_data_store(df_final, cleaned_store_path_to_save)
+        logger.info(f"Dados limpos e transformados ({len(df_final)} linhas) salvos em: {cleaned_store_path_to_save}")
         
         return df_final
 
@@ -128,17 +158,206 @@ def load_and_clean_data(raw_file_path: str, cleaned_file_path_to_save: str) -> p
 
 def load_cleaned_data(data_dir_path: str) -> pd.DataFrame:
     """
-    Carrega os dados limpos de um arquivo pickle.
+    Carrega os dados limpos do store colunar (memória mapeada, validado pelo hash do manifest).
+    Se o store não existir, tenta o pickle legado.
     """
-    cleaned_file_path = Path(data_dir_path) / CLEANED_DATA_FILE_NAME # CLEANED_DATA_FILE_NAME é importado do config
+    store_path = Path(data_dir_path) / CLEANED_DATA_STORE_DIR_NAME
     try:
-        logger.info(f"Carregando dados limpos de: {cleaned_file_path}")
+        logger.info(f"Carregando dados limpos de: {store_path}")
+        arrays = load_cleaned_store_arrays(str(store_path))
+        if arrays is not None:
+            df = store_arrays_to_dataframe(arrays)
+            logger.info(f"Dados limpos carregados com sucesso de: {store_path}. DataFrame com {len(df)} linhas.")
+            return df
+    except Exception as e:
+        logger.error(f"Erro ao carregar store de dados limpos '{store_path}': {e}", exc_info=True)
+
+    cleaned_file_path = Path(data_dir_path) / CLEANED_DATA_FILE_NAME # Pickle legado
+    try:
+        logger.info(f"Store colunar indisponível. Tentando pickle legado: {cleaned_file_path}")
         df = pd.read_pickle(cleaned_file_path)
         logger.info(f"Dados limpos carregados com sucesso de: {cleaned_file_path}. DataFrame com {len(df)} linhas.")
         return df
     except FileNotFoundError:
-        logger.warning(f"Arquivo de dados limpos não encontrado em: {cleaned_file_path}. Execute o processo de limpeza primeiro.")
+        logger.warning(f"Dados limpos não encontrados em: {store_path} nem em {cleaned_file_path}. Execute o processo de limpeza primeiro.")
         return pd.DataFrame()
     except Exception as e:
         logger.error(f"Erro ao carregar dados limpos de '{cleaned_file_path}': {e}", exc_info=True)
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
+
+
+def _read_raw_draws_tail(raw_file_path: str, last_contest_id: int) -> pd.DataFrame:
+    """
+    Lê do arquivo bruto apenas os concursos posteriores a 'last_contest_id'.
+    Para CSV, as linhas são percorridas do fim para o início e só a cauda é
+    entregue ao parser; para XLSX a planilha é lida e filtrada.
+    """
+    if str(raw_file_path).lower().endswith(('.xlsx', '.xls')):
+        df = _read_raw_draws_file(raw_file_path)
+        contest_col_raw = COLUMNS_TO_KEEP[0]
+        if contest_col_raw not in df.columns:
+            return df.iloc[0:0]
+        return df[pd.to_numeric(df[contest_col_raw], errors='coerce') > last_contest_id]
+
+    raw_bytes = Path(raw_file_path).read_bytes()
+    try:
+        text = raw_bytes.decode('utf-8')
+    except UnicodeDecodeError:
+        logger.warning(f"Falha ao decodificar {raw_file_path} com UTF-8. Tentando com ISO-8859-1.")
+        text = raw_bytes.decode('iso-8859-1')
+
+    lines = text.splitlines()
+    if not lines:
+        return pd.DataFrame()
+    header, body = lines[0], lines[1:]
+
+    tail_start = len(body)
+    for pos in range(len(body) - 1, -1, -1):
+        first_field = body[pos].split(';', 1)[0].strip().strip('"')
+        if not first_field:
+            tail_start = pos # Linha vazia/incompleta no fim: deixa a validação decidir
+            continue
+        try:
+            contest_value = int(float(first_field))
+        except ValueError:
+            tail_start = pos
+            continue
+        if contest_value <= last_contest_id:
+            break
+        tail_start = pos
+
+    tail_lines = [line for line in body[tail_start:] if line.strip()]
+    if not tail_lines:
+        return pd.DataFrame(columns=header.split(';'))
+    return pd.read_csv(io.StringIO("\n".join([header] + tail_lines)), sep=';', header=0)
+
+
+def validate_new_draws(df_new: pd.DataFrame, last_contest_id: Optional[int]) -> pd.DataFrame:
+    """
+    Valida concursos novos já limpos: concurso único e posterior ao último armazenado,
+    data presente e NUMBERS_PER_DRAW dezenas distintas dentro de ALL_NUMBERS.
+    Linhas inválidas são descartadas com aviso.
+    """
+    if df_new.empty:
+        return df_new
+    balls = df_new[BALL_NUMBER_COLUMNS].to_numpy(dtype=int)
+    sorted_balls = np.sort(balls, axis=1)
+    valid = np.isin(balls, ALL_NUMBERS).all(axis=1)
+    valid &= (np.diff(sorted_balls, axis=1) > 0).all(axis=1)
+    valid &= balls.shape[1] == NUMBERS_PER_DRAW
+    contest_ids = df_new[CONTEST_ID_COLUMN_NAME].to_numpy()
+    if last_contest_id is not None:
+        valid &= contest_ids > last_contest_id
+    valid &= ~pd.Series(contest_ids).duplicated(keep='first').to_numpy()
+    if DATE_COLUMN_NAME in df_new.columns:
+        valid &= df_new[DATE_COLUMN_NAME].notna().to_numpy()
+
+    rejected = df_new.loc[~valid, CONTEST_ID_COLUMN_NAME].tolist()
+    if rejected:
+        logger.warning(f"{len(rejected)} concurso(s) novo(s) inválido(s) descartado(s): {rejected[:20]}")
+    return df_new.loc[valid].sort_values(by=CONTEST_ID_COLUMN_NAME).reset_index(drop=True)
+
+
+def ingest_new_draws(raw_file_path: str, cleaned_store_path: str, existing_df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Ingestão incremental: detecta o último concurso do store limpo, lê só a cauda do
+    arquivo bruto, valida as novas linhas e as acrescenta ao store.
+    Retorna o DataFrame completo (existente + novos). Sem store válido, faz a carga completa.
+    """
+    manifest = read_store_manifest(cleaned_store_path)
+    if manifest is None or manifest.get('last_contest_id') is None:
+        logger.info("Store de dados limpos inexistente. Executando carga completa.")
+        return load_and_clean_data(raw_file_path, cleaned_store_path)
+
+    if existing_df is None or existing_df.empty:
+        existing_df = load_cleaned_data(str(Path(cleaned_store_path).parent))
+    last_contest_id = int(manifest['last_contest_id'])
+    try:
+        raw_tail = _read_raw_draws_tail(raw_file_path, last_contest_id)
+    except FileNotFoundError:
+        logger.error(f"Arquivo de dados brutos não encontrado em: {raw_file_path}. Verifique o caminho.")
+        return existing_df
+
+    df_new = _clean_raw_draws(raw_tail) if not raw_tail.empty else pd.DataFrame()
+    df_new = validate_new_draws(df_new, last_contest_id) if not df_new.empty else df_new
+    if df_new.empty:
+        logger.info(f"Nenhum concurso novo após o concurso {last_contest_id} em: {raw_file_path}")
+        return existing_df
+
+    append_cleaned_data_store(df_new, cleaned_store_path)
+    logger.info(f"Ingestão incremental: {len(df_new)} concurso(s) novo(s) ({df_new[CONTEST_ID_COLUMN_NAME].min()}-{df_new[CONTEST_ID_COLUMN_NAME].max()}).")
+    return pd.concat([existing_df, df_new[existing_df.columns.intersection(df_new.columns)]], ignore_index=True)
+
+
+def _draws_table_rows(df: pd.DataFrame, config: Any) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Linhas das tabelas de sorteios (MAIN_DRAWS_TABLE_NAME, FLAT_DRAWS_TABLE_NAME) para os concursos de 'df'."""
+    contest_col = config.CONTEST_ID_COLUMN_NAME
+    df = df.sort_values(by=contest_col)
+    draws_rows = df[[contest_col] + list(config.BALL_NUMBER_COLUMNS)].copy()
+    if config.DATE_COLUMN_NAME in df.columns:
+        draws_rows.insert(1, config.DATE_COLUMN_NAME, pd.to_datetime(df[config.DATE_COLUMN_NAME]).dt.strftime('%Y-%m-%d'))
+    balls = df[list(config.BALL_NUMBER_COLUMNS)].to_numpy(dtype=int)
+    draws_rows[config.DRAWN_NUMBERS_COLUMN_NAME] = [json.dumps(row) for row in np.sort(balls, axis=1).tolist()]
+    flat_rows = pd.DataFrame({
+        contest_col: np.repeat(df[contest_col].to_numpy(dtype=int), balls.shape[1]),
+        config.DEZENA_COLUMN_NAME: balls.ravel(),
+    }).drop_duplicates()
+    return draws_rows.reset_index(drop=True), flat_rows.reset_index(drop=True)
+
+
+def _stored_draws_match(db_manager: Any, draws_rows: pd.DataFrame, draws_table: str, contest_col: str) -> bool:
+    """Compara as linhas gravadas em 'draws_table' com 'draws_rows' (mesmos concursos e valores)."""
+    columns = ", ".join(draws_rows.columns)
+    stored = db_manager.execute_query(f"SELECT {columns} FROM {draws_table} ORDER BY {contest_col}")
+    if stored is None or len(stored) != len(draws_rows) or list(stored.columns) != list(draws_rows.columns):
+        return False
+    expected = draws_rows.astype(object).where(draws_rows.notna(), None)
+    stored = stored.astype(object).where(stored.notna(), None)
+    return all(str(a) == str(b) for a, b in zip(stored.itertuples(index=False), expected.itertuples(index=False)))
+
+
+def sync_draws_tables(db_manager: Any, all_data_df: pd.DataFrame, config: Any, force_full_rewrite: bool = False) -> int:
+    """
+    Sincroniza as tabelas de sorteios (MAIN_DRAWS_TABLE_NAME e FLAT_DRAWS_TABLE_NAME) com
+    'all_data_df'. Se os concursos já gravados conferem com os dados, só os posteriores
+    ao último gravado são acrescentados; se algum foi corrigido/removido nos dados (ou com
+    'force_full_rewrite'), as duas tabelas são regravadas por bulk_write (upsert/replace,
+    que mantêm o DDL). Retorna o número de concursos gravados.
+    """
+    draws_table = config.MAIN_DRAWS_TABLE_NAME
+    flat_table = config.FLAT_DRAWS_TABLE_NAME
+    contest_col = config.CONTEST_ID_COLUMN_NAME
+
+    last_contest_id, stored_count = None, 0
+    if db_manager.table_exists(draws_table):
+        last_df = db_manager.execute_query(f"SELECT MAX({contest_col}), COUNT(*) FROM {draws_table}")
+        if last_df is not None and not last_df.empty and pd.notna(last_df.iloc[0, 0]):
+            last_contest_id, stored_count = int(last_df.iloc[0, 0]), int(last_df.iloc[0, 1])
+
+    draws_rows, flat_rows = _draws_table_rows(all_data_df, config)
+    if last_contest_id is not None:
+        stored_part = draws_rows[draws_rows[contest_col] <= last_contest_id]
+        if force_full_rewrite or not _stored_draws_match(db_manager, stored_part, draws_table, contest_col):
+            reason = "recarga forçada" if force_full_rewrite else "concursos gravados diferem dos dados"
+            # FLAT_DRAWS_TABLE_NAME referencia MAIN_DRAWS_TABLE_NAME (FOREIGN KEY): os sorteios
+            # entram por upsert na chave primária; se concursos gravados saíram dos dados, a
+            # tabela achatada é esvaziada antes para que o 'replace' dos sorteios possa apagá-los.
+            if len(stored_part) < stored_count:
+                db_manager.bulk_write(flat_rows.iloc[:0], flat_table, mode='replace')
+                db_manager.bulk_write(draws_rows, draws_table, mode='replace')
+            else:
+                db_manager.bulk_write(draws_rows, draws_table, mode='upsert')
+            db_manager.bulk_write(flat_rows, flat_table, mode='replace')
+            logger.info(f"Tabelas '{draws_table}'/'{flat_table}' regravadas ({reason}): {len(draws_rows)} concurso(s).")
+            return len(draws_rows)
+        draws_rows = draws_rows[draws_rows[contest_col] > last_contest_id]
+        flat_rows = flat_rows[flat_rows[contest_col] > last_contest_id]
+
+    if draws_rows.empty:
+        logger.info(f"Tabelas '{draws_table}'/'{flat_table}' já atualizadas (último concurso: {last_contest_id}).")
+        return 0
+
+    db_manager.save_dataframe(draws_rows, draws_table, if_exists='append')
+    db_manager.save_dataframe(flat_rows, flat_table, if_exists='append')
+    logger.info(f"{len(draws_rows)} concurso(s) acrescentado(s) a '{draws_table}' e '{flat_table}'.")
+    return len(draws_rows)
@@ -3,18 +3,28 @@ import sqlite3
 import pandas as pd
 import logging
 import os
-from typing import List, Any, Tuple, Optional
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Any, Tuple, Optional
+
+from .db_schema import SCHEMA_TABLES, ensure_schema_indexes
 
 # Importar Config para type hinting, mas a instância é geralmente passada ou importada como config_obj
 # from .config import Config 
 
 logger = logging.getLogger(__name__)
 
+BULK_WRITE_MODES = ('replace', 'append', 'upsert')
+# Versão (token aleatório) de cada tabela, trocada na mesma transação de cada bulk_write.
+# Permite saber se uma tabela mudou desde uma leitura/gravação anterior sem relê-la.
+TABLE_VERSIONS_TABLE = 'pipeline_table_versions'
+
 class DatabaseManager:
     def __init__(self, db_path: str):
         self.db_path = db_path
         self.conn: Optional[sqlite3.Connection] = None
         self.cursor: Optional[sqlite3.Cursor] = None
+        self.write_log: List[str] = [] # tabelas gravadas por bulk_write nesta conexão, em ordem
         try:
             db_dir = os.path.dirname(self.db_path)
             if db_dir and not os.path.exists(db_dir): # Cria o diretório se não existir
@@ -87,19 +97,184 @@ class DatabaseManager:
             return pd.DataFrame()
 
     def save_dataframe(self, df: pd.DataFrame, table_name: str, if_exists: str = 'replace') -> None:
-        """Salva um DataFrame Pandas em uma tabela SQLite."""
+        """Salva um DataFrame Pandas em uma tabela SQLite (via bulk_write)."""
         self._ensure_connection()
         if df is None:
             logger.warning(f"DataFrame para '{table_name}' é None. Nada salvo.")
             return
         try:
             logger.info(f"Salvando DataFrame em '{table_name}' (if_exists='{if_exists}', Linhas: {len(df)})")
-            df.to_sql(table_name, self.conn, if_exists=if_exists, index=False, chunksize=1000)
+            if if_exists == 'fail' and self.table_exists(table_name):
+                raise ValueError(f"Tabela '{table_name}' já existe.")
+            self.bulk_write(df, table_name, mode='append' if if_exists == 'fail' else if_exists)
             logger.info(f"DataFrame salvo em '{table_name}'.")
         except Exception as e:
             logger.error(f"Erro ao salvar DataFrame em '{table_name}': {e}", exc_info=True)
             raise
 
+    @contextmanager
+    def bulk_load_pragmas(self, synchronous: Optional[str] = None, cache_size_kb: Optional[int] = None,
+                          temp_store: Optional[str] = None) -> Iterator[None]:
+        """Aplica PRAGMAs de carga em lote (padrões do config) e restaura os valores anteriores ao sair."""
+        from .config import config_obj
+        self._ensure_connection()
+        settings = {
+            'synchronous': synchronous or getattr(config_obj, 'DB_BULK_SYNCHRONOUS', 'NORMAL'),
+            'cache_size': -abs(int(cache_size_kb if cache_size_kb is not None else getattr(config_obj, 'DB_BULK_CACHE_SIZE_KB', 65536))),
+            'temp_store': temp_store or getattr(config_obj, 'DB_BULK_TEMP_STORE', 'MEMORY'),
+        }
+        if self.conn.in_transaction: # PRAGMA synchronous não muda dentro de transação
+            self.conn.commit()
+        previous = {name: self.conn.execute(f"PRAGMA {name};").fetchone()[0] for name in settings}
+        for name, value in settings.items():
+            self.conn.execute(f"PRAGMA {name} = {value};")
+        try:
+            yield
+        finally:
+            if self.conn is not None:
+                if self.conn.in_transaction:
+                    self.conn.rollback()
+                for name, value in previous.items():
+                    self.conn.execute(f"PRAGMA {name} = {value};")
+
+    def column_exists(self, table_name: str, column_name: str) -> bool:
+        """Verifica se a coluna existe na tabela."""
+        return column_name in self.get_table_columns(table_name)
+
+    def get_primary_key_columns(self, table_name: str) -> List[str]:
+        """Colunas da chave primária de uma tabela, na ordem da chave (lista vazia se não houver)."""
+        self._ensure_connection()
+        try:
+            self.cursor.execute(f"PRAGMA table_info({table_name});")
+            pk_columns = [(row[5], row[1]) for row in self.cursor.fetchall() if row[5] > 0]
+            return [name for _, name in sorted(pk_columns)]
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao ler chave primária da tabela '{table_name}': {e}", exc_info=True)
+            return []
+
+    @staticmethod
+    def _dataframe_rows(df: pd.DataFrame) -> List[tuple]:
+        """Linhas do DataFrame como tuplas de tipos Python (NaN/NaT -> None, datas -> texto ISO como no to_sql)."""
+        column_values = []
+        for _, series in df.items():
+            if pd.api.types.is_datetime64_any_dtype(series):
+                series = series.map(lambda v: v.isoformat(sep=' ') if pd.notna(v) else None)
+            if series.isna().any():
+                series = series.astype(object).where(series.notna(), None)
+            column_values.append(series.tolist())
+        return list(zip(*column_values)) if column_values else []
+
+    def _create_table_from_dataframe(self, df: pd.DataFrame, table_name: str, key_columns: Optional[List[str]] = None) -> None:
+        schema = pd.io.sql.get_schema(df, table_name, keys=key_columns or None, con=self.conn)
+        self.cursor.execute(schema)
+
+    def bulk_write(self, df: pd.DataFrame, table_name: str, mode: str = 'append',
+                   key_columns: Optional[List[str]] = None, batch_size: int = 50000) -> int:
+        """
+        Grava um DataFrame com INSERT preparado + executemany, numa única transação e com
+        os PRAGMAs de carga em lote (bulk_load_pragmas). Retorna o número de linhas gravadas.
+
+        - 'replace': apaga as linhas (DELETE) e reinsere, preservando DDL e índices da tabela;
+          se o conjunto de colunas não coincidir (a ordem não importa: o INSERT usa os nomes)
+          ou a chave existente for violada, recria a tabela a partir do DataFrame
+          (comportamento do to_sql 'replace').
+        - 'append': apenas insere.
+        - 'upsert': INSERT ... ON CONFLICT(chave) DO UPDATE. A chave padrão é a chave primária
+          da tabela; 'key_columns' permite outra (cria índice único se necessário).
+
+        Tabelas inexistentes são criadas a partir dos tipos do DataFrame (com 'key_columns' como PK).
+        """
+        if mode not in BULK_WRITE_MODES:
+            raise ValueError(f"Modo de gravação inválido: '{mode}'. Use um de {BULK_WRITE_MODES}.")
+        self._ensure_connection()
+        batch_size = max(1, int(batch_size))
+        columns = [str(col) for col in df.columns]
+        rows = self._dataframe_rows(df)
+        existing_columns = self.get_table_columns(table_name) if self.table_exists(table_name) else []
+
+        if existing_columns and mode != 'replace':
+            unknown = [col for col in columns if col not in existing_columns]
+            if unknown:
+                raise ValueError(f"Colunas inexistentes na tabela '{table_name}': {unknown}")
+        conflict_columns: List[str] = []
+        if mode == 'upsert':
+            conflict_columns = list(key_columns or (self.get_primary_key_columns(table_name) if existing_columns else []))
+            if not conflict_columns:
+                raise ValueError(f"Upsert em '{table_name}' requer chave primária ou 'key_columns'.")
+            missing_keys = [col for col in conflict_columns if col not in columns]
+            if missing_keys:
+                raise ValueError(f"Colunas de chave ausentes no DataFrame: {missing_keys}")
+
+        quoted = ", ".join(f'"{col}"' for col in columns)
+        insert_sql = f'INSERT INTO "{table_name}" ({quoted}) VALUES ({", ".join("?" for _ in columns)})'
+        if mode == 'upsert':
+            updates = [col for col in columns if col not in conflict_columns]
+            conflict = ", ".join(f'"{col}"' for col in conflict_columns)
+            action = ("DO UPDATE SET " + ", ".join(f'"{col}" = excluded."{col}"' for col in updates)) if updates else "DO NOTHING"
+            insert_sql += f" ON CONFLICT ({conflict}) {action}"
+
+        def write(recreate: bool) -> None:
+            self.cursor.execute("BEGIN")
+            if recreate:
+                self.cursor.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+            if recreate or not existing_columns:
+                self._create_table_from_dataframe(df, table_name, key_columns)
+            elif mode == 'replace':
+                self.cursor.execute(f'DELETE FROM "{table_name}"')
+            if mode == 'upsert' and key_columns and existing_columns and \
+                    list(key_columns) != self.get_primary_key_columns(table_name):
+                index_name = f"uidx_{table_name}_{'_'.join(conflict_columns)}"
+                self.cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{index_name}" ON "{table_name}" ({conflict})')
+            for start in range(0, len(rows), batch_size):
+                self.cursor.executemany(insert_sql, rows[start:start + batch_size])
+            self._bump_table_version(table_name)
+            self.conn.commit()
+
+        recreate = mode == 'replace' and bool(existing_columns) and set(existing_columns) != set(columns)
+        with self.bulk_load_pragmas():
+            try:
+                write(recreate)
+            except sqlite3.IntegrityError as e:
+                self.conn.rollback()
+                if mode != 'replace' or recreate:
+                    raise
+                logger.info(f"Dados violam a chave de '{table_name}' ({e}). Recriando a tabela a partir do DataFrame.")
+                write(True)
+                recreate = True
+            except Exception:
+                if self.conn.in_transaction:
+                    self.conn.rollback()
+                raise
+        if recreate or not existing_columns: # tabela nova: recupera os índices declarados no esquema
+            from .config import config_obj
+            ensure_schema_indexes(self, config_obj, tables=[table_name])
+        self.write_log.append(table_name)
+        logger.debug(f"bulk_write '{table_name}' (mode='{mode}'): {len(rows)} linha(s).")
+        return len(rows)
+
+    def _bump_table_version(self, table_name: str) -> None:
+        """Troca o token de versão da tabela (dentro da transação corrente)."""
+        if table_name == TABLE_VERSIONS_TABLE:
+            return
+        self.cursor.execute(f'CREATE TABLE IF NOT EXISTS "{TABLE_VERSIONS_TABLE}" '
+                            '(table_name TEXT PRIMARY KEY, version TEXT NOT NULL)')
+        self.cursor.execute(f'INSERT INTO "{TABLE_VERSIONS_TABLE}" (table_name, version) VALUES (?, ?) '
+                            'ON CONFLICT (table_name) DO UPDATE SET version = excluded.version',
+                            (table_name, uuid.uuid4().hex))
+
+    def get_table_versions(self, table_names: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Token de versão atual de cada tabela (None se nunca gravada por bulk_write)."""
+        names = list(dict.fromkeys(table_names))
+        versions: Dict[str, Optional[str]] = {name: None for name in names}
+        if not names or not self.table_exists(TABLE_VERSIONS_TABLE):
+            return versions
+        self._ensure_connection()
+        placeholders = ", ".join("?" for _ in names)
+        rows = self.conn.execute(f'SELECT table_name, version FROM "{TABLE_VERSIONS_TABLE}" '
+                                 f'WHERE table_name IN ({placeholders})', names).fetchall()
+        versions.update(dict(rows))
+        return versions
+
     def load_dataframe(self, table_name: str, query: Optional[str] = None, params: Optional[Tuple] = None) -> pd.DataFrame:
         """Carrega dados de uma tabela (ou query customizada) para um DataFrame Pandas."""
         final_query = query
@@ -128,6 +303,23 @@ class DatabaseManager:
             logger.error(f"Erro ao verificar se tabela '{table_name}' existe: {e}", exc_info=True)
             return False
 
+    def get_table_columns(self, table_name: str) -> List[str]:
+        """Nomes das colunas de uma tabela (lista vazia se não existir)."""
+        self._ensure_connection()
+        try:
+            self.cursor.execute(f"PRAGMA table_info({table_name});")
+            return [row[1] for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao ler colunas da tabela '{table_name}': {e}", exc_info=True)
+            return []
+
+    def create_index(self, table_name: str, columns: List[str], index_name: Optional[str] = None) -> str:
+        """Cria (se não existir) um índice sobre as colunas informadas. Retorna o nome do índice."""
+        index_name = index_name or f"idx_{table_name}_{'_'.join(columns)}"
+        self._execute_ddl_query(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({', '.join(columns)});")
+        logger.debug(f"Índice '{index_name}' verificado/criado em '{table_name}'.")
+        return index_name
+
     def get_table_name_from_config(self, attr_name: str, default_name: str) -> str:
         """Auxiliar para obter nome de tabela do config_obj ou usar default."""
         from .config import config_obj # Importa config_obj aqui para acesso
@@ -244,7 +436,8 @@ class DatabaseManager:
         table_name = self.get_table_name_from_config('ANALYSIS_CYCLES_SUMMARY_TABLE_NAME', 'analysis_cycles_summary')
         query = f"""CREATE TABLE IF NOT EXISTS {table_name} (
             summary_id INTEGER PRIMARY KEY DEFAULT 1, total_ciclos_fechados INTEGER, duracao_media_ciclo REAL, 
-            duracao_min_ciclo INTEGER, duracao_max_ciclo INTEGER, duracao_mediana_ciclo REAL);"""
+            duracao_min_ciclo INTEGER, duracao_max_ciclo INTEGER, duracao_mediana_ciclo REAL,
+            ultimo_concurso_processado INTEGER);"""
         if not self.table_exists(table_name): self._execute_ddl_query(query); logger.debug(f"Tabela '{table_name}' verificada/criada.")
 
     def _create_table_analysis_cycle_progression_raw(self) -> None:
@@ -414,27 +607,7 @@ class DatabaseManager:
         """Verifica e cria todas as tabelas conhecidas se não existirem."""
         logger.info("Verificando e criando todas as tabelas do banco de dados se não existirem...")
         
-        creation_methods = [
-            self._create_table_draws, self._create_table_draw_results_flat,
-            self._create_table_analysis_delays, self._create_table_analysis_frequency_overall,
-            self._create_table_analysis_recurrence_cdf, self._create_table_analysis_rank_trend_metrics,
-            self._create_table_analysis_cycle_status_dezenas, self._create_table_analysis_cycle_closing_propensity,
-            self._create_table_frequent_itemsets, self._create_table_analysis_itemset_metrics,
-            self._create_table_analysis_cycles_detail, self._create_table_analysis_cycles_summary,
-            self._create_table_analysis_cycle_progression_raw,
-            self._create_table_propriedades_numericas_por_concurso,
-            self._create_table_analise_repeticao_concurso_anterior,
-            self._create_table_chunk_metrics,
-            self._create_table_draw_position_frequency,
-            self._create_table_geral_ma_frequency, self._create_table_geral_ma_delay,
-            self._create_table_association_rules, self._create_table_grid_line_distribution,
-            self._create_table_grid_column_distribution, self._create_table_statistical_tests_results,
-            self._create_table_monthly_number_frequency, self._create_table_monthly_draw_properties_summary,
-            self._create_table_sequence_metrics,
-            self._create_table_ciclo_metric_frequency, self._create_table_ciclo_metric_atraso_medio,
-            self._create_table_ciclo_metric_atraso_maximo, self._create_table_ciclo_metric_atraso_final,
-            self._create_table_ciclo_rank_frequency, self._create_table_ciclo_group_metrics,
-        ]
+        creation_methods = [getattr(self, method_name) for _, _, method_name in SCHEMA_TABLES]
         
         for method_func in creation_methods:
             try:
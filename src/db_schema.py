@@ -0,0 +1,179 @@
+# src/db_schema.py
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Esquema declarativo do banco de análises:
+# - SCHEMA_TABLES: tabelas conhecidas (atributo do config, nome padrão, método _create_table_*);
+# - schema_indexes(): índices das consultas quentes (por dezena/concurso e por intervalo);
+# - MIGRATIONS: alterações versionadas aplicadas uma única vez, registradas em SCHEMA_MIGRATIONS_TABLE.
+# apply_schema() roda na inicialização: cria tabelas ausentes, aplica migrações pendentes e
+# garante os índices declarados (tabelas recriadas pelo pipeline perdem os índices).
+SCHEMA_MIGRATIONS_TABLE = 'schema_migrations'
+
+SCHEMA_TABLES: Tuple[Tuple[str, str, str], ...] = (
+    ('MAIN_DRAWS_TABLE_NAME', 'draws', '_create_table_draws'),
+    ('FLAT_DRAWS_TABLE_NAME', 'draw_results_flat', '_create_table_draw_results_flat'),
+    ('ANALYSIS_DELAYS_TABLE_NAME', 'analysis_delays', '_create_table_analysis_delays'),
+    ('ANALYSIS_FREQUENCY_OVERALL_TABLE_NAME', 'analysis_frequency_overall', '_create_table_analysis_frequency_overall'),
+    ('ANALYSIS_RECURRENCE_CDF_TABLE_NAME', 'analysis_recurrence_cdf', '_create_table_analysis_recurrence_cdf'),
+    ('ANALYSIS_RANK_TREND_METRICS_TABLE_NAME', 'analysis_rank_trend_metrics', '_create_table_analysis_rank_trend_metrics'),
+    ('ANALYSIS_CYCLE_STATUS_DEZENAS_TABLE_NAME', 'analysis_cycle_status_dezenas', '_create_table_analysis_cycle_status_dezenas'),
+    ('ANALYSIS_CYCLE_CLOSING_PROPENSITY_TABLE_NAME', 'analysis_cycle_closing_propensity', '_create_table_analysis_cycle_closing_propensity'),
+    ('FREQUENT_ITEMSETS_TABLE_NAME', 'frequent_itemsets', '_create_table_frequent_itemsets'),
+    ('ANALYSIS_ITEMSET_METRICS_TABLE_NAME', 'analysis_itemset_metrics', '_create_table_analysis_itemset_metrics'),
+    ('ANALYSIS_CYCLES_DETAIL_TABLE_NAME', 'analysis_cycles_detail', '_create_table_analysis_cycles_detail'),
+    ('ANALYSIS_CYCLES_SUMMARY_TABLE_NAME', 'analysis_cycles_summary', '_create_table_analysis_cycles_summary'),
+    ('ANALYSIS_CYCLE_PROGRESSION_RAW_TABLE_NAME', 'analysis_cycle_progression_raw', '_create_table_analysis_cycle_progression_raw'),
+    ('PROPRIEDADES_NUMERICAS_POR_CONCURSO_TABLE_NAME', 'propriedades_numericas_por_concurso', '_create_table_propriedades_numericas_por_concurso'),
+    ('REPETICAO_CONCURSO_ANTERIOR_TABLE_NAME', 'analise_repeticao_concurso_anterior', '_create_table_analise_repeticao_concurso_anterior'),
+    ('CHUNK_METRICS_TABLE_NAME', 'chunk_metrics', '_create_table_chunk_metrics'),
+    ('DRAW_POSITION_FREQUENCY_TABLE_NAME', 'draw_position_frequency', '_create_table_draw_position_frequency'),
+    ('GERAL_MA_FREQUENCY_TABLE_NAME', 'geral_ma_frequency', '_create_table_geral_ma_frequency'),
+    ('GERAL_MA_DELAY_TABLE_NAME', 'geral_ma_delay', '_create_table_geral_ma_delay'),
+    ('ASSOCIATION_RULES_TABLE_NAME', 'association_rules', '_create_table_association_rules'),
+    ('GRID_LINE_DISTRIBUTION_TABLE_NAME', 'grid_line_distribution', '_create_table_grid_line_distribution'),
+    ('GRID_COLUMN_DISTRIBUTION_TABLE_NAME', 'grid_column_distribution', '_create_table_grid_column_distribution'),
+    ('STATISTICAL_TESTS_RESULTS_TABLE_NAME', 'statistical_tests_results', '_create_table_statistical_tests_results'),
+    ('MONTHLY_NUMBER_FREQUENCY_TABLE_NAME', 'monthly_number_frequency', '_create_table_monthly_number_frequency'),
+    ('MONTHLY_DRAW_PROPERTIES_TABLE_NAME', 'monthly_draw_properties_summary', '_create_table_monthly_draw_properties_summary'),
+    ('SEQUENCE_METRICS_TABLE_NAME', 'sequence_metrics', '_create_table_sequence_metrics'),
+    ('CYCLE_METRIC_FREQUENCY_TABLE_NAME', 'ciclo_metric_frequency', '_create_table_ciclo_metric_frequency'),
+    ('CYCLE_METRIC_ATRASO_MEDIO_TABLE_NAME', 'ciclo_metric_atraso_medio', '_create_table_ciclo_metric_atraso_medio'),
+    ('CYCLE_METRIC_ATRASO_MAXIMO_TABLE_NAME', 'ciclo_metric_atraso_maximo', '_create_table_ciclo_metric_atraso_maximo'),
+    ('CYCLE_METRIC_ATRASO_FINAL_TABLE_NAME', 'ciclo_metric_atraso_final', '_create_table_ciclo_metric_atraso_final'),
+    ('CYCLE_RANK_FREQUENCY_TABLE_NAME', 'ciclo_rank_frequency', '_create_table_ciclo_rank_frequency'),
+    ('CYCLE_GROUP_METRICS_TABLE_NAME', 'ciclo_group_metrics', '_create_table_ciclo_group_metrics'),
+)
+
+# Tabelas "por concurso e dezena": busca da última linha por dezena até o concurso X
+# (AnalysisAggregator) e intervalos de concursos.
+_CONTEST_DEZENA_TABLES = ('FLAT_DRAWS_TABLE_NAME', 'ANALYSIS_DELAYS_TABLE_NAME', 'ANALYSIS_FREQUENCY_OVERALL_TABLE_NAME',
+                          'ANALYSIS_RECURRENCE_CDF_TABLE_NAME', 'ANALYSIS_RANK_TREND_METRICS_TABLE_NAME',
+                          'ANALYSIS_CYCLE_STATUS_DEZENAS_TABLE_NAME')
+# Tabelas filtradas por intervalo de concursos.
+_CONTEST_RANGE_TABLES = ('MAIN_DRAWS_TABLE_NAME', 'ANALYSIS_ITEMSET_METRICS_TABLE_NAME', 'FREQUENT_ITEMSETS_TABLE_NAME',
+                         'ANALYSIS_CYCLE_PROGRESSION_RAW_TABLE_NAME', 'PROPRIEDADES_NUMERICAS_POR_CONCURSO_TABLE_NAME')
+
+
+def table_name(config: Any, attr_name: str) -> str:
+    default = next((default for attr, default, _ in SCHEMA_TABLES if attr == attr_name), attr_name.lower())
+    return getattr(config, attr_name, default)
+
+
+def schema_indexes(config: Any) -> List[Tuple[str, List[str]]]:
+    """Índices declarados (tabela, colunas). Índices cobertos pela chave primária não são criados."""
+    cid_col = getattr(config, 'CONTEST_ID_COLUMN_NAME', 'contest_id')
+    dezena_col = getattr(config, 'DEZENA_COLUMN_NAME', 'dezena')
+    indexes: List[Tuple[str, List[str]]] = []
+    for attr_name in _CONTEST_DEZENA_TABLES:
+        indexes.append((table_name(config, attr_name), [dezena_col, cid_col]))
+        indexes.append((table_name(config, attr_name), [cid_col]))
+    for attr_name in _CONTEST_RANGE_TABLES:
+        indexes.append((table_name(config, attr_name), [cid_col]))
+    indexes.append((table_name(config, 'ANALYSIS_CYCLES_DETAIL_TABLE_NAME'), ['concurso_fim']))
+    return indexes
+
+
+def ensure_schema_indexes(db_manager: Any, config: Any, tables: Optional[Sequence[str]] = None) -> List[str]:
+    """
+    Cria os índices declarados que faltam (tabelas existentes e com as colunas).
+    Índices cujas colunas já são prefixo da chave primária são dispensados.
+    Retorna os nomes dos índices presentes ao final.
+    """
+    ensured: List[str] = []
+    for table, columns in schema_indexes(config):
+        if tables is not None and table not in tables:
+            continue
+        table_columns = db_manager.get_table_columns(table)
+        if not table_columns or any(col not in table_columns for col in columns):
+            continue
+        primary_key = db_manager.get_primary_key_columns(table)
+        if primary_key[:len(columns)] == columns:
+            continue
+        try:
+            ensured.append(db_manager.create_index(table, columns))
+        except Exception as e:
+            logger.warning(f"Não foi possível criar índice em '{table}' ({columns}): {e}")
+    return ensured
+
+
+def _migration_baseline(db_manager: Any, config: Any) -> None:
+    ensure_schema_indexes(db_manager, config)
+
+
+def _migration_cycles_last_processed(db_manager: Any, config: Any) -> None:
+    # Último concurso processado pela etapa de ciclos, necessário para retomar o ciclo aberto.
+    table = table_name(config, 'ANALYSIS_CYCLES_SUMMARY_TABLE_NAME')
+    if db_manager.table_exists(table) and not db_manager.column_exists(table, 'ultimo_concurso_processado'):
+        db_manager._execute_ddl_query(f"ALTER TABLE {table} ADD COLUMN ultimo_concurso_processado INTEGER;")
+
+
+# (versão, descrição, função(db_manager, config)). Novas alterações entram no fim, com versão maior.
+MIGRATIONS: Tuple[Tuple[int, str, Callable[[Any, Any], None]], ...] = (
+    (1, 'Esquema base: tabelas _create_table_* e índices das consultas por concurso/dezena', _migration_baseline),
+    (2, 'Coluna ultimo_concurso_processado no sumário de ciclos (retomada incremental)', _migration_cycles_last_processed),
+)
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(db_manager: Any) -> int:
+    if not db_manager.table_exists(SCHEMA_MIGRATIONS_TABLE):
+        return 0
+    version_df = db_manager.execute_query(f"SELECT MAX(version) AS version FROM {SCHEMA_MIGRATIONS_TABLE};")
+    if version_df is None or version_df.empty or pd.isna(version_df.iloc[0, 0]):
+        return 0
+    return int(version_df.iloc[0, 0])
+
+
+def apply_migrations(db_manager: Any, config: Any) -> List[int]:
+    """Aplica, em ordem, as migrações com versão maior que a registrada no banco."""
+    db_manager._execute_ddl_query(f"""CREATE TABLE IF NOT EXISTS {SCHEMA_MIGRATIONS_TABLE} (
+        version INTEGER PRIMARY KEY, description TEXT, applied_at TEXT);""")
+    current_version = get_schema_version(db_manager)
+    applied: List[int] = []
+    for version, description, migration_func in MIGRATIONS:
+        if version <= current_version:
+            continue
+        logger.info(f"Aplicando migração {version}: {description}")
+        migration_func(db_manager, config)
+        db_manager.bulk_write(pd.DataFrame([{'version': version, 'description': description,
+                                             'applied_at': datetime.now().isoformat(timespec='seconds')}]),
+                              SCHEMA_MIGRATIONS_TABLE, mode='append')
+        applied.append(version)
+    return applied
+
+
+def apply_schema(db_manager: Any, config: Any) -> Dict[str, Any]:
+    """Cria as tabelas ausentes, aplica migrações pendentes e garante os índices declarados."""
+    db_manager._create_all_tables()
+    applied = apply_migrations(db_manager, config)
+    indexes = ensure_schema_indexes(db_manager, config)
+    version = get_schema_version(db_manager)
+    logger.info(f"Esquema do banco na versão {version} ({len(applied)} migração(ões) aplicada(s), {len(indexes)} índice(s) declarados presentes).")
+    return {'version': version, 'applied_migrations': applied, 'indexes': indexes}
+
+
+def full_table_scans(db_manager: Any, sql: str, params: Tuple = ()) -> List[str]:
+    """
+    Passos do EXPLAIN QUERY PLAN que varrem uma tabela inteira sem índice
+    ('SCAN <tabela>'). Varreduras de CTEs, subconsultas e tabelas virtuais são ignoradas.
+    """
+    plan = db_manager.execute_query("EXPLAIN QUERY PLAN " + sql, params)
+    if plan is None or plan.empty:
+        raise ValueError("EXPLAIN QUERY PLAN não retornou um plano (consulta inválida?).")
+    details = plan['detail'].astype(str).tolist()
+    derived = {detail.split()[1] for detail in details if detail.startswith(('CO-ROUTINE ', 'MATERIALIZE '))}
+    scans = []
+    for detail in details:
+        if not detail.startswith('SCAN ') or 'USING' in detail or 'VIRTUAL TABLE' in detail:
+            continue
+        name = detail.split()[1]
+        if name.startswith('(') or name in derived or name == 'CONSTANT':
+            continue
+        scans.append(detail)
+    return scans
@@ -9,9 +9,11 @@ from typing import List, Dict, Any, Callable, Optional
 # Importar Config e DatabaseManager PRIMEIRO
 from src.config import config_obj, Config 
 from src.database_manager import DatabaseManager
+from src.db_schema import apply_schema
 
-from src.data_loader import load_and_clean_data, load_cleaned_data # Funções do seu data_loader.py
+from src.data_loader import load_and_clean_data, load_cleaned_data, ingest_new_draws, sync_draws_tables # Funções do seu data_loader.py
 from src.orchestrator import Orchestrator
+from src.step_cache import StepResultCache
 
 # --- Importações das Funções de Etapa do Pipeline ---
 # (Suas importações de execute_*.py permanecem aqui)
@@ -80,22 +82,25 @@ def main(cmd_args: argparse.Namespace):
     try:
         # Caminhos para os arquivos de dados, usando config_obj
         raw_file_full_path = config_obj.HISTORICO_CSV_PATH
-        cleaned_pickle_full_path = config_obj.CLEANED_DATA_PATH
+        cleaned_store_full_path = config_obj.CLEANED_DATA_STORE_PATH
 
         if not cmd_args.force_reload:
-            logger.info(f"Tentando carregar dados limpos de: {cleaned_pickle_full_path}")
+            logger.info(f"Tentando carregar dados limpos de: {cleaned_store_full_path}")
             # A função load_cleaned_data no seu data_loader.py espera data_dir_path
             all_data_df = load_cleaned_data(config_obj.DATA_DIR) 
+            if cmd_args.incremental_ingest:
+                logger.info(f"Ingestão incremental: verificando novos concursos em {raw_file_full_path}")
+                all_data_df = ingest_new_draws(raw_file_full_path, cleaned_store_full_path, existing_df=all_data_df)
         
         if all_data_df is None or all_data_df.empty or cmd_args.force_reload:
             action_msg = "--force-reload especificado." if cmd_args.force_reload else "Dados limpos não encontrados ou vazios."
             logger.info(f"{action_msg} Processando dados brutos de: {raw_file_full_path}")
             
             # ***** CORREÇÃO DA CHAMADA load_and_clean_data *****
-            # A função espera: load_and_clean_data(raw_file_path: str, cleaned_file_path_to_save: str)
+            # A função espera: load_and_clean_data(raw_file_path: str, cleaned_store_path_to_save: str)
             all_data_df = load_and_clean_data(
                 raw_file_path=raw_file_full_path, 
-                cleaned_file_path_to_save=cleaned_pickle_full_path
+                cleaned_store_path_to_save=cleaned_store_full_path
             )
             # O terceiro argumento 'config=config_obj' foi removido pois não é esperado pela função.
 
@@ -112,14 +117,20 @@ def main(cmd_args: argparse.Namespace):
         db_config_shared_args = ["db_manager", "config", "shared_context"]
 
         main_analysis_pipeline_config: List[Dict[str, Any]] = [
-            {"name": "frequency_analysis", "func": run_frequency_analysis, "args": default_step_args},
-            {"name": "delay_analysis", "func": run_delay_analysis, "args": default_step_args},
+            {"name": "frequency_analysis", "func": run_frequency_analysis, "args": default_step_args,
+             "kwargs": {"force_full_recalculation": cmd_args.force_reload}},
+            {"name": "delay_analysis", "func": run_delay_analysis, "args": default_step_args,
+             "kwargs": {"force_full_recalculation": cmd_args.force_reload}},
             # {"name": "max_delay_analysis", "func": run_max_delay_analysis_step, "args": default_step_args},
             {"name": "positional_analysis", "func": run_positional_analysis_step, "args": default_step_args},
-            {"name": "recurrence_analysis", "func": run_recurrence_analysis_step, "args": default_step_args},
+            {"name": "recurrence_analysis", "func": run_recurrence_analysis_step, "args": default_step_args,
+             "depends_on": ["delay_analysis"]},
             {"name": "grid_analysis", "func": run_grid_analysis_step, "args": default_step_args},
-            {"name": "statistical_tests", "func": run_statistical_tests_step, "args": default_step_args},
-            {"name": "seasonality_analysis", "func": run_seasonality_analysis_step, "args": default_step_args},
+            {"name": "number_properties", "func": run_number_properties_analysis, "args": default_step_args},
+            {"name": "statistical_tests", "func": run_statistical_tests_step, "args": default_step_args,
+             "depends_on": ["frequency_analysis", "number_properties"]},
+            {"name": "seasonality_analysis", "func": run_seasonality_analysis_step, "args": default_step_args,
+             "depends_on": ["number_properties"]},
             
             {"name": "frequent_itemsets_analysis", "func": run_frequent_itemsets_analysis_step, 
              "args": default_step_args, 
@@ -131,29 +142,35 @@ def main(cmd_args: argparse.Namespace):
             {"name": "association_rules", "func": run_association_rules_step, 
              "args": db_config_shared_args + ["combination_analyzer_instance"]},
 
-            {"name": "frequent_itemset_metrics_analysis", "func": run_frequent_itemset_metrics_step, "args": default_step_args},
-            {"name": "number_properties", "func": run_number_properties_analysis, "args": default_step_args},
+            {"name": "frequent_itemset_metrics_analysis", "func": run_frequent_itemset_metrics_step, "args": default_step_args,
+             "depends_on": ["frequent_itemsets_analysis"]},
             {"name": "sequence_analysis", "func": run_sequence_analysis_step, "args": default_step_args},
             
             {"name": "cycle_identification", "func": run_cycle_identification_step, 
-             "args": default_step_args, "output_key": "cycles_detail_df"}, 
+             "args": default_step_args, "output_key": "cycles_detail_df",
+             "kwargs": {"force_full_recalculation": cmd_args.force_reload}}, 
             
             {"name": "cycle_stats", "func": run_cycle_stats_step, 
-             "args": ["all_data_df", "db_manager", "config", "shared_context"]},
+             "args": ["all_data_df", "db_manager", "config", "shared_context"],
+             "depends_on": ["cycle_identification"]},
             
-            {"name": "cycle_progression", "func": run_cycle_progression_analysis_step, "args": default_step_args},
+            {"name": "cycle_progression", "func": run_cycle_progression_analysis_step, "args": default_step_args,
+             "depends_on": ["cycle_identification"]},
             
             {"name": "cycle_closing_propensity", "func": run_cycle_closing_propensity_analysis, 
              "args": db_config_shared_args + ["cycles_detail_df"]}, 
 
             {"name": "detailed_cycle_metrics", "func": run_detailed_cycle_metrics_step, 
-             "args": default_step_args + ["cycles_detail_df"]},
+             "args": default_step_args + ["cycles_detail_df"],
+             "depends_on": ["cycle_stats"]},
 
             {"name": "repetition_analysis", "func": run_repetition_analysis_step, "args": default_step_args},
             {"name": "temporal_trend_analysis", "func": run_temporal_trend_analysis_step, "args": default_step_args},
             {"name": "chunk_evolution_analysis", "func": run_chunk_evolution_analysis_step, "args": default_step_args},
-            {"name": "block_aggregation", "func": run_block_aggregation_step, "args": db_config_shared_args}, 
-            {"name": "rank_trend_analysis", "func": run_rank_trend_analysis_step, "args": db_config_shared_args + ["all_data_df"]},
+            {"name": "block_aggregation", "func": run_block_aggregation_step, "args": db_config_shared_args,
+             "depends_on": ["chunk_evolution_analysis", "detailed_cycle_metrics"]}, 
+            {"name": "rank_trend_analysis", "func": run_rank_trend_analysis_step, "args": db_config_shared_args + ["all_data_df"],
+             "depends_on": ["chunk_evolution_analysis", "block_aggregation"]},
         ]
         
         pipeline_to_run_actual: List[Dict[str, Any]] = []
@@ -177,14 +194,20 @@ def main(cmd_args: argparse.Namespace):
         elif pipeline_to_run_actual:
             with DatabaseManager(db_path=config_obj.DB_PATH) as db_m:
                 logger.info(f"Executando pipeline com etapas: {[s['name'] for s in pipeline_to_run_actual]}")
-                orchestrator = Orchestrator(pipeline=pipeline_to_run_actual, db_manager=db_m)
+                max_workers = cmd_args.workers if cmd_args.workers is not None else config_obj.PIPELINE_MAX_WORKERS
+                step_cache = None
+                if config_obj.PIPELINE_STEP_CACHE_ENABLED and not cmd_args.no_step_cache:
+                    # Com --force-reload tudo é recalculado, mas o cache é regravado.
+                    step_cache = StepResultCache(config_obj.PIPELINE_STEP_CACHE_DIR, reuse=not cmd_args.force_reload)
+                orchestrator = Orchestrator(pipeline=pipeline_to_run_actual, db_manager=db_m, max_workers=max_workers, step_cache=step_cache)
 
                 orchestrator.set_shared_context('all_data_df', all_data_df)
                 orchestrator.set_shared_context('config', config_obj)
                 orchestrator.set_shared_context('shared_context', orchestrator.shared_context) 
 
                 logger.info("Verificando e criando estrutura do banco de dados...")
-                db_m._create_all_tables() 
+                apply_schema(db_m, config_obj)
+                sync_draws_tables(db_m, all_data_df, config_obj, force_full_rewrite=cmd_args.force_reload)
 
                 logger.info(f"Iniciando o Orchestrator. Contexto inicial: {list(orchestrator.shared_context.keys())}")
                 orchestrator.run()
@@ -201,7 +224,10 @@ def main(cmd_args: argparse.Namespace):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Aplicativo de Análise da Lotofácil.")
     parser.add_argument("--force-reload", action="store_true", help="Força o recarregamento dos dados do arquivo CSV bruto.")
+    parser.add_argument("--incremental-ingest", action="store_true", help="Lê do arquivo bruto apenas os concursos posteriores ao último já armazenado e os acrescenta aos dados limpos.")
     parser.add_argument("--run-steps", nargs='*', help="Execute etapas específicas (ou 'all_analysis'). Ex: --run-steps frequency_analysis delay_analysis")
+    parser.add_argument("--workers", type=int, default=None, help="Número de processos para executar etapas independentes em paralelo (padrão: PIPELINE_MAX_WORKERS; 1 = sequencial).")
+    parser.add_argument("--no-step-cache", action="store_true", help="Desativa o cache de resultados das etapas (todas são executadas e nada é gravado no cache).")
     parser.add_argument("--run-strategy-flow", action="store_true", help="Executa o fluxo de agregação e teste de estratégias.")
     
     parsed_args = parser.parse_args()
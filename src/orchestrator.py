@@ -1,21 +1,71 @@
 # src/orchestrator.py
 import logging
-from typing import List, Dict, Callable, Any, Optional
+import pickle
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Callable, Any, Optional, Set, Tuple
 import time
 import pandas as pd # Adicionado para type check em resultado
 
+from src.step_cache import StepResultCache, CONTEXT_KEYS_NOT_HASHED, hash_config, hash_draws, hash_value, output_table_states
+
 # DatabaseManager não precisa ser importado aqui se a instância é injetada
 # from src.database_manager import DatabaseManager 
 
 logger = logging.getLogger(__name__)
 
+# Chaves do contexto que não atravessam processos (recriadas no worker).
+_PROCESS_LOCAL_CONTEXT_KEYS = ("db_manager", "shared_context")
+# Espera por locks do SQLite nos workers (várias etapas podem gravar ao mesmo tempo).
+WORKER_DB_BUSY_TIMEOUT_MS = 120000
+
+
+def _run_step_in_worker(
+    step_func: Callable,
+    step_kwargs: Dict[str, Any],
+    db_path: str,
+    context_snapshot: Dict[str, Any]
+) -> Tuple[Any, Dict[str, Any], List[str]]:
+    """
+    Executa uma etapa em um processo do pool. O worker abre sua própria conexão
+    com o banco e usa uma cópia do contexto compartilhado; retorna o resultado da
+    etapa, as chaves do contexto que ela criou ou alterou e as tabelas que gravou.
+    """
+    from src.database_manager import DatabaseManager
+
+    local_context = dict(context_snapshot)
+    original_ids = {key: id(value) for key, value in local_context.items()}
+    with DatabaseManager(db_path=db_path) as worker_db:
+        worker_db.conn.execute(f"PRAGMA busy_timeout = {WORKER_DB_BUSY_TIMEOUT_MS};")
+        local_context["db_manager"] = worker_db
+        local_context["shared_context"] = local_context
+        kwargs = dict(step_kwargs)
+        for key in _PROCESS_LOCAL_CONTEXT_KEYS:
+            if key in kwargs:
+                kwargs[key] = local_context[key]
+        result = step_func(**kwargs)
+        written_tables = list(worker_db.write_log)
+
+    context_updates = {
+        key: value for key, value in local_context.items()
+        if key not in _PROCESS_LOCAL_CONTEXT_KEYS and original_ids.get(key) != id(value)
+    }
+    return result, context_updates, written_tables
+
+
 class Orchestrator:
-    def __init__(self, pipeline: List[Dict[str, Any]], db_manager: Any): # db_manager pode ser Any ou DatabaseManager
+    def __init__(self, pipeline: List[Dict[str, Any]], db_manager: Any, max_workers: int = 1,
+                 step_cache: Optional[StepResultCache] = None): # db_manager pode ser Any ou DatabaseManager
         self.pipeline = pipeline
+        self._completed_steps: Set[int] = set()
+        self.step_cache = step_cache
+        self._step_fingerprints: List[Optional[str]] = [None] * len(pipeline)
+        self._dependencies: Optional[List[Set[int]]] = None
         # Contexto compartilhado inicializado com dependências essenciais
         self.shared_context: Dict[str, Any] = {"db_manager": db_manager}
         # O config_obj e all_data_df serão adicionados via set_shared_context pelo main.py
-        logger.info(f"Orchestrator inicializado com {len(pipeline)} etapas no pipeline.")
+        self.max_workers = max(1, int(max_workers or 1))
+        logger.info(f"Orchestrator inicializado com {len(pipeline)} etapas no pipeline (workers: {self.max_workers}).")
 
     def set_shared_context(self, key: str, value: Any):
         """Adiciona ou atualiza um item no contexto compartilhado."""
@@ -56,6 +106,23 @@ class Orchestrator:
             
         return prepared_args
 
+    def _handle_step_result(self, step_config: Dict[str, Any], result: Any) -> bool:
+        """Publica o resultado no contexto (output_key) e interpreta o sucesso da etapa."""
+        step_name = step_config.get("name", "Etapa Desconhecida")
+        output_key = step_config.get("output_key")
+        if output_key:
+            self.set_shared_context(output_key, result) # set_shared_context já lida com logging
+        
+        if isinstance(result, bool):
+            if not result:
+                 logger.warning(f"Etapa '{step_name}' concluída, mas retornou False (indicando falha ou condição não atendida).")
+            else:
+                logger.info(f"Etapa '{step_name}' concluída com sucesso (retornou True).")
+            return result
+        # Se não retorna bool, assume sucesso se não houver exceção
+        logger.info(f"Etapa '{step_name}' concluída (sem retorno booleano explícito, sucesso assumido).")
+        return True
+
     def run_step(self, step_config: Dict[str, Any]) -> bool:
         """Executa uma única etapa do pipeline."""
         step_name = step_config.get("name", "Etapa Desconhecida")
@@ -75,20 +142,7 @@ class Orchestrator:
             logger.debug(f"Argumentos preparados para '{step_name}': {list(step_kwargs.keys())}")
             
             result = step_func(**step_kwargs) # Desempacota os argumentos
-            
-            output_key = step_config.get("output_key")
-            if output_key:
-                self.set_shared_context(output_key, result) # set_shared_context já lida com logging
-            
-            if isinstance(result, bool):
-                step_succeeded = result
-                if not result:
-                     logger.warning(f"Etapa '{step_name}' concluída, mas retornou False (indicando falha ou condição não atendida).")
-                else:
-                    logger.info(f"Etapa '{step_name}' concluída com sucesso (retornou True).")
-            else: # Se não retorna bool, assume sucesso se não houver exceção
-                step_succeeded = True
-                logger.info(f"Etapa '{step_name}' concluída (sem retorno booleano explícito, sucesso assumido).")
+            step_succeeded = self._handle_step_result(step_config, result)
 
         except KeyError as e: # Erro já logado em _prepare_step_arguments
             logger.error(f"Falha ao executar '{step_name}': Argumento essencial não encontrado no contexto ({e}). Etapa pulada.")
@@ -101,8 +155,138 @@ class Orchestrator:
             logger.info(f"--- Etapa '{step_name}' finalizada. Duração: {end_time - start_time:.2f} segundos. Sucesso: {step_succeeded} ---")
         return step_succeeded
 
+    def _changed_context_keys(self, original_ids: Dict[str, int]) -> Dict[str, Any]:
+        """Chaves do contexto criadas ou substituídas desde o snapshot de ids."""
+        return {
+            key: value for key, value in self.shared_context.items()
+            if key not in _PROCESS_LOCAL_CONTEXT_KEYS and original_ids.get(key) != id(value)
+        }
+
+    def _run_step_tracked(self, step_idx: int) -> bool:
+        """Executa a etapa no processo principal e guarda no cache as saídas que ela publicou."""
+        original_ids = {key: id(value) for key, value in self.shared_context.items()}
+        write_log = getattr(self.shared_context.get("db_manager"), "write_log", [])
+        log_start = len(write_log)
+        success = self.run_step(self.pipeline[step_idx])
+        if success:
+            self._store_step_in_cache(step_idx, self._changed_context_keys(original_ids), write_log[log_start:])
+        return success
+
+    def compute_step_fingerprints(self) -> List[Optional[str]]:
+        """
+        Impressão digital de cada etapa: função, kwargs explícitos, Config, sorteios de
+        entrada, hash dos valores de contexto que ela recebe e impressões das etapas de que depende
+        (args produzidos por etapas anteriores entram só pela impressão da produtora).
+        None = etapa não cacheável nesta execução.
+        """
+        fingerprints: List[Optional[str]] = [None] * len(self.pipeline)
+        if self.step_cache is None:
+            return fingerprints
+        db_token = self.step_cache.database_token(self.shared_context.get("db_manager"))
+        if db_token is None:
+            logger.warning("Cache de etapas desativado nesta execução: banco sem marcador de cache.")
+            return fingerprints
+
+        config = self.shared_context.get("config")
+        config_hash = hash_config(config)
+        # Toda etapa deriva dos sorteios (via argumento ou tabelas do banco): o hash deles entra sempre.
+        draws_hash = hash_draws(self.shared_context.get("all_data_df"), config)
+        value_hashes: Dict[str, str] = {"all_data_df": draws_hash}
+        produced_keys: Set[str] = set()
+        dependencies = self._dependency_graph()
+
+        for idx, step_config in enumerate(self.pipeline):
+            step_func = step_config.get("func")
+            available_keys = set(produced_keys)
+            if step_config.get("output_key"):
+                produced_keys.add(step_config["output_key"])
+            if not callable(step_func) or any(fingerprints[dep] is None for dep in dependencies[idx]):
+                continue
+            arg_hashes: Dict[str, str] = {}
+            cacheable = True
+            for arg_key in step_config.get("args", []):
+                if arg_key in CONTEXT_KEYS_NOT_HASHED or arg_key in available_keys:
+                    arg_hashes[arg_key] = arg_key
+                elif arg_key in self.shared_context:
+                    if arg_key not in value_hashes:
+                        value = self.shared_context[arg_key]
+                        value_hashes[arg_key] = hash_value(value)
+                    arg_hashes[arg_key] = value_hashes[arg_key]
+                else:
+                    cacheable = False # run_step registrará o argumento ausente
+            if not cacheable:
+                continue
+            fingerprints[idx] = self.step_cache.fingerprint(
+                step_func, arg_hashes, step_config.get("kwargs", {}), config_hash, draws_hash,
+                [fingerprints[dep] for dep in dependencies[idx]], db_token
+            )
+        return fingerprints
+
+    def _restore_step_from_cache(self, step_idx: int) -> bool:
+        """Se a etapa está em cache com a mesma impressão, republica suas saídas e retorna True."""
+        fingerprint = self._step_fingerprints[step_idx]
+        if self.step_cache is None or fingerprint is None:
+            return False
+        step_name = self.pipeline[step_idx].get("name", f"Etapa Anônima {step_idx + 1}")
+        context_outputs = self.step_cache.lookup(step_name, fingerprint, self.shared_context.get("db_manager"))
+        if context_outputs is None:
+            return False
+        for key, value in context_outputs.items():
+            self.set_shared_context(key, value)
+        logger.info(f"Etapa '{step_name}' sem alterações desde a última execução (cache {fingerprint[:12]}). Saídas restauradas: {sorted(context_outputs)}")
+        return True
+
+    def _store_step_in_cache(self, step_idx: int, context_outputs: Dict[str, Any], written_tables: List[str]) -> None:
+        fingerprint = self._step_fingerprints[step_idx]
+        if self.step_cache is None or fingerprint is None:
+            return
+        step_name = self.pipeline[step_idx].get("name", f"Etapa Anônima {step_idx + 1}")
+        try:
+            output_tables = output_table_states(self.shared_context.get("db_manager"), written_tables)
+            self.step_cache.store(step_name, fingerprint, context_outputs, output_tables)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Falha ao gravar cache da etapa '{step_name}': {e}")
+
+    def build_dependency_graph(self) -> List[Set[int]]:
+        """
+        Dependências de cada etapa (por posição no pipeline). Uma etapa depende da
+        etapa anterior mais recente que produz (output_key) cada um de seus 'args' e
+        das etapas anteriores listadas em 'depends_on' (dependências via banco/contexto).
+        Uma etapa de 'depends_on' posicionada depois da dependente é erro de ordem
+        (ValueError); uma que não está no pipeline (ex.: seleção parcial de etapas)
+        gera aviso.
+        """
+        dependencies: List[Set[int]] = []
+        latest_producer: Dict[str, int] = {}
+        position_by_name: Dict[str, int] = {}
+        all_step_names = {step_config.get("name", f"Etapa Anônima {idx + 1}") for idx, step_config in enumerate(self.pipeline)}
+        for idx, step_config in enumerate(self.pipeline):
+            step_name = step_config.get("name", f"Etapa Anônima {idx + 1}")
+            deps: Set[int] = set()
+            for arg_key in step_config.get("args", []):
+                if arg_key in latest_producer:
+                    deps.add(latest_producer[arg_key])
+            for dep_name in step_config.get("depends_on", []):
+                if dep_name in position_by_name:
+                    deps.add(position_by_name[dep_name])
+                elif dep_name in all_step_names:
+                    raise ValueError(f"Etapa '{step_name}' depende de '{dep_name}', que está depois dela no pipeline.")
+                else:
+                    logger.warning(f"Etapa '{step_name}': dependência '{dep_name}' não está neste pipeline. Ignorada.")
+            dependencies.append(deps)
+            output_key = step_config.get("output_key")
+            if output_key:
+                latest_producer[output_key] = idx
+            position_by_name[step_name] = idx
+        return dependencies
+
+    def _dependency_graph(self) -> List[Set[int]]:
+        if self._dependencies is None:
+            self._dependencies = self.build_dependency_graph()
+        return self._dependencies
+
     def run(self) -> None:
-        """Executa todas as etapas definidas no pipeline."""
+        """Executa todas as etapas definidas no pipeline (em paralelo se max_workers > 1)."""
         logger.info(f"Iniciando execução do pipeline com {len(self.pipeline)} etapas.")
         total_start_time = time.time()
 
@@ -110,12 +294,33 @@ class Orchestrator:
             logger.warning("Pipeline está vazio. Nenhuma etapa para executar.")
             return
 
+        self._dependency_graph() # valida 'depends_on' antes de executar qualquer etapa
+        self._step_fingerprints = self.compute_step_fingerprints()
+        db_path = getattr(self.shared_context.get("db_manager"), "db_path", None)
+        if self.max_workers > 1 and len(self.pipeline) > 1 and db_path and db_path != ":memory:":
+            try:
+                self._run_parallel(db_path)
+            except (OSError, NotImplementedError, ImportError) as e:
+                logger.warning(f"Execução paralela indisponível ({e}). Executando etapas restantes sequencialmente.")
+                self._run_sequential(skip=self._completed_steps)
+        else:
+            self._run_sequential()
+
+        total_end_time = time.time()
+        logger.info(f"Execução completa do pipeline finalizada. Duração total: {total_end_time - total_start_time:.2f} segundos.")
+
+    def _run_sequential(self, skip: Optional[Set[int]] = None) -> None:
         for i, step_config in enumerate(self.pipeline):
+            if skip and i in skip:
+                continue
             step_number = i + 1
             step_name = step_config.get("name", f"Etapa Anônima {step_number}")
             logger.info(f"Processando Etapa {step_number}/{len(self.pipeline)}: {step_name}")
-            
-            success = self.run_step(step_config)
+            if self._restore_step_from_cache(i):
+                logger.info("-" * 50)
+                continue
+
+            success = self._run_step_tracked(i)
             
             # Opção: parar o pipeline se uma etapa crítica falhar
             # if not success and step_config.get('critical', False): # Adicionar 'critical': True na config da etapa
@@ -124,5 +329,95 @@ class Orchestrator:
             
             logger.info("-" * 50) 
 
-        total_end_time = time.time()
-        logger.info(f"Execução completa do pipeline finalizada. Duração total: {total_end_time - total_start_time:.2f} segundos.")
\ No newline at end of file
+    def _context_snapshot_for_worker(self) -> Dict[str, Any]:
+        """Cópia serializável do contexto compartilhado (sem as chaves locais ao processo)."""
+        snapshot: Dict[str, Any] = {}
+        for key, value in self.shared_context.items():
+            if key in _PROCESS_LOCAL_CONTEXT_KEYS:
+                continue
+            try:
+                pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                logger.debug(f"Chave de contexto '{key}' não serializável; não será enviada aos workers.")
+                continue
+            snapshot[key] = value
+        return snapshot
+
+    def _prepare_worker_payload(self, step_config: Dict[str, Any]) -> Optional[Tuple[Callable, Dict[str, Any]]]:
+        """Argumentos da etapa para execução em worker, ou None se ela deve rodar no processo principal."""
+        step_name = step_config.get("name", "Desconhecida")
+        if step_config.get("parallel", True) is False:
+            return None
+        try:
+            step_kwargs = self._prepare_step_arguments(step_config)
+        except KeyError:
+            return None # run_step registra o erro ao executar no processo principal
+        worker_kwargs = {k: v for k, v in step_kwargs.items() if k not in _PROCESS_LOCAL_CONTEXT_KEYS}
+        try:
+            pickle.dumps((step_config.get("func"), worker_kwargs), protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.info(f"Etapa '{step_name}' não serializável para worker ({e}). Executando no processo principal.")
+            return None
+        for key in _PROCESS_LOCAL_CONTEXT_KEYS:
+            if key in step_kwargs:
+                worker_kwargs[key] = None # Substituído dentro do worker
+        return step_config["func"], worker_kwargs
+
+    def _run_parallel(self, db_path: str) -> None:
+        """
+        Agenda as etapas pelo grafo de dependências: cada etapa é enviada ao pool de
+        processos assim que todas as suas dependências terminam.
+        """
+        dependencies = self._dependency_graph()
+        pending: List[int] = list(range(len(self.pipeline)))
+        self._completed_steps: Set[int] = set()
+        running: Dict[Any, Tuple[int, float]] = {}
+        logger.info(f"Execução paralela do pipeline com até {self.max_workers} workers.")
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                ready = [i for i in pending if dependencies[i] <= self._completed_steps]
+                for i in ready:
+                    if len(running) >= self.max_workers:
+                        break
+                    step_config = self.pipeline[i]
+                    step_name = step_config.get("name", f"Etapa Anônima {i + 1}")
+                    pending.remove(i)
+                    if self._restore_step_from_cache(i):
+                        self._completed_steps.add(i)
+                        continue
+                    payload = self._prepare_worker_payload(step_config)
+                    if payload is None:
+                        logger.info(f"Processando Etapa {i + 1}/{len(self.pipeline)}: {step_name} (processo principal)")
+                        self._run_step_tracked(i)
+                        self._completed_steps.add(i)
+                        continue
+                    step_func, worker_kwargs = payload
+                    logger.info(f"--- Iniciando etapa: {step_name} (worker) ---")
+                    future = pool.submit(_run_step_in_worker, step_func, worker_kwargs, db_path, self._context_snapshot_for_worker())
+                    running[future] = (i, time.time())
+
+                if not running:
+                    continue
+
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    i, start_time = running.pop(future)
+                    step_config = self.pipeline[i]
+                    step_name = step_config.get("name", f"Etapa Anônima {i + 1}")
+                    step_succeeded = False
+                    try:
+                        result, context_updates, written_tables = future.result()
+                        for key, value in context_updates.items():
+                            self.set_shared_context(key, value)
+                        step_succeeded = self._handle_step_result(step_config, result)
+                        if step_succeeded:
+                            output_key = step_config.get("output_key")
+                            if output_key:
+                                context_updates = {**context_updates, output_key: result}
+                            self._store_step_in_cache(i, context_updates, written_tables)
+                    except Exception as e:
+                        logger.error(f"Erro inesperado ao executar a etapa '{step_name}' em worker: {e}", exc_info=True)
+                    finally:
+                        logger.info(f"--- Etapa '{step_name}' finalizada. Duração: {time.time() - start_time:.2f} segundos. Sucesso: {step_succeeded} ---")
+                    self._completed_steps.add(i)
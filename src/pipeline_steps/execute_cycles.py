@@ -1,20 +1,47 @@
 # Arquivo: src/pipeline_steps/execute_cycles.py
 import pandas as pd
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 
 # Importa a função de análise e as chaves padronizadas
-from src.analysis.cycle_analysis import identify_and_process_cycles, KEY_CYCLE_DETAILS_DF, KEY_CYCLE_SUMMARY_DF
+from src.analysis.cycle_analysis import (
+    identify_and_process_cycles, KEY_CYCLE_DETAILS_DF, KEY_CYCLE_SUMMARY_DF,
+    KEY_CYCLE_FIRST_UPDATED_NUM, LAST_PROCESSED_CONTEST_COLUMN
+)
 # from src.database_manager import DatabaseManager # Para type hint
 # from src.config import Config # Para type hint
 
 logger = logging.getLogger(__name__)
 
+def _load_resume_state(all_data_df: pd.DataFrame, db_manager: Any, config: Any, step_name: str) -> Tuple[Optional[pd.DataFrame], Optional[int]]:
+    """Tabela de ciclos gravada e último concurso processado, se servirem para retomar sobre 'all_data_df'."""
+    detail_table = config.ANALYSIS_CYCLES_DETAIL_TABLE_NAME
+    summary_table = config.ANALYSIS_CYCLES_SUMMARY_TABLE_NAME
+    if not (db_manager.table_exists(detail_table) and db_manager.table_exists(summary_table)) \
+            or not db_manager.column_exists(summary_table, LAST_PROCESSED_CONTEST_COLUMN):
+        logger.info(f"{step_name}: Tabelas de ciclos ausentes ou sem '{LAST_PROCESSED_CONTEST_COLUMN}'. Recalculando tudo.")
+        return None, None
+    last_df = db_manager.execute_query(f"SELECT MAX({LAST_PROCESSED_CONTEST_COLUMN}) FROM {summary_table}")
+    if last_df is None or last_df.empty or pd.isna(last_df.iloc[0, 0]):
+        logger.info(f"{step_name}: Último concurso processado não registrado. Recalculando tudo.")
+        return None, None
+    last_processed = int(last_df.iloc[0, 0])
+    if last_processed not in set(pd.to_numeric(all_data_df[config.CONTEST_ID_COLUMN_NAME]).astype(int)):
+        logger.warning(f"{step_name}: Concurso {last_processed} salvo não está nos dados atuais. Recalculando tudo.")
+        return None, None
+    previous_detail = db_manager.load_dataframe(detail_table)
+    if previous_detail is None or previous_detail.empty:
+        return None, None
+    logger.info(f"{step_name}: Retomando ciclos a partir do concurso {last_processed}.")
+    return previous_detail, last_processed
+
+
 def run_cycle_identification_step(
     all_data_df: pd.DataFrame,
     db_manager: Any, 
     config: Any, 
     shared_context: Dict[str, Any],
+    force_full_recalculation: bool = False,
     **kwargs
 ) -> Optional[pd.DataFrame]: 
     step_name = "Cycle Identification and Basic Stats"
@@ -22,8 +49,17 @@ def run_cycle_identification_step(
     df_details_to_return: Optional[pd.DataFrame] = None 
 
     try:
-        # Chamada direta à função importada, passando o config_obj
-        cycle_analysis_results = identify_and_process_cycles(all_data_df, config)
+        previous_detail, last_processed = None, None
+        if not force_full_recalculation and all_data_df is not None and not all_data_df.empty:
+            previous_detail, last_processed = _load_resume_state(all_data_df, db_manager, config, step_name)
+        try:
+            cycle_analysis_results = identify_and_process_cycles(all_data_df, config, previous_detail, last_processed)
+        except ValueError as e_resume:
+            if previous_detail is None:
+                raise
+            logger.warning(f"{step_name}: Estado salvo de ciclos inconsistente ({e_resume}). Recalculando tudo.")
+            previous_detail = None
+            cycle_analysis_results = identify_and_process_cycles(all_data_df, config)
 
         if not cycle_analysis_results:
             logger.warning(f"Nenhum resultado de ciclo retornado para {step_name}.")
@@ -36,8 +72,16 @@ def run_cycle_identification_step(
         if df_details is not None and not df_details.empty:
             try:
                 # Usando o nome da tabela do config para salvar os detalhes
-                db_manager.save_dataframe(df_details, config.ANALYSIS_CYCLES_DETAIL_TABLE_NAME, if_exists='replace')
-                logger.info(f"Resultados de detalhes de ciclo salvos na tabela '{config.ANALYSIS_CYCLES_DETAIL_TABLE_NAME}'.")
+                if previous_detail is None:
+                    db_manager.save_dataframe(df_details, config.ANALYSIS_CYCLES_DETAIL_TABLE_NAME, if_exists='replace')
+                    logger.info(f"Resultados de detalhes de ciclo salvos na tabela '{config.ANALYSIS_CYCLES_DETAIL_TABLE_NAME}'.")
+                else:
+                    # Retomada: só o ciclo que estava aberto e os seguintes mudaram (upsert por ciclo_num).
+                    first_updated = cycle_analysis_results.get(KEY_CYCLE_FIRST_UPDATED_NUM, 1)
+                    df_changed = df_details[df_details['ciclo_num'] >= first_updated]
+                    if not df_changed.empty:
+                        db_manager.bulk_write(df_changed, config.ANALYSIS_CYCLES_DETAIL_TABLE_NAME, mode='upsert')
+                    logger.info(f"{len(df_changed)} ciclo(s) gravado(s) na tabela '{config.ANALYSIS_CYCLES_DETAIL_TABLE_NAME}' (a partir do ciclo {first_updated}).")
                 df_details_to_return = df_details 
                 saved_any = True
             except Exception as e_save:
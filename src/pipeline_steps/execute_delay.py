@@ -1,17 +1,12 @@
 # src/pipeline_steps/execute_delay.py
 import pandas as pd
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict
 
 from src.config import Config 
 from src.database_manager import DatabaseManager
 
-from src.analysis.delay_analysis import (
-    get_draw_matrix, 
-    calculate_current_delay, 
-    calculate_max_delay, 
-    calculate_mean_delay
-)
+from src.analysis.delay_analysis import calculate_delay_history
 
 logger = logging.getLogger(__name__)
 
@@ -79,95 +74,21 @@ def run_delay_analysis(
         logger.info(f"{step_name}: Nenhum novo concurso para processar (a partir de {start_processing_from_contest_id} e após {min_hist_contests-1} iniciais).")
         return True
 
-    historical_delays_data: List[pd.DataFrame] = []
-    
     total_points_to_process = len(target_contest_ids_to_calculate)
-    log_interval = max(1, total_points_to_process // 20) if total_points_to_process > 100 else 1
-    
     logger.info(f"{step_name}: Processamento de atrasos para {total_points_to_process} pontos (concursos de corte).")
 
-    for i, current_max_contest_id in enumerate(target_contest_ids_to_calculate):
-        if (i + 1) % log_interval == 0 or i == 0 or i == total_points_to_process - 1 :
-             logger.info(f"{step_name}: Progresso - {i+1}/{total_points_to_process} (concurso de corte: {current_max_contest_id})")
-        
-        # df_upto_contest AINDA é todo o histórico até current_max_contest_id
-        # Isso é necessário para calcular max_delay e avg_delay corretamente da forma atual.
-        df_upto_contest = all_data_df[all_data_df[contest_id_col] <= current_max_contest_id].copy()
-        if df_upto_contest.empty or len(df_upto_contest) < min_hist_contests : 
-            logger.debug(f"Dados insuficientes até concurso {current_max_contest_id} (linhas: {len(df_upto_contest)}).")
-            continue
-
-        try:
-            draw_matrix_upto_contest = get_draw_matrix(df_upto_contest, config)
-            if draw_matrix_upto_contest.empty:
-                logger.warning(f"Matriz de sorteios vazia para concurso {current_max_contest_id}.")
-                # Lógica de default para este ponto de cálculo
-                default_df = pd.DataFrame({
-                    contest_id_col: current_max_contest_id,
-                    dezena_col: config.ALL_NUMBERS,
-                    current_delay_col_name: len(df_upto_contest),
-                    max_delay_col_name: len(df_upto_contest),
-                    avg_delay_col_name: pd.NA
-                })
-                cols_order_def = [contest_id_col, dezena_col, current_delay_col_name, max_delay_col_name, avg_delay_col_name]
-                historical_delays_data.append(default_df[cols_order_def])
-                continue
-
-            last_contest_in_matrix = draw_matrix_upto_contest.index.max()
-            first_contest_in_matrix = draw_matrix_upto_contest.index.min()
-            
-            current_delay_df_raw = calculate_current_delay(draw_matrix_upto_contest, config, last_contest_in_matrix)
-            max_delay_df_raw = calculate_max_delay(draw_matrix_upto_contest, config, first_contest_in_matrix, last_contest_in_matrix)
-            mean_delay_df_raw = calculate_mean_delay(draw_matrix_upto_contest, config)
-            
-            # ... (lógica de merge e formatação como na versão anterior)
-            all_dezenas_df = pd.DataFrame({dezena_col: config.ALL_NUMBERS})
-            all_dezenas_df[dezena_col] = all_dezenas_df[dezena_col].astype(int)
-
-            current_delay_df = all_dezenas_df.copy()
-            if current_delay_df_raw is not None and not current_delay_df_raw.empty:
-                current_delay_df_raw = current_delay_df_raw.rename(columns={'Dezena': dezena_col, 'Atraso Atual': current_delay_col_name}, errors='ignore')
-                if dezena_col in current_delay_df_raw and current_delay_col_name in current_delay_df_raw:
-                    current_delay_df = pd.merge(current_delay_df, current_delay_df_raw[[dezena_col, current_delay_col_name]], on=dezena_col, how='left')
-            current_delay_df[current_delay_col_name] = current_delay_df[current_delay_col_name].fillna(len(draw_matrix_upto_contest)).astype(int)
-
-            max_delay_df = all_dezenas_df.copy()
-            if max_delay_df_raw is not None and not max_delay_df_raw.empty:
-                max_delay_df_raw = max_delay_df_raw.rename(columns={'Dezena': dezena_col, 'Atraso Maximo': max_delay_col_name}, errors='ignore')
-                if dezena_col in max_delay_df_raw and max_delay_col_name in max_delay_df_raw:
-                     max_delay_df = pd.merge(max_delay_df, max_delay_df_raw[[dezena_col, max_delay_col_name]], on=dezena_col, how='left')
-            
-            mean_delay_df = all_dezenas_df.copy()
-            if mean_delay_df_raw is not None and not mean_delay_df_raw.empty:
-                mean_delay_df_raw = mean_delay_df_raw.rename(columns={'Dezena': dezena_col, 'Atraso Medio': avg_delay_col_name}, errors='ignore')
-                if dezena_col in mean_delay_df_raw and avg_delay_col_name in mean_delay_df_raw:
-                    mean_delay_df = pd.merge(mean_delay_df, mean_delay_df_raw[[dezena_col, avg_delay_col_name]], on=dezena_col, how='left')
-            mean_delay_df[avg_delay_col_name] = pd.to_numeric(mean_delay_df[avg_delay_col_name], errors='coerce')
-
-            merged_df = pd.merge(current_delay_df, max_delay_df, on=dezena_col, how='outer')
-            merged_df = pd.merge(merged_df, mean_delay_df, on=dezena_col, how='outer')
-            merged_df[contest_id_col] = current_max_contest_id
-            cols_order = [contest_id_col, dezena_col, current_delay_col_name, max_delay_col_name, avg_delay_col_name]
-            
-            for col_name_check in cols_order:
-                if col_name_check not in merged_df.columns:
-                    default_val = len(draw_matrix_upto_contest) if col_name_check != avg_delay_col_name else pd.NA
-                    merged_df[col_name_check] = default_val
-            merged_df = merged_df[cols_order]
-
-            merged_df[current_delay_col_name] = merged_df[current_delay_col_name].fillna(len(draw_matrix_upto_contest)).astype(int)
-            merged_df[max_delay_col_name] = merged_df[max_delay_col_name].fillna(merged_df[current_delay_col_name]).astype(int)
-            
-            historical_delays_data.append(merged_df)
-        except Exception as e_inner:
-            logger.error(f"Erro ao processar atrasos para concurso {current_max_contest_id}: {e_inner}", exc_info=True)
+    try:
+        # Uma única passada pelos sorteios; o prefixo anterior ao primeiro concurso de corte
+        # é percorrido apenas para carregar o estado (não é emitido).
+        final_df_to_save = calculate_delay_history(all_data_df, config, target_contest_ids_to_calculate)
+    except Exception as e:
+        logger.error(f"Erro ao calcular atrasos históricos na etapa {step_name}: {e}", exc_info=True)
+        return False
 
-    if not historical_delays_data:
+    if final_df_to_save.empty:
         logger.warning(f"{step_name}: Nenhum novo dado de atraso histórico foi gerado para o intervalo solicitado.")
         return True # Não é um erro se não havia nada novo para processar
 
-    final_df_to_save = pd.concat(historical_delays_data, ignore_index=True)
-    
     try:
         if if_exists_mode == 'replace' and db_manager.table_exists(table_name):
              logger.info(f"Modo 'replace': Removendo dados antigos da tabela '{table_name}' antes de salvar.")
@@ -51,6 +51,7 @@ def run_frequent_itemsets_analysis_step(
         max_len = config.FREQUENT_ITEMSETS_MAX_LEN
         drawn_numbers_col = config.DRAWN_NUMBERS_COLUMN_NAME
         frequent_itemsets_table_name = config.FREQUENT_ITEMSETS_TABLE_NAME
+        max_itemsets = getattr(config, 'FREQUENT_ITEMSETS_MAX_COUNT', 0) or None
 
         logger.info(f"Parâmetros da análise: min_support={min_support}, min_len={min_len}, max_len={max_len}")
 
@@ -59,7 +60,8 @@ def run_frequent_itemsets_analysis_step(
             min_support=min_support,
             min_len=min_len,
             max_len=max_len,
-            drawn_numbers_col=drawn_numbers_col
+            drawn_numbers_col=drawn_numbers_col,
+            max_itemsets=max_itemsets
         )
 
         if not isinstance(df_for_db, pd.DataFrame):
@@ -7,7 +7,7 @@ from src.config import Config
 from src.database_manager import DatabaseManager
 
 from src.analysis.recurrence_analysis import analyze_recurrence
-from src.analysis.delay_analysis import get_draw_matrix 
+from src.analysis.draw_matrix import get_draw_matrix_provider
 
 logger = logging.getLogger(__name__)
 
@@ -84,6 +84,8 @@ def run_recurrence_analysis_step(
     log_interval = max(1, total_points_to_process // 20) if total_points_to_process > 100 else 1
     logger.info(f"{step_name}: Processamento de recorrência (após {min_hist_contests-1} concursos iniciais ou a partir de {start_processing_from_contest_id}) para {total_points_to_process} pontos.")
 
+    full_draw_matrix = get_draw_matrix_provider(all_data_df, config)
+
     processed_points_count = 0
     for i, current_max_contest_id in enumerate(target_contest_ids_to_calculate):
         if (i + 1) % log_interval == 0 or i == 0 or i == total_points_to_process - 1:
@@ -97,7 +99,7 @@ def run_recurrence_analysis_step(
             continue
 
         try:
-            draw_matrix = get_draw_matrix(df_upto_contest, config)
+            draw_matrix = full_draw_matrix.slice(end_contest=current_max_contest_id).to_dataframe(index_name=contest_id_col)
             if draw_matrix.empty:
                 logger.warning(f"Matriz de sorteios vazia para concurso {current_max_contest_id}.")
                 continue # Ou adicione um registro default como em execute_delay
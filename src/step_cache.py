@@ -0,0 +1,344 @@
+# src/step_cache.py
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+import sys
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Cache de resultados das etapas do pipeline, endereçado por conteúdo: cada etapa
+# recebe uma impressão digital (função + argumentos + Config + dados de entrada +
+# impressões das etapas de que depende). Se a impressão bate com o manifest, a etapa
+# é pulada e suas saídas do contexto compartilhado são recarregadas do disco, desde que
+# as tabelas que ela gravou continuem no banco como ela as deixou (nº de linhas e
+# versão registrada pelo bulk_write).
+CACHE_FORMAT_VERSION = 2
+CACHE_MANIFEST_FILE_NAME = 'manifest.json'
+# Tabela com um token aleatório por banco: se o banco for apagado/recriado, o token
+# muda e todas as entradas do cache (que dependem das tabelas gravadas) são ignoradas.
+CACHE_MARKER_TABLE = 'pipeline_step_cache_marker'
+# Atributos da Config que só afetam a execução (não os resultados).
+NON_RESULT_CONFIG_ATTRS = frozenset({'LOG_LEVEL', 'LOG_FILE', 'LOG_DIR', 'PIPELINE_MAX_WORKERS',
+                                     'PIPELINE_STEP_CACHE_ENABLED', 'PIPELINE_STEP_CACHE_DIR',
+                                     'PARAMETER_SEARCH_MAX_WORKERS', 'PARAMETER_SEARCH_CHECKPOINT_DIR',
+                                     'DB_BULK_SYNCHRONOUS', 'DB_BULK_CACHE_SIZE_KB', 'DB_BULK_TEMP_STORE'})
+# Chaves do contexto cujo valor não entra no hash (a Config entra via hash_config).
+CONTEXT_KEYS_NOT_HASHED = frozenset({'db_manager', 'shared_context', 'config'})
+
+
+def _update_with_value(hasher: Any, value: Any) -> None:
+    """Alimenta o hash com uma representação estável do valor."""
+    if isinstance(value, pd.DataFrame):
+        hasher.update(b'df')
+        hasher.update(repr(list(value.columns)).encode('utf-8'))
+        try:
+            hasher.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        except TypeError: # Colunas com listas (ex.: drawn_numbers) não são hasheáveis
+            hasher.update(pd.util.hash_pandas_object(value.astype(str), index=True).to_numpy().tobytes())
+    elif isinstance(value, pd.Series):
+        _update_with_value(hasher, value.to_frame())
+    elif isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        hasher.update(f"nd{array.dtype}{array.shape}".encode('utf-8'))
+        hasher.update(array.tobytes())
+    elif isinstance(value, (str, int, float, bool, type(None))):
+        hasher.update(repr(value).encode('utf-8'))
+    elif isinstance(value, dict):
+        hasher.update(b'{')
+        for key in sorted(value, key=repr):
+            _update_with_value(hasher, key)
+            _update_with_value(hasher, value[key])
+        hasher.update(b'}')
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = sorted(value, key=repr) if isinstance(value, (set, frozenset)) else value
+        hasher.update(b'[')
+        for item in items:
+            _update_with_value(hasher, item)
+        hasher.update(b']')
+    else:
+        try:
+            hasher.update(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            hasher.update(repr(value).encode('utf-8'))
+
+
+def hash_value(value: Any) -> str:
+    hasher = hashlib.sha256()
+    _update_with_value(hasher, value)
+    return hasher.hexdigest()
+
+
+def hash_draws(all_data_df: Optional[pd.DataFrame], config: Any) -> str:
+    """Hash dos sorteios de entrada (concursos x dezenas), independente da ordem das linhas."""
+    from src.analysis.draw_matrix import get_draw_matrix_provider
+
+    if all_data_df is None or all_data_df.empty:
+        return hash_value(None)
+    matrix = get_draw_matrix_provider(all_data_df, config)
+    if matrix.empty: # Sem colunas de dezenas reconhecíveis: usa o DataFrame inteiro
+        return hash_value(all_data_df)
+    hasher = hashlib.sha256()
+    _update_with_value(hasher, matrix.contest_ids.astype(np.int64))
+    _update_with_value(hasher, matrix.bitmasks)
+    _update_with_value(hasher, matrix.numbers)
+    return hasher.hexdigest()
+
+
+def hash_config(config: Any) -> str:
+    """Hash dos valores simples da Config (constantes em maiúsculas) que afetam os resultados."""
+    values: Dict[str, Any] = {}
+    for attr_name in dir(config):
+        if not attr_name.isupper() or attr_name in NON_RESULT_CONFIG_ATTRS:
+            continue
+        value = getattr(config, attr_name, None)
+        if callable(value):
+            continue
+        values[attr_name] = value
+    return hash_value(values)
+
+
+def _project_module_name(value: Any, project_packages: Iterable[str]) -> Optional[str]:
+    """Nome do módulo do projeto de onde vem o valor (módulo, função, classe...) ou None."""
+    module_name = value.__name__ if inspect.ismodule(value) else getattr(value, '__module__', None)
+    if not isinstance(module_name, str):
+        return None
+    if any(module_name == package or module_name.startswith(f"{package}.") for package in project_packages):
+        return module_name
+    return None
+
+
+def _project_source_files(func: Callable) -> List[str]:
+    """
+    Arquivos-fonte do projeto alcançados pela etapa: o módulo da função e, recursivamente,
+    todos os módulos 'src.*' (ou do pacote da própria função) referenciados nos globais
+    de cada módulo alcançado, inclusive os importados apenas indiretamente (ex.: o engine
+    usado pelo módulo de análise que a etapa chama).
+    """
+    func_module = getattr(func, '__module__', None)
+    project_packages = {'src'}
+    if isinstance(func_module, str):
+        project_packages.add(func_module.split('.')[0])
+
+    pending = [func_module] if func_module else []
+    pending.extend(filter(None, (_project_module_name(value, project_packages)
+                                 for value in getattr(func, '__globals__', {}).values())))
+    visited = set()
+    files = set()
+    while pending:
+        module_name = pending.pop()
+        if module_name in visited:
+            continue
+        visited.add(module_name)
+        module = sys.modules.get(module_name)
+        if module is None:
+            continue
+        source_file = getattr(module, '__file__', None)
+        if source_file and source_file.endswith('.py'):
+            files.add(source_file)
+        is_package = hasattr(module, '__path__')
+        for value in list(vars(module).values()):
+            referenced = _project_module_name(value, project_packages)
+            if referenced is None or referenced in visited:
+                continue
+            # Submódulos viram atributos do pacote quando importados em qualquer lugar;
+            # seguir esses atributos tornaria o conjunto dependente da ordem de importação.
+            if is_package and inspect.ismodule(value) and referenced.startswith(f"{module_name}."):
+                continue
+            pending.append(referenced)
+    return sorted(files)
+
+
+def function_identity(func: Callable) -> str:
+    """Identificação da função da etapa: nome qualificado e hash do código-fonte envolvido."""
+    name = f"{getattr(func, '__module__', '?')}.{getattr(func, '__qualname__', repr(func))}"
+    hasher = hashlib.sha256()
+    try:
+        hasher.update(inspect.getsource(func).encode('utf-8'))
+    except (OSError, TypeError):
+        code = getattr(func, '__code__', None)
+        if code is not None:
+            hasher.update(code.co_code)
+    for source_file in _project_source_files(func):
+        try:
+            hasher.update(Path(source_file).read_bytes())
+        except OSError:
+            hasher.update(source_file.encode('utf-8'))
+    return f"{name}:{hasher.hexdigest()}"
+
+
+def output_table_states(db_manager: Any, table_names: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Estado atual de cada tabela de saída: nº de linhas e token de versão do bulk_write
+    (None se a tabela não existe). Barato: não relê o conteúdo das tabelas.
+    """
+    names = sorted(set(table_names))
+    states: Dict[str, Optional[Dict[str, Any]]] = {}
+    if not names:
+        return states
+    versions = db_manager.get_table_versions(names) if hasattr(db_manager, 'get_table_versions') else {}
+    for name in names:
+        if not db_manager.table_exists(name):
+            states[name] = None
+            continue
+        row = db_manager.conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()
+        states[name] = {'rows': int(row[0]), 'version': versions.get(name)}
+    return states
+
+
+class StepResultCache:
+    """
+    Manifest (JSON) com a impressão digital da última execução bem-sucedida de cada
+    etapa e um pickle com as saídas que a etapa publicou no contexto compartilhado.
+    """
+
+    def __init__(self, cache_dir: str, reuse: bool = True):
+        self.cache_dir = Path(cache_dir)
+        self.reuse = reuse # False: recalcula tudo, mas continua gravando o cache
+        self._manifest: Optional[Dict[str, Any]] = None
+        self._db_token: Optional[str] = None
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.cache_dir / CACHE_MANIFEST_FILE_NAME
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        if self._manifest is None:
+            manifest: Dict[str, Any] = {}
+            if self.manifest_path.exists():
+                try:
+                    manifest = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Manifest do cache de etapas ilegível ({e}). Ignorando cache existente.")
+                    manifest = {}
+            if manifest.get('format_version') != CACHE_FORMAT_VERSION:
+                manifest = {'format_version': CACHE_FORMAT_VERSION, 'steps': {}}
+            self._manifest = manifest
+        return self._manifest
+
+    def _write_manifest(self) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_dir / f".{CACHE_MANIFEST_FILE_NAME}.tmp"
+        tmp_path.write_text(json.dumps(self._load_manifest(), indent=2), encoding='utf-8')
+        os.replace(tmp_path, self.manifest_path)
+
+    def database_token(self, db_manager: Any) -> Optional[str]:
+        """Token do banco em uso (criado na primeira chamada). None se indisponível."""
+        if self._db_token is not None:
+            return self._db_token
+        conn = getattr(db_manager, 'conn', None)
+        if conn is None:
+            return None
+        try:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {CACHE_MARKER_TABLE} (token TEXT NOT NULL)")
+            row = conn.execute(f"SELECT token FROM {CACHE_MARKER_TABLE} LIMIT 1").fetchone()
+            if row is None:
+                token = uuid.uuid4().hex
+                conn.execute(f"INSERT INTO {CACHE_MARKER_TABLE} (token) VALUES (?)", (token,))
+                conn.commit()
+            else:
+                token = row[0]
+        except Exception as e:
+            logger.warning(f"Não foi possível ler/criar o marcador do cache no banco: {e}")
+            return None
+        self._db_token = token
+        return token
+
+    def fingerprint(
+        self,
+        step_func: Callable,
+        arg_hashes: Dict[str, str],
+        explicit_kwargs: Dict[str, Any],
+        config_hash: str,
+        draws_hash: str,
+        dependency_fingerprints: Iterable[str],
+        db_token: Optional[str]
+    ) -> str:
+        hasher = hashlib.sha256()
+        _update_with_value(hasher, CACHE_FORMAT_VERSION)
+        _update_with_value(hasher, function_identity(step_func))
+        _update_with_value(hasher, arg_hashes)
+        _update_with_value(hasher, explicit_kwargs)
+        _update_with_value(hasher, config_hash)
+        _update_with_value(hasher, draws_hash)
+        _update_with_value(hasher, sorted(dependency_fingerprints))
+        _update_with_value(hasher, db_token)
+        return hasher.hexdigest()
+
+    def lookup(self, step_name: str, fingerprint: str, db_manager: Any = None) -> Optional[Dict[str, Any]]:
+        """
+        Retorna as saídas do contexto da etapa se ela está em cache com essa impressão e
+        as tabelas que ela gravou (conferidas em db_manager) não mudaram desde então.
+        """
+        if not self.reuse:
+            return None
+        entry = self._load_manifest()['steps'].get(step_name)
+        if not entry or entry.get('fingerprint') != fingerprint:
+            return None
+        recorded_tables = entry.get('output_tables', {})
+        if recorded_tables:
+            if db_manager is None:
+                return None
+            try:
+                current_tables = output_table_states(db_manager, recorded_tables)
+            except Exception as e:
+                logger.warning(f"Não foi possível conferir as tabelas da etapa '{step_name}' ({e}). Etapa será reexecutada.")
+                return None
+            changed = sorted(name for name, state in recorded_tables.items() if current_tables.get(name) != state)
+            if changed:
+                logger.info(f"Tabelas da etapa '{step_name}' alteradas ou ausentes desde o cache: {changed}. Etapa será reexecutada.")
+                return None
+        outputs_path = self.cache_dir / entry.get('outputs_file', '')
+        try:
+            with open(outputs_path, 'rb') as fh:
+                payload = pickle.load(fh)
+        except Exception as e:
+            logger.warning(f"Saídas em cache da etapa '{step_name}' ilegíveis ({e}). Etapa será reexecutada.")
+            return None
+        return payload.get('context_outputs', {})
+
+    def store(self, step_name: str, fingerprint: str, context_outputs: Dict[str, Any],
+              output_tables: Optional[Dict[str, Optional[Dict[str, Any]]]] = None) -> bool:
+        """
+        Grava as saídas da etapa e atualiza o manifest com o estado das tabelas que ela
+        gravou (output_table_states). Retorna False se as saídas não forem serializáveis.
+        """
+        try:
+            data = pickle.dumps({'context_outputs': context_outputs}, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.info(f"Saídas da etapa '{step_name}' não serializáveis ({e}). Etapa não será mantida em cache.")
+            return False
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        manifest = self._load_manifest()
+        previous = manifest['steps'].get(step_name, {}).get('outputs_file')
+        outputs_file = f"{step_name}_{fingerprint[:16]}.pkl"
+        tmp_path = self.cache_dir / f".{outputs_file}.tmp"
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, self.cache_dir / outputs_file)
+        manifest['steps'][step_name] = {
+            'fingerprint': fingerprint,
+            'outputs_file': outputs_file,
+            'context_keys': sorted(context_outputs),
+            'output_tables': output_tables or {},
+        }
+        self._write_manifest()
+        if previous and previous != outputs_file:
+            try:
+                (self.cache_dir / previous).unlink()
+            except OSError:
+                pass
+        return True
+
+    def invalidate(self, step_name: str) -> None:
+        manifest = self._load_manifest()
+        if manifest['steps'].pop(step_name, None) is not None:
+            self._write_manifest()
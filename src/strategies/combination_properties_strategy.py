@@ -2,7 +2,6 @@
 from typing import List, Optional, Dict, Any, Tuple
 import pandas as pd
 from sklearn.preprocessing import MinMaxScaler
-from itertools import combinations
 import math # Para math.comb
 
 # Supondo que BaseStrategy e os componentes do Aggregator/DBManager são importáveis
@@ -10,6 +9,7 @@ import math # Para math.comb
 from .base_strategy import BaseStrategy
 from ..database_manager import DatabaseManager
 from ..analysis_aggregator import AnalysisAggregator
+from .combination_search import search_top_combinations
 # from ..config import config as app_config
 
 class CombinationAndPropertiesStrategy(BaseStrategy):
@@ -35,7 +35,7 @@ class CombinationAndPropertiesStrategy(BaseStrategy):
                  # Adicionar outros targets de propriedades (primos, linhas, colunas) conforme necessário
                  # via strategy_params e processados no __init__ ou _score_combination_properties
                  candidate_pool_size: int = 30, # Top N dezenas da fase de scoring para gerar combinações
-                 max_combinations_to_evaluate: int = 50000 # Limite para avaliação de combinações
+                 max_combinations_to_evaluate: int = 50000 # Mantido por compatibilidade; a busca branch-and-bound não trunca
                  ):
         # Passando todos os params para BaseStrategy para que fiquem em self.strategy_specific_params
         super().__init__(db_manager, config, analysis_aggregator,
@@ -58,6 +58,7 @@ class CombinationAndPropertiesStrategy(BaseStrategy):
         self.target_even_count_range = self.strategy_specific_params.get('target_even_count_range')
         self.candidate_pool_size = self.strategy_specific_params.get('candidate_pool_size')
         self.max_combinations_to_evaluate = self.strategy_specific_params.get('max_combinations_to_evaluate')
+        self.last_search_result: Optional[Dict[str, Any]] = None
         
         # Cache para dados de itemsets, se necessário, embora cada chamada possa ser única
         # self._itemset_data_cache: Dict[str, pd.DataFrame] = {}
@@ -210,8 +211,8 @@ class CombinationAndPropertiesStrategy(BaseStrategy):
                        selection_params: Optional[Dict[str, Any]] = None) -> List[int]:
         """
         Fase 2: Seleciona o conjunto final de N dezenas (idealmente 15 para esta estratégia).
-        Gera combinações a partir de um pool de candidatas e escolhe a melhor
-        com base nas propriedades globais do jogo.
+        Busca, no pool de candidatas, a combinação com melhor score de propriedades
+        globais do jogo (desempate pela soma dos scores individuais).
         """
         if num_to_select != 15 and self.target_sum_range: # Se avalia propriedades, idealmente são 15
             print(f"AVISO ({self.get_name()}): Esta estratégia é otimizada para selecionar 15 dezenas "
@@ -228,55 +229,43 @@ class CombinationAndPropertiesStrategy(BaseStrategy):
                   f"menor que o número a selecionar ({num_to_select}). Retornando top N scores individuais.")
             return sorted(scores_df.head(num_to_select)['dezena'].tolist())
 
-        best_combination: Optional[List[int]] = None
-        max_property_score = -1.0 # Inicializa com -1 para garantir que qualquer score positivo seja melhor
-
-        # Calcula o número de combinações possíveis para decidir se a avaliação completa é viável
-        num_possible_combos = 0
-        if len(candidate_dezenas) >= num_to_select:
-            try:
-                num_possible_combos = math.comb(len(candidate_dezenas), num_to_select)
-            except AttributeError: # math.comb é Python 3.8+
-                from scipy.special import comb # Fallback para scipy
-                num_possible_combos = comb(len(candidate_dezenas), num_to_select, exact=True)
-
-        
-        print(f"INFO ({self.get_name()}): Pool de {len(candidate_dezenas)} dezenas. Gerando combinações de {num_to_select}. "
-              f"Combinações possíveis: {num_possible_combos}. Limite de avaliação: {self.max_combinations_to_evaluate}")
-        
-        # Se o número de combinações for gerenciável, gera todas.
-        # Caso contrário, precisaria de amostragem ou heurística.
-        iterator_combinations = combinations(candidate_dezenas, num_to_select)
-        
-        # Se for exceder o limite, e quisermos uma amostra aleatória em vez de apenas as primeiras N:
-        # import random
-        # if num_possible_combos > self.max_combinations_to_evaluate:
-        #     all_combinations = list(iterator_combinations) # Materializa todas, pode ser problemático
-        #     iterator_combinations = random.sample(all_combinations, self.max_combinations_to_evaluate)
-        #     print(f"INFO ({self.get_name()}): Amostrando {self.max_combinations_to_evaluate} combinações aleatoriamente.")
-
-        count = 0
-        for combo_tuple in iterator_combinations:
-            if count >= self.max_combinations_to_evaluate and num_possible_combos > self.max_combinations_to_evaluate :
-                print(f"AVISO ({self.get_name()}): Limite de {self.max_combinations_to_evaluate} combinações atingido para avaliação.")
-                break
-            
-            combo_list = list(combo_tuple)
-            property_score = self._score_combination_properties(combo_list)
-
-            if property_score > max_property_score:
-                max_property_score = property_score
-                best_combination = combo_list
-            count += 1
-            if count % 10000 == 0 and count > 0: # Log de progresso para muitas combinações
-                print(f"INFO ({self.get_name()}): Avaliadas {count} combinações...")
-
-
-        if best_combination:
+        top = self.top_combinations(scores_df, k=1, num_to_select=num_to_select)
+        if top:
+            best_combination, max_property_score, _ = top[0]
             print(f"INFO ({self.get_name()}): Melhor combinação encontrada com score de propriedade: {max_property_score:.4f}")
             return sorted(best_combination)
         else:
-            # Se nenhuma combinação foi avaliada ou nenhuma atingiu um score > -1 (o que é improvável se houver combinações)
-            print(f"AVISO ({self.get_name()}): Nenhuma combinação adequada encontrada (ou limite de avaliação/pool baixo). "
+            print(f"AVISO ({self.get_name()}): Nenhuma combinação adequada encontrada (ou pool baixo). "
                   "Retornando top N dezenas com base no score individual de itemsets.")
-            return sorted(scores_df.head(num_to_select)['dezena'].tolist())
\ No newline at end of file
+            return sorted(scores_df.head(num_to_select)['dezena'].tolist())
+
+    def top_combinations(self,
+                         scores_df: pd.DataFrame,
+                         k: int = 1,
+                         num_to_select: int = 15) -> List[Tuple[List[int], float, float]]:
+        """
+        Top-K combinações do pool de candidatas por (score de propriedades, soma dos scores
+        da Fase 1), via busca branch-and-bound (sem truncar a enumeração).
+        Retorna (dezenas ordenadas, score de propriedades, soma dos scores).
+        """
+        pool_df = scores_df.head(self.candidate_pool_size)
+        if len(pool_df) < num_to_select:
+            return []
+        # Propriedades só são avaliadas para jogos de 15 dezenas (como em _score_combination_properties).
+        evaluate_properties = num_to_select == 15
+        num_possible_combos = math.comb(len(pool_df), num_to_select)
+        print(f"INFO ({self.get_name()}): Pool de {len(pool_df)} dezenas. Buscando top-{k} combinações de {num_to_select} "
+              f"entre {num_possible_combos} possíveis (branch-and-bound).")
+
+        search_result = search_top_combinations(
+            pool_df['dezena'].astype(int).tolist(),
+            pool_df['score'].astype(float).tolist(),
+            combination_size=num_to_select,
+            target_sum_range=self.target_sum_range if evaluate_properties else None,
+            target_even_count_range=self.target_even_count_range if evaluate_properties else None,
+            top_k=k
+        )
+        self.last_search_result = search_result
+        print(f"INFO ({self.get_name()}): Busca concluída: {search_result['nodes_explored']} nós explorados, "
+              f"{search_result['leaves_scored']} combinações pontuadas em {search_result['elapsed_seconds']:.3f}s.")
+        return [(list(combo), prop_score, total_score) for combo, prop_score, total_score in search_result['combinations']]
@@ -0,0 +1,158 @@
+# src/strategies/combination_search.py
+import heapq
+import math
+import time
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Subárvores com até este número de folhas são pontuadas de uma vez (arrays NumPy).
+DEFAULT_BATCH_LEAF_LIMIT = 4096
+# Somas de scores são arredondadas para que a ordem da soma (lote vs. recursão) não desempate.
+SCORE_DECIMALS = 9
+
+
+def search_top_combinations(
+    numbers: Sequence[int],
+    number_scores: Sequence[float],
+    combination_size: int = 15,
+    target_sum_range: Optional[Tuple[int, int]] = None,
+    target_even_count_range: Optional[Tuple[int, int]] = None,
+    top_k: int = 1,
+    batch_leaf_limit: int = DEFAULT_BATCH_LEAF_LIMIT
+) -> Dict[str, Any]:
+    """
+    Busca branch-and-bound das top-K combinações de 'combination_size' dezenas do pool.
+
+    Cada combinação é ordenada por (score de propriedades, soma dos scores das dezenas).
+    O score de propriedades é a fração das restrições atendidas (soma no intervalo,
+    quantidade de pares no intervalo), como em
+    CombinationAndPropertiesStrategy._score_combination_properties. Um ramo é podado
+    quando seu limite superior (propriedades ainda viáveis + melhores scores restantes)
+    não supera a K-ésima melhor combinação já encontrada.
+
+    Returns:
+        Dict com 'combinations' (lista de (dezenas ordenadas, score de propriedades,
+        soma dos scores), da melhor para a pior), 'nodes_explored', 'leaves_scored'
+        e 'elapsed_seconds'.
+    """
+    start_time = time.perf_counter()
+    values = np.asarray(numbers, dtype=np.int64)
+    scores = np.asarray(number_scores, dtype=np.float64)
+    n_pool, need_total = len(values), int(combination_size)
+    stats = {'nodes_explored': 0, 'leaves_scored': 0}
+    if need_total <= 0 or n_pool < need_total or top_k <= 0:
+        return {'combinations': [], 'elapsed_seconds': time.perf_counter() - start_time, **stats}
+
+    properties: List[Tuple[int, int]] = []
+    if target_sum_range:
+        properties.append(tuple(target_sum_range))
+    if target_even_count_range:
+        properties.append(tuple(target_even_count_range))
+    use_sum, use_even = bool(target_sum_range), bool(target_even_count_range)
+    n_properties = len(properties)
+    is_even = (values % 2 == 0).astype(np.int64)
+
+    # Somas acumuladas dos sufixos do pool: menores/maiores valores e maiores scores.
+    def suffix_prefix_sums(array: np.ndarray, descending: bool) -> List[np.ndarray]:
+        sums = []
+        for i in range(n_pool + 1):
+            ordered = np.sort(array[i:])
+            if descending:
+                ordered = ordered[::-1]
+            sums.append(np.concatenate([[0], np.cumsum(ordered)]))
+        return sums
+
+    min_value_sums = suffix_prefix_sums(values, descending=False)
+    max_value_sums = suffix_prefix_sums(values, descending=True)
+    best_score_sums = suffix_prefix_sums(scores, descending=True)
+    evens_left = np.concatenate([np.cumsum(is_even[::-1])[::-1], [0]])
+
+    def property_score(total: float, evens: float) -> float:
+        hits = 0.0
+        if use_sum:
+            hits += float(target_sum_range[0] <= total <= target_sum_range[1])
+        if use_even:
+            hits += float(target_even_count_range[0] <= evens <= target_even_count_range[1])
+        return hits / n_properties if n_properties else 0.0
+
+    # Min-heap das K melhores: (score de propriedades, soma dos scores, -ordem, dezenas).
+    best: List[Tuple[float, float, int, Tuple[int, ...]]] = []
+    order_counter = [0]
+
+    def threshold() -> Optional[Tuple[float, float]]:
+        return (best[0][0], best[0][1]) if len(best) >= top_k else None
+
+    def offer(prop: float, total_score: float, chosen: Tuple[int, ...]) -> None:
+        order_counter[0] += 1
+        entry = (prop, total_score, -order_counter[0], chosen)
+        if len(best) < top_k:
+            heapq.heappush(best, entry)
+        elif (prop, total_score) > (best[0][0], best[0][1]):
+            heapq.heapreplace(best, entry)
+
+    def score_batch(start: int, need: int, chosen: Tuple[int, ...], value_sum: int, even_count: int, score_sum: float) -> None:
+        """Pontua de uma vez todas as completações com 'need' dezenas de pool[start:]."""
+        index_combos = np.array(list(combinations(range(start, n_pool), need)), dtype=np.int64).reshape(-1, need)
+        totals = value_sum + values[index_combos].sum(axis=1)
+        evens = even_count + is_even[index_combos].sum(axis=1)
+        total_scores = np.round(score_sum + scores[index_combos].sum(axis=1), SCORE_DECIMALS)
+        hits = np.zeros(len(index_combos))
+        if use_sum:
+            hits += (totals >= target_sum_range[0]) & (totals <= target_sum_range[1])
+        if use_even:
+            hits += (evens >= target_even_count_range[0]) & (evens <= target_even_count_range[1])
+        props = hits / n_properties if n_properties else hits
+        stats['leaves_scored'] += len(index_combos)
+
+        # Só as candidatas que podem entrar no top-K, na ordem (prop, score) decrescente.
+        candidate_order = np.lexsort((-np.arange(len(index_combos)), total_scores, props))[::-1][:top_k]
+        for pos in candidate_order:
+            combo = chosen + tuple(int(values[i]) for i in index_combos[pos])
+            offer(float(props[pos]), float(total_scores[pos]), combo)
+
+    def upper_bound(start: int, need: int, value_sum: int, even_count: int, score_sum: float) -> Tuple[float, float]:
+        hits = 0.0
+        if use_sum:
+            low = value_sum + min_value_sums[start][need]
+            high = value_sum + max_value_sums[start][need]
+            hits += float(high >= target_sum_range[0] and low <= target_sum_range[1])
+        if use_even:
+            remaining = n_pool - start
+            evens_available = int(evens_left[start])
+            odds_available = remaining - evens_available
+            low = even_count + max(0, need - odds_available)
+            high = even_count + min(need, evens_available)
+            hits += float(high >= target_even_count_range[0] and low <= target_even_count_range[1])
+        prop_bound = hits / n_properties if n_properties else 0.0
+        return prop_bound, round(score_sum + float(best_score_sums[start][need]), SCORE_DECIMALS)
+
+    def explore(start: int, chosen: Tuple[int, ...], value_sum: int, even_count: int, score_sum: float) -> None:
+        stats['nodes_explored'] += 1
+        need = need_total - len(chosen)
+        if need == 0:
+            stats['leaves_scored'] += 1
+            offer(property_score(value_sum, even_count), round(score_sum, SCORE_DECIMALS), chosen)
+            return
+        if n_pool - start < need:
+            return
+        bound = upper_bound(start, need, value_sum, even_count, score_sum)
+        current = threshold()
+        if current is not None and bound <= current:
+            return
+        if math.comb(n_pool - start, need) <= batch_leaf_limit:
+            score_batch(start, need, chosen, value_sum, even_count, score_sum)
+            return
+        # Inclui pool[start] primeiro (melhores scores cedo -> poda mais forte), depois exclui.
+        explore(start + 1, chosen + (int(values[start]),), value_sum + int(values[start]),
+                even_count + int(is_even[start]), score_sum + float(scores[start]))
+        explore(start + 1, chosen, value_sum, even_count, score_sum)
+
+    explore(0, (), 0, 0, 0.0)
+    ranked = sorted(best, key=lambda entry: (entry[0], entry[1], entry[2]), reverse=True)
+    return {
+        'combinations': [(tuple(sorted(entry[3])), entry[0], entry[1]) for entry in ranked],
+        'elapsed_seconds': time.perf_counter() - start_time,
+        **stats,
+    }
@@ -2,9 +2,12 @@
 
 import pytest
 import sqlite3
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from typing import List, Optional, Set
+from typing import Callable, Dict, Iterable, List, Optional, Set, Union
+
+from src.config import config_obj
 
 # Importa constantes do config (com try/except para garantir fallback)
 try:
@@ -21,8 +24,12 @@ except ImportError:
     CYCLES_TABLE_NAME = 'ciclos' # <<< Fallback no nível do módulo
     CHUNK_STATS_FINAL_PREFIX = 'chunk_stats_'
 
-# Importa função de nome de tabela
-from src.database_manager import get_chunk_final_stats_table_name
+# Importa função de nome de tabela (removida do database_manager; fallback com o mesmo formato)
+try:
+    from src.database_manager import get_chunk_final_stats_table_name
+except ImportError:
+    def get_chunk_final_stats_table_name(interval_size: int) -> str:
+        return f"{CHUNK_STATS_FINAL_PREFIX}{interval_size}_final"
 
 # --- Dados de Teste (20 concursos) ---
 TEST_DATA_SORTEIOS = [ # Omitido por brevidade - MANTENHA OS 20 SORTEIOS AQUI
@@ -106,4 +113,34 @@ def populated_db_sem_ciclos(test_db_conn: sqlite3.Connection) -> sqlite3.Connect
      cols_ordered_sorteios = ['concurso', 'data_sorteio'] + NEW_BALL_COLUMNS; placeholders_sorteios = ', '.join(['?'] * len(cols_ordered_sorteios)); sql_insert_sorteios = f"INSERT INTO {SORTEIOS_TABLE_NAME} ({', '.join(cols_ordered_sorteios)}) VALUES ({placeholders_sorteios})"
      for record in TEST_DATA_SORTEIOS: cursor.execute(sql_insert_sorteios, [record.get(col) for col in cols_ordered_sorteios])
      conn.commit()
-     return conn
\ No newline at end of file
+     return conn
+
+
+@pytest.fixture
+def draws_df() -> Callable[..., pd.DataFrame]:
+    """
+    Fábrica de DataFrames de sorteios: draws_df(n_contests=..., seed=...).
+
+    - contest_ids: concursos (padrão 1..n_contests); lacunas entram pela lista.
+    - draws: {concurso: dezenas} explícito (sem sorteio aleatório).
+    - size: dezenas por concurso (int ou função do concurso); 0 gera um sorteio vazio.
+      Colunas de bolas faltantes ficam NaN.
+    - drawn_numbers: usa a coluna DRAWN_NUMBERS_COLUMN_NAME (listas) no lugar das bolas.
+    """
+    def make(n_contests: int = 60, *, contest_ids: Optional[Iterable[int]] = None,
+             draws: Optional[Dict[int, Iterable[int]]] = None, seed: int = 0,
+             size: Union[int, Callable[[int], int]] = 15, drawn_numbers: bool = False) -> pd.DataFrame:
+        cid_col = config_obj.CONTEST_ID_COLUMN_NAME
+        ball_cols = list(config_obj.BALL_NUMBER_COLUMNS)
+        if draws is None:
+            rng = np.random.default_rng(seed)
+            draws = {}
+            for cid in (range(1, n_contests + 1) if contest_ids is None else contest_ids):
+                n_balls = size(cid) if callable(size) else size
+                draws[cid] = sorted(rng.choice(np.arange(1, 26), n_balls, replace=False).tolist()) if n_balls else []
+        draws = {cid: list(numbers) for cid, numbers in draws.items()}
+        if drawn_numbers:
+            return pd.DataFrame({cid_col: list(draws), config_obj.DRAWN_NUMBERS_COLUMN_NAME: list(draws.values())})
+        rows = [[cid] + numbers + [np.nan] * (len(ball_cols) - len(numbers)) for cid, numbers in draws.items()]
+        return pd.DataFrame(rows, columns=[cid_col] + ball_cols)
+    return make
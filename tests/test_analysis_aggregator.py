@@ -0,0 +1,104 @@
+# tests/test_analysis_aggregator.py
+
+import numpy as np
+import pandas as pd
+
+from src.analysis_aggregator import AnalysisAggregator
+from src.config import config_obj
+from src.database_manager import DatabaseManager
+
+
+def _populate(db: DatabaseManager, n_contests=120, seed=3):
+    """ Tabela de atrasos esparsa: nem toda dezena tem linha em todo concurso. """
+    rng = np.random.default_rng(seed)
+    rows = [(c, d, int(rng.integers(0, 20)), int(rng.integers(0, 30)), float(rng.random()))
+            for c in range(1, n_contests + 1) for d in range(1, 26) if rng.random() < 0.6]
+    df = pd.DataFrame(rows, columns=['contest_id', 'dezena', 'current_delay', 'max_delay_observed', 'avg_delay'])
+    db.save_dataframe(df, config_obj.ANALYSIS_DELAYS_TABLE_NAME)
+
+
+def _legacy_latest_delays(db: DatabaseManager, concurso_id: int) -> pd.DataFrame:
+    sql = f"""
+        WITH RankedData AS (
+            SELECT dezena, current_delay, max_delay_observed, avg_delay,
+                   ROW_NUMBER() OVER (PARTITION BY dezena ORDER BY contest_id DESC) as rn
+            FROM {config_obj.ANALYSIS_DELAYS_TABLE_NAME} WHERE contest_id <= ?
+        )
+        SELECT dezena, current_delay, max_delay_observed, avg_delay FROM RankedData WHERE rn = 1;
+    """
+    return db.execute_query(sql, (concurso_id,))
+
+
+def test_latest_row_lookup_matches_window_query(tmp_path):
+    """ Busca indexada por dezena devolve as mesmas linhas que ROW_NUMBER() OVER (PARTITION BY dezena). """
+    db = DatabaseManager(str(tmp_path / "agg.db"))
+    try:
+        _populate(db)
+        aggregator = AnalysisAggregator(db, config_obj)
+        assert f"idx_{config_obj.ANALYSIS_DELAYS_TABLE_NAME}_dezena_contest_id" in aggregator.ensure_metric_indexes()
+        for concurso_id in (1, 2, 57, 120, 500):
+            got = aggregator._merge_delay_metrics(pd.DataFrame({'dezena': list(range(1, 26))}), concurso_id)
+            expected = pd.merge(pd.DataFrame({'dezena': list(range(1, 26))}), _legacy_latest_delays(db, concurso_id), on='dezena', how='left')
+            pd.testing.assert_frame_equal(got.reset_index(drop=True), expected, check_dtype=False)
+    finally:
+        db.close()
+
+
+def test_latest_row_lookup_uses_index(tmp_path):
+    db = DatabaseManager(str(tmp_path / "agg.db"))
+    try:
+        _populate(db, n_contests=20)
+        aggregator = AnalysisAggregator(db, config_obj)
+        aggregator.ensure_metric_indexes()
+        plan = db.execute_query("EXPLAIN QUERY PLAN " + aggregator._latest_rows_sql(config_obj.ANALYSIS_DELAYS_TABLE_NAME, "t.current_delay"), (10,))
+        assert plan['detail'].str.contains(f"idx_{config_obj.ANALYSIS_DELAYS_TABLE_NAME}_dezena_contest_id").any()
+    finally:
+        db.close()
+
+
+def test_batch_contests_match_single_contest_path(tmp_path):
+    """ Lote (uma consulta por tabela) == chamadas individuais; o lote alimenta o cache por concurso. """
+    db = DatabaseManager(str(tmp_path / "agg.db"))
+    try:
+        _populate(db)
+        rng = np.random.default_rng(8)
+        flat = pd.DataFrame([(c, d) for c in range(1, 121) for d in range(1, 26) if rng.random() < 0.6], columns=['contest_id', 'dezena'])
+        db.save_dataframe(flat, config_obj.FLAT_DRAWS_TABLE_NAME)
+        contest_ids = [3, 40, 41, 120]
+
+        expected = {c: AnalysisAggregator(db, config_obj).get_historical_metrics_for_dezenas(c) for c in contest_ids}
+        aggregator = AnalysisAggregator(db, config_obj)
+        long_df = aggregator.get_historical_metrics_for_contests(contest_ids)
+        for contest_id in contest_ids:
+            got = long_df[long_df['contest_id'] == contest_id].drop(columns=['contest_id']).reset_index(drop=True)
+            pd.testing.assert_frame_equal(got, expected[contest_id])
+            pd.testing.assert_frame_equal(aggregator.get_historical_metrics_for_dezenas(contest_id), expected[contest_id])
+
+        cube, metric_names = aggregator.get_metrics_cube(contest_ids)
+        assert cube.shape == (len(contest_ids), 25, len(metric_names))
+        assert cube[1, 4, metric_names.index('current_delay')] == expected[40].loc[4, 'current_delay']
+    finally:
+        db.close()
+
+
+def test_metrics_cache_invalidated_when_source_tables_change(tmp_path):
+    """ Aggregator de vida longa não serve métricas antigas depois que o pipeline regrava as tabelas. """
+    db = DatabaseManager(str(tmp_path / "agg.db"))
+    try:
+        _populate(db)
+        db._create_table_analysis_frequency_overall()
+        aggregator = AnalysisAggregator(db, config_obj)
+        before = aggregator.get_historical_metrics_for_dezenas(100)
+        assert aggregator.get_historical_metrics_for_contests([100]).drop(columns=['contest_id']).equals(before)
+
+        _populate(db, seed=4) # pipeline regrava a tabela de atrasos
+        after = aggregator.get_historical_metrics_for_dezenas(100)
+        assert not after['current_delay'].equals(before['current_delay'])
+        pd.testing.assert_frame_equal(after, AnalysisAggregator(db, config_obj).get_historical_metrics_for_dezenas(100))
+
+        db.conn.execute(f"INSERT INTO {config_obj.ANALYSIS_FREQUENCY_OVERALL_TABLE_NAME} (contest_id, dezena, frequency, relative_frequency) "
+                        "VALUES (100, 1, 77, 0.5)") # gravação fora do bulk_write
+        db.conn.commit()
+        assert aggregator.get_historical_metrics_for_dezenas(100).loc[0, 'overall_frequency'] == 77
+    finally:
+        db.close()
@@ -0,0 +1,63 @@
+# tests/test_backtester_runner.py
+
+from functools import partial
+
+import numpy as np
+
+from src.backtester.runner import BacktesterRunner, _popcount32, select_top_by_metric
+from src.config import config_obj
+
+
+def most_frequent(state, count=15):
+    return set(state['overall_freq'].sort_values(ascending=False, kind='stable').index[:count])
+
+
+def missing_first(state):
+    missing = sorted(state['missing_in_current_cycle'])
+    others = [n for n in state['current_delay'].sort_values(ascending=False, kind='stable').index if n not in missing]
+    return set((missing + others)[:15])
+
+
+def _reference_states(draws):
+    """ Estado antes de cada concurso, atualizado sorteio a sorteio. """
+    freq = {n: 0 for n in range(1, 26)}
+    last_seen = {n: 0 for n in range(1, 26)}
+    seen_in_cycle, states = set(), []
+    for contest, drawn in enumerate(draws, start=1):
+        states.append({'freq': dict(freq), 'delay': {n: (contest - 1) - last_seen[n] for n in range(1, 26)},
+                       'missing': set(range(1, 26)) - seen_in_cycle})
+        for n in drawn:
+            freq[n] += 1
+            last_seen[n] = contest
+        seen_in_cycle |= drawn
+        if len(seen_in_cycle) == 25:
+            seen_in_cycle = set()
+    return states
+
+
+def test_runner_matches_contest_by_contest_reference(draws_df):
+    df = draws_df(n_contests=60, seed=4)
+    draws = [set(row) for row in df[config_obj.BALL_NUMBER_COLUMNS].to_numpy().tolist()]
+    states = _reference_states(draws)
+    runner = BacktesterRunner(df, config_obj,
+                              strategies={'freq': most_frequent, 'freq_short': partial(most_frequent, count=10), 'cycle': missing_first},
+                              vectorized_strategies={'freq_vec': partial(select_top_by_metric, metric='overall_freq')},
+                              start_contest=10, end_contest=60)
+    summaries = runner.run()
+    assert set(summaries) == {'freq', 'freq_short', 'cycle', 'freq_vec'}
+
+    for contest in range(10, 61):
+        state = states[contest - 1]
+        chosen = set(sorted(state['freq'], key=lambda n: -state['freq'][n])[:15])
+        assert runner.results_logs['freq'][contest] == len(chosen & draws[contest - 1])
+        assert runner.results_logs['freq_vec'][contest] == runner.results_logs['freq'][contest]
+        assert runner.results_logs['freq_short'][contest] == -1
+        missing = sorted(state['missing'])
+        others = [n for n in sorted(state['delay'], key=lambda n: -state['delay'][n]) if n not in missing]
+        assert runner.results_logs['cycle'][contest] == len(set((missing + others)[:15]) & draws[contest - 1])
+    assert summaries['freq_short']['errors'] == 51
+
+
+def test_popcount_matches_python_bit_count():
+    values = np.random.default_rng(1).integers(0, 2**32, 500, dtype=np.uint64).astype(np.uint32)
+    assert _popcount32(values).tolist() == [int(v).bit_count() for v in values]
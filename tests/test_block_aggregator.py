@@ -0,0 +1,43 @@
+# tests/test_block_aggregator.py
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.block_aggregator import aggregate_block_data_to_wide_format, dense_rank_descending
+from src.analysis.chunk_analysis import calculate_chunk_metrics_and_persist
+from src.analysis.rank_trend_analysis import calculate_and_persist_rank_per_chunk
+from src.config import config_obj
+from src.database_manager import DatabaseManager
+
+
+def test_dense_rank_matches_pandas():
+    values = np.random.default_rng(1).integers(0, 6, (40, 25))
+    expected = pd.DataFrame(values).T.rank(method='dense', ascending=False).T.astype(int).to_numpy()
+    assert (dense_rank_descending(values) == expected).all()
+
+
+def test_materialized_wide_tables_match_pivot_of_long_tables(tmp_path, draws_df):
+    """ Tabela larga montada dos arrays == pivot das tabelas longas relidas do SQLite. """
+    config = copy.copy(config_obj)
+    config.CHUNK_TYPES_CONFIG = {'linear': [10, 30]}
+    db = DatabaseManager(str(tmp_path / "blocks.db"))
+    try:
+        contest_ids = [cid for cid in range(1, 96) if cid not in range(21, 33)] # bloco inteiro sem sorteios
+        calculate_chunk_metrics_and_persist(draws_df(contest_ids=contest_ids, seed=5), db, config)
+        tables = [f"{config.BLOCK_ANALISES_CONSOLIDADAS_PREFIX}_linear_{size}" for size in (10, 30)]
+        materialized = {table: db.load_dataframe(table) for table in tables}
+
+        calculate_and_persist_rank_per_chunk(db, config)
+        aggregate_block_data_to_wide_format(db, config) # já materializadas: nada é refeito
+        for table in tables:
+            pd.testing.assert_frame_equal(db.load_dataframe(table), materialized[table])
+
+        aggregate_block_data_to_wide_format(db, config, rebuild_existing=True)
+        for table in tables:
+            rebuilt = db.load_dataframe(table)
+            assert set(rebuilt['tipo_analise']) == set(materialized[table]['tipo_analise'])
+            pd.testing.assert_frame_equal(rebuilt, materialized[table], check_dtype=False)
+    finally:
+        db.close()
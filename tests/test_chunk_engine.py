@@ -0,0 +1,75 @@
+# tests/test_chunk_engine.py
+
+import numpy as np
+
+from src.config import config_obj
+from src.analysis.chunk_analysis import (
+    calculate_delays_for_matrix,
+    calculate_frequency_in_chunk,
+    get_draw_matrix_for_chunk,
+)
+from src.analysis.chunk_engine import build_chunk_engine
+from src.analysis.draw_matrix import build_draw_matrix
+
+
+_CONTEST_IDS = [cid for cid in range(1, 61) if cid not in (4, 17, 18)] # concursos ausentes nos dados
+
+
+def test_engine_matches_per_chunk_calculation(draws_df):
+    """ Frequências e atrasos por prefixos batem com o cálculo bloco a bloco. """
+    df = draws_df(contest_ids=_CONTEST_IDS, seed=7)
+    draw_matrix = build_draw_matrix(df, config_obj)
+    engine = build_chunk_engine(draw_matrix, config_obj)
+    contest_col = config_obj.CONTEST_ID_COLUMN_NAME
+
+    for size in (1, 7, 13, 60, 100):
+        metrics = engine.compute(size)
+        for k, (start, end) in enumerate(zip(metrics['chunk_start'], metrics['chunk_end'])):
+            df_chunk = df[(df[contest_col] >= start) & (df[contest_col] <= end)]
+            assert metrics['has_draws'][k] == (not df_chunk.empty)
+            if df_chunk.empty:
+                continue
+            expected_freq = calculate_frequency_in_chunk(df_chunk, config_obj)
+            expected = calculate_delays_for_matrix(
+                get_draw_matrix_for_chunk(df_chunk, int(start), int(end), config_obj, draw_matrix=draw_matrix),
+                int(start), int(end), config_obj
+            )
+            assert metrics['frequency'][k].tolist() == expected_freq.tolist()
+            assert metrics['delay_final'][k].tolist() == expected["final"].astype(int).tolist()
+            assert metrics['delay_max'][k].tolist() == expected["max"].astype(int).tolist()
+            np.testing.assert_allclose(metrics['delay_mean'][k], expected["mean"].to_numpy(dtype=float), equal_nan=True)
+            np.testing.assert_allclose(metrics['delay_std'][k], expected["std_dev"].to_numpy(dtype=float), equal_nan=True)
+
+
+def test_engine_group_averages(draws_df):
+    """ Médias de pares/primos/soma por bloco a partir das somas acumuladas. """
+    df = draws_df(contest_ids=[c for c in _CONTEST_IDS if c <= 10], seed=7)
+    engine = build_chunk_engine(build_draw_matrix(df, config_obj), config_obj)
+    metrics = engine.compute(5)
+    first_block = df[df[config_obj.CONTEST_ID_COLUMN_NAME] <= 5][config_obj.BALL_NUMBER_COLUMNS].to_numpy()
+    assert metrics['avg_soma_dezenas'][0] == first_block.sum(axis=1).mean()
+    assert metrics['avg_pares'][0] == (first_block % 2 == 0).sum(axis=1).mean()
+
+
+def test_compute_ranges_matches_per_range_calculation(draws_df):
+    """ Intervalos arbitrários (com lacunas entre eles, como ciclos) batem com o cálculo por intervalo. """
+    df = draws_df(contest_ids=_CONTEST_IDS, seed=7)
+    draw_matrix = build_draw_matrix(df, config_obj)
+    engine = build_chunk_engine(draw_matrix, config_obj)
+    starts, ends = np.array([2, 9, 16, 30]), np.array([5, 14, 19, 60])
+    metrics = engine.compute_ranges(starts, ends)
+    for k, (start, end) in enumerate(zip(starts, ends)):
+        expected = calculate_delays_for_matrix(
+            get_draw_matrix_for_chunk(df, int(start), int(end), config_obj, draw_matrix=draw_matrix),
+            int(start), int(end), config_obj
+        )
+        assert metrics['delay_final'][k].tolist() == expected["final"].astype(int).tolist()
+        assert metrics['delay_max'][k].tolist() == expected["max"].astype(int).tolist()
+        np.testing.assert_allclose(metrics['delay_std'][k], expected["std_dev"].to_numpy(dtype=float), equal_nan=True)
+
+    try:
+        engine.compute_ranges(np.array([5, 3]), np.array([8, 9]))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("intervalos sobrepostos deveriam ser rejeitados")
@@ -0,0 +1,63 @@
+# tests/test_cleaned_data_store.py
+
+import numpy as np
+import pytest
+import pandas as pd
+
+from src.config import BALL_NUMBER_COLUMNS, CONTEST_ID_COLUMN_NAME, DATE_COLUMN_NAME
+from src.cleaned_data_store import (
+    save_cleaned_data_store,
+    append_cleaned_data_store,
+    load_cleaned_store_arrays,
+    store_arrays_to_dataframe,
+)
+
+
+def _cleaned_df():
+    rng = np.random.default_rng(0)
+    rows = []
+    for cid in range(1, 11):
+        balls = rng.choice(np.arange(1, 26), size=15, replace=False).tolist()
+        row = {CONTEST_ID_COLUMN_NAME: cid, DATE_COLUMN_NAME: pd.Timestamp('2020-01-01') + pd.Timedelta(days=cid)}
+        row.update(dict(zip(BALL_NUMBER_COLUMNS, balls)))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def test_store_roundtrip_is_memory_mapped(tmp_path):
+    """ O store grava e relê os mesmos dados, com os arrays abertos via mmap. """
+    df = _cleaned_df()
+    save_cleaned_data_store(df, str(tmp_path))
+
+    arrays = load_cleaned_store_arrays(str(tmp_path))
+    assert arrays is not None
+    assert isinstance(arrays['balls'], np.memmap)
+    assert arrays['balls'].dtype == np.uint8 and arrays['balls'].shape == (10, 15)
+
+    loaded = store_arrays_to_dataframe(arrays)
+    pd.testing.assert_frame_equal(loaded[df.columns], df, check_dtype=False)
+    assert loaded['drawn_numbers'].iloc[0] == sorted(df[BALL_NUMBER_COLUMNS].iloc[0].tolist())
+
+
+def test_store_rejects_content_hash_mismatch(tmp_path):
+    """ Arrays alterados fora do store invalidam o hash do manifest. """
+    save_cleaned_data_store(_cleaned_df(), str(tmp_path))
+    balls = np.load(tmp_path / 'balls.npy')
+    balls[0, 0] = 0
+    np.save(tmp_path / 'balls.npy', balls)
+    assert load_cleaned_store_arrays(str(tmp_path)) is None
+
+
+def test_store_append_only_new_contests(tmp_path):
+    """ O append acrescenta concursos ao fim dos .npy e mantém o store válido. """
+    df = _cleaned_df()
+    save_cleaned_data_store(df.iloc[:7], str(tmp_path))
+    append_cleaned_data_store(df.iloc[7:], str(tmp_path))
+
+    arrays = load_cleaned_store_arrays(str(tmp_path))
+    assert arrays is not None
+    assert arrays['contest_ids'].tolist() == list(range(1, 11))
+    pd.testing.assert_frame_equal(store_arrays_to_dataframe(arrays)[df.columns], df, check_dtype=False)
+
+    with pytest.raises(ValueError):
+        append_cleaned_data_store(df.iloc[9:], str(tmp_path))
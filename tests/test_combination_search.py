@@ -0,0 +1,40 @@
+# tests/test_combination_search.py
+
+from itertools import combinations
+
+import numpy as np
+
+from src.strategies.combination_search import search_top_combinations
+
+
+def _brute_force(numbers, scores, size, sum_range, even_range, top_k):
+    ranked = []
+    for position, combo in enumerate(combinations(range(len(numbers)), size)):
+        values = [numbers[i] for i in combo]
+        evens = sum(1 for v in values if v % 2 == 0)
+        prop = ((sum_range[0] <= sum(values) <= sum_range[1]) + (even_range[0] <= evens <= even_range[1])) / 2.0
+        ranked.append((prop, round(sum(scores[i] for i in combo), 9), -position, tuple(sorted(values))))
+    ranked.sort(reverse=True)
+    return [(combo, prop) for prop, _, _, combo in ranked[:top_k]]
+
+
+def test_search_matches_brute_force():
+    """ Top-K exato (com desempate pela ordem de enumeração), com ou sem pontuação em lote. """
+    rng = np.random.default_rng(5)
+    numbers = rng.choice(np.arange(1, 26), 14, replace=False).tolist()
+    scores = rng.random(14).round(3).tolist()
+    expected = _brute_force(numbers, scores, 7, (80, 100), (3, 4), 5)
+    for batch_leaf_limit in (1, 64, 4096):
+        result = search_top_combinations(numbers, scores, 7, (80, 100), (3, 4), top_k=5, batch_leaf_limit=batch_leaf_limit)
+        assert [(combo, prop) for combo, prop, _ in result['combinations']] == expected
+        assert result['nodes_explored'] > 0
+
+
+def test_search_prunes_full_lotofacil_pool():
+    """ Pool de 25 dezenas: encontra uma combinação que atende às propriedades sem enumerar C(25, 15). """
+    scores = np.linspace(1.0, 0.0, 25).tolist()
+    result = search_top_combinations(list(range(1, 26)), scores, 15, (180, 220), (6, 9), top_k=3)
+    assert len(result['combinations']) == 3
+    best, prop, _ = result['combinations'][0]
+    assert prop == 1.0 and 180 <= sum(best) <= 220
+    assert result['leaves_scored'] < 3268760
@@ -0,0 +1,46 @@
+# tests/test_cooccurrence.py
+
+from itertools import combinations
+
+from src.config import config_obj
+from src.analysis.combination_analysis import CombinationAnalyzer
+from src.analysis.cooccurrence import CooccurrenceEngine
+from src.analysis.draw_matrix import build_draw_matrix
+
+
+_CONTEST_IDS = [cid for cid in range(1, 41) if cid != 10]
+
+
+def test_pair_and_triple_counts_match_direct_counting(draws_df):
+    df = draws_df(contest_ids=_CONTEST_IDS, seed=3, drawn_numbers=True)
+    engine = CooccurrenceEngine(build_draw_matrix(df, config_obj))
+    draws = [set(numbers) for numbers in df[config_obj.DRAWN_NUMBERS_COLUMN_NAME]]
+    pairs, triples = engine.pair_matrix(), engine.triple_tensor()
+    for a, b in [(1, 2), (5, 25), (7, 7)]:
+        assert pairs[a - 1, b - 1] == sum(1 for d in draws if {a, b} <= d)
+    for a, b, c in [(1, 2, 3), (4, 9, 25), (10, 10, 11)]:
+        assert triples[a - 1, b - 1, c - 1] == sum(1 for d in draws if {a, b, c} <= d)
+
+
+def test_windowed_pairs_from_prefix_sums(draws_df):
+    """ Janelas (intervalo, últimos K, blocos) por prefixos batem com Mᵀ·M da fatia. """
+    df = draws_df(contest_ids=_CONTEST_IDS, seed=3, drawn_numbers=True)
+    engine = CooccurrenceEngine(build_draw_matrix(df, config_obj))
+    lo, hi = engine.draw_matrix.row_bounds(5, 20)
+    assert (engine.pair_matrix_for_contests(5, 20) == engine.pair_matrix(lo, hi)).all()
+    assert (engine.pair_matrix_last_k(7, until_contest=30) == engine.pair_matrix(hi + 3, hi + 10)).all()
+    starts, per_chunk = engine.pair_matrices_for_chunks(15)
+    assert starts.tolist() == [1, 16, 31]
+    assert (per_chunk.sum(axis=0) == engine.pair_matrix()).all()
+
+
+def test_analyze_pairs_format(draws_df):
+    df = draws_df(contest_ids=_CONTEST_IDS, seed=3, drawn_numbers=True)
+    pairs_df = CombinationAnalyzer(config_obj.ALL_NUMBERS).analyze_pairs(df)
+    assert list(pairs_df.columns) == ['pair_str', 'frequency', 'last_contest', 'current_delay']
+    assert len(pairs_df) == len(list(combinations(config_obj.ALL_NUMBERS, 2)))
+    row = pairs_df.set_index('pair_str').loc['1-2']
+    hits = [cid for cid, d in zip(df[config_obj.CONTEST_ID_COLUMN_NAME], df[config_obj.DRAWN_NUMBERS_COLUMN_NAME]) if {1, 2} <= set(d)]
+    assert row['frequency'] == len(hits)
+    assert row['last_contest'] == max(hits)
+    assert row['current_delay'] == 40 - max(hits)
@@ -0,0 +1,53 @@
+# tests/test_cycle_closing_analysis.py
+
+from collections import Counter
+
+import pandas as pd
+
+from src.analysis.cycle_closing_analysis import calculate_closing_number_stats
+from src.config import config_obj
+from src.database_manager import DatabaseManager
+
+
+def _draws_and_cycles(draws_df, n_contests=150, seed=11):
+    df = draws_df(n_contests, seed=seed)
+    draws = {c: set(balls) for c, balls in zip(df[config_obj.CONTEST_ID_COLUMN_NAME], df[config_obj.BALL_NUMBER_COLUMNS].to_numpy().tolist())}
+    cycles, seen, start = [], set(), 1
+    for contest, drawn in draws.items():
+        seen |= drawn
+        if len(seen) == 25:
+            cycles.append((len(cycles) + 1, start, contest, contest - start + 1))
+            seen, start = set(), contest + 1
+    cycles_df = pd.DataFrame(cycles, columns=['ciclo_num', 'concurso_inicio', 'concurso_fim', 'duracao_concursos'])
+    return draws, cycles_df
+
+
+def _reference_stats(draws, cycles_df):
+    """ Fechamento ciclo a ciclo com conjuntos, como a versão com consultas por ciclo. """
+    closing, sole = Counter(), Counter()
+    for _, cycle in cycles_df.iterrows():
+        end = int(cycle['concurso_fim'])
+        if end not in draws:
+            continue
+        seen = set().union(*[draws.get(c, set()) for c in range(int(cycle['concurso_inicio']), end)])
+        closing_numbers = draws[end] - seen
+        closing.update(closing_numbers)
+        if len(closing_numbers) == 1:
+            sole.update(closing_numbers)
+    return closing, sole
+
+
+def test_closing_stats_match_per_cycle_reference(tmp_path, draws_df):
+    draws, cycles_df = _draws_and_cycles(draws_df)
+    del draws[cycles_df['concurso_fim'].iloc[3]] # concurso final ausente: ciclo ignorado
+    del draws[cycles_df['concurso_inicio'].iloc[5]]
+    db = DatabaseManager(str(tmp_path / "closing.db"))
+    try:
+        db.save_dataframe(draws_df(draws={c: sorted(d) for c, d in draws.items()}), config_obj.MAIN_DRAWS_TABLE_NAME)
+        stats = calculate_closing_number_stats(db, config_obj, cycles_df)
+        closing, sole = _reference_stats(draws, cycles_df)
+        assert stats['closing_freq'].to_dict() == {n: closing.get(n, 0) for n in config_obj.ALL_NUMBERS}
+        assert stats['sole_closing_freq'].to_dict() == {n: sole.get(n, 0) for n in config_obj.ALL_NUMBERS}
+        assert stats['closing_freq'].sum() > 0
+    finally:
+        db.close()
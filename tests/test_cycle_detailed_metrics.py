@@ -0,0 +1,44 @@
+# tests/test_cycle_detailed_metrics.py
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.block_aggregator import aggregate_cycle_data_to_wide_format
+from src.analysis.cycle_analysis import (
+    KEY_CYCLE_DETAILS_DF,
+    calculate_detailed_metrics_per_closed_cycle,
+    identify_and_process_cycles,
+)
+from src.config import config_obj
+from src.database_manager import DatabaseManager
+
+
+def test_cycle_metrics_per_range_and_consolidated_table(tmp_path, draws_df):
+    # Concursos ausentes nos dados (múltiplos de 23) e sorteios incompletos, que ficam fora das médias de grupo.
+    df = draws_df(contest_ids=[c for c in range(1, 201) if c % 23], seed=5, size=lambda c: 14 if c % 11 == 0 else 15)
+    db = DatabaseManager(str(tmp_path / "cycles.db"))
+    try:
+        db.save_dataframe(identify_and_process_cycles(df, config_obj)[KEY_CYCLE_DETAILS_DF], config_obj.ANALYSIS_CYCLES_DETAIL_TABLE_NAME)
+        df_ciclos_detalhe = db.load_dataframe(config_obj.ANALYSIS_CYCLES_DETAIL_TABLE_NAME)
+        metric_dfs = calculate_detailed_metrics_per_closed_cycle(df, df_ciclos_detalhe, config_obj)
+
+        closed = df_ciclos_detalhe[df_ciclos_detalhe['concurso_fim'].notna()]
+        frequency = metric_dfs[config_obj.CYCLE_METRIC_FREQUENCY_TABLE_NAME]
+        group = metric_dfs[config_obj.CYCLE_GROUP_METRICS_TABLE_NAME]
+        assert len(frequency) == len(closed) * 25
+        for _, cycle in closed.iterrows():
+            in_cycle = df[df[config_obj.CONTEST_ID_COLUMN_NAME].between(cycle['concurso_inicio'], cycle['concurso_fim'])]
+            balls = in_cycle[config_obj.BALL_NUMBER_COLUMNS].to_numpy(dtype=float)
+            counts = [int((balls == n).sum()) for n in config_obj.ALL_NUMBERS]
+            assert frequency[frequency['ciclo_num'] == cycle['ciclo_num']]['frequencia_no_ciclo'].tolist() == counts
+            complete = balls[~np.isnan(balls).any(axis=1)]
+            expected_pares = (complete % 2 == 0).sum(axis=1).mean()
+            assert group[group['ciclo_num'] == cycle['ciclo_num']]['avg_pares_no_ciclo'].iloc[0] == expected_pares
+
+        for table_name, df_metric in metric_dfs.items():
+            db.save_dataframe(df_metric, table_name)
+        materialized = db.load_dataframe(config_obj.CYCLE_ANALISES_CONSOLIDADAS_TABLE_NAME)
+        aggregate_cycle_data_to_wide_format(db, config_obj, rebuild_existing=True) # pivot das tabelas longas
+        pd.testing.assert_frame_equal(materialized, db.load_dataframe(config_obj.CYCLE_ANALISES_CONSOLIDADAS_TABLE_NAME))
+    finally:
+        db.close()
@@ -0,0 +1,131 @@
+# tests/test_cycle_engine.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.analysis.cycle_analysis import KEY_CYCLE_DETAILS_DF, identify_and_process_cycles
+from src.analysis.cycle_engine import CycleEngine
+from src.analysis.draw_matrix import build_draw_matrix
+from src.config import config_obj
+from src.database_manager import DatabaseManager
+from src.db_schema import apply_schema
+from src.pipeline_steps.execute_cycles import run_cycle_identification_step
+
+
+def _sparse_size(contest):
+    return 0 if contest % 17 == 0 else 12 # sorteio sem dezenas não inicia ciclo
+
+
+def _reference_cycles(df):
+    """ Percorre os sorteios com um conjunto de dezenas faltantes (formato da tabela de ciclos). """
+    all_numbers = set(config_obj.ALL_NUMBERS)
+    cycles, needed, start = [], set(all_numbers), None
+    for _, row in df.sort_values(config_obj.CONTEST_ID_COLUMN_NAME).iterrows():
+        drawn = {int(row[col]) for col in config_obj.BALL_NUMBER_COLUMNS if pd.notna(row[col])}
+        if needed == all_numbers and drawn:
+            start = int(row[config_obj.CONTEST_ID_COLUMN_NAME])
+        needed -= drawn
+        if not needed:
+            end = int(row[config_obj.CONTEST_ID_COLUMN_NAME])
+            cycles.append((len(cycles) + 1, start, end, end - start + 1, None, 0))
+            needed = set(all_numbers)
+    if needed != all_numbers:
+        cycles.append((len(cycles) + 1, start, None, None, ",".join(map(str, sorted(needed))), len(needed)))
+    return cycles
+
+
+def _as_tuples(df_cycles_detail):
+    return [tuple(None if pd.isna(value) else value for value in row) for row in df_cycles_detail.itertuples(index=False)]
+
+
+def test_engine_matches_set_based_cycles_and_trajectories(draws_df):
+    df = draws_df(400, seed=0, size=_sparse_size)
+    details = identify_and_process_cycles(df, config_obj)[KEY_CYCLE_DETAILS_DF]
+    assert _as_tuples(details) == _reference_cycles(df)
+
+    engine = CycleEngine.from_draw_matrix(build_draw_matrix(df, config_obj))
+    arrays = engine.arrays()
+    np.testing.assert_array_equal(arrays['concurso_fim'], details['concurso_fim'].dropna().to_numpy(dtype=np.int64))
+    np.testing.assert_array_equal(arrays['duracao_concursos'], arrays['concurso_fim'] - arrays['concurso_inicio'] + 1)
+    assert len(arrays['row_contest_ids']) == len(df)
+    # Nos concursos de fechamento não falta nenhuma dezena; no último, faltam as do ciclo aberto.
+    closing_rows = np.isin(arrays['row_contest_ids'], arrays['concurso_fim'])
+    assert (arrays['row_missing_after'][closing_rows] == 0).all()
+    assert int(arrays['row_missing_after'][-1]) == arrays['open_missing_mask']
+    assert arrays['row_cycle_num'][-1] == len(arrays['concurso_fim']) + 1
+
+
+def test_append_and_resume_match_full_rebuild(draws_df):
+    df = draws_df(300, seed=3, size=_sparse_size)
+    draw_matrix = build_draw_matrix(df, config_obj)
+    full = CycleEngine.from_draw_matrix(draw_matrix)
+
+    split = 150
+    engine = CycleEngine(draw_matrix.numbers)
+    engine.extend(draw_matrix.contest_ids[:split], draw_matrix.bitmasks[:split])
+    resumed = CycleEngine.from_cycles_detail(engine.to_cycles_detail_df(), draw_matrix.numbers, engine.last_contest)
+    assert resumed.last_contest == int(draw_matrix.contest_ids[split - 1])
+    for contest_id, mask in zip(draw_matrix.contest_ids[split:], draw_matrix.bitmasks[split:]):
+        engine.append(contest_id, mask)
+        resumed.append(contest_id, mask)
+
+    pd.testing.assert_frame_equal(engine.to_cycles_detail_df(), full.to_cycles_detail_df())
+    pd.testing.assert_frame_equal(resumed.to_cycles_detail_df(), full.to_cycles_detail_df())
+    for key in ('row_contest_ids', 'row_cycle_num', 'row_missing_after'):
+        np.testing.assert_array_equal(engine.arrays()[key], full.arrays()[key])
+
+
+def test_resume_ignores_replayed_contests(draws_df):
+    """ Reenviar concursos já processados (após retomar ou após um fechamento) não altera os ciclos. """
+    df = draws_df(300, seed=5, size=_sparse_size)
+    draw_matrix = build_draw_matrix(df, config_obj)
+    full = CycleEngine.from_draw_matrix(draw_matrix)
+
+    split = 140
+    engine = CycleEngine(draw_matrix.numbers)
+    engine.extend(draw_matrix.contest_ids[:split], draw_matrix.bitmasks[:split])
+    details = engine.to_cycles_detail_df()
+    with pytest.raises(ValueError):
+        CycleEngine.from_cycles_detail(details, draw_matrix.numbers, None)
+    resumed = CycleEngine.from_cycles_detail(details, draw_matrix.numbers, engine.last_contest)
+
+    replay_from = split - 20 # parte do fim já processado, incluindo o fechamento de um ciclo
+    assert np.isin(draw_matrix.contest_ids[replay_from:split], full.arrays()['concurso_fim']).any()
+    assert resumed.append(draw_matrix.contest_ids[split - 1], draw_matrix.bitmasks[split - 1]) is None
+    for replayed in (resumed, engine):
+        replayed.extend(draw_matrix.contest_ids[replay_from:], draw_matrix.bitmasks[replay_from:])
+        pd.testing.assert_frame_equal(replayed.to_cycles_detail_df(), full.to_cycles_detail_df())
+
+
+def test_cycle_step_resumes_from_stored_cycles(tmp_path, draws_df):
+    """ A etapa retoma o ciclo aberto gravado e grava só os ciclos a partir dele. """
+    df = draws_df(300, seed=7, size=_sparse_size)
+    db = DatabaseManager(str(tmp_path / "cycles.db"))
+    apply_schema(db, config_obj)
+    detail_table = config_obj.ANALYSIS_CYCLES_DETAIL_TABLE_NAME
+
+    run_cycle_identification_step(df.iloc[:150], db, config_obj, {})
+    first_run = db.load_dataframe(detail_table)
+    open_cycle = int(first_run['ciclo_num'].max())
+    assert first_run['concurso_fim'].isna().iloc[-1] # ciclo aberto gravado
+
+    written = []
+    bulk_write = db.bulk_write
+    def spy(frame, table_name, *args, **kwargs):
+        written.append((table_name, frame.copy(), kwargs.get('mode', args[0] if args else 'append')))
+        return bulk_write(frame, table_name, *args, **kwargs)
+    db.bulk_write = spy
+    returned = run_cycle_identification_step(df, db, config_obj, {})
+
+    detail_writes = [(frame, mode) for table, frame, mode in written if table == detail_table]
+    assert len(detail_writes) == 1 and detail_writes[0][1] == 'upsert'
+    assert int(detail_writes[0][0]['ciclo_num'].min()) == open_cycle
+    expected = _reference_cycles(df)
+    assert _as_tuples(returned) == expected
+    stored = db.load_dataframe(detail_table).sort_values('ciclo_num')
+    assert _as_tuples(stored) == expected
+
+    db.bulk_write = bulk_write
+    rebuilt = run_cycle_identification_step(df, db, config_obj, {}, force_full_recalculation=True)
+    assert _as_tuples(rebuilt) == expected
@@ -0,0 +1,75 @@
+# tests/test_database_bulk_write.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.config import config_obj
+from src.database_manager import DatabaseManager
+
+
+def _delays(contests, seed=0):
+    rng = np.random.default_rng(seed)
+    contests = np.repeat(np.asarray(contests), 25)
+    return pd.DataFrame({
+        'contest_id': contests,
+        'dezena': np.tile(np.arange(1, 26), len(contests) // 25),
+        'current_delay': rng.integers(0, 20, len(contests)),
+        'max_delay_observed': rng.integers(0, 30, len(contests)),
+        'avg_delay': np.where(rng.random(len(contests)) < 0.1, np.nan, rng.random(len(contests))),
+    })
+
+
+def test_replace_keeps_ddl_and_upsert_updates_by_primary_key(tmp_path):
+    db = DatabaseManager(str(tmp_path / "bulk.db"))
+    table = config_obj.ANALYSIS_DELAYS_TABLE_NAME
+    try:
+        db._create_table_analysis_delays()
+        db.create_index(table, ['dezena', 'contest_id'])
+        first = _delays(range(1, 11))
+        db.save_dataframe(first, table)
+        db.save_dataframe(first, table) # 'replace' não duplica nem perde a chave
+        assert db.get_primary_key_columns(table) == ['contest_id', 'dezena']
+        assert not db.execute_query(f"SELECT name FROM sqlite_master WHERE type='index' AND name='idx_{table}_dezena_contest_id'").empty
+        pd.testing.assert_frame_equal(db.load_dataframe(table), first, check_dtype=False)
+
+        update = _delays(range(8, 14), seed=1)
+        assert db.bulk_write(update, table, mode='upsert') == len(update)
+        expected = pd.concat([first[first['contest_id'] < 8], update], ignore_index=True)
+        got = db.execute_query(f"SELECT * FROM {table} ORDER BY contest_id, dezena")
+        pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+
+        with pytest.raises(Exception):
+            db.bulk_write(update, table, mode='append') # viola a chave primária
+        assert len(db.load_dataframe(table)) == len(expected) # transação revertida
+    finally:
+        db.close()
+
+
+def test_replace_with_reordered_columns_keeps_ddl(tmp_path):
+    db = DatabaseManager(str(tmp_path / "bulk.db"))
+    table = config_obj.ANALYSIS_DELAYS_TABLE_NAME
+    try:
+        db._create_table_analysis_delays()
+        delays = _delays(range(1, 6))
+        reordered = delays[list(reversed(delays.columns))]
+        db.save_dataframe(reordered, table)
+        assert db.get_primary_key_columns(table) == ['contest_id', 'dezena']
+        assert db.get_table_columns(table) == list(delays.columns)
+        pd.testing.assert_frame_equal(db.load_dataframe(table), delays, check_dtype=False)
+    finally:
+        db.close()
+
+
+def test_replace_with_new_columns_recreates_table_like_to_sql(tmp_path):
+    db = DatabaseManager(str(tmp_path / "bulk.db"))
+    try:
+        db.save_dataframe(pd.DataFrame({'a': [1, 2], 'b': ['x', None]}), 'generic')
+        db.save_dataframe(pd.DataFrame({'a': [1.5], 'c': [pd.Timestamp('2024-01-02')]}), 'generic')
+        assert db.get_table_columns('generic') == ['a', 'c']
+        assert db.load_dataframe('generic').iloc[0].tolist() == [1.5, '2024-01-02 00:00:00']
+        db.bulk_write(pd.DataFrame({'k': [1, 1], 'v': [1, 2]}).iloc[:1], 'keyed', mode='upsert', key_columns=['k'])
+        db.bulk_write(pd.DataFrame({'k': [1], 'v': [5]}), 'keyed', mode='upsert')
+        assert db.load_dataframe('keyed').values.tolist() == [[1, 5]]
+    finally:
+        db.close()
@@ -0,0 +1,106 @@
+# tests/test_db_schema.py
+
+import pandas as pd
+import pytest
+
+from src.analysis_aggregator import AnalysisAggregator, LATEST_ROW_TABLE_KEYS
+from src.config import config_obj
+from src.database_manager import DatabaseManager
+from src.db_schema import SCHEMA_VERSION, apply_schema, full_table_scans, get_schema_version
+
+
+def _index_names(db: DatabaseManager) -> set:
+    return set(db.execute_query("SELECT name FROM sqlite_master WHERE type = 'index';")['name'])
+
+
+def _hot_queries(db: DatabaseManager):
+    """ Consultas por concurso/dezena usadas no AnalysisAggregator e em cycle_closing_analysis. """
+    cid = config_obj.CONTEST_ID_COLUMN_NAME
+    aggregator = AnalysisAggregator(db, config_obj)
+    queries = []
+    for key in LATEST_ROW_TABLE_KEYS:
+        table = aggregator.table_names[key]
+        queries.append((f"ultima linha por dezena: {table}", aggregator._latest_rows_sql(table, "t.dezena"), (10,)))
+        queries.append((f"intervalo: {table}", f"SELECT t.{cid}, t.dezena FROM {table} t WHERE t.{cid} <= ? ORDER BY t.{cid}, t.rowid;", (10,)))
+    draws = config_obj.MAIN_DRAWS_TABLE_NAME
+    balls = ", ".join(config_obj.BALL_NUMBER_COLUMNS)
+    queries += [
+        ("frequencia recente", f"SELECT {cid}, dezena FROM {config_obj.FLAT_DRAWS_TABLE_NAME} WHERE {cid} BETWEEN ? AND ?;", (1, 10)),
+        ("sorteio por concurso", f"SELECT {balls} FROM {draws} WHERE {cid} = ?", (5,)),
+        ("sorteios do ciclo", f"SELECT {balls} FROM {draws} WHERE {cid} BETWEEN ? AND ?", (1, 5)),
+        ("ciclos fechados", f"SELECT ciclo_num, concurso_inicio, concurso_fim, duracao_concursos FROM {config_obj.ANALYSIS_CYCLES_DETAIL_TABLE_NAME} "
+                            f"WHERE concurso_fim <= ? ORDER BY concurso_fim ASC, ciclo_num ASC;", (10,)),
+        ("itemsets", f"""WITH RankedItemsets AS (
+                SELECT itemset_str, k, support, ROW_NUMBER() OVER (PARTITION BY itemset_str, k ORDER BY {cid} DESC) as rn
+                FROM {config_obj.ANALYSIS_ITEMSET_METRICS_TABLE_NAME} im WHERE im.{cid} <= ? AND im.k IN (?, ?))
+            SELECT itemset_str, k, support FROM RankedItemsets WHERE rn = 1;""", (10, 2, 3)),
+    ]
+    return queries
+
+
+def test_apply_schema_is_versioned_and_idempotent(tmp_path):
+    db = DatabaseManager(str(tmp_path / "schema.db"))
+    try:
+        first = apply_schema(db, config_obj)
+        assert first['applied_migrations'] == list(range(1, SCHEMA_VERSION + 1))
+        assert get_schema_version(db) == SCHEMA_VERSION
+        assert apply_schema(db, config_obj)['applied_migrations'] == []
+
+        indexes = _index_names(db)
+        assert f"idx_{config_obj.ANALYSIS_DELAYS_TABLE_NAME}_dezena_contest_id" in indexes
+        assert f"idx_{config_obj.ANALYSIS_CYCLES_DETAIL_TABLE_NAME}_concurso_fim" in indexes
+        assert f"idx_{config_obj.ANALYSIS_DELAYS_TABLE_NAME}_contest_id" not in indexes # coberto pela chave primária
+
+        # Tabela recriada com outras colunas perde a chave primária: os índices declarados voltam.
+        db.save_dataframe(pd.DataFrame({'contest_id': [1], 'dezena': [2], 'current_delay': [0]}), config_obj.ANALYSIS_DELAYS_TABLE_NAME)
+        indexes = _index_names(db)
+        assert {f"idx_{config_obj.ANALYSIS_DELAYS_TABLE_NAME}_dezena_contest_id", f"idx_{config_obj.ANALYSIS_DELAYS_TABLE_NAME}_contest_id"} <= indexes
+    finally:
+        db.close()
+
+
+def test_hot_queries_do_not_scan_full_tables(tmp_path):
+    db = DatabaseManager(str(tmp_path / "schema.db"))
+    try:
+        apply_schema(db, config_obj)
+        assert full_table_scans(db, f"SELECT * FROM {config_obj.ANALYSIS_DELAYS_TABLE_NAME} WHERE avg_delay > ?", (1.0,))
+        for name, sql, params in _hot_queries(db):
+            assert full_table_scans(db, sql, params) == [], name
+        with pytest.raises(ValueError):
+            full_table_scans(db, "SELECT * FROM tabela_inexistente")
+    finally:
+        db.close()
+
+
+def test_sync_draws_tables_rewrites_corrected_contests(tmp_path):
+    """ Concursos corrigidos nos dados (ou --force-reload) regravam as tabelas de sorteios, mantendo o DDL. """
+    from src.data_loader import sync_draws_tables
+    cid = config_obj.CONTEST_ID_COLUMN_NAME
+    balls = list(config_obj.BALL_NUMBER_COLUMNS)
+    db = DatabaseManager(str(tmp_path / "draws.db"))
+    apply_schema(db, config_obj)
+    df = pd.DataFrame([[c] + list(range(1 + c % 5, 16 + c % 5)) for c in range(1, 7)], columns=[cid] + balls)
+    df.insert(1, config_obj.DATE_COLUMN_NAME, pd.date_range('2020-01-01', periods=6))
+    flat_sql = f"SELECT dezena FROM {config_obj.FLAT_DRAWS_TABLE_NAME} WHERE {cid} = 3 ORDER BY dezena"
+    draws_sql = f"SELECT {balls[-1]} FROM {config_obj.MAIN_DRAWS_TABLE_NAME} WHERE {cid} = 3"
+
+    assert sync_draws_tables(db, df.iloc[:4], config_obj) == 4
+    assert sync_draws_tables(db, df, config_obj) == 2 # só os novos
+    assert sync_draws_tables(db, df, config_obj) == 0
+
+    corrected = df.copy()
+    corrected.loc[corrected[cid] == 3, balls[-1]] = 25
+    assert sync_draws_tables(db, corrected, config_obj) == 6
+    assert db.execute_query(draws_sql).iloc[0, 0] == 25
+    assert 25 in db.execute_query(flat_sql)['dezena'].tolist() and 18 not in db.execute_query(flat_sql)['dezena'].tolist()
+    ddl = db.execute_query(f"SELECT sql FROM sqlite_master WHERE name = '{config_obj.MAIN_DRAWS_TABLE_NAME}'").iloc[0, 0]
+    assert 'PRIMARY KEY' in ddl
+
+    assert sync_draws_tables(db, corrected, config_obj) == 0
+    assert sync_draws_tables(db, corrected, config_obj, force_full_rewrite=True) == 6
+    assert len(db.execute_query(f"SELECT * FROM {config_obj.MAIN_DRAWS_TABLE_NAME}")) == 6
+
+    removed = corrected[corrected[cid] != 2]
+    assert sync_draws_tables(db, removed, config_obj) == 5
+    assert 2 not in db.execute_query(f"SELECT {cid} FROM {config_obj.MAIN_DRAWS_TABLE_NAME}")[cid].tolist()
+    assert 2 not in db.execute_query(f"SELECT {cid} FROM {config_obj.FLAT_DRAWS_TABLE_NAME}")[cid].tolist()
@@ -0,0 +1,37 @@
+# tests/test_delay_history.py
+
+import pandas as pd
+
+from src.config import config_obj
+from src.analysis.delay_analysis import (
+    get_draw_matrix,
+    calculate_current_delay,
+    calculate_max_delay,
+    calculate_mean_delay,
+    calculate_delay_history,
+)
+
+
+def test_delay_history_matches_prefix_functions(draws_df):
+    """ O kernel de passada única deve reproduzir as funções de atraso por prefixo. """
+    # Sorteios esparsos (com lacunas de concurso) para exercitar dezenas nunca sorteadas.
+    df = draws_df(contest_ids=[1, 2, 4, 5, 8] + list(range(10, 30)), seed=7, size=5)
+    cid_col = config_obj.CONTEST_ID_COLUMN_NAME
+    targets = [5, 10, 17, 29]
+    history = calculate_delay_history(df, config_obj, targets)
+    assert sorted(history[cid_col].unique().tolist()) == targets
+
+    for cid in targets:
+        matrix = get_draw_matrix(df[df[cid_col] <= cid], config_obj)
+        first, last = matrix.index.min(), matrix.index.max()
+        current = calculate_current_delay(matrix, config_obj, last).set_index('Dezena')['Atraso Atual']
+        max_delay = calculate_max_delay(matrix, config_obj, first, last).set_index('Dezena')['Atraso Maximo']
+        mean_delay = calculate_mean_delay(matrix, config_obj).set_index('Dezena')['Atraso Medio']
+
+        rows = history[history[cid_col] == cid].set_index(config_obj.DEZENA_COLUMN_NAME)
+        for dezena in config_obj.ALL_NUMBERS:
+            assert rows.loc[dezena, config_obj.CURRENT_DELAY_COLUMN_NAME] == current[dezena]
+            assert rows.loc[dezena, config_obj.MAX_DELAY_OBSERVED_COLUMN_NAME] == max_delay[dezena]
+            expected_mean = mean_delay[dezena]
+            got_mean = rows.loc[dezena, config_obj.AVG_DELAY_COLUMN_NAME]
+            assert (pd.isna(expected_mean) and pd.isna(got_mean)) or got_mean == expected_mean
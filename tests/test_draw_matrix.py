@@ -0,0 +1,33 @@
+# tests/test_draw_matrix.py
+
+import numpy as np
+
+from src.config import config_obj
+from src.analysis.draw_matrix import build_draw_matrix, get_draw_matrix_provider
+
+
+_DRAWS = {3: range(11, 26), 1: range(1, 16), 2: range(6, 21)} # fora de ordem de concurso
+
+
+def test_build_draw_matrix_sorted_presence_and_bitmasks(draws_df):
+    """ Linhas ordenadas por concurso, 15 dezenas por linha e máscara de bits coerente. """
+    matrix = build_draw_matrix(draws_df(draws=_DRAWS), config_obj)
+    assert matrix.contest_ids.tolist() == [1, 2, 3]
+    assert matrix.presence.sum(axis=1).tolist() == [15, 15, 15]
+    assert int(matrix.bitmasks[0]) == (1 << 15) - 1
+    assert int(matrix.bitmasks[2]) == ((1 << 25) - 1) & ~((1 << 10) - 1)
+
+
+def test_provider_is_cached_and_slices_are_views(draws_df):
+    """ O provedor reaproveita a matriz para o mesmo DataFrame e fatia sem copiar. """
+    df = draws_df(draws=_DRAWS)
+    matrix = get_draw_matrix_provider(df, config_obj)
+    assert get_draw_matrix_provider(df, config_obj) is matrix
+
+    sliced = matrix.slice(2, 3)
+    assert sliced.contest_ids.tolist() == [2, 3]
+    assert np.shares_memory(sliced.presence, matrix.presence)
+
+    ranged = matrix.to_dataframe_for_range(0, 2)
+    assert ranged.loc[0].sum() == 0
+    assert ranged.loc[2, 6] == 1 and ranged.loc[2, 5] == 0
@@ -0,0 +1,58 @@
+# tests/test_frequency_history.py
+
+import pandas as pd
+import pytest
+
+from src.config import config_obj
+from src.analysis.frequency_analysis import (
+    calculate_frequency,
+    calculate_relative_frequency,
+    calculate_cumulative_frequency_history,
+)
+
+
+@pytest.fixture
+def draws_df(draws_df):
+    """ Sorteios sintéticos com as colunas de bolas do config. """
+    return draws_df(40, seed=42)
+
+
+def _reference_history(df):
+    """ Caminho antigo: recalcula cada prefixo do histórico. """
+    cid_col = config_obj.CONTEST_ID_COLUMN_NAME
+    frames = []
+    for cid in sorted(df[cid_col].unique()):
+        upto = df[df[cid_col] <= cid]
+        abs_df = calculate_frequency(upto, config_obj)
+        rel_df = calculate_relative_frequency(abs_df, upto[cid_col].nunique(), config_obj)
+        frames.append(pd.DataFrame({
+            cid_col: cid,
+            config_obj.DEZENA_COLUMN_NAME: rel_df['Dezena'],
+            config_obj.FREQUENCY_COLUMN_NAME: rel_df['Frequencia Absoluta'],
+            config_obj.RELATIVE_FREQUENCY_COLUMN_NAME: rel_df['Frequencia Relativa'],
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_cumulative_history_matches_prefix_recalculation(draws_df):
+    """ O contador acumulado deve reproduzir o cálculo por prefixo. """
+    expected = _reference_history(draws_df)
+    result = calculate_cumulative_frequency_history(draws_df, config_obj)
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected, check_dtype=False)
+
+
+def test_cumulative_history_resume_from_saved_counts(draws_df):
+    """ A retomada a partir das contagens salvas só emite os concursos novos. """
+    cid_col = config_obj.CONTEST_ID_COLUMN_NAME
+    full = calculate_cumulative_frequency_history(draws_df, config_obj)
+    saved = full[full[cid_col] == 25]
+    base_counts = dict(zip(saved[config_obj.DEZENA_COLUMN_NAME], saved[config_obj.FREQUENCY_COLUMN_NAME]))
+
+    resumed = calculate_cumulative_frequency_history(
+        draws_df, config_obj, start_after_contest_id=25, base_counts=base_counts, base_total_draws=25
+    )
+    assert resumed[cid_col].min() == 26
+    pd.testing.assert_frame_equal(
+        resumed.reset_index(drop=True),
+        full[full[cid_col] > 25].reset_index(drop=True)
+    )
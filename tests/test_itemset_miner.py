@@ -0,0 +1,72 @@
+# tests/test_itemset_miner.py
+
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.combination_analysis import CombinationAnalyzer
+from src.analysis.itemset_miner import build_item_bitsets, mine_frequent_itemsets_eclat
+
+
+def _transactions(n=80, seed=11):
+    rng = np.random.default_rng(seed)
+    return [sorted(rng.choice(np.arange(1, 11), 6, replace=False).tolist()) for _ in range(n)]
+
+
+def _brute_force(transactions, min_support, max_len):
+    sets = [set(t) for t in transactions]
+    items = sorted(set().union(*sets))
+    found = {}
+    for length in range(1, max_len + 1):
+        for itemset in combinations(items, length):
+            count = sum(1 for s in sets if s.issuperset(itemset))
+            if count / len(sets) >= min_support:
+                found[itemset] = count
+    return found
+
+
+def test_eclat_matches_brute_force():
+    """ Todos os itemsets com suporte >= mínimo, com as contagens corretas e respeitando max_len. """
+    transactions = _transactions()
+    mined = mine_frequent_itemsets_eclat(build_item_bitsets(transactions), len(transactions), 0.15, max_len=4)
+    assert dict(mined) == _brute_force(transactions, 0.15, 4)
+
+
+def test_eclat_max_itemsets_cap():
+    """ O limite corta tamanhos inteiros: todo subconjunto de um itemset retornado está no resultado. """
+    transactions = _transactions()
+    complete = _brute_force(transactions, 0.05, 10)
+    for cap in (25, 60, 200):
+        mined = dict(mine_frequent_itemsets_eclat(build_item_bitsets(transactions), len(transactions), 0.05, max_itemsets=cap))
+        assert len(mined) <= cap
+        kept_lengths = {len(itemset) for itemset in mined}
+        assert mined == {itemset: count for itemset, count in complete.items() if len(itemset) in kept_lengths}
+        assert kept_lengths == set(range(1, len(kept_lengths) + 1))
+
+
+def test_capped_mining_feeds_association_rules():
+    """ Itemsets de uma mineração com limite geram regras sem subconjuntos faltando. """
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({'drawn_numbers': [sorted(rng.choice(np.arange(1, 26), 15, replace=False).tolist()) for _ in range(200)]})
+    analyzer = CombinationAnalyzer(list(range(1, 26)))
+    _, raw = analyzer.analyze_frequent_itemsets(df, 0.25, min_len=2, max_len=3, max_itemsets=340)
+    assert len(raw) == 25 + 300 # os 57 trios não cabem inteiros no limite
+    supports = dict(zip(raw['itemsets'], raw['support']))
+    assert all(frozenset(subset) in supports for itemset in supports for subset in combinations(itemset, len(itemset) - 1) if subset)
+    rules = analyzer.generate_association_rules(raw, metric="confidence", min_threshold=0.1)
+    assert not rules.empty
+
+
+def test_analyze_frequent_itemsets_output_shape():
+    """ Saída para o banco com itemset_str '-' e saída bruta no formato do apriori (support, itemsets). """
+    df = pd.DataFrame({'drawn_numbers': _transactions()})
+    df_for_db, raw = CombinationAnalyzer(list(range(1, 11))).analyze_frequent_itemsets(df, 0.15, min_len=2, max_len=3)
+    assert list(df_for_db.columns) == ['itemset_str', 'support', 'length', 'frequency_count']
+    assert list(raw.columns) == ['support', 'itemsets']
+    assert df_for_db['length'].between(2, 3).all()
+    assert raw['itemsets'].map(len).is_monotonic_increasing
+    expected = _brute_force(df['drawn_numbers'].tolist(), 0.15, 3)
+    for row in df_for_db.itertuples():
+        itemset = tuple(int(n) for n in row.itemset_str.split('-'))
+        assert expected[itemset] == row.frequency_count
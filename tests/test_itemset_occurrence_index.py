@@ -0,0 +1,46 @@
+# tests/test_itemset_occurrence_index.py
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.config import config_obj
+from src.analysis.frequent_itemset_metrics_analysis import calculate_frequent_itemset_delay_metrics
+from src.analysis.itemset_occurrence_index import build_itemset_occurrence_index
+
+
+_DRAWS = {1: range(1, 16), 2: range(11, 26), 4: range(1, 16), 9: list(range(1, 8)) + list(range(18, 26))}
+
+
+def test_vertical_and_horizontal_lookups_agree(draws_df):
+    """ AND dos bitmaps por dezena e (máscara & m) == m encontram os mesmos concursos. """
+    index = build_itemset_occurrence_index(draws_df(draws=_DRAWS, drawn_numbers=True), config_obj)
+    for itemset in ([1, 2], [11, 15], [20], [1, 25], [1, 2, 3, 4, 5, 6, 7]):
+        mask = index.itemset_mask(itemset)
+        horizontal = index.contest_ids[(index.draw_masks & mask) == mask]
+        assert index.occurrence_contests(itemset).tolist() == horizontal.tolist()
+        assert index.support_count(itemset) == len(horizontal)
+    assert index.occurrence_contests([1, 2]).tolist() == [1, 4, 9]
+
+
+def test_delay_metrics_for_itemsets(draws_df):
+    """ Atraso atual, médio, máximo e desvio entre ocorrências; itemset sem ocorrências usa a idade dos dados. """
+    itemsets_df = pd.DataFrame({
+        'itemset_str': ['01-02', '16-17', '08-17'],
+        'length': [2, 2, 2], 'support': [0.75, 0.5, 0.0], 'frequency_count': [3, 2, 0],
+    })
+    result = calculate_frequent_itemset_delay_metrics(draws_df(draws=_DRAWS, drawn_numbers=True), itemsets_df, 10, config_obj).set_index('itemset_str')
+
+    assert json.loads(result.loc['01-02', 'occurrences_draw_ids']) == [1, 4, 9]
+    assert result.loc['01-02', 'current_delay'] == 1
+    assert result.loc['01-02', 'max_delay'] == 4
+    assert result.loc['01-02', 'mean_delay'] == 3.0
+    assert np.isclose(result.loc['01-02', 'std_dev_delay'], np.std([2, 4], ddof=1))
+
+    assert result.loc['16-17', 'last_occurrence_contest_id'] == 2
+    assert np.isnan(result.loc['16-17', 'std_dev_delay'])
+
+    assert pd.isna(result.loc['08-17', 'last_occurrence_contest_id'])
+    assert result.loc['08-17', 'current_delay'] == 10
+    assert result.loc['08-17', 'max_delay'] == 10
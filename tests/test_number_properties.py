@@ -0,0 +1,67 @@
+# tests/test_number_properties.py
+
+import numpy as np
+
+from src.analysis.draw_matrix import build_draw_matrix
+from src.analysis.number_properties_analysis import (
+    BASE_PROPERTY_COLUMNS,
+    FIBONACCI_UP_TO_25,
+    PRIMES_UP_TO_25,
+    analyze_number_properties,
+    build_property_kernel,
+)
+from src.config import config_obj
+
+
+def _incomplete_every_10th(contest):
+    return 13 if contest % 10 == 0 else 15 # sorteios incompletos ficam fora da tabela
+
+
+def _reference_properties(draw):
+    """ Propriedades de um sorteio dezena a dezena. """
+    lines = list(config_obj.LOTOFACIL_GRID_LINES.values())
+    columns = list(config_obj.LOTOFACIL_GRID_COLUMNS.values())
+    frame = set(lines[0]) | set(lines[-1]) | set(columns[0]) | set(columns[-1])
+    runs, current = [], 1
+    for previous, number in zip(draw, draw[1:]):
+        if number == previous + 1:
+            current += 1
+        else:
+            runs.append(current); current = 1
+    runs.append(current)
+    expected = {
+        'soma_dezenas': sum(draw), 'pares': sum(n % 2 == 0 for n in draw), 'impares': sum(n % 2 for n in draw),
+        'primos': sum(n in PRIMES_UP_TO_25 for n in draw), 'fibonacci': sum(n in FIBONACCI_UP_TO_25 for n in draw),
+        'moldura': sum(n in frame for n in draw), 'miolo': sum(n not in frame for n in draw),
+        'sequencias': sum(run >= 2 for run in runs), 'maior_sequencia': max(runs),
+    }
+    expected.update({f'linha_{k}': len(set(draw) & set(line)) for k, line in enumerate(lines, start=1)})
+    expected.update({f'coluna_{k}': len(set(draw) & set(column)) for k, column in enumerate(columns, start=1)})
+    return expected
+
+
+def test_property_table_matches_per_draw_reference(draws_df):
+    df = draws_df(120, seed=11, size=_incomplete_every_10th)
+    table = analyze_number_properties(df, config_obj)
+    assert table.columns[:5].tolist() == ['Concurso'] + BASE_PROPERTY_COLUMNS
+    complete = df[df[config_obj.BALL_NUMBER_COLUMNS].notna().all(axis=1)]
+    assert table['Concurso'].tolist() == complete[config_obj.CONTEST_ID_COLUMN_NAME].tolist()
+    for (_, row), (_, props) in zip(complete.iterrows(), table.iterrows()):
+        draw = sorted(int(n) for n in row[config_obj.BALL_NUMBER_COLUMNS])
+        expected = _reference_properties(draw)
+        assert {name: int(props[name]) for name in expected} == expected
+
+
+def test_range_means_match_table_means(draws_df):
+    df = draws_df(120, seed=11, size=_incomplete_every_10th)
+    draw_matrix = build_draw_matrix(df, config_obj)
+    kernel = build_property_kernel(config_obj)
+    table = kernel.table(draw_matrix)
+    starts, ends = [1, 15, 50, 200], [10, 48, 120, 210]
+    means = kernel.range_means(draw_matrix, starts, ends)
+    for k, (start, end) in enumerate(zip(starts, ends)):
+        in_range = table[table['Concurso'].between(start, end)]
+        assert means['draws'][k] == len(in_range)
+        for name in kernel.property_names:
+            expected = in_range[name].mean() if len(in_range) else np.nan
+            np.testing.assert_allclose(means[name][k], expected, equal_nan=True)
@@ -0,0 +1,204 @@
+# tests/test_orchestrator.py
+
+import pandas as pd
+import pytest
+
+from src.orchestrator import Orchestrator
+from src.database_manager import DatabaseManager
+
+
+def _produce(db_manager, shared_context):
+    db_manager.save_dataframe(pd.DataFrame({'x': [1, 2]}), 'tmp_produced')
+    shared_context['produced_extra'] = 'ok'
+    return 7
+
+
+def _consume(db_manager, shared_context, produced_value):
+    rows = db_manager.execute_query("SELECT COUNT(*) AS n FROM tmp_produced")
+    return produced_value == 7 and shared_context.get('produced_extra') == 'ok' and int(rows['n'].iloc[0]) == 2
+
+
+def _independent(shared_context):
+    return True
+
+
+PIPELINE = [
+    {"name": "produce", "func": _produce, "args": ["db_manager", "shared_context"], "output_key": "produced_value"},
+    {"name": "independent", "func": _independent, "args": ["shared_context"]},
+    {"name": "consume", "func": _consume, "args": ["db_manager", "shared_context", "produced_value"],
+     "output_key": "consume_ok"},
+    {"name": "after_independent", "func": _independent, "args": ["shared_context"], "depends_on": ["independent"]},
+]
+
+
+def test_dependency_graph_from_args_and_depends_on():
+    """ Arestas vêm de args/output_key e de 'depends_on' (apenas etapas anteriores). """
+    orchestrator = Orchestrator(PIPELINE, db_manager=None)
+    assert orchestrator.build_dependency_graph() == [set(), set(), {0}, {1}]
+
+
+def test_depends_on_later_step_raises_and_missing_step_warns(caplog):
+    """ 'depends_on' apontando para etapa posterior é erro de ordem; etapa fora do pipeline gera aviso. """
+    forward = [
+        {"name": "reader", "func": _independent, "args": ["shared_context"], "depends_on": ["writer"]},
+        {"name": "writer", "func": _independent, "args": ["shared_context"]},
+    ]
+    with pytest.raises(ValueError, match="writer"):
+        Orchestrator(forward, db_manager=None).build_dependency_graph()
+    with pytest.raises(ValueError):
+        Orchestrator(forward, db_manager=None).run()
+
+    missing = [{"name": "reader", "func": _independent, "args": ["shared_context"], "depends_on": ["not_selected"]}]
+    with caplog.at_level("WARNING", logger="src.orchestrator"):
+        assert Orchestrator(missing, db_manager=None).build_dependency_graph() == [set()]
+    assert "not_selected" in caplog.text
+
+
+def test_parallel_run_matches_sequential(tmp_path):
+    """ Com workers, resultados e chaves de contexto gravadas pelas etapas voltam ao processo principal. """
+    for workers in (1, 2):
+        with DatabaseManager(db_path=str(tmp_path / f"pipeline_{workers}.db")) as db_m:
+            orchestrator = Orchestrator(PIPELINE, db_manager=db_m, max_workers=workers)
+            orchestrator.set_shared_context('shared_context', orchestrator.shared_context)
+            orchestrator.run()
+            assert orchestrator.get_shared_context_value('consume_ok') is True
+            assert orchestrator.get_shared_context_value('produced_extra') == 'ok'
+
+
+CALLS = {'produce': 0, 'consume': 0}
+
+
+def _counted_produce(db_manager, shared_context, all_data_df, scale=1):
+    CALLS['produce'] += 1
+    shared_context['produced_extra'] = 'ok'
+    return int(all_data_df['ball_1'].sum()) * scale
+
+
+def _counted_consume(produced_value):
+    CALLS['consume'] += 1
+    return produced_value > 0
+
+
+def _cached_pipeline(scale=1):
+    return [
+        {"name": "produce", "func": _counted_produce, "args": ["db_manager", "shared_context", "all_data_df"],
+         "kwargs": {"scale": scale}, "output_key": "produced_value"},
+        {"name": "consume", "func": _counted_consume, "args": ["produced_value"], "output_key": "consume_ok"},
+    ]
+
+
+def _run_cached(pipeline, db_path, cache_dir, draws_df):
+    from src.step_cache import StepResultCache
+    with DatabaseManager(db_path=db_path) as db_m:
+        orchestrator = Orchestrator(pipeline, db_manager=db_m, step_cache=StepResultCache(cache_dir))
+        orchestrator.set_shared_context('all_data_df', draws_df)
+        orchestrator.set_shared_context('shared_context', orchestrator.shared_context)
+        orchestrator.run()
+        return orchestrator
+
+
+def test_step_cache_skips_unchanged_steps_and_restores_outputs(tmp_path):
+    """ Segunda execução sem mudanças não roda as etapas; mudanças nos dados/kwargs/banco invalidam. """
+    CALLS.update(produce=0, consume=0)
+    draws = pd.DataFrame({'contest_id': [1, 2], 'ball_1': [1, 2]})
+    db_path, cache_dir = str(tmp_path / "cache.db"), str(tmp_path / "step_cache")
+
+    _run_cached(_cached_pipeline(), db_path, cache_dir, draws)
+    orchestrator = _run_cached(_cached_pipeline(), db_path, cache_dir, draws)
+    assert CALLS == {'produce': 1, 'consume': 1}
+    assert orchestrator.get_shared_context_value('produced_value') == 3
+    assert orchestrator.get_shared_context_value('produced_extra') == 'ok'
+    assert orchestrator.get_shared_context_value('consume_ok') is True
+
+    _run_cached(_cached_pipeline(scale=2), db_path, cache_dir, draws)
+    assert CALLS == {'produce': 2, 'consume': 2}
+
+    new_draws = pd.DataFrame({'contest_id': [1, 2, 3], 'ball_1': [1, 2, 4]})
+    _run_cached(_cached_pipeline(scale=2), db_path, cache_dir, new_draws)
+    assert CALLS == {'produce': 3, 'consume': 3}
+
+    _run_cached(_cached_pipeline(scale=2), str(tmp_path / "other.db"), cache_dir, new_draws)
+    assert CALLS == {'produce': 4, 'consume': 4}
+
+
+def test_step_identity_covers_indirectly_imported_modules(tmp_path, monkeypatch):
+    """ Editar um módulo alcançado só indiretamente pela etapa muda a impressão digital. """
+    import importlib
+    from src.step_cache import _project_source_files, function_identity
+
+    package_dir = tmp_path / "cache_fixture_pkg"
+    package_dir.mkdir()
+    (package_dir / "__init__.py").write_text("")
+    (package_dir / "helper.py").write_text("def compute(x):\n    return x + 1\n")
+    (package_dir / "analysis.py").write_text("from cache_fixture_pkg.helper import compute\n\ndef analyze(x):\n    return compute(x)\n")
+    (package_dir / "step.py").write_text("from cache_fixture_pkg.analysis import analyze\n\ndef run_step(x):\n    return analyze(x)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    step = importlib.import_module("cache_fixture_pkg.step")
+
+    assert str(package_dir / "helper.py") in _project_source_files(step.run_step)
+    identity = function_identity(step.run_step)
+    (package_dir / "helper.py").write_text("def compute(x):\n    return x + 2\n")
+    assert function_identity(step.run_step) != identity
+
+    from src.pipeline_steps.execute_detailed_cycle_metrics import run_detailed_cycle_metrics_step
+    reached = {path.replace('\\', '/').rsplit('/src/', 1)[-1] for path in _project_source_files(run_detailed_cycle_metrics_step)}
+    assert {'analysis/chunk_engine.py', 'analysis/block_aggregator.py', 'analysis/draw_matrix.py',
+            'analysis/number_properties_analysis.py'} <= reached
+
+
+def test_step_cache_misses_after_editing_indirect_module(tmp_path, monkeypatch):
+    """ Orchestrator reexecuta a etapa quando um módulo indireto muda. """
+    import importlib
+
+    package_dir = tmp_path / "cache_fixture_run_pkg"
+    package_dir.mkdir()
+    (package_dir / "__init__.py").write_text("")
+    (package_dir / "helper.py").write_text("SCALE = 1\n")
+    (package_dir / "analysis.py").write_text("from cache_fixture_run_pkg import helper\n\ndef analyze():\n    return helper.SCALE\n")
+    (package_dir / "step.py").write_text(
+        "from cache_fixture_run_pkg.analysis import analyze\nCALLS = []\n\n"
+        "def run_step(all_data_df):\n    CALLS.append(1)\n    return analyze()\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    step = importlib.import_module("cache_fixture_run_pkg.step")
+    pipeline = [{"name": "indirect", "func": step.run_step, "args": ["all_data_df"], "output_key": "indirect_value"}]
+    draws = pd.DataFrame({'contest_id': [1, 2], 'ball_1': [1, 2]})
+    db_path, cache_dir = str(tmp_path / "cache.db"), str(tmp_path / "step_cache")
+
+    _run_cached(pipeline, db_path, cache_dir, draws)
+    _run_cached(pipeline, db_path, cache_dir, draws)
+    assert len(step.CALLS) == 1
+    (package_dir / "helper.py").write_text("SCALE = 2\n")
+    _run_cached(pipeline, db_path, cache_dir, draws)
+    assert len(step.CALLS) == 2
+
+
+def _counted_table_writer(db_manager, all_data_df):
+    CALLS['produce'] += 1
+    db_manager.save_dataframe(all_data_df, 'tmp_step_output')
+    return True
+
+
+def test_step_cache_reruns_when_output_tables_changed(tmp_path):
+    """ Tabela de saída apagada ou sobrescrita por outra gravação invalida o cache da etapa. """
+    CALLS.update(produce=0, consume=0)
+    pipeline = [{"name": "writer", "func": _counted_table_writer, "args": ["db_manager", "all_data_df"], "output_key": "written"}]
+    draws = pd.DataFrame({'contest_id': [1, 2], 'ball_1': [1, 2]})
+    db_path, cache_dir = str(tmp_path / "cache.db"), str(tmp_path / "step_cache")
+
+    _run_cached(pipeline, db_path, cache_dir, draws)
+    _run_cached(pipeline, db_path, cache_dir, draws)
+    assert CALLS['produce'] == 1
+
+    with DatabaseManager(db_path=db_path) as db_m:
+        db_m.save_dataframe(pd.DataFrame({'contest_id': [9, 9], 'ball_1': [0, 0]}), 'tmp_step_output') # mesmo nº de linhas
+    _run_cached(pipeline, db_path, cache_dir, draws)
+    assert CALLS['produce'] == 2
+
+    with DatabaseManager(db_path=db_path) as db_m:
+        db_m.conn.execute("DROP TABLE tmp_step_output")
+    _run_cached(pipeline, db_path, cache_dir, draws)
+    assert CALLS['produce'] == 3
+    with DatabaseManager(db_path=db_path) as db_m:
+        assert len(db_m.load_dataframe('tmp_step_output')) == 2
+    _run_cached(pipeline, db_path, cache_dir, draws)
+    assert CALLS['produce'] == 3
@@ -0,0 +1,101 @@
+# tests/test_parameter_search.py
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.analysis_aggregator import AnalysisAggregator
+from src.backtester.evaluator import evaluate_hits
+from src.backtester.parameter_search import StrategyParameterSearch, walk_forward_windows
+from src.config import config_obj
+from src.database_manager import DatabaseManager
+from src.scorer import ScorerManager
+
+
+def _setup(tmp_path, draws_df, n=40, seed=2):
+    all_draws_df = draws_df(n, seed=seed)
+    draws = all_draws_df[config_obj.BALL_NUMBER_COLUMNS].to_numpy().tolist()
+
+    db = DatabaseManager(str(tmp_path / "search.db"))
+    flat = pd.DataFrame([(c, d) for c, row in enumerate(draws, start=1) for d in row], columns=['contest_id', 'dezena'])
+    db.save_dataframe(flat, config_obj.FLAT_DRAWS_TABLE_NAME)
+    last_seen, delays = {d: 0 for d in range(1, 26)}, []
+    for c, row in enumerate(draws, start=1):
+        for d in row:
+            last_seen[d] = c
+        delays.extend((c, d, c - last_seen[d]) for d in range(1, 26))
+    db.save_dataframe(pd.DataFrame(delays, columns=['contest_id', 'dezena', 'current_delay']), config_obj.ANALYSIS_DELAYS_TABLE_NAME)
+    scorer = ScorerManager(db, AnalysisAggregator(db, config_obj), {})
+    return db, scorer, all_draws_df, draws
+
+
+def test_walk_forward_windows():
+    assert walk_forward_windows(21, 45, 10) == [(21, 30), (31, 40), (41, 45)]
+    assert walk_forward_windows(1, 20, 10, step=5) == [(1, 10), (6, 15), (11, 20)]
+
+
+def test_grid_search_matches_direct_evaluation_and_resumes(tmp_path, draws_df):
+    db, scorer, all_draws_df, draws = _setup(tmp_path, draws_df)
+    try:
+        grid = {'delay_weight': [0.2, 0.8], 'frequency_weight': [0.5]}
+        checkpoint = str(tmp_path / "checkpoint.jsonl")
+        search = StrategyParameterSearch(scorer, 'SimpleRecencyAndDelayStrategy', grid, all_draws_df, config_obj,
+                                         start_contest=21, end_contest=40, window_size=10, checkpoint_path=checkpoint)
+        ranking = search.run()
+        assert len(ranking) == 2 and len(search.walk_forward_selection) == 1
+
+        for params in search.candidates:
+            direct = []
+            for contest in range(21, 41):
+                chosen = scorer.select_numbers_for_strategy('SimpleRecencyAndDelayStrategy', contest - 1, 15, params)
+                direct.append(evaluate_hits(set(chosen), set(draws[contest - 1])))
+            row = ranking[ranking['param_delay_weight'] == params['delay_weight']].iloc[0]
+            assert row['mean_hits'] == np.mean(direct)
+
+        resumed = StrategyParameterSearch(scorer, 'SimpleRecencyAndDelayStrategy', grid, all_draws_df, config_obj,
+                                          start_contest=21, end_contest=40, window_size=10, checkpoint_path=checkpoint)
+        pd.testing.assert_frame_equal(resumed.run(), ranking)
+        with open(checkpoint, encoding='utf-8') as handle:
+            assert len(handle.readlines()) == 4 # nenhuma tarefa reexecutada
+    finally:
+        db.close()
+
+
+def test_default_checkpoint_changes_with_draws_and_analysis_tables(tmp_path, monkeypatch, draws_df):
+    db, scorer, all_draws_df, _ = _setup(tmp_path, draws_df)
+    try:
+        monkeypatch.setattr(config_obj, 'PARAMETER_SEARCH_CHECKPOINT_DIR', str(tmp_path / "checkpoints"))
+        grid = {'delay_weight': [0.5]}
+        def checkpoint(df):
+            return StrategyParameterSearch(scorer, 'SimpleRecencyAndDelayStrategy', grid, df, config_obj,
+                                           start_contest=21, end_contest=30, window_size=10).checkpoint_path
+        original = checkpoint(all_draws_df)
+        assert checkpoint(all_draws_df) == original
+        corrected = all_draws_df.copy()
+        corrected.loc[0, config_obj.BALL_NUMBER_COLUMNS] = list(range(1, 16))
+        assert checkpoint(corrected) != original
+        delays = db.load_dataframe(config_obj.ANALYSIS_DELAYS_TABLE_NAME)
+        db.save_dataframe(delays.assign(current_delay=delays['current_delay'] + 1), config_obj.ANALYSIS_DELAYS_TABLE_NAME)
+        assert checkpoint(all_draws_df) != original
+    finally:
+        db.close()
+
+
+def _crash_worker(*args, **kwargs):
+    os._exit(1)
+
+
+def test_broken_worker_pool_falls_back_to_serial(tmp_path, monkeypatch, draws_df):
+    import src.backtester.parameter_search as parameter_search
+    db, scorer, all_draws_df, _ = _setup(tmp_path, draws_df)
+    try:
+        grid = {'delay_weight': [0.2, 0.8]}
+        serial = StrategyParameterSearch(scorer, 'SimpleRecencyAndDelayStrategy', grid, all_draws_df, config_obj, start_contest=21,
+                                         end_contest=40, window_size=10, checkpoint_path=str(tmp_path / "serial.jsonl")).run()
+        monkeypatch.setattr(parameter_search, '_evaluate_in_worker', _crash_worker)
+        search = StrategyParameterSearch(scorer, 'SimpleRecencyAndDelayStrategy', grid, all_draws_df, config_obj, start_contest=21,
+                                         end_contest=40, window_size=10, max_workers=2, checkpoint_path=str(tmp_path / "broken.jsonl"))
+        pd.testing.assert_frame_equal(search.run(), serial)
+    finally:
+        db.close()
@@ -0,0 +1,42 @@
+# tests/test_sequence_analysis.py
+
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.sequence_analysis import analyze_sequences, count_progressions, draws_to_bitmasks
+from src.config import config_obj
+
+
+def _reference_progressions(draw, step, length):
+    """ Progressões de razão 'step' testando todas as combinações do sorteio. """
+    return sorted(combo for combo in combinations(sorted(draw), length)
+                  if all(b - a == step for a, b in zip(combo, combo[1:])))
+
+
+def test_count_progressions_matches_combinations():
+    rng = np.random.default_rng(2)
+    draws = [sorted(rng.choice(np.arange(1, 26), 15, replace=False).tolist()) for _ in range(40)]
+    masks, valid = draws_to_bitmasks(draws + [None, [1, 2.0]])
+    assert valid.tolist() == [True] * 40 + [False, False]
+    for step in (1, 2, 3, 4):
+        progressions = count_progressions(masks, step, 2, 5)
+        for length in range(2, 6):
+            expected_counts = {}
+            for draw in draws:
+                for combo in _reference_progressions(draw, step, length):
+                    expected_counts[combo] = expected_counts.get(combo, 0) + 1
+            draws_with_any = sum(bool(_reference_progressions(draw, step, length)) for draw in draws)
+            assert progressions[length] == (draws_with_any, expected_counts)
+
+
+def test_analyze_sequences_counts_and_support():
+    draws = [[1, 2, 3, 4, 10, 12, 14], [5, 6, 7, 20, 22, 24, 25], [1, 3, 9, 11, 13, 15, 17], [2, 'x']]
+    metrics = analyze_sequences(pd.DataFrame({config_obj.CONTEST_ID_COLUMN_NAME: [1, 2, 3, 4], 'drawn_numbers': draws}), config_obj)
+    any_rows = metrics[metrics['specific_sequence'] == 'N/A'].set_index(['sequence_type', 'length'])['frequency_count']
+    assert any_rows[('consecutive_any', 3)] == 2 and any_rows[('consecutive_any', 4)] == 1 and any_rows[('consecutive_any', 5)] == 0
+    assert any_rows[('arithmetic_step_2_any', 3)] == 3 and any_rows[('arithmetic_step_2_any', 4)] == 1
+    specific = metrics.set_index('specific_sequence')
+    assert specific.loc['2-3-4', 'frequency_count'] == 1 and specific.loc['2-3-4', 'support'] == 0.25
+    assert specific.loc['11-13-15-17', 'sequence_type'] == 'arithmetic_step_2_specific'
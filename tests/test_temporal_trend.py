@@ -0,0 +1,55 @@
+# tests/test_temporal_trend.py
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.temporal_trend_analysis import (
+    calculate_moving_average_delay,
+    calculate_moving_average_frequency,
+    get_historical_delay_matrix,
+    rolling_means,
+)
+from src.config import config_obj
+
+
+def _occurrences(n_contests=90, seed=4):
+    rng = np.random.default_rng(seed)
+    contest_ids = np.sort(rng.choice(np.arange(5, 3 * n_contests), n_contests, replace=False)) # concursos com lacunas
+    presence = (rng.random((n_contests, 25)) < 0.6).astype(int)
+    presence[:, 24] = 0 # dezena que nunca sai
+    return pd.DataFrame(presence, index=pd.Index(contest_ids, name='Concurso'), columns=config_obj.ALL_NUMBERS)
+
+
+def test_delay_matrix_matches_contest_walk():
+    draw_matrix = _occurrences()
+    delays = get_historical_delay_matrix(draw_matrix, config_obj)
+    first_contest = int(draw_matrix.index.min())
+    for dezena in draw_matrix.columns:
+        last_seen = None
+        for contest_id, drawn in draw_matrix[dezena].items():
+            expected = contest_id - last_seen if last_seen is not None else contest_id - first_contest + 1
+            assert delays.loc[contest_id, dezena] == expected
+            if drawn == 1:
+                last_seen = contest_id
+
+
+def test_moving_averages_match_pandas_rolling():
+    draw_matrix = _occurrences()
+    delays = get_historical_delay_matrix(draw_matrix, config_obj)
+    windows = [5, 10, 20, 30]
+    ma_delay = calculate_moving_average_delay(delays, windows, config_obj)
+    ma_frequency = calculate_moving_average_frequency(draw_matrix, windows, config_obj)
+    assert len(ma_delay) == len(ma_frequency) == len(draw_matrix) * 25 * len(windows)
+    for ma_df, source, value_column in ((ma_delay, delays, 'MA_Atraso'), (ma_frequency, draw_matrix, 'MA_Frequencia')):
+        for (dezena, window_size), group in ma_df.groupby(['Dezena', 'Janela'], sort=False):
+            expected = source[dezena].astype(float).rolling(window=window_size, min_periods=1).mean()
+            assert group['Concurso'].tolist() == source.index.tolist()
+            np.testing.assert_allclose(group[value_column].to_numpy(), expected.to_numpy())
+
+
+def test_rolling_means_skip_nan_like_pandas():
+    values = np.array([[1.0], [np.nan], [3.0], [np.nan], [np.nan], [8.0]])
+    means = rolling_means(values, [2, 3])
+    for window_size, result in means.items():
+        expected = pd.Series(values[:, 0]).rolling(window=window_size, min_periods=1).mean().to_numpy()
+        np.testing.assert_allclose(result[:, 0], expected, equal_nan=True)